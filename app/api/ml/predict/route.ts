@@ -13,12 +13,19 @@ export async function POST(request: NextRequest) {
 
     const patientData = await request.json()
 
-    // Chama API Python de ML
+    // Chama API Python de ML, repassando o prazo do modelo principal
+    // (X-Deadline-Ms, ver DeadlineRouter em ml/fallback.py)
+    const headers: Record<string, string> = {
+      "Content-Type": "application/json",
+    }
+    const deadline = request.headers.get("X-Deadline-Ms")
+    if (deadline) {
+      headers["X-Deadline-Ms"] = deadline
+    }
+
     const response = await fetch(`${ML_API_URL}/predict`, {
       method: "POST",
-      headers: {
-        "Content-Type": "application/json",
-      },
+      headers,
       body: JSON.stringify(patientData),
     })
 
@@ -0,0 +1,245 @@
+#!/usr/bin/env python3
+"""
+Codemod runner for the Next.js app tree
+
+Discovers every route handler and page under app/ (route.ts, page.tsx, ...),
+applies the registered rewrite rules to each file in a single pass and writes
+the files that changed. Files whose content hash is already known to be a
+fixed point of the selected rules (see .codemod-cache.json) are skipped, so a
+re-run over an unchanged tree only reads and hashes the files.
+
+Usage:
+    python codemod.py                      # rewrite app/ in place
+    python codemod.py --dry-run            # print a unified diff, write nothing
+    python codemod.py --rule params-promise-type app/api
+    python codemod.py --list-rules
+
+Adding a rule: append a Rule to RULES. Patterns are compiled once at import,
+and the cache is keyed on this file's hash, so editing a rule invalidates it.
+"""
+
+import argparse
+import difflib
+import hashlib
+import json
+import os
+import re
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional, Tuple, Union
+
+TARGET_NAMES = {"route.ts", "route.tsx", "page.ts", "page.tsx", "page.js", "page.jsx"}
+SKIP_DIRS = {"node_modules", ".next", ".git"}
+CACHE_FILE = ".codemod-cache.json"
+
+# Below this many files to transform, starting worker processes costs more
+# than running the regexes inline
+PARALLEL_MIN_FILES = 32
+
+
+@dataclass(frozen=True)
+class Rule:
+    """A regex rewrite applied to the whole file content"""
+
+    name: str
+    description: str
+    pattern: "re.Pattern"
+    replacement: Union[str, Callable[["re.Match"], str]]
+    # Only applied to files where this pattern matches (checked on the
+    # content left by the previous rules)
+    requires: Optional["re.Pattern"] = None
+
+    def apply(self, content: str) -> Tuple[str, int]:
+        if self.requires is not None and not self.requires.search(content):
+            return content, 0
+        return self.pattern.subn(self.replacement, content)
+
+
+def _promise_params(match: "re.Match") -> str:
+    fields = re.sub(r"\s+", " ", match.group(1)).strip().rstrip(";").strip()
+    return f"{{ params }}: {{ params: Promise<{{ {fields} }}> }}"
+
+
+def _await_member(match: "re.Match") -> str:
+    indent, var_name, key = match.groups()
+    target = key if var_name == key else f"{key}: {var_name}"
+    return f"{indent}const {{ {target} }} = await params;"
+
+
+# Applied in order; each rule sees the output of the previous ones
+RULES: List[Rule] = [
+    Rule(
+        name="params-promise-type",
+        description="Next.js 15+: { params }: { params: { id: string } } -> { params: Promise<{ id: string }> }",
+        pattern=re.compile(r"\{\s*params\s*\}\s*:\s*\{\s*params\s*:\s*\{([^{}]*)\}\s*;?\s*\}"),
+        replacement=_promise_params,
+    ),
+    Rule(
+        name="params-await-member",
+        description="const patientId = params.id; -> const { id: patientId } = await params;",
+        pattern=re.compile(r"^([ \t]*)const\s+(\w+)\s*=\s*params\.(\w+)\s*;?[ \t]*$", re.MULTILINE),
+        replacement=_await_member,
+        # Client pages read params from useParams(), which is not a Promise
+        requires=re.compile(r"params\s*:\s*Promise<"),
+    ),
+    Rule(
+        name="params-await-destructure",
+        description="const { id } = params; -> const { id } = await params;",
+        pattern=re.compile(r"^([ \t]*)const\s+\{([\w\s,:]+)\}\s*=\s*params\s*;?[ \t]*$", re.MULTILINE),
+        replacement=lambda match: f"{match.group(1)}const {{ {match.group(2).strip()} }} = await params;",
+        requires=re.compile(r"params\s*:\s*Promise<"),
+    ),
+]
+RULES_BY_NAME = {rule.name: rule for rule in RULES}
+
+
+def discover(roots: List[str]) -> List[str]:
+    """Route handlers and pages under roots (files are accepted as given)"""
+    found = []
+    for root in roots:
+        if os.path.isfile(root):
+            found.append(root)
+            continue
+        for dirpath, dirnames, filenames in os.walk(root):
+            dirnames[:] = [name for name in dirnames if name not in SKIP_DIRS]
+            found.extend(os.path.join(dirpath, name) for name in filenames if name in TARGET_NAMES)
+    return sorted(set(os.path.normpath(path) for path in found))
+
+
+def rules_fingerprint(rule_names: List[str]) -> str:
+    """Identifies this runner's code and the selected rules (cache key)"""
+    with open(__file__, "rb") as f:
+        digest = hashlib.sha256(f.read())
+    digest.update("\0".join(rule_names).encode())
+    return digest.hexdigest()
+
+
+def content_hash(content: bytes) -> str:
+    return hashlib.sha256(content).hexdigest()
+
+
+def load_cache(path: str, fingerprint: str) -> Dict[str, str]:
+    """{file path: hash of content known to need no changes}; empty if the rules changed"""
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            cache = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    return cache.get("files", {}) if cache.get("rules") == fingerprint else {}
+
+
+def save_cache(path: str, fingerprint: str, files: Dict[str, str]):
+    tmp = f"{path}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump({"rules": fingerprint, "files": files}, f, indent=0, sort_keys=True)
+    os.replace(tmp, path)
+
+
+def transform(job: Tuple[str, str, List[str]]) -> Tuple[str, str, Dict[str, int]]:
+    """Applies the named rules to one file's content (runs in the worker processes)"""
+    path, content, rule_names = job
+    applied = {}
+    for name in rule_names:
+        content, count = RULES_BY_NAME[name].apply(content)
+        if count:
+            applied[name] = count
+    return path, content, applied
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Apply codemod rules to the Next.js app tree")
+    parser.add_argument("paths", nargs="*", default=["app"], help="Directories or files (default: app)")
+    parser.add_argument("--rule", action="append", dest="rules", help="Rule to apply (repeatable; default: all)")
+    parser.add_argument("--dry-run", action="store_true", help="Print a unified diff instead of writing")
+    parser.add_argument("--jobs", type=int, default=os.cpu_count() or 1, help="Worker processes")
+    parser.add_argument("--no-cache", action="store_true", help="Ignore and do not update the hash cache")
+    parser.add_argument("--cache", default=CACHE_FILE, help=f"Cache file (default: {CACHE_FILE})")
+    parser.add_argument("--list-rules", action="store_true")
+    args = parser.parse_args(argv)
+
+    if args.list_rules:
+        for rule in RULES:
+            print(f"{rule.name:<26} {rule.description}")
+        return 0
+
+    rule_names = args.rules or [rule.name for rule in RULES]
+    unknown = [name for name in rule_names if name not in RULES_BY_NAME]
+    if unknown:
+        parser.error(f"unknown rule(s): {', '.join(unknown)} (see --list-rules)")
+    # Registry order, whatever the order on the command line
+    rule_names = [rule.name for rule in RULES if rule.name in rule_names]
+
+    start = time.perf_counter()
+    fingerprint = rules_fingerprint(rule_names)
+    cache = {} if args.no_cache else load_cache(args.cache, fingerprint)
+
+    files = discover(args.paths)
+    jobs, hashes, errors = [], {}, 0
+    for path in files:
+        try:
+            with open(path, "rb") as f:
+                raw = f.read()
+            digest = content_hash(raw)
+            if cache.get(path) == digest:
+                hashes[path] = digest
+                continue
+            jobs.append((path, raw.decode("utf-8"), rule_names))
+            hashes[path] = digest
+        except (OSError, UnicodeDecodeError) as e:
+            print(f"  [ERROR] {path}: {e}")
+            errors += 1
+
+    originals = {path: content for path, content, _ in jobs}
+    if args.jobs > 1 and len(jobs) >= PARALLEL_MIN_FILES:
+        with ProcessPoolExecutor(max_workers=args.jobs) as pool:
+            results = list(pool.map(transform, jobs, chunksize=max(1, len(jobs) // (args.jobs * 4))))
+    else:
+        results = [transform(job) for job in jobs]
+
+    changed = 0
+    for path, content, applied in results:
+        if content == originals[path]:
+            continue
+        changed += 1
+        summary = ", ".join(f"{name} x{count}" for name, count in applied.items())
+        if args.dry_run:
+            sys.stdout.writelines(
+                difflib.unified_diff(
+                    originals[path].splitlines(keepends=True),
+                    content.splitlines(keepends=True),
+                    fromfile=f"a/{path}",
+                    tofile=f"b/{path}",
+                )
+            )
+            del hashes[path]  # still needs the rewrite
+            continue
+        try:
+            with open(path, "w", encoding="utf-8", newline="") as f:
+                f.write(content)
+            hashes[path] = content_hash(content.encode("utf-8"))
+            print(f"  [OK] {path} ({summary})")
+        except OSError as e:
+            print(f"  [ERROR] {path}: {e}")
+            del hashes[path]
+            errors += 1
+
+    if not args.no_cache:
+        # Keeps entries for files outside this run's paths
+        save_cache(args.cache, fingerprint, {**cache, **hashes})
+
+    elapsed = time.perf_counter() - start
+    verb = "would change" if args.dry_run else "changed"
+    print(
+        f"\n[OK] {len(files)} file(s), {len(files) - len(jobs)} cached, {changed} {verb},"
+        f" {errors} error(s) in {elapsed * 1000:.0f} ms",
+        file=sys.stderr if args.dry_run else sys.stdout,
+    )
+    if errors:
+        return 2
+    return 1 if args.dry_run and changed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -41,6 +41,10 @@ export interface MLPredictionResult {
     values: Record<string, any>
   }
   modelVersion: string
+  // Modelo que respondeu: 'tenant' | 'collective' | 'individual' | 'fallback'
+  modelUsed?: string
+  // Só com modelUsed = 'fallback': 'deadline' | 'unavailable' | 'error'
+  fallbackReason?: string
   timestamp: Date
 }
 
@@ -55,9 +59,13 @@ export interface MLPredictionError {
 
 const ML_API_BASE_URL = process.env.ML_API_URL || 'http://localhost:8000'
 const ML_API_TIMEOUT = 5000 // 5 segundos
+// Prazo do modelo principal na API: depois dele responde o fallback destilado,
+// antes do timeout do fetch
+const ML_API_DEADLINE_MS = Number(process.env.ML_API_DEADLINE_MS) || ML_API_TIMEOUT - 1000
 const ML_MODEL_VERSION = process.env.ML_MODEL_VERSION || '1.0.0'
 
-// Thresholds para classificação de risco
+// Thresholds para classificação de risco quando a API não envia risk_level.
+// A API Python classifica com os cortes calculados no treino (ver /health).
 const RISK_THRESHOLDS = {
   LOW: 0.3,    // 0.0 - 0.3 = baixo risco
   MEDIUM: 0.6, // 0.3 - 0.6 = médio risco
@@ -77,6 +85,16 @@ function classifyRiskLevel(probability: number): 'low' | 'medium' | 'high' {
   return 'high'
 }
 
+/**
+ * Nível de risco calculado pela API (cortes do modelo treinado).
+ * A faixa "critical" da API é exibida como alto risco.
+ */
+function apiRiskLevel(level: unknown): 'low' | 'medium' | 'high' | null {
+  if (level === 'critical' || level === 'high') return 'high'
+  if (level === 'medium' || level === 'low') return level
+  return null
+}
+
 /**
  * Prepara os dados do paciente para enviar ao modelo ML
  */
@@ -161,6 +179,7 @@ export async function predictComplicationRisk(
         method: 'POST',
         headers: {
           'Content-Type': 'application/json',
+          'X-Deadline-Ms': String(ML_API_DEADLINE_MS),
         },
         body: JSON.stringify(input),
       },
@@ -173,22 +192,25 @@ export async function predictComplicationRisk(
 
     const data = await response.json()
 
-    // Validar resposta
-    if (typeof data.risk !== 'number' || data.risk < 0 || data.risk > 1) {
+    // Validar resposta (/predict devolve probability; risk só em APIs antigas)
+    const risk = typeof data.probability === 'number' ? data.probability : data.risk
+    if (typeof risk !== 'number' || risk < 0 || risk > 1) {
       throw new Error('Resposta inválida da API ML: risco fora do intervalo [0,1]')
     }
 
     // Classificar nível de risco
-    const riskLevel = classifyRiskLevel(data.risk)
+    const riskLevel = apiRiskLevel(data.risk_level) ?? classifyRiskLevel(risk)
 
     const result: MLPredictionResult = {
-      risk: data.risk,
+      risk,
       level: riskLevel,
       features: {
         importance: data.feature_importance || {},
         values: input,
       },
       modelVersion: data.model_version || ML_MODEL_VERSION,
+      modelUsed: data.model_used,
+      fallbackReason: data.fallback_reason,
       timestamp: new Date(),
     }
 
@@ -198,6 +220,8 @@ export async function predictComplicationRisk(
       surgeryId: surgery.id,
       risk: result.risk,
       level: result.level,
+      modelUsed: result.modelUsed,
+      fallbackReason: result.fallbackReason,
       elapsedTimeMs: elapsedTime,
     })
 
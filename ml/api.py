@@ -3,10 +3,20 @@ API Flask para servir modelo de ML
 Endpoint para predição de complicações pós-operatórias
 """
 
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request
 from flask_cors import CORS
-from model import ComplicationPredictor
+from audit import AuditLog
+from compiled import CompiledPredictor, Frozen, required_number
+from drift import DriftMonitor
+from fallback import DEADLINE, DEADLINE_HEADER, DeadlineRouter, load_fallback
+from profiler import ProfilerBusy, StackSampler, admin_key, authorized
+from latest_risk import DEFAULT_DB_PATH as RESCORE_DB_PATH, LatestRiskStore
+from registry import ModelRegistry, load_model, model_exists, validate_tenant_id
+from serialization import bytes_response, encode_static_responses, json_response, loads
 import os
+import threading
+import time
+from types import MappingProxyType
 
 app = Flask(__name__)
 CORS(app)  # Permite requests do Next.js
@@ -15,13 +25,14 @@ CORS(app)  # Permite requests do Next.js
 MODEL_PATH = "models/complication_predictor.joblib"
 MODEL_COLLECTIVE_PATH = "models/complication_predictor_collective.joblib"
 
-predictor = ComplicationPredictor()
-predictor_collective = ComplicationPredictor()
+# Preditores vazios (model is None) até a carga
+predictor = CompiledPredictor()
+predictor_collective = CompiledPredictor()
 
 # Tenta carregar modelo individual
-if os.path.exists(MODEL_PATH):
+if model_exists(MODEL_PATH):
     try:
-        predictor.load(MODEL_PATH)
+        predictor = load_model(MODEL_PATH)
         print("✅ Modelo individual carregado com sucesso!")
     except Exception as e:
         print(f"⚠️ Erro ao carregar modelo individual: {e}")
@@ -29,9 +40,9 @@ else:
     print("⚠️ Modelo individual não encontrado. Execute: python train_model.py")
 
 # Tenta carregar modelo coletivo (preferencial)
-if os.path.exists(MODEL_COLLECTIVE_PATH):
+if model_exists(MODEL_COLLECTIVE_PATH):
     try:
-        predictor_collective.load(MODEL_COLLECTIVE_PATH)
+        predictor_collective = load_model(MODEL_COLLECTIVE_PATH)
         print("✅ Modelo coletivo carregado com sucesso!")
         print("   📊 Este modelo foi treinado com dados de múltiplos médicos")
     except Exception as e:
@@ -39,28 +50,154 @@ if os.path.exists(MODEL_COLLECTIVE_PATH):
 else:
     print("💡 Modelo coletivo não encontrado. Execute: python train_model_collective.py")
 
+DRIFT_WINDOW = int(os.environ.get("ML_DRIFT_WINDOW", 5000))
+
+
+def _load_fallbacks(individual, collective):
+    """
+    Fallbacks destilados (distillation.py), usados quando o modelo principal
+    não responde no prazo ou não está carregado (None se não exportados ou
+    destilados de outra versão do modelo principal)
+    """
+    return {
+        "collective": load_fallback(MODEL_COLLECTIVE_PATH, collective.model_version),
+        "individual": load_fallback(MODEL_PATH, individual.model_version),
+    }
+
+
+class ServingState(Frozen):
+    """
+    Tudo o que as requisições leem dos modelos carregados: preditores,
+    fallbacks, respostas estáticas do modelo individual (codificadas uma vez
+    por carga) e monitores de drift (None se o artefato não tem referência)
+
+    Imutável e publicado em uma única atribuição (serving): uma requisição
+    que lê serving uma vez nunca combina um modelo novo com as respostas ou
+    o fallback do anterior.
+    """
+
+    __slots__ = ("individual", "collective", "fallbacks", "static_responses", "drift_monitors")
+
+    def __init__(self, individual, collective, fallbacks, static_responses, drift_monitors):
+        self._set(
+            individual=individual,
+            collective=collective,
+            fallbacks=MappingProxyType(dict(fallbacks)),
+            static_responses=MappingProxyType(dict(static_responses)),
+            drift_monitors=MappingProxyType(dict(drift_monitors)),
+        )
+
+
+serving = ServingState(
+    predictor,
+    predictor_collective,
+    _load_fallbacks(predictor, predictor_collective),
+    encode_static_responses(predictor),
+    {
+        "individual": DriftMonitor.for_predictor(predictor, DRIFT_WINDOW),
+        "collective": DriftMonitor.for_predictor(predictor_collective, DRIFT_WINDOW),
+    },
+)
+# Só serving é trocado por /admin/reload: os nomes da carga inicial saem do módulo
+del predictor, predictor_collective
+router = DeadlineRouter.from_env()
+
+# Modelos por médico/clínica, carregados sob demanda (ver registry.py)
+tenant_registry = ModelRegistry.from_env()
+
+# Último risco por paciente, gravado pelo worker de re-scoring (rescoring.py)
+RESCORE_DB = os.environ.get("ML_RESCORE_DB", RESCORE_DB_PATH)
+latest_risk = None
+
+# Log de auditoria das respostas de /predict (audit.py; None sem ML_AUDIT_DIR)
+audit = AuditLog.from_env()
+
+# Profiler por amostragem (/admin/profile, só com ML_ADMIN_API_KEY)
+sampler = StackSampler()
+
+# Serializa as recargas (/admin/reload); as predições não usam lock
+reload_lock = threading.Lock()
+
 
 @app.route("/health", methods=["GET"])
 def health():
     """Health check"""
-    return jsonify({
+    # Uma leitura de serving: /admin/reload pode trocá-lo a qualquer momento
+    state = serving
+    individual, collective = state.individual, state.collective
+    return json_response({
         "status": "ok",
         "models": {
             "individual": {
-                "loaded": predictor.model is not None,
-                "type": predictor.model_type if predictor.model else None,
-                "metrics": predictor.metrics if predictor.metrics else None
+                "loaded": individual.model is not None,
+                "type": individual.model_type if individual.model else None,
+                "version": individual.model_version if individual.model else None,
+                "metrics": individual.metrics if individual.metrics else None,
+                # Probabilidade mínima de cada faixa (risk_level de /predict)
+                "risk_thresholds": individual.risk_thresholds if individual.model else None
             },
             "collective": {
-                "loaded": predictor_collective.model is not None,
-                "type": predictor_collective.model_type if predictor_collective.model else None,
-                "metrics": predictor_collective.metrics if predictor_collective.metrics else None
+                "loaded": collective.model is not None,
+                "type": collective.model_type if collective.model else None,
+                "version": collective.model_version if collective.model else None,
+                "metrics": collective.metrics if collective.metrics else None,
+                # Probabilidade mínima de cada faixa (risk_level de /predict)
+                "risk_thresholds": collective.risk_thresholds if collective.model else None
             }
         },
-        "recommended_model": "collective" if predictor_collective.model else "individual"
+        # Fidelidade: quanto o fallback reproduz o modelo (medida no treino)
+        "fallbacks": {
+            name: {"version": model.model_version, "fidelity": model.metrics} if model else None
+            for name, model in state.fallbacks.items()
+        },
+        "routing": router.stats(),
+        "audit": audit.stats() if audit else None,
+        "recommended_model": "collective" if collective.model else "individual"
     })
 
 
+def _predict_primary(state, data, tenant_id, use_collective):
+    """
+    Resposta do modelo principal: do tenant se existir, senão coletivo se
+    disponível e solicitado, senão individual (None se nenhum carregado)
+    """
+    tenant_model = None
+    if tenant_id:
+        try:
+            tenant_model = tenant_registry.get(tenant_id)
+        except Exception as e:
+            print(f"⚠️ Erro ao carregar modelo do tenant {tenant_id}: {e}")
+
+    individual, collective = state.individual, state.collective
+    if tenant_model is not None:
+        model = tenant_model
+        model_used = "tenant"
+    elif use_collective and collective.model is not None:
+        model = collective
+        model_used = "collective"
+    elif individual.model is not None:
+        model = individual
+        model_used = "individual"
+    else:
+        return None
+
+    result = model.predict(data)
+    result["model_used"] = model_used
+    result["model_version"] = model.model_version
+    if tenant_model is not None:
+        result["tenant_id"] = tenant_id
+    return result
+
+
+def _fallback_for(state, use_collective):
+    """(nome, fallback) na mesma ordem de preferência do modelo principal"""
+    current = state.fallbacks
+    for name in ("collective", "individual") if use_collective else ("individual",):
+        if current[name] is not None:
+            return name, current[name]
+    return None, None
+
+
 @app.route("/predict", methods=["POST"])
 def predict():
     """
@@ -78,7 +215,9 @@ def predict():
         "retencao_urinaria": 1,
         "febre": 0,
         "sangramento_intenso": 0,
-        "use_collective_model": true  // Opcional: força uso do modelo coletivo
+        "use_collective_model": true,  // Opcional: força uso do modelo coletivo
+        "tenant_id": "abc123",  // Opcional (ou header X-Tenant-Id): modelo do médico/clínica
+        "deadline_ms": 200  // Opcional (ou header X-Deadline-Ms): prazo do modelo principal
     }
 
     Response:
@@ -89,11 +228,20 @@ def predict():
         "risk_label": "ALTO",
         "recommendation": "Monitoramento próximo recomendado...",
         "top_risk_factors": [...],
-        "model_used": "collective" // ou "individual"
+        "model_used": "collective", // ou "individual", "tenant" ou "fallback"
+        "model_version": "random_forest-20250101T030000", // do modelo que respondeu
+        "tenant_id": "abc123", // só quando model_used = "tenant"
+        "fallback_reason": "deadline" // só com fallback: "deadline", "unavailable" ou "error"
     }
     """
+    started = time.perf_counter()
     try:
-        data = request.json
+        try:
+            data = loads(request.get_data())
+        except ValueError:
+            return json_response({"error": "JSON inválido"}, 400)
+        if not isinstance(data, dict):
+            return json_response({"error": "O corpo deve ser um objeto JSON"}, 400)
 
         # Validação básica
         required_fields = [
@@ -102,64 +250,259 @@ def predict():
 
         for field in required_fields:
             if field not in data:
-                return jsonify({
+                return json_response({
                     "error": f"Campo obrigatório ausente: {field}"
-                }), 400
+                }, 400)
 
-        # Escolhe modelo: coletivo se disponível e solicitado, senão individual
         use_collective = data.get("use_collective_model", True)
+        tenant_id = data.get("tenant_id") or request.headers.get("X-Tenant-Id")
+        try:
+            required_number(data, "idade")
+            if tenant_id:
+                validate_tenant_id(tenant_id)
+            deadline_ms = router.deadline_ms(data.get("deadline_ms", request.headers.get(DEADLINE_HEADER)))
+        except ValueError as e:
+            return json_response({"error": str(e)}, 400)
 
-        if use_collective and predictor_collective.model is not None:
-            model = predictor_collective
-            model_used = "collective"
-        elif predictor.model is not None:
-            model = predictor
-            model_used = "individual"
+        # Uma leitura de serving: a requisição termina com os modelos que
+        # escolheu mesmo que /admin/reload troque o global no meio
+        state = serving
+
+        # Modelo principal no prazo; senão o fallback destilado
+        result, reason, error = router.call(
+            lambda: _predict_primary(state, data, tenant_id, use_collective), deadline_ms
+        )
+        if result is None:
+            fallback_name, fallback_model = _fallback_for(state, use_collective)
+            if fallback_model is None:
+                router.record(f"failed_{reason}")
+                if error is not None:
+                    raise error
+                if reason == DEADLINE:
+                    return json_response({
+                        "error": f"Modelo não respondeu em {deadline_ms:.0f} ms e não há fallback exportado"
+                    }, 503)
+                return json_response({
+                    "error": "Nenhum modelo treinado. Execute train_model.py ou train_model_collective.py primeiro."
+                }, 503)
+            if error is not None:
+                print(f"⚠️ Erro no modelo principal, respondido pelo fallback: {error}")
+
+            result = fallback_model.predict(data)
+            result["model_used"] = "fallback"
+            result["model_version"] = fallback_model.model_version
+            result["fallback_reason"] = reason
+            router.record(f"fallback_{reason}")
+            model_used = fallback_name
         else:
-            return jsonify({
-                "error": "Nenhum modelo treinado. Execute train_model.py ou train_model_collective.py primeiro."
-            }), 503
+            router.record("primary")
+            model_used = result["model_used"]
 
-        # Predição
-        result = model.predict(data)
-        result["model_used"] = model_used
+        monitor = state.drift_monitors.get(model_used)
+        if monitor is not None:
+            monitor.update(data)
 
-        return jsonify(result)
+        if audit is not None:
+            audit.record(data, result, (time.perf_counter() - started) * 1000)
+        return json_response(result)
 
     except Exception as e:
-        return jsonify({
+        return json_response({
             "error": str(e)
-        }), 500
+        }, 500)
 
 
 @app.route("/feature-importance", methods=["GET"])
 def feature_importance():
     """Retorna importância das features"""
-    if predictor.model is None:
-        return jsonify({
+    responses = serving.static_responses
+    if "feature-importance" not in responses:
+        return json_response({
             "error": "Modelo não treinado"
-        }), 503
+        }, 503)
 
-    return jsonify({
-        "feature_importance": predictor.feature_importance,
-        "top_10": dict(list(predictor.feature_importance.items())[:10])
-    })
+    return bytes_response(responses["feature-importance"])
 
 
 @app.route("/metrics", methods=["GET"])
 def metrics():
     """Retorna métricas do modelo"""
-    if predictor.model is None:
-        return jsonify({
+    responses = serving.static_responses
+    if "metrics" not in responses:
+        return json_response({
             "error": "Modelo não treinado"
-        }), 503
+        }, 503)
+
+    return bytes_response(responses["metrics"])
+
 
-    return jsonify({
-        "metrics": predictor.metrics,
-        "model_type": predictor.model_type
+@app.route("/drift", methods=["GET"])
+def drift():
+    """
+    Drift das entradas de /predict em relação aos dados de treino
+
+    Por modelo e por feature: PSI, KS (features ordinais), status
+    (ok / warning / drift / insufficient_data) e as distribuições
+    de referência e recente por faixa.
+    """
+    return json_response({
+        model_name: monitor.report() if monitor else None
+        for model_name, monitor in serving.drift_monitors.items()
     })
 
 
+@app.route("/tenants", methods=["GET"])
+def tenants():
+    """
+    Modelos por tenant: residentes no LRU, limites e, por tenant, hits,
+    misses, hit rate, fallbacks para o modelo padrão e latência de carga
+    """
+    return json_response(tenant_registry.stats())
+
+
+@app.route("/risk/<patient_id>", methods=["GET"])
+def patient_risk(patient_id):
+    """
+    Último risco calculado para o paciente pelo worker de re-scoring
+
+    Response:
+    {
+        "patient_id": "...",
+        "surgery_id": "...",
+        "probability": 0.73,
+        "risk_level": "high",
+        "model_version": "random_forest-20250101T030000",
+        "scored_at": "2025-01-01T03:00:00+00:00"
+    }
+    """
+    global latest_risk
+    if latest_risk is None:
+        if not os.path.exists(RESCORE_DB):
+            return json_response({"error": "Re-scoring não configurado (execute rescoring.py)"}, 404)
+        latest_risk = LatestRiskStore(RESCORE_DB)
+
+    row = latest_risk.get(patient_id)
+    if row is None:
+        return json_response({"error": "Paciente sem risco calculado"}, 404)
+    return json_response(row)
+
+
+@app.route("/admin/profile", methods=["POST"])
+def admin_profile():
+    """
+    Profiling por amostragem deste processo (ver profiler.py)
+
+    Header: Authorization: Bearer <ML_ADMIN_API_KEY>
+
+    Query string:
+        seconds: duração (padrão 10, máximo ML_PROFILE_MAX_SECONDS)
+        interval_ms: intervalo entre amostras (padrão 10)
+        memory=1: inclui as alocações do tracemalloc na janela
+        idle=1: inclui threads paradas esperando
+        format=collapsed: só as pilhas, em texto (flamegraph.pl, speedscope)
+
+    Response (JSON): seconds, samples, threads, sampling_overhead,
+    collapsed ("thread;frame;... contagem" por linha) e memory
+    """
+    if admin_key() is None:
+        return json_response({"error": "Não encontrado"}, 404)
+    if not authorized(request.headers.get("Authorization")):
+        return json_response({"error": "Unauthorized"}, 401)
+
+    try:
+        report = sampler.profile(
+            seconds=float(request.args.get("seconds", 10)),
+            interval_ms=float(request.args.get("interval_ms", 10)),
+            memory=request.args.get("memory") == "1",
+            idle=request.args.get("idle") == "1",
+        )
+    except ValueError as e:
+        return json_response({"error": str(e)}, 400)
+    except ProfilerBusy as e:
+        return json_response({"error": str(e)}, 409)
+
+    if request.args.get("format") == "collapsed":
+        return Response(report["collapsed"], mimetype="text/plain")
+    return json_response(report)
+
+
+@app.route("/admin/reload", methods=["POST"])
+def admin_reload():
+    """
+    Recarrega do disco os modelos individual e coletivo e os fallbacks
+
+    Header: Authorization: Bearer <ML_ADMIN_API_KEY>
+    Query: tenant_id (opcional): só descarta o modelo desse tenant
+
+    Os modelos novos são carregados por completo, junto com fallbacks,
+    respostas estáticas e monitores, em um novo ServingState, publicado com
+    uma única atribuição de referência: predições em andamento terminam com
+    o estado antigo e as seguintes usam o novo, sem lock. Modelo principal que falha
+    ao carregar mantém o anterior; os fallbacks refletem o que está no
+    disco. O monitor de drift recomeça quando a versão muda. Os modelos de
+    tenant residentes são descartados do ModelRegistry e recarregados do
+    disco no próximo uso (com tenant_id, só o desse tenant, sem recarregar
+    os modelos compartilhados).
+
+    Response:
+    {
+        "individual": {"reloaded": true, "version": "random_forest-20250101T030000"},
+        "collective": {"reloaded": false, "error": "..."},
+        "fallbacks": {"collective": "...", "individual": null},
+        "tenants": {"evicted": ["abc123"]}
+    }
+    """
+    global serving
+    if admin_key() is None:
+        return json_response({"error": "Não encontrado"}, 404)
+    if not authorized(request.headers.get("Authorization")):
+        return json_response({"error": "Unauthorized"}, 401)
+
+    tenant_id = request.args.get("tenant_id")
+    if tenant_id is not None:
+        try:
+            validate_tenant_id(tenant_id)
+        except ValueError as e:
+            return json_response({"error": str(e)}, 400)
+        evicted = [tenant_id] if tenant_registry.evict(tenant_id) else []
+        return json_response({"tenants": {"evicted": evicted}})
+
+    report = {}
+    with reload_lock:
+        current = serving
+        models = {"individual": current.individual, "collective": current.collective}
+        monitors = dict(current.drift_monitors)
+        for name, path in (("individual", MODEL_PATH), ("collective", MODEL_COLLECTIVE_PATH)):
+            if not model_exists(path):
+                report[name] = {"reloaded": False, "error": "Modelo não encontrado"}
+                continue
+            try:
+                loaded = load_model(path)
+            except Exception as e:
+                print(f"⚠️ Erro ao recarregar modelo {name}: {e}")
+                report[name] = {"reloaded": False, "error": str(e)}
+                continue
+
+            if loaded.model_version != models[name].model_version:
+                monitors[name] = DriftMonitor.for_predictor(loaded, DRIFT_WINDOW)
+            models[name] = loaded
+            report[name] = {"reloaded": True, "version": loaded.model_version}
+
+        individual, collective = models["individual"], models["collective"]
+        static_responses = (
+            current.static_responses if individual is current.individual
+            else encode_static_responses(individual)
+        )
+        loaded_fallbacks = _load_fallbacks(individual, collective)
+        serving = ServingState(individual, collective, loaded_fallbacks, static_responses, monitors)
+
+    report["fallbacks"] = {
+        name: model.model_version if model else None for name, model in loaded_fallbacks.items()
+    }
+    report["tenants"] = {"evicted": tenant_registry.evict_all()}
+    return json_response(report)
+
+
 if __name__ == "__main__":
     port = int(os.environ.get("PORT", 5000))
     app.run(host="0.0.0.0", port=port, debug=True)
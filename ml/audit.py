@@ -0,0 +1,507 @@
+"""
+Log de auditoria das predições de /predict
+
+Cada resposta de /predict vira um registro com o horário, o modelo que
+respondeu (tipo, versão, tenant, motivo do fallback), a resposta
+(probabilidade, predição, faixa de risco), a latência e as entradas brutas.
+
+A thread da requisição só faz put_nowait em uma fila limitada: nunca espera
+disco. Com a fila cheia o registro é descartado e contado (stats()["dropped"]),
+então queue_size precisa comportar flush_interval_s na taxa de pico. Uma
+thread de fundo esvazia a fila em lotes a cada flush_interval_s e anexa as
+linhas a um journal JSON Lines por processo.
+
+O journal é rotacionado (segment_rows linhas, segment_seconds, troca de dia
+ou encerramento) em segmentos colunares comprimidos, particionados por data
+(UTC) e versão do modelo:
+
+    <diretório>/date=2025-01-01/model_version=<versão>/segment-<início>-<pid>-<n>.npz
+
+Cada segmento é um .npz comprimido (sem pickle) com uma coluna por campo;
+colunas de texto são codificadas por dicionário (<coluna> com os códigos e
+<coluna>.values com os valores distintos). A escrita é atômica (arquivo
+temporário + os.replace). Journals de processos encerrados são convertidos
+em segmentos na próxima inicialização.
+
+O log é opt-in: as entradas brutas do paciente só são gravadas quando
+ML_AUDIT_DIR aponta para um diretório.
+
+Consulta offline por data e versão do modelo (só segmentos; o journal do
+processo em execução aparece após a rotação):
+    python audit.py --dir models/audit --from 2025-01-01 --to 2025-01-31
+    python audit.py --dir models/audit --model-version random_forest-20250101T030000 --output auditoria.csv
+"""
+
+import argparse
+import atexit
+import glob
+import os
+import queue
+import re
+import sys
+import threading
+import time
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from serialization import dumps, loads
+
+# Entradas de /predict gravadas no log (as demais chaves são ignoradas)
+NUMERIC_INPUTS = [
+    "idade", "duracao_minutos", "dor_d1",
+    "bloqueio_pudendo", "retencao_urinaria", "febre", "sangramento_intenso",
+]
+TEXT_INPUTS = ["sexo", "comorbidades", "tipo_cirurgia"]
+
+# Colunas de cada segmento (texto ausente é gravado como "", número como NaN)
+TEXT_COLUMNS = ["model_used", "model_version", "tenant_id", "fallback_reason", "risk_level"] + TEXT_INPUTS
+NUMERIC_COLUMNS = {
+    "timestamp_us": np.int64,
+    "probability": np.float64,
+    "prediction": np.int8,
+    "latency_ms": np.float32,
+    **{name: np.float64 for name in NUMERIC_INPUTS},
+}
+
+# Linhas convertidas pela thread de fundo entre duas cessões do GIL
+YIELD_EVERY = 32
+
+_UNSAFE_PATH_CHARS = re.compile(r"[^A-Za-z0-9._-]")
+
+
+@dataclass
+class AuditConfig:
+    """Diretório, fila e rotação do log de auditoria"""
+
+    directory: Optional[str] = None  # None = desligado (opt-in)
+    queue_size: int = 10000
+    flush_interval_s: float = 1.0
+    segment_rows: int = 100_000
+    segment_seconds: float = 900.0
+
+    @classmethod
+    def from_env(cls) -> "AuditConfig":
+        """
+        Lê ML_AUDIT_DIR (ausente ou "" desliga o log), ML_AUDIT_QUEUE_SIZE,
+        ML_AUDIT_FLUSH_INTERVAL_S, ML_AUDIT_SEGMENT_ROWS e
+        ML_AUDIT_SEGMENT_SECONDS
+        """
+        return cls(
+            directory=os.getenv("ML_AUDIT_DIR") or None,
+            queue_size=int(os.getenv("ML_AUDIT_QUEUE_SIZE", cls.queue_size)),
+            flush_interval_s=float(os.getenv("ML_AUDIT_FLUSH_INTERVAL_S", cls.flush_interval_s)),
+            segment_rows=int(os.getenv("ML_AUDIT_SEGMENT_ROWS", cls.segment_rows)),
+            segment_seconds=float(os.getenv("ML_AUDIT_SEGMENT_SECONDS", cls.segment_seconds)),
+        )
+
+
+def _number(value) -> float:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return float("nan")
+
+
+def _text(value) -> str:
+    if value is None:
+        return ""
+    if isinstance(value, (list, tuple)):
+        return ",".join(str(item) for item in value)
+    return str(value)
+
+
+def _row(timestamp: float, data: Dict, result: Dict, latency_ms: float) -> Dict:
+    """Linha do journal (na thread de fundo, fora da requisição)"""
+    row = {
+        "timestamp_us": int(timestamp * 1e6),
+        "probability": _number(result.get("probability")),
+        "prediction": int(result.get("prediction") or 0),
+        "latency_ms": latency_ms,
+    }
+    for name in ("model_used", "model_version", "tenant_id", "fallback_reason", "risk_level"):
+        row[name] = _text(result.get(name))
+    for name in NUMERIC_INPUTS:
+        row[name] = _number(data.get(name))
+    for name in TEXT_INPUTS:
+        row[name] = _text(data.get(name))
+    return row
+
+
+def _partition(row: Dict) -> Tuple[str, str]:
+    date = datetime.fromtimestamp(row["timestamp_us"] / 1e6, tz=timezone.utc).strftime("%Y-%m-%d")
+    return date, row["model_version"]
+
+
+def partition_dir(root: str, date: str, model_version: str) -> str:
+    """Diretório da partição (caracteres fora de [A-Za-z0-9._-] viram "_")"""
+    version = _UNSAFE_PATH_CHARS.sub("_", model_version) or "_"
+    return os.path.join(root, f"date={date}", f"model_version={version}")
+
+
+def _codes_dtype(n_values: int):
+    if n_values <= np.iinfo(np.uint8).max + 1:
+        return np.uint8
+    if n_values <= np.iinfo(np.uint16).max + 1:
+        return np.uint16
+    return np.uint32
+
+
+def _columns(rows: List[Dict]) -> Dict[str, np.ndarray]:
+    """Linhas -> colunas do segmento (texto codificado por dicionário)"""
+    columns = {}
+    for name, dtype in NUMERIC_COLUMNS.items():
+        values = [row.get(name) for row in rows]
+        if np.issubdtype(dtype, np.floating):
+            values = [np.nan if value is None else value for value in values]
+        columns[name] = np.asarray(values, dtype=dtype)
+    for name in TEXT_COLUMNS:
+        distinct, codes = np.unique(np.asarray([row.get(name) or "" for row in rows], dtype=str), return_inverse=True)
+        columns[name] = codes.astype(_codes_dtype(len(distinct)))
+        columns[f"{name}.values"] = distinct
+    return columns
+
+
+def write_segment(root: str, rows: List[Dict], label: str) -> List[str]:
+    """
+    Grava as linhas em um segmento por partição (data, versão do modelo)
+
+    Returns:
+        Caminhos dos segmentos gravados
+    """
+    partitions: Dict[Tuple[str, str], List[Dict]] = {}
+    for row in rows:
+        partitions.setdefault(_partition(row), []).append(row)
+
+    paths = []
+    for (date, model_version), partition_rows in sorted(partitions.items()):
+        directory = partition_dir(root, date, model_version)
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f"segment-{label}.npz")
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "wb") as f:
+            np.savez_compressed(f, **_columns(partition_rows))
+        os.replace(tmp_path, path)
+        paths.append(path)
+    return paths
+
+
+def _read_journal(path: str) -> List[Dict]:
+    rows = []
+    with open(path, "rb") as f:
+        for line in f:
+            try:
+                row = loads(line)
+            except ValueError:
+                # Última linha truncada por um encerramento abrupto
+                continue
+            if isinstance(row, dict):
+                rows.append(row)
+    return rows
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class AuditLog:
+    """Escritor não bloqueante: fila limitada + thread de fundo"""
+
+    def __init__(self, config: AuditConfig):
+        self.config = config
+        self.root = config.directory
+        self.queue: "queue.Queue" = queue.Queue(maxsize=config.queue_size)
+        self.lock = threading.Lock()
+        self.dropped = 0
+        self.written = 0
+        self.segments = 0
+        self.errors = 0
+        self.last_error: Optional[str] = None
+        self._journal = None
+        self._journal_rows = 0
+        self._journal_opened = 0.0
+        self._journal_date = None
+        self._sequence = 0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @classmethod
+    def from_env(cls) -> Optional["AuditLog"]:
+        """
+        AuditLog iniciado com AuditConfig.from_env(), ou None se desligado
+
+        Também None, com um aviso, se o log não puder ser iniciado (ex.:
+        diretório sem permissão): a auditoria nunca impede a API de subir.
+        """
+        config = AuditConfig.from_env()
+        if not config.directory:
+            return None
+        try:
+            return cls(config).start()
+        except Exception as e:
+            print(f"⚠️ Log de auditoria desligado: erro ao iniciar em {config.directory}: {e}")
+            return None
+
+    @property
+    def journal_path(self) -> str:
+        return os.path.join(self.root, f"journal-{os.getpid()}.jsonl")
+
+    def start(self) -> "AuditLog":
+        os.makedirs(self.root, exist_ok=True)
+        self._recover()
+        self._thread = threading.Thread(target=self._run, name="ml-audit", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+        return self
+
+    def record(self, data: Dict, result: Dict, latency_ms: float):
+        """
+        Enfileira a predição (chamado na thread da requisição)
+
+        Guarda só referências: data e result não podem ser alterados depois.
+        A conversão para a linha do log acontece na thread de fundo.
+        """
+        try:
+            self.queue.put_nowait((time.time(), data, result, latency_ms))
+        except queue.Full:
+            with self.lock:
+                self.dropped += 1
+
+    def _recover(self):
+        """
+        Converte em segmentos os journals de processos que já encerraram
+
+        Workers iniciados juntos enxergam os mesmos journals: cada um é
+        reivindicado com um os.rename atômico para recovering-<pid>-<dono>.jsonl
+        antes da leitura, e quem perde a corrida (ENOENT) apenas o ignora. Um
+        arquivo reivindicado por um worker que morreu no meio da conversão é
+        reivindicado de novo na próxima inicialização. Um journal que não pode
+        ser convertido é renomeado para corrupt-<pid>-<dono>.jsonl e contado
+        em errors.
+        """
+        pattern = re.compile(r"(journal|recovering)-(\d+)(?:-(\d+))?\.jsonl$")
+        candidates = glob.glob(os.path.join(self.root, "journal-*.jsonl"))
+        candidates += glob.glob(os.path.join(self.root, "recovering-*.jsonl"))
+        for path in candidates:
+            match = pattern.match(os.path.basename(path))
+            if match is None:
+                continue
+            pid = int(match.group(2))
+            if pid != os.getpid() and _pid_alive(pid):
+                continue
+            owner = match.group(3) or match.group(2)
+            claimed = os.path.join(self.root, f"recovering-{os.getpid()}-{owner}.jsonl")
+            try:
+                os.rename(path, claimed)
+            except FileNotFoundError:
+                continue
+            try:
+                rows = _read_journal(claimed)
+                if rows:
+                    self.segments += len(write_segment(self.root, rows, f"{self._label()}-recovered{owner}"))
+                os.remove(claimed)
+            except Exception as e:
+                # Journal ilegível não impede a API de subir: fica de lado
+                # (corrupt-*.jsonl, fora dos padrões acima) para inspeção
+                self.errors += 1
+                self.last_error = str(e)
+                corrupt = os.path.join(self.root, f"corrupt-{os.getpid()}-{owner}.jsonl")
+                print(f"⚠️ Erro ao recuperar journal de auditoria {claimed}: {e} (movido para {corrupt})")
+                try:
+                    os.replace(claimed, corrupt)
+                except OSError:
+                    pass
+
+    def _label(self) -> str:
+        self._sequence += 1
+        started = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%S")
+        return f"{started}-{os.getpid()}-{self._sequence}"
+
+    def _run(self):
+        # Acorda a cada flush_interval_s em vez de esperar na fila: um get()
+        # bloqueado acordaria esta thread a cada put() das requisições
+        while not self._stop.wait(self.config.flush_interval_s):
+            self._flush(self._drain())
+        # Encerramento: o que ainda está na fila
+        self._flush(self._drain(), rotate=True)
+
+    def _drain(self) -> List[Tuple]:
+        batch = []
+        while True:
+            try:
+                batch.append(self.queue.get_nowait())
+            except queue.Empty:
+                return batch
+
+    def _flush(self, batch: List[Tuple], rotate: bool = False):
+        """Anexa o lote ao journal e rotaciona se preciso (thread de fundo)"""
+        try:
+            if batch:
+                date = _partition(_row(*batch[0]))[0]
+                if self._journal is not None and date != self._journal_date:
+                    self._rotate()
+                if self._journal is None:
+                    self._journal = open(self.journal_path, "ab")
+                    self._journal_opened = time.monotonic()
+                    self._journal_date = date
+                # Em pedaços pequenos, cedendo o GIL entre eles: a conversão
+                # de um lote inteiro de uma vez atrasaria as requisições que
+                # chegam no meio dela (uma CPU = uma thread Python por vez)
+                for start in range(0, len(batch), YIELD_EVERY):
+                    rows = [_row(*item) for item in batch[start : start + YIELD_EVERY]]
+                    self._journal.write(b"".join(dumps(row) + b"\n" for row in rows))
+                    time.sleep(0)
+                self._journal.flush()
+                self._journal_rows += len(batch)
+                with self.lock:
+                    self.written += len(batch)
+            if self._journal is not None and (
+                rotate
+                or self._journal_rows >= self.config.segment_rows
+                or time.monotonic() - self._journal_opened >= self.config.segment_seconds
+            ):
+                self._rotate()
+        except Exception as e:
+            with self.lock:
+                self.errors += 1
+                self.last_error = str(e)
+            print(f"⚠️ Erro ao gravar auditoria: {e}")
+
+    def _rotate(self):
+        """Journal -> segmentos colunares comprimidos"""
+        if self._journal is None:
+            return
+        self._journal.close()
+        self._journal = None
+        self._journal_rows = 0
+        rows = _read_journal(self.journal_path)
+        if rows:
+            paths = write_segment(self.root, rows, self._label())
+            with self.lock:
+                self.segments += len(paths)
+        os.remove(self.journal_path)
+
+    def close(self, timeout: float = 10.0):
+        """Grava o que está na fila e rotaciona o journal"""
+        if self._thread is None or self._stop.is_set():
+            return
+        self._stop.set()
+        self._thread.join(timeout)
+
+    def stats(self) -> Dict:
+        with self.lock:
+            return {
+                "directory": self.root,
+                "written": self.written,
+                "dropped": self.dropped,
+                "queued": self.queue.qsize(),
+                "segments": self.segments,
+                "errors": self.errors,
+                "last_error": self.last_error,
+            }
+
+
+def iter_segments(
+    root: str,
+    date_from: Optional[str] = None,
+    date_to: Optional[str] = None,
+    model_version: Optional[str] = None,
+) -> Iterator[str]:
+    """Segmentos das partições no intervalo de datas (inclusivo) e da versão"""
+    version_dir = None
+    if model_version is not None:
+        version_dir = os.path.basename(partition_dir(root, "", model_version))
+    for date_path in sorted(glob.glob(os.path.join(root, "date=*"))):
+        date = os.path.basename(date_path)[len("date="):]
+        if (date_from and date < date_from) or (date_to and date > date_to):
+            continue
+        for version_path in sorted(glob.glob(os.path.join(date_path, "model_version=*"))):
+            if version_dir is not None and os.path.basename(version_path) != version_dir:
+                continue
+            yield from sorted(glob.glob(os.path.join(version_path, "segment-*.npz")))
+
+
+def read_segment(path: str) -> Dict[str, np.ndarray]:
+    """Colunas do segmento, com o texto decodificado"""
+    with np.load(path, allow_pickle=False) as segment:
+        columns = {name: segment[name] for name in NUMERIC_COLUMNS}
+        for name in TEXT_COLUMNS:
+            columns[name] = segment[f"{name}.values"][segment[name]]
+    return columns
+
+
+def query(
+    root: str,
+    date_from: Optional[str] = None,
+    date_to: Optional[str] = None,
+    model_version: Optional[str] = None,
+) -> Dict[str, np.ndarray]:
+    """
+    Predições registradas, em colunas
+
+    Args:
+        root: Diretório do log
+        date_from, date_to: Datas UTC (YYYY-MM-DD), inclusivas
+        model_version: Versão exata do modelo que respondeu
+
+    Returns:
+        {coluna: array}, com as linhas de todos os segmentos selecionados
+    """
+    parts = [read_segment(path) for path in iter_segments(root, date_from, date_to, model_version)]
+    if not parts:
+        columns = _columns([])
+        return {name: columns[name] for name in list(NUMERIC_COLUMNS) + TEXT_COLUMNS}
+    columns = {name: np.concatenate([part[name] for part in parts]) for name in parts[0]}
+    if model_version is not None:
+        # Nomes de partição saneados podem coincidir para versões diferentes
+        keep = columns["model_version"] == model_version
+        columns = {name: values[keep] for name, values in columns.items()}
+    return columns
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Consulta ao log de auditoria de /predict")
+    parser.add_argument("--dir", default=AuditConfig.from_env().directory or "models/audit")
+    parser.add_argument("--from", dest="date_from", help="Data UTC inicial (YYYY-MM-DD)")
+    parser.add_argument("--to", dest="date_to", help="Data UTC final (YYYY-MM-DD), inclusiva")
+    parser.add_argument("--model-version", help="Versão do modelo que respondeu")
+    parser.add_argument("--output", help="Arquivo CSV com as linhas selecionadas")
+    args = parser.parse_args(argv)
+
+    columns = query(args.dir, args.date_from, args.date_to, args.model_version)
+    n_rows = len(columns["timestamp_us"])
+    print(f"📒 {n_rows} predições em {args.dir}")
+    if n_rows:
+        first, last = (
+            datetime.fromtimestamp(value / 1e6, tz=timezone.utc).isoformat(timespec="seconds")
+            for value in (columns["timestamp_us"].min(), columns["timestamp_us"].max())
+        )
+        print(f"   Período: {first} a {last}")
+        print(
+            f"   Probabilidade média: {np.nanmean(columns['probability']):.3f}"
+            f" | latência p50 {np.percentile(columns['latency_ms'], 50):.2f} ms"
+            f" p99 {np.percentile(columns['latency_ms'], 99):.2f} ms"
+        )
+        for name in ("model_version", "model_used", "risk_level", "fallback_reason"):
+            values, counts = np.unique(columns[name], return_counts=True)
+            summary = ", ".join(f"{value or '-'}: {count}" for value, count in zip(values, counts))
+            print(f"   {name}: {summary}")
+
+    if args.output:
+        import pandas as pd
+
+        pd.DataFrame(columns).to_csv(args.output, index=False)
+        print(f"✅ Linhas salvas em: {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,6 @@
+"""
+Benchmarks do pipeline de ML (treino e inferência)
+
+Executar a partir do diretório ml/:
+    python -m benchmarks.bench_ml
+"""
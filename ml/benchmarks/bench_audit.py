@@ -0,0 +1,184 @@
+"""
+Benchmark do log de auditoria (audit.py)
+
+1. Custo de AuditLog.record() na thread da requisição
+2. Latência de POST /predict (api.py pelo test client do Flask, modelo
+   compilado) com e sem o log, em malha aberta na taxa de pico (--rate):
+   blocos alternados para as duas condições verem a mesma máquina
+3. Registros gravados x descartados (fila cheia) na taxa de pico
+4. Segmentos: bytes por predição e tempo da consulta offline por data e
+   versão do modelo
+
+Uso (a partir do diretório ml/):
+    python -m benchmarks.bench_audit
+    python -m benchmarks.bench_audit --rate 500 --duration 5 --rounds 4 --output audit.json
+"""
+
+import argparse
+import contextlib
+import glob
+import io
+import json
+import os
+import sys
+import tempfile
+import time
+from typing import List, Optional
+
+import numpy as np
+
+import audit as audit_module
+from model import ComplicationPredictor
+from registry import compiled_path
+from benchmarks.bench_ml import environment_info
+from benchmarks.synthetic import generate_patients, generate_payloads
+
+
+def _paced(client, records: List[dict], rate: float, duration: float) -> List[float]:
+    """Latências (ms) medidas a partir do horário agendado de cada requisição"""
+    n_requests = int(rate * duration)
+    latencies = []
+    start = time.perf_counter()
+    for i in range(n_requests):
+        scheduled = start + i / rate
+        delay = scheduled - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+        response = client.post("/predict", json=records[i % len(records)])
+        if response.status_code != 200:
+            raise RuntimeError(f"/predict respondeu {response.status_code}: {response.get_data(as_text=True)}")
+        latencies.append((time.perf_counter() - scheduled) * 1000)
+    return latencies
+
+
+def _summary(latencies: List[float]) -> dict:
+    values = np.asarray(latencies)
+    return {
+        "requests": len(values),
+        "mean_ms": float(values.mean()),
+        "p50_ms": float(np.percentile(values, 50)),
+        "p99_ms": float(np.percentile(values, 99)),
+        "max_ms": float(values.max()),
+    }
+
+
+def start_api(tmpdir: str, patients: int, seed: int, audit_dir: str = ""):
+    """
+    Importa api.py servindo um modelo compilado treinado em tmpdir/models
+
+    Returns:
+        (módulo api, ComplicationPredictor treinado)
+    """
+    model_path = os.path.join(tmpdir, "models", "complication_predictor.joblib")
+    predictor = ComplicationPredictor(model_type="random_forest")
+    with contextlib.redirect_stdout(io.StringIO()):
+        predictor.train(generate_patients(patients, seed=seed))
+        predictor.save(model_path)
+        predictor.export_compiled(compiled_path(model_path))
+
+    os.environ["ML_AUDIT_DIR"] = audit_dir
+    cwd = os.getcwd()
+    os.chdir(tmpdir)
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            import api
+    finally:
+        os.chdir(cwd)
+    return api, predictor
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Benchmark do log de auditoria")
+    parser.add_argument("--patients", type=int, default=2000)
+    parser.add_argument("--rate", type=float, default=200.0, help="Taxa de pico em req/s")
+    parser.add_argument("--duration", type=float, default=3.0, help="Duração de cada bloco (s)")
+    parser.add_argument("--rounds", type=int, default=3, help="Blocos por condição (alternados)")
+    parser.add_argument("--record-calls", type=int, default=100000)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="Arquivo JSON de saída")
+    args = parser.parse_args(argv)
+
+    print("=" * 60)
+    print("⏱️  BENCHMARK DO LOG DE AUDITORIA")
+    print("=" * 60)
+
+    records = generate_payloads(2000, seed=args.seed + 1)
+    with tempfile.TemporaryDirectory() as tmpdir:
+        audit_dir = os.path.join(tmpdir, "audit")
+        api, predictor = start_api(tmpdir, args.patients, args.seed, audit_dir)
+        log = api.audit
+        client = api.app.test_client()
+
+        # 1. record() isolado (a thread de fundo esvazia a fila em paralelo)
+        data, result = records[0], client.post("/predict", json=records[0]).get_json()
+        probe = audit_module.AuditLog(
+            audit_module.AuditConfig(directory=os.path.join(tmpdir, "probe"), queue_size=args.record_calls + 1)
+        ).start()
+        start = time.perf_counter()
+        for _ in range(args.record_calls):
+            probe.record(data, result, 0.5)
+        record_us = (time.perf_counter() - start) / args.record_calls * 1e6
+        probe.close()
+        print(f"\n⚡ AuditLog.record(): {record_us:.2f} µs por chamada")
+
+        # 2. /predict com e sem auditoria, blocos alternados
+        _paced(client, records, args.rate, 0.5)  # aquecimento
+        latencies = {"sem_auditoria": [], "com_auditoria": []}
+        for _ in range(args.rounds):
+            for condition in latencies:
+                api.audit = log if condition == "com_auditoria" else None
+                latencies[condition] += _paced(client, records, args.rate, args.duration)
+        api.audit = log
+        log.close()
+
+        latency = {condition: _summary(values) for condition, values in latencies.items()}
+        print(f"\n🚦 POST /predict a {args.rate:.0f} req/s ({args.rounds} blocos de {args.duration:.0f} s por condição):")
+        for condition, run in latency.items():
+            print(
+                f"   {condition:<14} média {run['mean_ms']:.3f} ms | p50 {run['p50_ms']:.3f} ms"
+                f" | p99 {run['p99_ms']:.3f} ms | máx {run['max_ms']:.1f} ms"
+            )
+        delta = {
+            f"{name}_delta_ms": latency["com_auditoria"][name] - latency["sem_auditoria"][name]
+            for name in ("mean_ms", "p50_ms", "p99_ms")
+        }
+        print(
+            f"   Diferença: média {delta['mean_ms_delta_ms']:+.3f} ms | p50 {delta['p50_ms_delta_ms']:+.3f} ms"
+            f" | p99 {delta['p99_ms_delta_ms']:+.3f} ms"
+        )
+
+        # 3. Gravados x descartados
+        stats = log.stats()
+        print(f"\n📒 Gravados: {stats['written']} | descartados: {stats['dropped']} | erros: {stats['errors']}")
+
+        # 4. Segmentos e consulta offline
+        segments = glob.glob(os.path.join(audit_dir, "date=*", "model_version=*", "segment-*.npz"))
+        segment_bytes = sum(os.path.getsize(path) for path in segments)
+        today = time.strftime("%Y-%m-%d", time.gmtime())
+        start = time.perf_counter()
+        rows = audit_module.query(audit_dir, today, today, predictor.model_version)
+        query_ms = (time.perf_counter() - start) * 1000
+        n_rows = len(rows["timestamp_us"])
+        storage = {
+            "segments": len(segments),
+            "segment_bytes": segment_bytes,
+            "bytes_per_prediction": segment_bytes / max(n_rows, 1),
+            "query_rows": n_rows,
+            "query_ms": query_ms,
+        }
+        print(
+            f"\n💾 {len(segments)} segmento(s), {storage['bytes_per_prediction']:.1f} bytes por predição"
+            f" | consulta por data e versão: {n_rows} linhas em {query_ms:.1f} ms"
+        )
+
+    results = {"record_us": record_us, "latency": latency, "delta": delta, "audit": stats, "storage": storage}
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"environment": environment_info(), "config": vars(args), "results": results}, f, indent=2)
+        print(f"\n✅ Resultados salvos em: {args.output}")
+
+    return 1 if stats["dropped"] or stats["errors"] or n_rows != stats["written"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,137 @@
+"""
+Cold start e memória: artefato joblib x formato compilado
+
+Cada medição roda em um processo Python novo (imports frios) e registra:
+- import_s: import do módulo de carga (model ou compiled)
+- load_s: leitura do artefato
+- first_predict_s: primeira predição de um paciente
+- rss_mb: memória residente máxima do processo ao final
+
+Uso (a partir do diretório ml/):
+    python -m benchmarks.bench_coldstart
+    python -m benchmarks.bench_coldstart --runs 5 --output coldstart.json
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+from typing import Dict, List, Optional
+
+from model import ComplicationPredictor
+from benchmarks.bench_ml import environment_info
+from benchmarks.synthetic import generate_patients, generate_payloads
+
+MODEL_TYPES = ["random_forest", "gradient_boosting"]
+
+# Executado no processo filho; imprime um JSON com as medições
+_CHILD = """
+import json, resource, sys, time
+start = time.perf_counter()
+if sys.argv[1] == "joblib":
+    from model import ComplicationPredictor
+else:
+    from compiled import CompiledPredictor
+imported = time.perf_counter()
+if sys.argv[1] == "joblib":
+    predictor = ComplicationPredictor()
+    predictor.load(sys.argv[2])
+else:
+    predictor = CompiledPredictor.load(sys.argv[2])
+loaded = time.perf_counter()
+predictor.predict(json.loads(sys.argv[3]))
+predicted = time.perf_counter()
+try:
+    # VmHWM é do processo atual (ru_maxrss herda o pico do pai após fork+exec)
+    with open("/proc/self/status") as status:
+        peak_kb = next(int(line.split()[1]) for line in status if line.startswith("VmHWM:"))
+except OSError:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    peak_kb = peak / 1024 if sys.platform == "darwin" else peak
+print(json.dumps({
+    "import_s": imported - start,
+    "load_s": loaded - imported,
+    "first_predict_s": predicted - loaded,
+    "total_s": predicted - start,
+    "rss_mb": peak_kb / 1024,
+}))
+"""
+
+
+def _measure(fmt: str, path: str, payload: Dict) -> Dict:
+    ml_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    output = subprocess.run(
+        [sys.executable, "-c", _CHILD, fmt, path, json.dumps(payload)],
+        cwd=ml_dir,
+        capture_output=True,
+        text=True,
+        check=True,
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def run_benchmarks(model_types: List[str], n: int = 1000, runs: int = 3, seed: int = 42) -> List[Dict]:
+    payload = generate_payloads(1, seed=seed)[0]
+    results = []
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        for model_type in model_types:
+            predictor = ComplicationPredictor(model_type=model_type)
+            paths = {
+                "joblib": os.path.join(tmpdir, f"{model_type}.joblib"),
+                "compiled": os.path.join(tmpdir, f"{model_type}.compiled"),
+            }
+            with contextlib.redirect_stdout(io.StringIO()):
+                predictor.train(generate_patients(n, seed=seed))
+                predictor.save(paths["joblib"])
+                predictor.export_compiled(paths["compiled"])
+
+            for fmt, path in paths.items():
+                samples = [_measure(fmt, path, payload) for _ in range(runs)]
+                entry = {
+                    "model_type": model_type,
+                    "format": fmt,
+                    "artifact_bytes": os.path.getsize(path),
+                    **{key: statistics.median(sample[key] for sample in samples) for key in samples[0]},
+                }
+                results.append(entry)
+                print(
+                    f"  {model_type:<18} {fmt:<9} total={entry['total_s'] * 1000:8.1f} ms"
+                    f"  (import {entry['import_s'] * 1000:7.1f} | load {entry['load_s'] * 1000:6.1f}"
+                    f" | 1ª predição {entry['first_predict_s'] * 1000:6.1f})"
+                    f"  RSS={entry['rss_mb']:6.1f} MB  arquivo={entry['artifact_bytes'] / 1024:7.1f} KB"
+                )
+
+    return results
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Cold start: joblib x formato compilado")
+    parser.add_argument("--models", nargs="+", default=MODEL_TYPES, choices=MODEL_TYPES)
+    parser.add_argument("--n", type=int, default=1000, help="Pacientes sintéticos no treino")
+    parser.add_argument("--runs", type=int, default=3, help="Processos por medição (mediana)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="Arquivo JSON de saída")
+    args = parser.parse_args(argv)
+
+    print("=" * 60)
+    print("⏱️  COLD START: JOBLIB x COMPILADO")
+    print("=" * 60)
+
+    results = run_benchmarks(args.models, args.n, args.runs, args.seed)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"environment": environment_info(), "config": vars(args), "results": results}, f, indent=2)
+        print(f"\n✅ Resultados salvos em: {args.output}")
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
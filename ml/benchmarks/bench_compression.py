@@ -0,0 +1,149 @@
+"""
+Benchmark da compressão pós-treino (compression.py)
+
+Treina Random Forest e Gradient Boosting uma vez com pacientes sintéticos e
+comprime cópias do modelo em cada combinação de tolerância de AUC e epsilon
+de poda. Para cada uma reporta:
+- árvores, nós e profundidade antes/depois
+- AUC OOF (seleção cruzada) e AUC em um holdout independente, que não
+  participou nem do treino nem da seleção
+- tamanho do .compiled e do .joblib, memória das árvores
+- latência do runtime compilado (individual e em lote)
+- conferência do limite da poda: com só a poda, a probabilidade do Random
+  Forest muda no máximo epsilon (o escore bruto do Gradient Boosting,
+  no máximo epsilon x learning_rate x estágios)
+
+Uso (a partir do diretório ml/):
+    python -m benchmarks.bench_compression
+    python -m benchmarks.bench_compression --patients 5000 --tolerances 0.001 0.005 --epsilons 0 0.02
+"""
+
+import argparse
+import contextlib
+import copy
+import io
+import json
+import sys
+import time
+from typing import List, Optional
+
+import numpy as np
+from sklearn.metrics import roc_auc_score
+
+from compression import CompressionConfig, _prune_model
+from model import ComplicationPredictor
+from benchmarks.bench_ml import environment_info
+from benchmarks.synthetic import generate_patients
+
+MODEL_TYPES = ["random_forest", "gradient_boosting"]
+
+
+def _raw_scores(predictor, X) -> np.ndarray:
+    if predictor.model_type == "random_forest":
+        return predictor.model.predict_proba(X)[:, 1]
+    return predictor.model.decision_function(X)
+
+
+def _prune_bound(predictor, X, epsilon: float) -> dict:
+    """Maior mudança da predição só com a poda, e o limite teórico"""
+    pruned = copy.deepcopy(predictor.model)
+    _prune_model(pruned, predictor.model_type, epsilon)
+    shadow = copy.copy(predictor)
+    shadow.model = pruned
+    before, after = _raw_scores(predictor, X), _raw_scores(shadow, X)
+    if predictor.model_type == "random_forest":
+        bound = epsilon
+    else:
+        bound = epsilon * predictor.model.learning_rate * predictor.model.n_estimators_
+    change = float(np.max(np.abs(after - before)))
+    return {"max_change": change, "bound": bound, "ok": change <= bound + 1e-12}
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Benchmark da compressão pós-treino do ensemble")
+    parser.add_argument("--patients", type=int, default=3000)
+    parser.add_argument("--holdout", type=int, default=20000, help="Pacientes do holdout independente")
+    parser.add_argument("--tolerances", type=float, nargs="+", default=[0.001, 0.005, 0.01])
+    parser.add_argument("--epsilons", type=float, nargs="+", default=[0.0, 0.02])
+    parser.add_argument("--min-trees", type=int, default=CompressionConfig.min_trees)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="Arquivo JSON de saída")
+    args = parser.parse_args(argv)
+
+    print("=" * 60)
+    print("⏱️  BENCHMARK DA COMPRESSÃO DO ENSEMBLE")
+    print("=" * 60)
+
+    train_data = generate_patients(args.patients, seed=args.seed)
+    holdout = generate_patients(args.holdout, seed=args.seed + 1)
+
+    results = {}
+    for model_type in MODEL_TYPES:
+        trained = ComplicationPredictor(model_type=model_type)
+        with contextlib.redirect_stdout(io.StringIO()):
+            trained.train(train_data)
+        features = trained.prepare_features(holdout)
+        X_holdout = trained._model_input(features, trained._feature_matrix(features))
+        y_holdout = holdout["teve_complicacao"].to_numpy()
+        holdout_auc = float(roc_auc_score(y_holdout, trained.predict_proba(holdout)))
+
+        print(f"\n📦 Modelo: {model_type} | AUC holdout completo: {holdout_auc:.4f}")
+        runs = []
+        for epsilon in args.epsilons:
+            bound = _prune_bound(trained, X_holdout, epsilon) if epsilon > 0 else None
+            if bound:
+                print(
+                    f"   Poda epsilon={epsilon}: mudança máx. {bound['max_change']:.4f}"
+                    f" (limite {bound['bound']:.4f}) {'✅' if bound['ok'] else '❌'}"
+                )
+            for tolerance in args.tolerances:
+                predictor = copy.deepcopy(trained)
+                config = CompressionConfig(auc_tolerance=tolerance, prune_epsilon=epsilon, min_trees=args.min_trees)
+                start = time.perf_counter()
+                with contextlib.redirect_stdout(io.StringIO()):
+                    report = predictor.compress(config)
+                seconds = time.perf_counter() - start
+                compressed_auc = float(roc_auc_score(y_holdout, predictor.predict_proba(holdout)))
+
+                before, after, reduction = report["before"], report["after"], report["reduction"]
+                run = {
+                    "auc_tolerance": tolerance,
+                    "prune_epsilon": epsilon,
+                    "seconds": seconds,
+                    "oof_auc_before": report["oof_auc_before"],
+                    "oof_auc_after": report["oof_auc_after"],
+                    "holdout_auc_before": holdout_auc,
+                    "holdout_auc_after": compressed_auc,
+                    "prune_bound": bound,
+                    "before": before,
+                    "after": after,
+                    "reduction": reduction,
+                }
+                runs.append(run)
+                print(
+                    f"   tol={tolerance} eps={epsilon}: árvores {before['trees']} -> {after['trees']},"
+                    f" nós {before['nodes']:,} -> {after['nodes']:,} ({reduction['nodes']:.0%} menos)"
+                    f" em {seconds:.1f} s"
+                )
+                print(
+                    f"      AUC OOF {report['oof_auc_before']:.4f} -> {report['oof_auc_after']:.4f}"
+                    f" | holdout {holdout_auc:.4f} -> {compressed_auc:.4f} ({compressed_auc - holdout_auc:+.4f})"
+                )
+                print(
+                    f"      .compiled {before['compiled_bytes'] / 1024:.0f} -> {after['compiled_bytes'] / 1024:.0f} KB"
+                    f" | .joblib {before['joblib_bytes'] / 1024:.0f} -> {after['joblib_bytes'] / 1024:.0f} KB"
+                    f" | latência {before['single_us']:.0f} -> {after['single_us']:.0f} µs,"
+                    f" lote {before['batch_us_per_row']:.1f} -> {after['batch_us_per_row']:.1f} µs/linha"
+                )
+        results[model_type] = runs
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"environment": environment_info(), "config": vars(args), "results": results}, f, indent=2)
+        print(f"\n✅ Resultados salvos em: {args.output}")
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,169 @@
+"""
+Benchmark do fallback destilado (distillation.py + fallback.py)
+
+1. Treina o ensemble com pacientes sintéticos, destila o fallback e exporta
+   os dois no formato compilado
+2. Latência de uma predição: modelo principal x fallback
+3. Fidelidade em um holdout independente (comparada à fidelidade OOF
+   reportada no treino): erro, R², mesma faixa de risco e AUC
+4. Roteamento por prazo: requisições em que uma fração (--slow-rate) do
+   modelo principal demora --slow-ms (GC, carga de tenant, máquina
+   saturada...). Latência p50/p99/máx. e taxa de fallback, sem prazo e
+   com --deadline-ms
+
+Uso (a partir do diretório ml/):
+    python -m benchmarks.bench_fallback
+    python -m benchmarks.bench_fallback --model-type gradient_boosting --deadline-ms 20 --slow-rate 0.1
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from typing import List, Optional
+
+import numpy as np
+
+from compiled import CompiledPredictor
+from distillation import fidelity
+from fallback import DeadlineRouter
+from model import ComplicationPredictor
+from benchmarks.bench_ml import environment_info
+from benchmarks.synthetic import generate_patients
+
+
+def _records(data) -> List[dict]:
+    payloads = data.drop(columns=["teve_complicacao"])
+    return payloads.astype(object).where(payloads.notna(), None).to_dict("records")
+
+
+def _single_us(model, records: List[dict], repeats: int) -> float:
+    for record in records[:20]:
+        model.predict(record)
+    start = time.perf_counter()
+    for i in range(repeats):
+        model.predict(records[i % len(records)])
+    return (time.perf_counter() - start) / repeats * 1e6
+
+
+def _percentiles(latencies: List[float]) -> dict:
+    values = np.asarray(latencies) * 1000
+    return {
+        "p50_ms": float(np.percentile(values, 50)),
+        "p99_ms": float(np.percentile(values, 99)),
+        "max_ms": float(values.max()),
+    }
+
+
+def _route(primary, fallback, records, router, deadline_ms, slow_rate, slow_ms, seed) -> dict:
+    """Latência ponta a ponta (prazo + fallback) de cada requisição"""
+    rng = random.Random(seed)
+    latencies = []
+    fallbacks = 0
+    for record in records:
+        slow = rng.random() < slow_rate
+
+        def call_primary(record=record, slow=slow):
+            if slow:
+                time.sleep(slow_ms / 1000)
+            return primary.predict(record)
+
+        start = time.perf_counter()
+        result, reason, _ = router.call(call_primary, deadline_ms)
+        if result is None:
+            fallback.predict(record)
+            fallbacks += 1
+        latencies.append(time.perf_counter() - start)
+    return {"deadline_ms": deadline_ms, "fallback_rate": fallbacks / len(records), **_percentiles(latencies)}
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Benchmark do fallback destilado")
+    parser.add_argument("--model-type", default="random_forest", choices=["random_forest", "gradient_boosting"])
+    parser.add_argument("--patients", type=int, default=3000)
+    parser.add_argument("--holdout", type=int, default=20000)
+    parser.add_argument("--repeats", type=int, default=2000, help="Predições medidas na latência individual")
+    parser.add_argument("--requests", type=int, default=1000, help="Requisições no roteamento por prazo")
+    parser.add_argument("--deadline-ms", type=float, default=50)
+    parser.add_argument("--slow-rate", type=float, default=0.05)
+    parser.add_argument("--slow-ms", type=float, default=300)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="Arquivo JSON de saída")
+    args = parser.parse_args(argv)
+
+    print("=" * 60)
+    print("⏱️  BENCHMARK DO FALLBACK DESTILADO")
+    print("=" * 60)
+
+    predictor = ComplicationPredictor(model_type=args.model_type)
+    with contextlib.redirect_stdout(io.StringIO()):
+        predictor.train(generate_patients(args.patients, seed=args.seed))
+        report = predictor.distill()
+
+    holdout = generate_patients(args.holdout, seed=args.seed + 1)
+    records = _records(holdout)
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        paths = {name: os.path.join(tmpdir, f"{name}.compiled") for name in ("primary", "fallback")}
+        with contextlib.redirect_stdout(io.StringIO()):
+            predictor.export_compiled(paths["primary"])
+            predictor.export_fallback(paths["fallback"])
+            primary = CompiledPredictor.load(paths["primary"])
+            fallback = CompiledPredictor.load(paths["fallback"])
+
+        latency = {
+            "primary_us": _single_us(primary, records, args.repeats),
+            "fallback_us": _single_us(fallback, records, args.repeats),
+            "primary_bytes": os.path.getsize(paths["primary"]),
+            "fallback_bytes": os.path.getsize(paths["fallback"]),
+        }
+        print(
+            f"\n⚡ Predição individual: principal {latency['primary_us']:.0f} µs"
+            f" ({latency['primary_bytes'] / 1024:.0f} KB) | fallback {latency['fallback_us']:.0f} µs"
+            f" ({latency['fallback_bytes'] / 1024:.0f} KB)"
+        )
+
+        holdout_fidelity = fidelity(
+            primary.predict_proba(records),
+            fallback.predict_proba(records),
+            holdout["teve_complicacao"].to_numpy(),
+            primary.risk_thresholds,
+        )
+        print(f"\n🎯 Fidelidade (árvore de profundidade {report['max_depth']}, {report['leaves']} folhas):")
+        for name in ("fidelity_mae", "fidelity_max_abs_error", "fidelity_r2", "risk_level_agreement", "roc_auc", "teacher_roc_auc"):
+            print(f"   {name:<24} OOF {report[name]:.3f} | holdout {holdout_fidelity[name]:.3f}")
+
+        routing_records = records[: args.requests]
+        routing = [
+            _route(primary, fallback, routing_records, DeadlineRouter(), deadline, args.slow_rate, args.slow_ms, args.seed)
+            for deadline in (None, args.deadline_ms)
+        ]
+        print(f"\n🚦 Roteamento ({args.slow_rate:.0%} das chamadas ao principal levam {args.slow_ms:.0f} ms):")
+        for run in routing:
+            label = "sem prazo" if run["deadline_ms"] is None else f"prazo {run['deadline_ms']:.0f} ms"
+            print(
+                f"   {label:<14} p50 {run['p50_ms']:.2f} ms | p99 {run['p99_ms']:.1f} ms | máx {run['max_ms']:.1f} ms"
+                f" | fallback {run['fallback_rate']:.1%}"
+            )
+
+    results = {
+        "distillation": report,
+        "latency": latency,
+        "holdout_fidelity": holdout_fidelity,
+        "routing": routing,
+    }
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"environment": environment_info(), "config": vars(args), "results": results}, f, indent=2)
+        print(f"\n✅ Resultados salvos em: {args.output}")
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
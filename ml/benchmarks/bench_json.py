@@ -0,0 +1,132 @@
+"""
+Microbenchmark de serialização JSON da API
+
+Compara, para os payloads reais da API:
+- encode: flask.jsonify (caminho antigo) x json da stdlib x codec da API
+  (serialization.dumps, orjson quando instalado)
+- respostas estáticas: jsonify por requisição x corpo pré-codificado
+- decode: request.get_json do Flask x serialization.loads
+
+Uso (a partir do diretório ml/):
+    python -m benchmarks.bench_json
+    python -m benchmarks.bench_json --batch-size 5000 --output json.json
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import sys
+from typing import Callable, Dict, List, Optional
+
+from flask import Flask, jsonify
+
+import serialization
+from model import ComplicationPredictor
+from benchmarks.bench_ml import _timeit, environment_info
+from benchmarks.synthetic import generate_patients, generate_payloads
+
+
+def _stdlib_dumps(obj) -> bytes:
+    return json.dumps(obj, default=serialization._to_builtin).encode("utf-8")
+
+
+def _payloads(batch_size: int, seed: int) -> Dict[str, object]:
+    """Corpos de requisição e resposta no formato da API"""
+    predictor = ComplicationPredictor(model_type="gradient_boosting")
+    with contextlib.redirect_stdout(io.StringIO()):
+        predictor.train(generate_patients(500, seed=seed))
+
+    requests_ = generate_payloads(batch_size, seed=seed)
+    responses = [predictor.predict(payload) for payload in requests_[:200]]
+    batch = (responses * (1 + batch_size // len(responses)))[:batch_size]
+
+    return {
+        "predict_request": requests_[0],
+        "predict_response": {**responses[0], "model_used": "individual"},
+        "batch_response": {"predictions": batch},
+        "feature_importance": {
+            "feature_importance": predictor.feature_importance,
+            "top_10": dict(list(predictor.feature_importance.items())[:10]),
+        },
+        "predictor": predictor,
+    }
+
+
+def run_benchmarks(batch_size: int = 1000, calls: int = 2000, seed: int = 42) -> List[Dict]:
+    app = Flask(__name__)
+    payloads = _payloads(batch_size, seed)
+    results = []
+
+    def record(name: str, variant: str, fn: Callable[[], object], repeat: int):
+        stats = _timeit(fn, repeat)
+        results.append({"benchmark": name, "variant": variant, **stats})
+        print(f"  {name:<22} {variant:<16} mediana={stats['median_s'] * 1e6:12.1f} µs")
+
+    print(f"🧾 Codec: {serialization.BACKEND}")
+
+    with app.app_context():
+        for name in ("predict_response", "batch_response", "feature_importance"):
+            obj = payloads[name]
+            repeat = calls if name != "batch_response" else max(calls // 100, 5)
+            record(name, "flask.jsonify", lambda: jsonify(obj).get_data(), repeat)
+            record(name, "json (stdlib)", lambda: _stdlib_dumps(obj), repeat)
+            record(name, f"codec ({serialization.BACKEND})", lambda: serialization.dumps(obj), repeat)
+
+        static = serialization.encode_static_responses(payloads["predictor"])
+        record(
+            "feature_importance",
+            "pré-codificado",
+            lambda: serialization.bytes_response(static["feature-importance"]).get_data(),
+            calls,
+        )
+
+    body = serialization.dumps(payloads["predict_request"])
+    for name, data in (("predict_request", body), ("batch_response", serialization.dumps(payloads["batch_response"]))):
+        repeat = calls if name == "predict_request" else max(calls // 100, 5)
+
+        def flask_decode(data=data):
+            with app.test_request_context(method="POST", data=data, content_type="application/json"):
+                from flask import request
+
+                return request.get_json()
+
+        def flask_parse_only(data=data):
+            return app.json.loads(data)
+
+        record(f"decode_{name}", "flask.get_json", flask_decode, repeat)
+        record(f"decode_{name}", "flask.json.loads", flask_parse_only, repeat)
+        record(f"decode_{name}", f"codec ({serialization.BACKEND})", lambda data=data: serialization.loads(data), repeat)
+
+    return results
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Microbenchmark de JSON da API")
+    parser.add_argument("--batch-size", type=int, default=1000, help="Predições na resposta em lote")
+    parser.add_argument("--calls", type=int, default=2000, help="Repetições dos payloads pequenos")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="Arquivo JSON de saída")
+    args = parser.parse_args(argv)
+
+    print("=" * 60)
+    print("⏱️  BENCHMARK DE SERIALIZAÇÃO JSON")
+    print("=" * 60)
+
+    results = run_benchmarks(args.batch_size, args.calls, args.seed)
+
+    if args.output:
+        report = {
+            "environment": {**environment_info(), "json_backend": serialization.BACKEND},
+            "config": vars(args),
+            "results": results,
+        }
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"\n✅ Resultados salvos em: {args.output}")
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
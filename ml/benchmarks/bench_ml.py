@@ -0,0 +1,272 @@
+"""
+Benchmark de treino e inferência do ComplicationPredictor
+
+Mede, para vários tamanhos de dataset sintético:
+- prepare_features
+- train (random_forest e gradient_boosting)
+- bootstrap_ci (2000 reamostragens das probabilidades out-of-fold)
+- predict (um paciente por chamada)
+- predict_proba (lote com o dataset inteiro)
+- load (leitura do artefato .joblib)
+
+Os resultados são gravados em JSON para comparar execuções e detectar
+regressões.
+
+Uso (a partir do diretório ml/):
+    python -m benchmarks.bench_ml
+    python -m benchmarks.bench_ml --sizes 500 2000 --output benchmarks/results/atual.json
+    python -m benchmarks.bench_ml --compare benchmarks/results/base.json
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+import sklearn
+
+from evaluation import bootstrap_confidence_intervals
+from model import ComplicationPredictor
+from benchmarks.synthetic import generate_patients
+
+DEFAULT_SIZES = [250, 1000, 5000]
+MODEL_TYPES = ["random_forest", "gradient_boosting"]
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), "results")
+
+
+def _quiet():
+    """Silencia os prints de progresso do modelo durante as medições"""
+    return contextlib.redirect_stdout(io.StringIO())
+
+
+def _timeit(fn: Callable[[], object], repeat: int) -> Dict:
+    """Executa fn `repeat` vezes e retorna estatísticas em segundos por chamada"""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+
+    timings.sort()
+    return {
+        "repeat": repeat,
+        "min_s": timings[0],
+        "median_s": statistics.median(timings),
+        "mean_s": statistics.fmean(timings),
+        "p95_s": timings[min(len(timings) - 1, int(round(0.95 * (len(timings) - 1))))],
+        "std_s": statistics.pstdev(timings),
+    }
+
+
+def environment_info() -> Dict:
+    """Metadados do ambiente, para saber se duas execuções são comparáveis"""
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "processor": platform.processor() or platform.machine(),
+        "cpu_count": os.cpu_count(),
+        "numpy": np.__version__,
+        "pandas": pd.__version__,
+        "scikit-learn": sklearn.__version__,
+    }
+
+
+def run_benchmarks(
+    sizes: List[int],
+    model_types: List[str],
+    repeat: int = 3,
+    predict_calls: int = 200,
+    seed: int = 42,
+) -> List[Dict]:
+    """
+    Executa todos os benchmarks
+
+    Args:
+        sizes: Tamanhos de dataset
+        model_types: Tipos de modelo a treinar
+        repeat: Repetições das etapas pesadas (prepare_features, train, lote, load)
+        predict_calls: Chamadas de predict() individuais medidas
+        seed: Semente do gerador sintético
+
+    Returns:
+        Lista de resultados (um dict por benchmark/modelo/tamanho)
+    """
+    results = []
+
+    def record(name: str, n: int, model_type: Optional[str], stats: Dict):
+        entry = {"benchmark": name, "model_type": model_type, "n": n, **stats}
+        results.append(entry)
+        label = f"{name}[{model_type}]" if model_type else name
+        print(
+            f"  {label:<40} n={n:<7} mediana={stats['median_s'] * 1000:10.3f} ms"
+            f"  p95={stats['p95_s'] * 1000:10.3f} ms"
+        )
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        for n in sizes:
+            print(f"\n📊 Dataset sintético: {n} pacientes")
+            data = generate_patients(n, seed=seed)
+            payloads = (
+                data.drop(columns=["teve_complicacao"])
+                .head(predict_calls)
+                .to_dict(orient="records")
+            )
+
+            base = ComplicationPredictor()
+            record(
+                "prepare_features", n, None,
+                _timeit(lambda: base.prepare_features(data), repeat),
+            )
+
+            for model_type in model_types:
+                predictor = ComplicationPredictor(model_type=model_type)
+
+                def train():
+                    with _quiet():
+                        predictor.train(data)
+
+                record("train", n, model_type, _timeit(train, repeat))
+
+                record(
+                    "bootstrap_ci", n, model_type,
+                    _timeit(
+                        lambda: bootstrap_confidence_intervals(predictor.oof.y, predictor.oof.proba),
+                        repeat,
+                    ),
+                )
+
+                calls = iter(payloads * (1 + predict_calls // max(len(payloads), 1)))
+                record(
+                    "predict_single", n, model_type,
+                    _timeit(lambda: predictor.predict(next(calls)), predict_calls),
+                )
+
+                record(
+                    "predict_batch", n, model_type,
+                    _timeit(lambda: predictor.predict_proba(data), repeat),
+                )
+
+                path = os.path.join(tmpdir, f"{model_type}_{n}.joblib")
+                with _quiet():
+                    predictor.save(path)
+
+                def load():
+                    with _quiet():
+                        ComplicationPredictor().load(path)
+
+                stats = _timeit(load, repeat)
+                stats["artifact_bytes"] = os.path.getsize(path)
+                record("load", n, model_type, stats)
+
+    return results
+
+
+def _key(entry: Dict):
+    return (entry["benchmark"], entry["model_type"], entry["n"])
+
+
+def compare_results(current: List[Dict], baseline: List[Dict], tolerance: float) -> List[Dict]:
+    """
+    Compara medianas com uma execução anterior
+
+    Returns:
+        Lista de regressões (razão atual/base acima de 1 + tolerance)
+    """
+    baseline_by_key = {_key(entry): entry for entry in baseline}
+    regressions = []
+
+    print("\n" + "=" * 78)
+    print(f"{'benchmark':<40} {'n':>7} {'base ms':>10} {'atual ms':>10} {'razão':>7}")
+    print("=" * 78)
+
+    for entry in current:
+        base = baseline_by_key.get(_key(entry))
+        if base is None:
+            continue
+
+        ratio = entry["median_s"] / base["median_s"] if base["median_s"] else float("inf")
+        name = entry["benchmark"]
+        if entry["model_type"]:
+            name = f"{name}[{entry['model_type']}]"
+        flag = ""
+        if ratio > 1 + tolerance:
+            flag = " ⚠️"
+            regressions.append({**entry, "baseline_median_s": base["median_s"], "ratio": ratio})
+
+        print(
+            f"{name:<40} {entry['n']:>7} {base['median_s'] * 1000:>10.3f}"
+            f" {entry['median_s'] * 1000:>10.3f} {ratio:>7.2f}{flag}"
+        )
+
+    return regressions
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Benchmark do pipeline de ML")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES)
+    parser.add_argument("--models", nargs="+", default=MODEL_TYPES, choices=MODEL_TYPES)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--predict-calls", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="Arquivo JSON de saída (padrão: benchmarks/results/<timestamp>.json)")
+    parser.add_argument("--compare", help="JSON de uma execução anterior para comparar")
+    parser.add_argument(
+        "--tolerance", type=float, default=0.20,
+        help="Aumento relativo da mediana considerado regressão (padrão: 0.20)",
+    )
+    args = parser.parse_args(argv)
+
+    print("=" * 60)
+    print("⏱️  BENCHMARK DO PIPELINE DE ML")
+    print("=" * 60)
+
+    results = run_benchmarks(
+        args.sizes, args.models,
+        repeat=args.repeat, predict_calls=args.predict_calls, seed=args.seed,
+    )
+
+    report = {
+        "created_at": datetime.now().isoformat(),
+        "environment": environment_info(),
+        "config": {
+            "sizes": args.sizes,
+            "models": args.models,
+            "repeat": args.repeat,
+            "predict_calls": args.predict_calls,
+            "seed": args.seed,
+        },
+        "results": results,
+    }
+
+    output = args.output or os.path.join(
+        RESULTS_DIR, f"bench_ml_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+    )
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"\n✅ Resultados salvos em: {output}")
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = compare_results(results, baseline["results"], args.tolerance)
+        if regressions:
+            print(f"\n❌ {len(regressions)} regressão(ões) acima de {args.tolerance:.0%}")
+            return 1
+        print("\n✅ Nenhuma regressão detectada")
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
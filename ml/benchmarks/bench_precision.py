@@ -0,0 +1,154 @@
+"""
+Benchmark das precisões do formato compilado (compiled.Precision)
+
+Treina Random Forest e Gradient Boosting com pacientes sintéticos e exporta
+cada combinação de thresholds (float64, float32, int16) e folhas (float64,
+float32, float16). Para cada uma reporta:
+- bytes do arquivo e dos arrays das árvores, comparados ao layout anterior
+  (índices int32, thresholds e folhas float64) e ao cache L2 da CPU
+- maior diferença para o predict_proba do scikit-learn e o limite de erro
+  gravado no cabeçalho
+- vazão (linhas/s) do runtime compilado em lotes de 1, 64 e 4096 linhas
+
+Uso (a partir do diretório ml/):
+    python -m benchmarks.bench_precision
+    python -m benchmarks.bench_precision --patients 5000 --batch-sizes 1 256 --output precision.json
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import sys
+import tempfile
+import time
+from typing import List, Optional
+
+import numpy as np
+import pandas as pd
+
+from compiled import LEAF_DTYPES, THRESHOLD_DTYPES, CompiledPredictor, Precision
+from model import ComplicationPredictor
+from benchmarks.bench_ml import environment_info
+from benchmarks.synthetic import generate_patients, generate_payloads
+
+MODEL_TYPES = ["random_forest", "gradient_boosting"]
+
+# Bytes por nó do layout anterior: feature, left, right (int32), threshold e
+# valor (float64), missing_left (uint8)
+_LEGACY_NODE_BYTES = 4 + 4 + 4 + 8 + 8 + 1
+
+
+def _l2_cache_bytes() -> Optional[int]:
+    """Tamanho do cache L2 (Linux), ou None"""
+    base = "/sys/devices/system/cpu/cpu0/cache"
+    try:
+        for index in sorted(os.listdir(base)):
+            with open(os.path.join(base, index, "level")) as f:
+                if f.read().strip() != "2":
+                    continue
+            with open(os.path.join(base, index, "size")) as f:
+                size = f.read().strip()
+            units = {"K": 1024, "M": 1024 ** 2}
+            return int(size[:-1]) * units[size[-1]] if size[-1] in units else int(size)
+    except (OSError, ValueError):
+        return None
+    return None
+
+
+def _rows_per_s(ensemble, X: np.ndarray, batch_size: int, min_rows: int) -> float:
+    """Vazão em lotes de batch_size linhas (uma passada de aquecimento)"""
+    batches = [X[start : start + batch_size] for start in range(0, len(X), batch_size)]
+    n_batches = max(1, -(-min_rows // batch_size))
+    ensemble.predict_proba(batches[0])
+    start = time.perf_counter()
+    for i in range(n_batches):
+        ensemble.predict_proba(batches[i % len(batches)])
+    elapsed = time.perf_counter() - start
+    return sum(len(batches[i % len(batches)]) for i in range(n_batches)) / elapsed
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Benchmark das precisões do formato compilado")
+    parser.add_argument("--patients", type=int, default=3000)
+    parser.add_argument("--rows", type=int, default=8192, help="Pacientes usados na medição")
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 64, 4096])
+    parser.add_argument("--min-rows", type=int, default=4096, help="Linhas preditas por medição (mínimo 1 lote)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="Arquivo JSON de saída")
+    args = parser.parse_args(argv)
+
+    print("=" * 60)
+    print("⏱️  BENCHMARK DAS PRECISÕES DO MODELO COMPILADO")
+    print("=" * 60)
+
+    l2_bytes = _l2_cache_bytes()
+    print(f"Cache L2: {l2_bytes / 1024:.0f} KB" if l2_bytes else "Cache L2: desconhecido")
+
+    data = generate_patients(args.patients, seed=args.seed)
+    records = generate_payloads(args.rows, seed=args.seed + 1)
+
+    results = {}
+    with tempfile.TemporaryDirectory() as tmpdir:
+        for model_type in MODEL_TYPES:
+            predictor = ComplicationPredictor(model_type=model_type)
+            with contextlib.redirect_stdout(io.StringIO()):
+                predictor.train(data)
+            expected = predictor.predict_proba(pd.DataFrame(records))
+
+            print(f"\n📦 Modelo: {model_type}")
+            runs = []
+            for thresholds in THRESHOLD_DTYPES:
+                for leaves in LEAF_DTYPES:
+                    path = os.path.join(tmpdir, f"{model_type}-{thresholds}-{leaves}.compiled")
+                    with contextlib.redirect_stdout(io.StringIO()):
+                        predictor.export_compiled(path, Precision(thresholds=thresholds, leaves=leaves))
+                        compiled = CompiledPredictor.load(path)
+                    ensemble = compiled.model
+                    X = compiled.feature_matrix(records).astype(np.float32)
+                    legacy_bytes = len(ensemble.feature) * _LEGACY_NODE_BYTES + ensemble.n_trees * 4
+
+                    run = {
+                        "thresholds": thresholds,
+                        "leaves": leaves,
+                        "file_bytes": os.path.getsize(path),
+                        "tree_bytes": ensemble.nbytes,
+                        "legacy_tree_bytes": legacy_bytes,
+                        "size_ratio": legacy_bytes / ensemble.nbytes,
+                        "fits_l2": l2_bytes is not None and ensemble.nbytes <= l2_bytes,
+                        "max_abs_diff": float(np.max(np.abs(ensemble.predict_proba(X) - expected))),
+                        "max_proba_error": ensemble.max_proba_error,
+                        "rows_per_s": {
+                            str(size): _rows_per_s(ensemble, X, size, args.min_rows) for size in args.batch_sizes
+                        },
+                    }
+                    runs.append(run)
+                    del compiled, ensemble
+
+                    throughput = " | ".join(
+                        f"lote {size}: {rate:,.0f}/s" for size, rate in run["rows_per_s"].items()
+                    )
+                    print(
+                        f"   thresholds {thresholds:<7} folhas {leaves:<7}: árvores {run['tree_bytes'] / 1024:,.0f} KB"
+                        f" ({run['size_ratio']:.1f}x menor{', cabe no L2' if run['fits_l2'] else ''})"
+                        f" | erro {run['max_abs_diff']:.1e} (limite {run['max_proba_error']:.1e})"
+                    )
+                    print(f"      {throughput}")
+            results[model_type] = runs
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(
+                {"environment": environment_info(), "l2_cache_bytes": l2_bytes, "config": vars(args), "results": results},
+                f,
+                indent=2,
+            )
+        print(f"\n✅ Resultados salvos em: {args.output}")
+
+    failures = sum(run["max_abs_diff"] > run["max_proba_error"] + 1e-12 for runs in results.values() for run in runs)
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,148 @@
+"""
+Benchmark do profiler por amostragem (profiler.py)
+
+Latência de POST /predict (api.py pelo test client do Flask, modelo
+compilado) em malha aberta na taxa de pico (--rate), em blocos alternados:
+- sem profiler
+- amostrando as pilhas a cada --interval-ms
+- amostrando as pilhas com o tracemalloc ligado (memory=1)
+
+Para cada bloco com profiler também reporta a fração do tempo gasta
+percorrendo pilhas e a fração das amostras dentro de predict (api.py), que
+deve bater com a fração do tempo medida dentro da view (um amostrador
+enviesado cairia nas esperas da thread, não no código que roda).
+
+Uso (a partir do diretório ml/):
+    python -m benchmarks.bench_profiler
+    python -m benchmarks.bench_profiler --rate 300 --interval-ms 5 --output profiler.json
+"""
+
+import argparse
+import json
+import sys
+import tempfile
+import threading
+import time
+from typing import List, Optional
+
+from profiler import StackSampler
+from benchmarks.bench_audit import _paced, _summary, start_api
+from benchmarks.bench_ml import environment_info
+from benchmarks.synthetic import generate_payloads
+
+CONDITIONS = ["sem_profiler", "pilhas", "pilhas_e_memoria"]
+
+
+def _share_in(collapsed: str, frame: str) -> float:
+    """Fração das pilhas amostradas que passam pelo frame (ex.: "predict (api.py:")"""
+    total = inside = 0
+    for line in collapsed.splitlines():
+        stack, count = line.rsplit(" ", 1)
+        total += int(count)
+        if frame in stack:
+            inside += int(count)
+    return inside / total if total else 0.0
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Benchmark do profiler por amostragem")
+    parser.add_argument("--patients", type=int, default=2000)
+    parser.add_argument("--rate", type=float, default=200.0, help="Taxa de pico em req/s")
+    parser.add_argument("--duration", type=float, default=3.0, help="Duração de cada bloco (s)")
+    parser.add_argument("--rounds", type=int, default=3, help="Blocos por condição (alternados)")
+    parser.add_argument("--interval-ms", type=float, default=10.0)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="Arquivo JSON de saída")
+    args = parser.parse_args(argv)
+
+    print("=" * 60)
+    print("⏱️  BENCHMARK DO PROFILER POR AMOSTRAGEM")
+    print("=" * 60)
+
+    records = generate_payloads(2000, seed=args.seed + 1)
+    latencies = {condition: [] for condition in CONDITIONS}
+    view_s = {condition: 0.0 for condition in CONDITIONS}
+    block_s = {condition: 0.0 for condition in CONDITIONS}
+    profiles = {condition: [] for condition in CONDITIONS[1:]}
+    with tempfile.TemporaryDirectory() as tmpdir:
+        api, _ = start_api(tmpdir, args.patients, args.seed)
+        client = api.app.test_client()
+        sampler = StackSampler()
+
+        # Tempo dentro da view de /predict (referência para as amostras)
+        view = api.app.view_functions["predict"]
+        current = {"condition": CONDITIONS[0]}
+
+        def timed_view():
+            start = time.perf_counter()
+            try:
+                return view()
+            finally:
+                view_s[current["condition"]] += time.perf_counter() - start
+
+        api.app.view_functions["predict"] = timed_view
+
+        _paced(client, records, args.rate, 0.5)  # aquecimento
+        for _ in range(args.rounds):
+            for condition in CONDITIONS:
+                thread = None
+                if condition != "sem_profiler":
+                    # Um pouco mais longo que o bloco: cobre todas as requisições
+                    thread = threading.Thread(
+                        target=lambda condition=condition: profiles[condition].append(
+                            sampler.profile(
+                                args.duration + 0.2, args.interval_ms, memory=condition == "pilhas_e_memoria"
+                            )
+                        )
+                    )
+                    thread.start()
+                current["condition"] = condition
+                start = time.perf_counter()
+                latencies[condition] += _paced(client, records, args.rate, args.duration)
+                block_s[condition] += time.perf_counter() - start
+                if thread is not None:
+                    thread.join()
+
+    latency = {condition: _summary(values) for condition, values in latencies.items()}
+    print(f"\n🚦 POST /predict a {args.rate:.0f} req/s, amostras a cada {args.interval_ms:g} ms:")
+    baseline = latency["sem_profiler"]
+    for condition, run in latency.items():
+        print(
+            f"   {condition:<17} média {run['mean_ms']:.3f} ms | p50 {run['p50_ms']:.3f} ms"
+            f" | p99 {run['p99_ms']:.3f} ms | máx {run['max_ms']:.1f} ms"
+            + (
+                f" | Δp50 {run['p50_ms'] - baseline['p50_ms']:+.3f} ms"
+                if condition != "sem_profiler" else ""
+            )
+        )
+
+    sampling = {}
+    for condition, reports in profiles.items():
+        sampling[condition] = {
+            "samples": sum(report["samples"] for report in reports),
+            "stack_samples": sum(report["stack_samples"] for report in reports),
+            "sampling_overhead": max(report["sampling_overhead"] for report in reports),
+            "predict_share": _share_in("".join(report["collapsed"] for report in reports), "predict (api.py:"),
+            "view_share": view_s[condition] / block_s[condition],
+            "peak_traced_bytes": max(
+                (report["memory"]["peak_traced_bytes"] for report in reports if report["memory"]), default=None
+            ),
+        }
+        print(
+            f"\n🔎 {condition}: {sampling[condition]['samples']} amostras,"
+            f" {sampling[condition]['sampling_overhead']:.1%} do tempo percorrendo pilhas,"
+            f" {sampling[condition]['predict_share']:.0%} das amostras em predict"
+            f" (medido na view: {sampling[condition]['view_share']:.0%})"
+        )
+
+    results = {"latency": latency, "sampling": sampling}
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"environment": environment_info(), "config": vars(args), "results": results}, f, indent=2)
+        print(f"\n✅ Resultados salvos em: {args.output}")
+
+    return 0 if sampling["pilhas"]["predict_share"] > 0 else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
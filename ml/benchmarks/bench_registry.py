@@ -0,0 +1,169 @@
+"""
+Benchmark do registro de modelos por tenant (registry.ModelRegistry)
+
+Cria T tenants com artefatos compilados e mede:
+- single-flight: W threads pedem o mesmo tenant frio ao mesmo tempo;
+  deve haver uma única carga
+- tráfego Zipf: requisições de várias threads com popularidade Zipf entre
+  os tenants e LRU menor que T; reporta hit rate, cargas, evicções,
+  latência de carga e throughput de get() + predict()
+
+Uso (a partir do diretório ml/):
+    python -m benchmarks.bench_registry
+    python -m benchmarks.bench_registry --tenants 50 --max-models 10 --requests 20000
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from model import ComplicationPredictor
+from registry import MODEL_FILENAME, ModelRegistry, compiled_path, tenant_model_path
+from benchmarks.bench_ml import environment_info
+from benchmarks.synthetic import generate_patients, generate_payloads
+
+
+def _create_tenants(root: str, n_tenants: int, seed: int) -> List[str]:
+    """Mesmo modelo compilado copiado para n_tenants diretórios"""
+    predictor = ComplicationPredictor(model_type="random_forest")
+    source = os.path.join(root, "_source", MODEL_FILENAME)
+    with contextlib.redirect_stdout(io.StringIO()):
+        predictor.train(generate_patients(500, seed=seed))
+        predictor.export_compiled(compiled_path(source))
+
+    tenant_ids = [f"medico-{i:03d}" for i in range(n_tenants)]
+    for tenant_id in tenant_ids:
+        target = compiled_path(tenant_model_path(tenant_id, root))
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        shutil.copyfile(compiled_path(source), target)
+    return tenant_ids
+
+
+def single_flight(root: str, tenant_id: str, workers: int) -> Dict:
+    registry = ModelRegistry(root)
+    barrier = threading.Barrier(workers)
+
+    def request():
+        barrier.wait()
+        return registry.get(tenant_id)
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        with ThreadPoolExecutor(workers) as pool:
+            predictors = list(pool.map(lambda _: request(), range(workers)))
+
+    stats = registry.stats()["tenants"][tenant_id]
+    return {
+        "workers": workers,
+        "loads": stats["loads"],
+        "coalesced_loads": stats["coalesced_loads"],
+        "same_instance": all(p is predictors[0] for p in predictors),
+        "load_ms": stats["load_ms_max"],
+    }
+
+
+def zipf_traffic(
+    root: str, tenant_ids: List[str], max_models: int, n_requests: int, workers: int, zipf_a: float, seed: int
+) -> Dict:
+    rng = np.random.default_rng(seed)
+    # Zipf truncada: P(k-ésimo tenant mais popular) ∝ 1 / k^a
+    weights = 1.0 / np.arange(1, len(tenant_ids) + 1) ** zipf_a
+    ranks = rng.choice(len(tenant_ids), size=n_requests, p=weights / weights.sum())
+    sequence = [tenant_ids[rank] for rank in ranks]
+    payloads = generate_payloads(256, seed=seed)
+    registry = ModelRegistry(root, max_models=max_models)
+
+    def run(start: int):
+        for i in range(start, n_requests, workers):
+            registry.get(sequence[i]).predict(payloads[i % len(payloads)])
+
+    began = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        with ThreadPoolExecutor(workers) as pool:
+            list(pool.map(run, range(workers)))
+    elapsed = time.perf_counter() - began
+
+    stats = registry.stats()
+    tenants = stats["tenants"].values()
+    loads = sum(t["loads"] for t in tenants)
+    return {
+        "tenants": len(tenant_ids),
+        "max_models": max_models,
+        "requests": n_requests,
+        "workers": workers,
+        "zipf_a": zipf_a,
+        "hit_rate": stats["hit_rate"],
+        "loads": loads,
+        "evictions": sum(t["evictions"] for t in tenants),
+        "load_ms_mean": sum(t["load_ms_mean"] * t["loads"] for t in tenants if t["loads"]) / max(loads, 1),
+        "requests_per_s": n_requests / elapsed,
+        "top_tenants": {
+            tenant_id: {"hit_rate": data["hit_rate"], "loads": data["loads"]}
+            for tenant_id, data in sorted(
+                stats["tenants"].items(), key=lambda item: item[1]["hits"] + item[1]["misses"], reverse=True
+            )[:5]
+        },
+    }
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Benchmark do LRU de modelos por tenant")
+    parser.add_argument("--tenants", type=int, default=30)
+    parser.add_argument("--max-models", type=int, default=8)
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--zipf-a", type=float, default=1.3, help="Expoente Zipf da popularidade dos tenants")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="Arquivo JSON de saída")
+    args = parser.parse_args(argv)
+
+    print("=" * 60)
+    print("⏱️  BENCHMARK DO REGISTRO DE MODELOS POR TENANT")
+    print("=" * 60)
+
+    with tempfile.TemporaryDirectory() as root:
+        tenant_ids = _create_tenants(root, args.tenants, args.seed)
+
+        flight = single_flight(root, tenant_ids[0], args.workers)
+        print(
+            f"\n🛫 Single-flight: {flight['workers']} threads, {flight['loads']} carga(s),"
+            f" {flight['coalesced_loads']} esperaram a carga em andamento"
+            f" (mesma instância: {flight['same_instance']}, {flight['load_ms']:.1f} ms)"
+        )
+
+        traffic = zipf_traffic(
+            root, tenant_ids, args.max_models, args.requests, args.workers, args.zipf_a, args.seed
+        )
+        print(
+            f"\n📈 Zipf(a={args.zipf_a}) em {args.tenants} tenants, LRU de {args.max_models} modelos:"
+            f"\n   hit rate {traffic['hit_rate']:.1%} | {traffic['loads']} cargas"
+            f" ({traffic['load_ms_mean']:.2f} ms em média) | {traffic['evictions']} evicções"
+            f" | {traffic['requests_per_s']:.0f} req/s (get + predict)"
+        )
+        for tenant_id, data in traffic["top_tenants"].items():
+            print(f"   {tenant_id}: hit rate {data['hit_rate']:.1%}, {data['loads']} carga(s)")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(
+                {"environment": environment_info(), "config": vars(args), "single_flight": flight, "zipf": traffic},
+                f,
+                indent=2,
+            )
+        print(f"\n✅ Resultados salvos em: {args.output}")
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
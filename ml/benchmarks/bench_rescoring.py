@@ -0,0 +1,153 @@
+"""
+Benchmark do worker de re-scoring (rescoring.py)
+
+Com fila SQLite e features em memória:
+- eventos: E eventos sobre N pacientes (com repetições, popularidade Zipf),
+  consumidos até a fila esvaziar; reporta eventos/s, pacientes/s,
+  taxa de coalescência e latência por micro-lote
+- baseline: um predict() por evento, sem lote nem coalescência
+- leitura: GET do último risco (consulta por chave em latest_risk)
+- conferência: probabilidades gravadas = predict_proba do modelo
+
+Uso (a partir do diretório ml/):
+    python -m benchmarks.bench_rescoring
+    python -m benchmarks.bench_rescoring --patients 50000 --events 200000 --batch-size 1024
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+from typing import List, Optional
+
+import numpy as np
+
+from compiled import CompiledPredictor
+from latest_risk import LatestRiskStore
+from model import ComplicationPredictor
+from rescoring import FrameFeatureSource, RescoreEvent, RescoringWorker, SQLiteEventQueue, predict_batch
+from benchmarks.bench_ml import environment_info
+from benchmarks.synthetic import generate_patients
+
+
+def _predictors(tmpdir: str, seed: int):
+    predictor = ComplicationPredictor(model_type="gradient_boosting")
+    path = os.path.join(tmpdir, "model.compiled")
+    with contextlib.redirect_stdout(io.StringIO()):
+        predictor.train(generate_patients(1000, seed=seed))
+        predictor.export_compiled(path)
+        compiled = CompiledPredictor.load(path)
+    return {"joblib": predictor, "compiled": compiled}
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Benchmark do worker de re-scoring")
+    parser.add_argument("--patients", type=int, default=20000)
+    parser.add_argument("--events", type=int, default=50000)
+    parser.add_argument("--batch-size", type=int, default=512)
+    parser.add_argument("--max-wait-ms", type=float, default=50)
+    parser.add_argument("--zipf-a", type=float, default=1.1, help="Expoente Zipf da repetição de eventos")
+    parser.add_argument("--baseline-events", type=int, default=500, help="Eventos medidos no baseline")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="Arquivo JSON de saída")
+    args = parser.parse_args(argv)
+
+    print("=" * 60)
+    print("⏱️  BENCHMARK DO RE-SCORING POR EVENTOS")
+    print("=" * 60)
+
+    rng = np.random.default_rng(args.seed)
+    patients = generate_patients(args.patients, seed=args.seed + 1)
+    patients.insert(0, "patient_id", [f"p{i:07d}" for i in range(len(patients))])
+    patients.insert(1, "surgery_id", [f"s{i:07d}" for i in range(len(patients))])
+    features = FrameFeatureSource(patients)
+
+    weights = 1.0 / np.arange(1, args.patients + 1) ** args.zipf_a
+    chosen = rng.choice(args.patients, size=args.events, p=weights / weights.sum())
+    events = [RescoreEvent(patients["patient_id"].iat[i]) for i in chosen]
+
+    results = {}
+    with tempfile.TemporaryDirectory() as tmpdir:
+        predictors = _predictors(tmpdir, args.seed)
+
+        for name, predictor in predictors.items():
+            db = os.path.join(tmpdir, f"{name}.sqlite")
+            queue = SQLiteEventQueue(db)
+            store = LatestRiskStore(db)
+            queue.publish_many(events)
+
+            worker = RescoringWorker(
+                queue, features, predictor, store, batch_size=args.batch_size, max_wait=args.max_wait_ms / 1000
+            )
+            latencies = []
+            start = time.perf_counter()
+            while True:
+                stats = worker.run_once(timeout=0)
+                if stats is None:
+                    break
+                latencies.append(stats["seconds"])
+            elapsed = time.perf_counter() - start
+            totals = worker.totals
+
+            # Conferência: o que foi gravado = predição em lote do modelo
+            sample = patients.sample(min(200, totals["patients"]), random_state=args.seed)
+            sample = sample[sample["patient_id"].isin(set(patients["patient_id"].iloc[np.unique(chosen)]))]
+            stored = np.array([store.get(pid)["probability"] for pid in sample["patient_id"]])
+            max_diff = float(np.max(np.abs(stored - predict_batch(predictor, sample)))) if len(sample) else 0.0
+
+            lookup_ids = rng.choice(patients["patient_id"].iloc[np.unique(chosen)].to_numpy(), size=5000)
+            lookup_start = time.perf_counter()
+            for patient_id in lookup_ids:
+                store.get(patient_id)
+            lookup_us = (time.perf_counter() - lookup_start) / len(lookup_ids) * 1e6
+
+            payloads = patients.iloc[chosen[: args.baseline_events]].drop(columns=["patient_id", "surgery_id"])
+            records = payloads.astype(object).where(payloads.notna(), None).to_dict("records")
+            baseline_start = time.perf_counter()
+            with contextlib.redirect_stdout(io.StringIO()):
+                for record in records:
+                    predictor.predict(record)
+            baseline_rate = len(records) / (time.perf_counter() - baseline_start)
+
+            results[name] = {
+                "events": totals["events"],
+                "patients_scored": totals["scored"],
+                "coalescing_ratio": totals["events"] / max(totals["patients"], 1),
+                "batches": totals["batches"],
+                "events_per_s": totals["events"] / elapsed,
+                "patients_per_s": totals["scored"] / elapsed,
+                "batch_ms_median": statistics.median(latencies) * 1000,
+                "batch_ms_max": max(latencies) * 1000,
+                "baseline_events_per_s": baseline_rate,
+                "lookup_us": lookup_us,
+                "max_abs_diff": max_diff,
+                "pending_after": queue.pending(),
+            }
+            r = results[name]
+            print(f"\n📦 Modelo: {name}")
+            print(
+                f"   {r['events']} eventos -> {r['patients_scored']} pacientes"
+                f" (coalescência {r['coalescing_ratio']:.1f}x) em {r['batches']} lotes"
+            )
+            print(
+                f"   {r['events_per_s']:,.0f} eventos/s | {r['patients_per_s']:,.0f} pacientes/s"
+                f" | lote: mediana {r['batch_ms_median']:.1f} ms, máx {r['batch_ms_max']:.1f} ms"
+            )
+            print(f"   Baseline (predict por evento): {r['baseline_events_per_s']:,.0f} eventos/s")
+            print(f"   Leitura do último risco: {r['lookup_us']:.1f} µs | diferença máx. {r['max_abs_diff']:.1e}")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"environment": environment_info(), "config": vars(args), "results": results}, f, indent=2)
+        print(f"\n✅ Resultados salvos em: {args.output}")
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
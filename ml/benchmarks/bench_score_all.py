@@ -0,0 +1,184 @@
+"""
+Benchmark do scoring em lote (score_all.py)
+
+Em um schema descartável (benchmarks/synthetic_pg.py) com N pacientes:
+1. treina e exporta um modelo compilado com pacientes sintéticos
+2. roda `python score_all.py` em um subprocesso e o mata com SIGKILL
+   depois de --kill-after blocos gravados no checkpoint
+3. continua pelo checkpoint até o fim (score_all no próprio processo)
+4. confere: uma predição por paciente elegível em "MlPrediction"
+   (nenhuma perdida ou duplicada) e tempo total dentro de --time-budget
+
+Uso (a partir do diretório ml/):
+    ML_BENCH_DATABASE_URL=postgresql://... python -m benchmarks.bench_score_all
+    python -m benchmarks.bench_score_all --dsn postgresql://... --patients 1000000 --time-budget 600
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from typing import List, Optional
+
+import psycopg2
+
+from model import ComplicationPredictor
+from queries import TRAINING_QUERY
+from registry import MODEL_FILENAME, compiled_path
+from score_all import Checkpoint, score_all
+from writeback import ensure_predictions_table
+from benchmarks.bench_ml import environment_info
+from benchmarks.synthetic import generate_patients
+from benchmarks.synthetic_pg import create_synthetic_schema, drop_schema
+
+SCHEMA = "ml_bench_score_all"
+ML_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _schema_dsn(dsn: str, schema: str) -> str:
+    """DSN com search_path no schema de teste (vale para todas as conexões do pool)"""
+    return psycopg2.extensions.make_dsn(dsn, options=f"-csearch_path={schema},public")
+
+
+def _train_model(tmpdir: str, seed: int) -> str:
+    path = os.path.join(tmpdir, MODEL_FILENAME)
+    predictor = ComplicationPredictor(model_type="random_forest")
+    with contextlib.redirect_stdout(io.StringIO()):
+        predictor.train(generate_patients(2000, seed=seed))
+        predictor.export_compiled(compiled_path(path))
+    return path
+
+
+def _kill_after(dsn: str, model_path: str, checkpoint_path: str, args) -> dict:
+    """Roda o CLI e o mata (SIGKILL) após args.kill_after blocos gravados"""
+    command = [
+        sys.executable, os.path.join(ML_DIR, "score_all.py"), "--dsn", dsn, "--model", model_path, "--checkpoint", checkpoint_path,
+        "--chunk-size", str(args.chunk_size), "--workers", str(args.workers), "--restart",
+    ]
+    start = time.perf_counter()
+    process = subprocess.Popen(command, cwd=ML_DIR, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+    checkpoint = Checkpoint(checkpoint_path)
+    while process.poll() is None:
+        state = checkpoint.load()
+        if state and state["chunks"] >= args.kill_after:
+            process.kill()
+            break
+        time.sleep(0.05)
+    process.wait()
+    state = checkpoint.load() or {}
+    if process.returncode not in (-9, 0):
+        raise RuntimeError(f"score_all.py falhou: {process.stderr.read().decode()[-2000:]}")
+    process.stderr.close()
+    return {
+        "seconds": time.perf_counter() - start,
+        "killed": process.returncode == -9,
+        "chunks": state.get("chunks", 0),
+        "patients": state.get("patients", 0),
+        "last_patient_id": state.get("last_patient_id"),
+    }
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Benchmark do scoring em lote com checkpoint")
+    parser.add_argument("--dsn", default=os.environ.get("ML_BENCH_DATABASE_URL"), help="URL do PostgreSQL")
+    parser.add_argument("--patients", type=int, default=1_000_000)
+    parser.add_argument("--chunk-size", type=int, default=10_000)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--kill-after", type=int, default=5, help="Blocos gravados antes do SIGKILL")
+    parser.add_argument("--time-budget", type=float, default=600, help="Segundos para o scoring completo")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--keep-schema", action="store_true", help="Não apaga o schema de teste no fim")
+    parser.add_argument("--output", help="Arquivo JSON de saída")
+    args = parser.parse_args(argv)
+
+    if not args.dsn:
+        parser.error("informe --dsn ou ML_BENCH_DATABASE_URL (o schema de teste é recriado)")
+
+    print("=" * 60)
+    print("⏱️  BENCHMARK DO SCORING EM LOTE")
+    print("=" * 60)
+
+    conn = psycopg2.connect(args.dsn)
+    try:
+        print(f"\n🗄️  Criando {args.patients:,} pacientes sintéticos em {SCHEMA}...")
+        dataset = create_synthetic_schema(conn, SCHEMA, args.patients)
+        ensure_predictions_table(conn)
+        with conn, conn.cursor() as cursor:
+            cursor.execute(f"SELECT count(*) FROM ({TRAINING_QUERY}) eligible")
+            eligible = cursor.fetchone()[0]
+        print(
+            f"   Carga {dataset['load_seconds']:.1f} s + índices {dataset['index_seconds']:.1f} s"
+            f" | {eligible:,} pacientes elegíveis"
+        )
+
+        dsn = _schema_dsn(args.dsn, SCHEMA)
+        with tempfile.TemporaryDirectory() as tmpdir:
+            model_path = _train_model(tmpdir, args.seed)
+            checkpoint_path = os.path.join(tmpdir, "score_all.checkpoint.json")
+
+            killed = _kill_after(dsn, model_path, checkpoint_path, args)
+            print(
+                f"\n💥 SIGKILL após {killed['chunks']} blocos ({killed['patients']:,} pacientes,"
+                f" até {killed['last_patient_id']}) em {killed['seconds']:.1f} s"
+            )
+
+            with contextlib.redirect_stdout(io.StringIO()):
+                resumed = score_all(
+                    dsn, model_path, checkpoint_path=checkpoint_path,
+                    chunk_size=args.chunk_size, workers=args.workers, verbose=False,
+                )
+        print(
+            f"↩️  Continuação a partir de {resumed['resumed_from']}: {resumed['patients']:,} pacientes,"
+            f" {resumed['rows']:,} predições em {resumed['seconds']:.1f} s ({resumed['rows_per_s']:,.0f} linhas/s)"
+        )
+        print(
+            f"   Leitura {resumed['fetch_seconds']:.1f} s | scoring {resumed['score_seconds']:.1f} s"
+            f" | gravação {resumed['write_seconds']:.1f} s"
+        )
+
+        with conn, conn.cursor() as cursor:
+            cursor.execute('SELECT count(*), count(DISTINCT ("patientId", "surgeryId")) FROM "MlPrediction"')
+            stored, distinct = cursor.fetchone()
+
+        total_seconds = killed["seconds"] + resumed["seconds"]
+        results = {
+            "dataset": dataset,
+            "eligible": eligible,
+            "killed_run": killed,
+            "resumed_run": resumed,
+            "stored_predictions": stored,
+            "distinct_predictions": distinct,
+            "complete": stored == eligible == distinct and resumed["completed"],
+            "total_seconds": total_seconds,
+            "rows_per_s": eligible / total_seconds,
+            "within_budget": total_seconds <= args.time_budget,
+        }
+        print(
+            f"\n📊 {stored:,} predições gravadas para {eligible:,} elegíveis"
+            f" ({'✅ completo' if results['complete'] else '❌ incompleto'})"
+        )
+        print(
+            f"   Total {total_seconds:.1f} s (orçamento {args.time_budget:.0f} s:"
+            f" {'✅ dentro' if results['within_budget'] else '❌ estourado'})"
+            f" | {results['rows_per_s']:,.0f} linhas/s"
+        )
+    finally:
+        if not args.keep_schema:
+            drop_schema(conn, SCHEMA)
+        conn.close()
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"environment": environment_info(), "config": vars(args), "results": results}, f, indent=2)
+        print(f"\n✅ Resultados salvos em: {args.output}")
+
+    return 0 if results["complete"] and results["within_budget"] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,181 @@
+"""
+Startup da API: imports e tempo até o primeiro /health
+
+Para cada formato de artefato (compilado ou só .joblib), em processos novos:
+- python -X importtime -c "import api": módulos mais caros (tempo acumulado)
+  e quais pacotes pesados (pandas, scipy, scikit-learn, joblib) foram carregados
+- time_to_health_s: do início do processo do servidor até GET /health
+  responder 200
+
+O servidor roda como api.app.run(debug=False): o reloader do modo debug de
+`python api.py` reinicia o processo e dobraria o tempo medido.
+
+Uso (a partir do diretório ml/):
+    python -m benchmarks.bench_startup
+    python -m benchmarks.bench_startup --runs 5 --top 15 --output startup.json
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.error
+import urllib.request
+from typing import Dict, List, Optional
+
+from model import ComplicationPredictor
+from benchmarks.bench_ml import environment_info
+from benchmarks.synthetic import generate_patients
+
+ML_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HEAVY_PACKAGES = ["pandas", "scipy", "sklearn", "joblib"]
+FORMATS = ["compiled", "joblib"]
+
+_SERVER = "import api; api.app.run(host='127.0.0.1', port={port}, debug=False)"
+_MODULES = (
+    "import json, sys; import api; "
+    "print(json.dumps(sorted({{m.split('.')[0] for m in sys.modules}} & set({packages!r}))))"
+)
+
+
+def _env() -> Dict[str, str]:
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join(filter(None, [ML_DIR, env.get("PYTHONPATH")]))
+    return env
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def import_profile(workdir: str, top: int) -> Dict:
+    """-X importtime de `import api`: total e os módulos de maior tempo acumulado"""
+    stderr = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import api"],
+        cwd=workdir, env=_env(), capture_output=True, text=True, check=True,
+    ).stderr
+
+    modules = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        modules.append({"module": name.strip(), "depth": (len(name) - len(name.lstrip())) // 2,
+                        "cumulative_s": int(cumulative) / 1e6})
+
+    # Filhos vêm antes do pai: os imports de api ficam entre o módulo de
+    # topo anterior (startup do interpretador) e a linha de api
+    end = next(i for i, m in enumerate(modules) if m["module"] == "api" and m["depth"] == 0)
+    begin = max((i for i in range(end) if modules[i]["depth"] == 0), default=-1) + 1
+    children = sorted(
+        (m for m in modules[begin:end] if m["depth"] == 1), key=lambda m: m["cumulative_s"], reverse=True
+    )
+    loaded = json.loads(subprocess.run(
+        [sys.executable, "-c", _MODULES.format(packages=HEAVY_PACKAGES)],
+        cwd=workdir, env=_env(), capture_output=True, text=True, check=True,
+    ).stdout.strip().splitlines()[-1])
+
+    return {
+        "import_api_s": modules[end]["cumulative_s"],
+        "top_imports": [{"module": m["module"], "cumulative_s": m["cumulative_s"]} for m in children[:top]],
+        "heavy_packages_loaded": loaded,
+    }
+
+
+def time_to_health(workdir: str, timeout: float = 60.0) -> float:
+    """Segundos do spawn do servidor até o primeiro GET /health com 200"""
+    port = _free_port()
+    url = f"http://127.0.0.1:{port}/health"
+    start = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "-c", _SERVER.format(port=port)],
+        cwd=workdir, env=_env(), stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        while time.perf_counter() - start < timeout:
+            if server.poll() is not None:
+                raise RuntimeError(f"Servidor terminou com código {server.returncode}")
+            try:
+                with urllib.request.urlopen(url, timeout=1) as response:
+                    if response.status == 200:
+                        return time.perf_counter() - start
+            except (urllib.error.URLError, ConnectionError):
+                time.sleep(0.005)
+        raise TimeoutError(f"/health não respondeu em {timeout:.0f} s")
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def _model_dirs(tmpdir: str, n: int, seed: int) -> Dict[str, str]:
+    """Diretórios de trabalho com models/ em cada formato"""
+    predictor = ComplicationPredictor(model_type="random_forest")
+    with contextlib.redirect_stdout(io.StringIO()):
+        predictor.train(generate_patients(n, seed=seed))
+
+    workdirs = {}
+    for fmt in FORMATS:
+        workdir = os.path.join(tmpdir, fmt)
+        os.makedirs(os.path.join(workdir, "models"))
+        with contextlib.redirect_stdout(io.StringIO()):
+            predictor.save(os.path.join(workdir, "models", "complication_predictor.joblib"))
+            if fmt == "compiled":
+                predictor.export_compiled(os.path.join(workdir, "models", "complication_predictor.compiled"))
+        workdirs[fmt] = workdir
+    return workdirs
+
+
+def run_benchmarks(formats: List[str], n: int = 1000, runs: int = 3, top: int = 10, seed: int = 42) -> List[Dict]:
+    results = []
+    with tempfile.TemporaryDirectory() as tmpdir:
+        workdirs = _model_dirs(tmpdir, n, seed)
+        for fmt in formats:
+            profile = import_profile(workdirs[fmt], top)
+            samples = [time_to_health(workdirs[fmt]) for _ in range(runs)]
+            entry = {"format": fmt, "time_to_health_s": statistics.median(samples), **profile}
+            results.append(entry)
+
+            print(f"\n📦 Artefato: {fmt}")
+            print(f"   import api:      {entry['import_api_s'] * 1000:8.1f} ms")
+            print(f"   1º /health 200:  {entry['time_to_health_s'] * 1000:8.1f} ms (mediana de {runs})")
+            print(f"   Pacotes pesados: {', '.join(entry['heavy_packages_loaded']) or 'nenhum'}")
+            for item in entry["top_imports"]:
+                print(f"     {item['module']:<24} {item['cumulative_s'] * 1000:8.1f} ms")
+    return results
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Startup da API (imports e primeiro /health)")
+    parser.add_argument("--formats", nargs="+", default=FORMATS, choices=FORMATS)
+    parser.add_argument("--n", type=int, default=1000, help="Pacientes sintéticos no treino")
+    parser.add_argument("--runs", type=int, default=3, help="Processos por medição (mediana)")
+    parser.add_argument("--top", type=int, default=10, help="Imports diretos de api listados")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="Arquivo JSON de saída")
+    args = parser.parse_args(argv)
+
+    print("=" * 60)
+    print("⏱️  STARTUP DA API")
+    print("=" * 60)
+
+    results = run_benchmarks(args.formats, args.n, args.runs, args.top, args.seed)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"environment": environment_info(), "config": vars(args), "results": results}, f, indent=2)
+        print(f"\n✅ Resultados salvos em: {args.output}")
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
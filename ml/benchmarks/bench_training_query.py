@@ -0,0 +1,270 @@
+"""
+Benchmark da query do dataset de treino (queries.py)
+
+Compara, com EXPLAIN (ANALYZE, BUFFERS), a query antiga (join das sete
+tabelas agrupado, com EXISTS correlacionado em "FollowUp") e a reescrita
+(queries.training_query e queries.patients_query), em schemas descartáveis
+(benchmarks/synthetic_pg.py) de vários tamanhos. Para cada tamanho:
+1. confere que a query nova devolve as mesmas linhas que a antiga, restrita
+   às cirurgias com D+1 respondido, em cada uso
+2. mede as duas em três usos: treino completo (TRAINING_QUERY), treino de
+   um médico (TENANT_FILTER) e features de --patient-ids pacientes
+   (PATIENTS_FILTER, re-scoring e score_all)
+3. repete a medição depois de criar TRAINING_INDEXES_SQL
+
+Uso (a partir do diretório ml/):
+    ML_BENCH_DATABASE_URL=postgresql://... python -m benchmarks.bench_training_query
+    python -m benchmarks.bench_training_query --dsn postgresql://... --scales 10000,100000,1000000 --plans plans/
+"""
+
+import argparse
+import json
+import os
+import statistics
+import sys
+from typing import Dict, List, Optional, Tuple
+
+import psycopg2
+
+from queries import PATIENTS_FILTER, TENANT_FILTER, TRAINING_INDEXES_SQL, TRAINING_QUERY, TRAINING_QUERY_TEMPLATE
+from benchmarks.bench_ml import environment_info
+from benchmarks.synthetic_pg import create_synthetic_schema, drop_schema
+
+SCHEMA = "ml_bench_training_query"
+
+# Query de treino antes da reescrita (referência)
+LEGACY_TRAINING_QUERY_TEMPLATE = """
+SELECT
+    p.id as patient_id,
+    s.id as surgery_id,
+    p.age as idade,
+    p.sex as sexo,
+    STRING_AGG(DISTINCT c.name, ',') as comorbidades,
+    s.type as tipo_cirurgia,
+    s."durationMinutes" as duracao_minutos,
+    CASE WHEN a."pudendoBlock" = true THEN 1 ELSE 0 END as bloqueio_pudendo,
+    MAX(CASE
+        WHEN fu."dayNumber" = 1
+        THEN CAST(fur."questionnaireData"::jsonb->>'painLevel' AS INTEGER)
+    END) as dor_d1,
+    MAX(CASE
+        WHEN fu."dayNumber" = 1
+        THEN CASE WHEN fur."questionnaireData"::jsonb->>'urinaryRetention' = 'true' THEN 1 ELSE 0 END
+    END) as retencao_urinaria,
+    MAX(CASE
+        WHEN fu."dayNumber" = 1
+        THEN CASE WHEN fur."questionnaireData"::jsonb->>'fever' = 'true' THEN 1 ELSE 0 END
+    END) as febre,
+    MAX(CASE
+        WHEN fu."dayNumber" = 1
+        THEN CASE WHEN fur."questionnaireData"::jsonb->>'intenseBleeding' = 'true' THEN 1 ELSE 0 END
+    END) as sangramento_intenso,
+    MAX(CASE
+        WHEN fu."dayNumber" >= 3 AND fur."riskLevel" IN ('high', 'critical')
+        THEN 1
+        ELSE 0
+    END) as teve_complicacao
+FROM "Patient" p
+LEFT JOIN "PatientComorbidity" pc ON p.id = pc."patientId"
+LEFT JOIN "Comorbidity" c ON pc."comorbidityId" = c.id
+LEFT JOIN "Surgery" s ON p.id = s."patientId"
+LEFT JOIN "Anesthesia" a ON s.id = a."surgeryId"
+LEFT JOIN "FollowUp" fu ON s.id = fu."surgeryId"
+LEFT JOIN "FollowUpResponse" fur ON fu.id = fur."followUpId"
+WHERE
+    p.age IS NOT NULL
+    AND s.type IS NOT NULL
+    AND s.status = 'completed'
+    AND EXISTS (
+        SELECT 1 FROM "FollowUp" fu2
+        WHERE fu2."patientId" = p.id AND fu2.status = 'responded'
+    )
+    {filters}
+GROUP BY p.id, s.id, p.age, p.sex, s.type, s."durationMinutes", a."pudendoBlock"
+HAVING
+    MAX(CASE WHEN fu."dayNumber" = 1 THEN 1 ELSE 0 END) = 1
+"""
+
+
+def queries(filters: str) -> Dict[str, str]:
+    """{"antiga": SQL, "nova": SQL} de um uso (a nova escolhe a forma como queries.training_query)"""
+    return {
+        "antiga": LEGACY_TRAINING_QUERY_TEMPLATE.format(filters=filters),
+        "nova": TRAINING_QUERY_TEMPLATE.format(filters=filters) if filters else TRAINING_QUERY,
+    }
+
+
+# Linhas da antiga (só D+1 respondido) que faltam na nova, e vice-versa
+_PARITY_SQL = """
+WITH antiga AS ({antiga}), nova AS ({nova})
+SELECT
+    (SELECT count(*) FROM (
+        SELECT * FROM antiga WHERE surgery_id IN (
+            SELECT fu."surgeryId" FROM "FollowUp" fu JOIN "FollowUpResponse" fur ON fur."followUpId" = fu.id
+            WHERE fu."dayNumber" = 1 AND fu.status = 'responded'
+        )
+        EXCEPT ALL SELECT * FROM nova
+    ) missing),
+    (SELECT count(*) FROM (SELECT * FROM nova EXCEPT ALL SELECT * FROM antiga) extra),
+    (SELECT count(*) FROM antiga),
+    (SELECT count(*) FROM nova)
+"""
+
+
+def _workloads(conn, n_patient_ids: int) -> Dict[str, Tuple[str, Optional[Dict]]]:
+    """{uso: (filtro, parâmetros)}, com o médico e os pacientes tirados do schema"""
+    with conn, conn.cursor() as cursor:
+        cursor.execute('SELECT "userId" FROM "Patient" ORDER BY id LIMIT 1')
+        tenant_id = cursor.fetchone()[0]
+        cursor.execute('SELECT id FROM "Patient" ORDER BY md5(id) LIMIT %s', (n_patient_ids,))
+        patient_ids = [row[0] for row in cursor.fetchall()]
+    return {
+        "treino": ("", None),
+        "tenant": (TENANT_FILTER, {"tenant_id": tenant_id}),
+        "pacientes": (PATIENTS_FILTER, {"patient_ids": patient_ids}),
+    }
+
+
+def check_parity(conn, filters: str = "", params: Optional[Dict] = None) -> Dict:
+    """Confere a query nova contra a antiga no schema atual"""
+    with conn, conn.cursor() as cursor:
+        cursor.execute(_PARITY_SQL.format(**queries(filters)), params)
+        missing, extra, legacy_rows, rows = cursor.fetchone()
+    return {"missing": missing, "extra": extra, "legacy_rows": legacy_rows, "rows": rows, "ok": missing == extra == 0}
+
+
+def explain(conn, sql: str, params: Optional[Dict], repeat: int) -> Dict:
+    """EXPLAIN (ANALYZE, BUFFERS) repetido: mediana dos tempos e buffers da última execução"""
+    runs = []
+    with conn, conn.cursor() as cursor:
+        for _ in range(repeat + 1):  # a primeira aquece o cache
+            cursor.execute(f"EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) {sql}", params)
+            runs.append(cursor.fetchone()[0][0])
+        cursor.execute(f"EXPLAIN (ANALYZE, BUFFERS, FORMAT TEXT) {sql}", params)
+        text = "\n".join(row[0] for row in cursor.fetchall())
+    runs = runs[1:]
+    plan = runs[-1]["Plan"]
+    return {
+        "execution_ms": statistics.median(run["Execution Time"] for run in runs),
+        "planning_ms": statistics.median(run["Planning Time"] for run in runs),
+        "rows": plan["Actual Rows"],
+        "shared_hit_blocks": plan.get("Shared Hit Blocks", 0),
+        "shared_read_blocks": plan.get("Shared Read Blocks", 0),
+        "temp_blocks": plan.get("Temp Read Blocks", 0) + plan.get("Temp Written Blocks", 0),
+        "top_node": plan["Node Type"],
+        "plan_text": text,
+    }
+
+
+def _create_training_indexes(conn):
+    with conn, conn.cursor() as cursor:
+        cursor.execute(TRAINING_INDEXES_SQL)
+        cursor.execute('ANALYZE "FollowUp"')
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Benchmark da query do dataset de treino")
+    parser.add_argument("--dsn", default=os.environ.get("ML_BENCH_DATABASE_URL"), help="URL do PostgreSQL")
+    parser.add_argument("--scales", default="10000,100000,300000", help="Números de pacientes, separados por vírgula")
+    parser.add_argument("--repeat", type=int, default=3, help="Execuções medidas por query (mediana)")
+    parser.add_argument("--patient-ids", type=int, default=1000, help="Pacientes no uso com PATIENTS_FILTER")
+    parser.add_argument("--plans", help="Diretório para salvar os planos em texto")
+    parser.add_argument("--keep-schema", action="store_true", help="Não apaga o schema de teste no fim")
+    parser.add_argument("--output", help="Arquivo JSON de saída")
+    args = parser.parse_args(argv)
+
+    if not args.dsn:
+        parser.error("informe --dsn ou ML_BENCH_DATABASE_URL (o schema de teste é recriado)")
+    scales = [int(scale) for scale in args.scales.split(",")]
+
+    print("=" * 60)
+    print("⏱️  BENCHMARK DA QUERY DE TREINO")
+    print("=" * 60)
+
+    conn = psycopg2.connect(args.dsn)
+    results = []
+    try:
+        with conn, conn.cursor() as cursor:
+            cursor.execute("SELECT version(), current_setting('work_mem')")
+            server, work_mem = cursor.fetchone()
+        print(f"\n🗄️  {server.split(',')[0]} | work_mem {work_mem}")
+
+        for n_patients in scales:
+            print(f"\n📦 {n_patients:,} pacientes sintéticos em {SCHEMA}...")
+            dataset = create_synthetic_schema(conn, SCHEMA, n_patients)
+            print(
+                f"   Carga {dataset['load_seconds']:.1f} s + índices {dataset['index_seconds']:.1f} s"
+                f" | {dataset['rows']['FollowUp']:,} follow-ups, {dataset['rows']['FollowUpResponse']:,} respostas"
+            )
+
+            workloads = _workloads(conn, args.patient_ids)
+            parity = {}
+            for workload, (filters, params) in workloads.items():
+                parity[workload] = check = check_parity(conn, filters, params)
+                print(
+                    f"   {'✅' if check['ok'] else '❌'} {workload}: {check['rows']:,} linhas na nova,"
+                    f" {check['legacy_rows']:,} na antiga ({check['legacy_rows'] - check['rows']:,} sem D+1 respondido)"
+                    + ("" if check["ok"] else f" | faltando {check['missing']}, sobrando {check['extra']}")
+                )
+
+            timings = []
+            for indexes in ("app", "app+treino"):
+                if indexes == "app+treino":
+                    _create_training_indexes(conn)
+                print(f"\n   Índices: {indexes}")
+                print(f"   {'uso':<10} {'query':<7} {'execução':>11} {'planejamento':>13} {'linhas':>9} {'buffers':>9} {'temp':>7}")
+                for workload, (filters, params) in workloads.items():
+                    for name, sql in queries(filters).items():
+                        run = explain(conn, sql, params, args.repeat)
+                        if args.plans:
+                            os.makedirs(args.plans, exist_ok=True)
+                            path = os.path.join(args.plans, f"{n_patients}-{indexes}-{workload}-{name}.txt")
+                            with open(path, "w", encoding="utf-8") as f:
+                                f.write(run["plan_text"] + "\n")
+                        del run["plan_text"]
+                        timings.append({"indexes": indexes, "workload": workload, "query": name, **run})
+                        print(
+                            f"   {workload:<10} {name:<7} {run['execution_ms']:>8.1f} ms {run['planning_ms']:>10.2f} ms"
+                            f" {run['rows']:>9,} {run['shared_hit_blocks'] + run['shared_read_blocks']:>9,}"
+                            f" {run['temp_blocks']:>7,}"
+                        )
+
+            speedups = {}
+            for indexes in ("app", "app+treino"):
+                for workload in workloads:
+                    by_query = {
+                        t["query"]: t["execution_ms"]
+                        for t in timings
+                        if t["indexes"] == indexes and t["workload"] == workload
+                    }
+                    speedups[f"{indexes}/{workload}"] = by_query["antiga"] / by_query["nova"]
+            print(
+                "\n   Antiga / nova: "
+                + " | ".join(f"{key} {speedup:.1f}x" for key, speedup in speedups.items())
+            )
+            results.append(
+                {"patients": n_patients, "dataset": dataset, "parity": parity, "timings": timings, "speedups": speedups}
+            )
+    finally:
+        if not args.keep_schema:
+            drop_schema(conn, SCHEMA)
+        conn.close()
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(
+                {
+                    "environment": {**environment_info(), "postgres": server, "work_mem": work_mem},
+                    "config": vars(args),
+                    "results": results,
+                },
+                f,
+                indent=2,
+            )
+        print(f"\n✅ Resultados salvos em: {args.output}")
+
+    return 0 if all(check["ok"] for result in results for check in result["parity"].values()) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
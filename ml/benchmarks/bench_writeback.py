@@ -0,0 +1,169 @@
+"""
+Benchmark da gravação das predições no PostgreSQL (writeback.py)
+
+Em um schema descartável do banco apontado por --dsn (ou
+ML_BENCH_DATABASE_URL), com "MlPrediction" e um "Surgery" mínimo:
+- copy: COPY para tabela temporária + upsert, uma transação por lote
+- values: execute_values, uma transação por lote
+- row: um INSERT por linha em transação própria (amostra menor)
+- regravação: o mesmo lote de novo (upsert sem linhas novas)
+- conferência: contagem final = chaves distintas, e uma predição mais
+  antiga não sobrescreve a mais nova
+
+Uso (a partir do diretório ml/):
+    ML_BENCH_DATABASE_URL=postgresql://... python -m benchmarks.bench_writeback
+    python -m benchmarks.bench_writeback --dsn postgresql://... --rows 1000000 --batch-rows 100000
+"""
+
+import argparse
+import json
+import os
+import sys
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional
+
+import numpy as np
+import psycopg2
+
+from writeback import ensure_predictions_table, write_predictions
+from benchmarks.bench_ml import environment_info
+
+SCHEMA = "ml_bench_writeback"
+
+_SURGERY_SQL = """
+CREATE TABLE "Surgery" (
+    "id" TEXT PRIMARY KEY,
+    "predictedRisk" DOUBLE PRECISION,
+    "predictedRiskLevel" TEXT,
+    "mlModelVersion" TEXT,
+    "mlPredictedAt" TIMESTAMP(3)
+)
+"""
+
+
+def _connect(dsn: str):
+    conn = psycopg2.connect(dsn)
+    with conn, conn.cursor() as cursor:
+        cursor.execute(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE")
+        cursor.execute(f"CREATE SCHEMA {SCHEMA}")
+        cursor.execute(f"SET search_path TO {SCHEMA}, public")
+    return conn
+
+
+def _reset(conn, n_rows: int):
+    with conn, conn.cursor() as cursor:
+        cursor.execute('DROP TABLE IF EXISTS "MlPrediction", "Surgery"')
+        cursor.execute(_SURGERY_SQL)
+        cursor.execute(
+            'INSERT INTO "Surgery" ("id") SELECT \'s\' || lpad(g::text, 8, \'0\') FROM generate_series(0, %s) g',
+            (n_rows - 1,),
+        )
+    ensure_predictions_table(conn)
+
+
+def _count(conn, table: str) -> int:
+    with conn, conn.cursor() as cursor:
+        cursor.execute(f'SELECT count(*) FROM "{table}"')
+        return cursor.fetchone()[0]
+
+
+def _rows(n_rows: int, seed: int, scored_at: datetime) -> List[Dict]:
+    rng = np.random.default_rng(seed)
+    probabilities = rng.random(n_rows)
+    return [
+        {
+            "patient_id": f"p{i:08d}",
+            "surgery_id": f"s{i:08d}",
+            "model_version": "gradient_boosting-bench",
+            "probability": float(p),
+            "risk_level": "critical" if p >= 0.75 else "high" if p >= 0.5 else "medium" if p >= 0.25 else "low",
+            "scored_at": scored_at,
+        }
+        for i, p in enumerate(probabilities)
+    ]
+
+
+def run_method(conn, method: str, rows: List[Dict], batch_rows: int, update_surgeries: bool) -> Dict:
+    _reset(conn, len(rows))
+    first = write_predictions(conn, rows, method=method, batch_rows=batch_rows, update_surgeries=update_surgeries)
+    again = write_predictions(conn, rows, method=method, batch_rows=batch_rows, update_surgeries=update_surgeries)
+
+    # Predição mais antiga para as mesmas chaves: não pode sobrescrever
+    stale = [dict(row, probability=-1.0, scored_at=row["scored_at"] - timedelta(days=1)) for row in rows[:100]]
+    write_predictions(conn, stale, method=method, batch_rows=batch_rows, update_surgeries=update_surgeries)
+    with conn, conn.cursor() as cursor:
+        cursor.execute('SELECT count(*) FROM "MlPrediction" WHERE "probability" < 0')
+        overwritten = cursor.fetchone()[0]
+        cursor.execute('SELECT count(*) FROM "Surgery" WHERE "predictedRisk" IS NOT NULL')
+        surgeries = cursor.fetchone()[0]
+
+    return {
+        "rows": first["rows"],
+        "transactions": first["transactions"],
+        "seconds": first["seconds"],
+        "rows_per_s": first["rows"] / first["seconds"],
+        "rewrite_rows_per_s": again["rows"] / again["seconds"],
+        "table_rows": _count(conn, "MlPrediction"),
+        "surgeries_updated": surgeries,
+        "stale_overwrites": overwritten,
+    }
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Benchmark da gravação de predições no PostgreSQL")
+    parser.add_argument("--dsn", default=os.environ.get("ML_BENCH_DATABASE_URL"), help="URL do PostgreSQL")
+    parser.add_argument("--rows", type=int, default=200_000)
+    parser.add_argument("--row-sample", type=int, default=2000, help="Linhas no método 'row'")
+    parser.add_argument("--batch-rows", type=int, default=100_000)
+    parser.add_argument("--update-surgeries", action="store_true", help="Também atualiza \"Surgery\"")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="Arquivo JSON de saída")
+    args = parser.parse_args(argv)
+
+    if not args.dsn:
+        parser.error("informe --dsn ou ML_BENCH_DATABASE_URL (o schema de teste é recriado)")
+
+    print("=" * 60)
+    print("⏱️  BENCHMARK DA GRAVAÇÃO DE PREDIÇÕES (POSTGRESQL)")
+    print("=" * 60)
+
+    scored_at = datetime.now(timezone.utc)
+    rows = _rows(args.rows, args.seed, scored_at)
+    conn = _connect(args.dsn)
+
+    results = {}
+    try:
+        for method, sample in (("copy", rows), ("values", rows), ("row", rows[: args.row_sample])):
+            r = results[method] = run_method(conn, method, sample, args.batch_rows, args.update_surgeries)
+            print(f"\n📦 Método: {method}")
+            print(
+                f"   {r['rows']:,} linhas em {r['transactions']:,} transações: {r['seconds']:.2f} s"
+                f" ({r['rows_per_s']:,.0f} linhas/s) | regravação {r['rewrite_rows_per_s']:,.0f} linhas/s"
+            )
+            print(
+                f"   Linhas na tabela: {r['table_rows']:,} | cirurgias atualizadas: {r['surgeries_updated']:,}"
+                f" | sobrescritas por predição antiga: {r['stale_overwrites']}"
+            )
+
+        baseline = results["row"]["rows_per_s"]
+        for method in ("copy", "values"):
+            results[method]["speedup_vs_row"] = results[method]["rows_per_s"] / baseline
+        print(
+            f"\n🚀 Speedup sobre INSERT por linha: copy {results['copy']['speedup_vs_row']:.0f}x,"
+            f" values {results['values']['speedup_vs_row']:.0f}x"
+        )
+    finally:
+        with conn, conn.cursor() as cursor:
+            cursor.execute(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE")
+        conn.close()
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"environment": environment_info(), "config": vars(args), "results": results}, f, indent=2)
+        print(f"\n✅ Resultados salvos em: {args.output}")
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
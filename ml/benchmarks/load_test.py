@@ -0,0 +1,394 @@
+"""
+Teste de carga da API de predição (ml/api.py)
+
+Gerador de carga assíncrono em malha aberta (open-loop): as requisições são
+disparadas em horários fixos, independentemente das respostas anteriores, e a
+latência é medida a partir do horário agendado. Assim uma API saturada
+aparece como latência crescente, e não como uma taxa menor de envio.
+
+Critério de sucesso: a resposta precisa chegar dentro do timeout do cliente
+Next.js (ML_API_TIMEOUT = 5000 ms em lib/ml-prediction.ts).
+
+Uso (a partir do diretório ml/, com a API rodando localmente):
+    python -m benchmarks.load_test --rate 50 --duration 20
+    python -m benchmarks.load_test --find-saturation
+    python -m benchmarks.load_test --payloads payloads.jsonl --rate 100
+
+Não depende de bibliotecas HTTP externas (apenas asyncio).
+"""
+
+import argparse
+import asyncio
+import json
+import sys
+import time
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+from benchmarks.synthetic import generate_payloads
+
+CLIENT_TIMEOUT_S = 5.0  # ML_API_TIMEOUT em lib/ml-prediction.ts
+DEFAULT_MAX_ERROR_RATE = 0.01
+PERCENTILES = [50, 90, 95, 99]
+
+
+class HTTPError(Exception):
+    """Resposta HTTP malformada ou conexão encerrada pelo servidor"""
+
+
+class ConnectionPool:
+    """Pool de conexões HTTP/1.1 keep-alive sobre asyncio streams"""
+
+    def __init__(self, host: str, port: int, max_connections: int):
+        self.host = host
+        self.port = port
+        self._idle: List[Tuple[asyncio.StreamReader, asyncio.StreamWriter]] = []
+        self._slots = asyncio.Semaphore(max_connections)
+
+    async def request(self, method: str, path: str, body: bytes = b"") -> Tuple[int, bytes]:
+        async with self._slots:
+            if self._idle:
+                reader, writer = self._idle.pop()
+            else:
+                reader, writer = await asyncio.open_connection(self.host, self.port)
+
+            try:
+                status, payload, keep_alive = await self._roundtrip(reader, writer, method, path, body)
+            except BaseException:
+                writer.close()
+                raise
+
+            if keep_alive:
+                self._idle.append((reader, writer))
+            else:
+                writer.close()
+            return status, payload
+
+    async def _roundtrip(self, reader, writer, method: str, path: str, body: bytes):
+        head = (
+            f"{method} {path} HTTP/1.1\r\n"
+            f"Host: {self.host}:{self.port}\r\n"
+            "Content-Type: application/json\r\n"
+            f"Content-Length: {len(body)}\r\n"
+            "Connection: keep-alive\r\n\r\n"
+        )
+        writer.write(head.encode("ascii") + body)
+        await writer.drain()
+
+        status_line = await reader.readline()
+        if not status_line:
+            raise HTTPError("conexão encerrada pelo servidor")
+        parts = status_line.split(None, 2)
+        if len(parts) < 2:
+            raise HTTPError(f"linha de status inválida: {status_line!r}")
+        version, status = parts[0], int(parts[1])
+
+        headers: Dict[str, str] = {}
+        while True:
+            line = await reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+
+        keep_alive = version == b"HTTP/1.1" and headers.get("connection", "").lower() != "close"
+        if "content-length" in headers:
+            payload = await reader.readexactly(int(headers["content-length"]))
+        else:
+            payload = await reader.read()
+            keep_alive = False
+
+        return status, payload, keep_alive
+
+    def close(self):
+        for _, writer in self._idle:
+            writer.close()
+        self._idle.clear()
+
+
+@dataclass
+class RunResult:
+    """Resultado de uma execução a uma taxa fixa"""
+
+    target_rate: float
+    duration_s: float
+    sent: int = 0
+    ok: int = 0
+    timeouts: int = 0
+    http_errors: Dict[int, int] = field(default_factory=dict)
+    connection_errors: int = 0
+    latencies_s: List[float] = field(default_factory=list)
+    wall_s: float = 0.0
+
+    @property
+    def errors(self) -> int:
+        return self.sent - self.ok
+
+    @property
+    def error_rate(self) -> float:
+        return self.errors / self.sent if self.sent else 0.0
+
+    @property
+    def throughput(self) -> float:
+        """Predições bem-sucedidas por segundo"""
+        return self.ok / self.wall_s if self.wall_s else 0.0
+
+    def percentile(self, p: float) -> Optional[float]:
+        if not self.latencies_s:
+            return None
+        ordered = sorted(self.latencies_s)
+        index = min(len(ordered) - 1, int(round(p / 100 * (len(ordered) - 1))))
+        return ordered[index]
+
+    def sustainable(self, max_error_rate: float, timeout_s: float) -> bool:
+        p99 = self.percentile(99)
+        return (
+            self.sent > 0
+            and self.error_rate <= max_error_rate
+            and p99 is not None
+            and p99 < timeout_s
+            and self.throughput >= 0.95 * self.target_rate
+        )
+
+    def to_dict(self) -> Dict:
+        return {
+            "target_rate": self.target_rate,
+            "duration_s": self.duration_s,
+            "sent": self.sent,
+            "ok": self.ok,
+            "throughput_rps": self.throughput,
+            "error_rate": self.error_rate,
+            "timeouts": self.timeouts,
+            "http_errors": {str(k): v for k, v in self.http_errors.items()},
+            "connection_errors": self.connection_errors,
+            "latency_ms": {
+                f"p{p}": (self.percentile(p) or 0.0) * 1000 for p in PERCENTILES
+            } | {"max": max(self.latencies_s, default=0.0) * 1000},
+        }
+
+
+async def run_at_rate(
+    url: str,
+    payloads: List[bytes],
+    rate: float,
+    duration_s: float,
+    timeout_s: float = CLIENT_TIMEOUT_S,
+    max_connections: int = 256,
+) -> RunResult:
+    """
+    Dispara POST /predict a `rate` req/s durante `duration_s` segundos
+
+    A latência de cada requisição é contada a partir do horário em que ela
+    deveria ter sido enviada, incluindo espera por conexão livre.
+    """
+    parts = urlsplit(url)
+    pool = ConnectionPool(parts.hostname or "localhost", parts.port or 80, max_connections)
+    path = (parts.path.rstrip("/") or "") + "/predict"
+    result = RunResult(target_rate=rate, duration_s=duration_s)
+    loop = asyncio.get_running_loop()
+
+    async def one(body: bytes, scheduled: float):
+        try:
+            status, _ = await asyncio.wait_for(pool.request("POST", path, body), timeout_s)
+        except asyncio.TimeoutError:
+            result.timeouts += 1
+            return
+        except (OSError, HTTPError, asyncio.IncompleteReadError):
+            result.connection_errors += 1
+            return
+
+        if 200 <= status < 300:
+            result.ok += 1
+            result.latencies_s.append(loop.time() - scheduled)
+        else:
+            result.http_errors[status] = result.http_errors.get(status, 0) + 1
+
+    total = int(rate * duration_s)
+    interval = 1.0 / rate
+    tasks = []
+    start = loop.time()
+
+    for i in range(total):
+        scheduled = start + i * interval
+        delay = scheduled - loop.time()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        tasks.append(asyncio.create_task(one(payloads[i % len(payloads)], scheduled)))
+        result.sent += 1
+
+    await asyncio.gather(*tasks)
+    result.wall_s = max(loop.time() - start, duration_s)
+    pool.close()
+    return result
+
+
+async def wait_for_health(url: str, timeout_s: float = 30.0):
+    """Espera a API responder /health antes de iniciar a carga"""
+    parts = urlsplit(url)
+    pool = ConnectionPool(parts.hostname or "localhost", parts.port or 80, 1)
+    deadline = time.monotonic() + timeout_s
+    path = (parts.path.rstrip("/") or "") + "/health"
+    try:
+        while True:
+            try:
+                status, body = await pool.request("GET", path)
+                if status == 200:
+                    return json.loads(body)
+            except (OSError, HTTPError, asyncio.IncompleteReadError):
+                pass
+            if time.monotonic() > deadline:
+                raise RuntimeError(f"API não respondeu em {url}/health")
+            await asyncio.sleep(0.5)
+    finally:
+        pool.close()
+
+
+def print_result(result: RunResult):
+    summary = result.to_dict()
+    latency = summary["latency_ms"]
+    print(
+        f"  alvo={result.target_rate:8.1f} req/s  vazão={result.throughput:8.1f} req/s"
+        f"  erros={result.error_rate:6.2%}  p50={latency['p50']:7.1f} ms"
+        f"  p99={latency['p99']:7.1f} ms  max={latency['max']:7.1f} ms"
+    )
+
+
+async def find_saturation(
+    url: str,
+    payloads: List[bytes],
+    start_rate: float,
+    duration_s: float,
+    timeout_s: float,
+    max_error_rate: float,
+    growth: float = 1.5,
+    resolution: float = 0.05,
+    max_rate: float = 100_000,
+) -> Tuple[Optional[RunResult], List[RunResult]]:
+    """
+    Encontra a maior taxa sustentável
+
+    Aumenta a taxa geometricamente até a primeira falha e depois faz busca
+    binária entre a última taxa boa e a primeira ruim, até a resolução
+    relativa pedida.
+
+    Returns:
+        (melhor execução sustentável ou None, todas as execuções)
+    """
+    runs: List[RunResult] = []
+    best: Optional[RunResult] = None
+    rate = start_rate
+    bad_rate = None
+
+    async def attempt(r: float) -> bool:
+        nonlocal best
+        result = await run_at_rate(url, payloads, r, duration_s, timeout_s)
+        runs.append(result)
+        print_result(result)
+        ok = result.sustainable(max_error_rate, timeout_s)
+        if ok and (best is None or r > best.target_rate):
+            best = result
+        # Deixa a fila do servidor esvaziar antes do próximo degrau
+        await asyncio.sleep(min(timeout_s, 2.0))
+        return ok
+
+    print("\n📈 Rampa geométrica")
+    while rate <= max_rate:
+        if not await attempt(rate):
+            bad_rate = rate
+            break
+        rate *= growth
+
+    if bad_rate is None:
+        return best, runs
+
+    low = best.target_rate if best else 0.0
+    high = bad_rate
+    print("\n🔎 Busca binária")
+    while low == 0.0 or (high - low) / low > resolution:
+        mid = (low + high) / 2
+        if mid < 1.0:
+            break
+        if await attempt(mid):
+            low = mid
+        else:
+            high = mid
+
+    return best, runs
+
+
+def load_payloads(path: Optional[str], count: int, seed: int) -> List[bytes]:
+    """Carrega payloads de um arquivo JSONL ou gera pacientes sintéticos"""
+    if path:
+        with open(path, encoding="utf-8") as f:
+            records = [json.loads(line) for line in f if line.strip()]
+    else:
+        records = generate_payloads(count, seed=seed)
+    return [json.dumps(record).encode("utf-8") for record in records]
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Teste de carga de POST /predict")
+    parser.add_argument("--url", default="http://localhost:5000")
+    parser.add_argument("--rate", type=float, default=20.0, help="Taxa alvo em req/s")
+    parser.add_argument("--duration", type=float, default=15.0, help="Duração de cada degrau (s)")
+    parser.add_argument("--timeout", type=float, default=CLIENT_TIMEOUT_S)
+    parser.add_argument("--max-error-rate", type=float, default=DEFAULT_MAX_ERROR_RATE)
+    parser.add_argument("--find-saturation", action="store_true")
+    parser.add_argument("--payloads", help="Arquivo JSONL com bodies de /predict")
+    parser.add_argument("--payload-count", type=int, default=1000)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="Arquivo JSON com o relatório")
+    args = parser.parse_args(argv)
+
+    async def run():
+        health = await wait_for_health(args.url)
+        print(f"✅ API disponível: {args.url} (modelo recomendado: {health.get('recommended_model')})")
+        payloads = load_payloads(args.payloads, args.payload_count, args.seed)
+        print(f"📦 {len(payloads)} payloads distintos")
+
+        if args.find_saturation:
+            best, runs = await find_saturation(
+                args.url, payloads, args.rate, args.duration,
+                args.timeout, args.max_error_rate,
+            )
+        else:
+            result = await run_at_rate(args.url, payloads, args.rate, args.duration, args.timeout)
+            print_result(result)
+            runs = [result]
+            best = result if result.sustainable(args.max_error_rate, args.timeout) else None
+        return best, runs
+
+    print("=" * 60)
+    print("🚀 TESTE DE CARGA - POST /predict")
+    print("=" * 60)
+
+    best, runs = asyncio.run(run())
+
+    print("\n" + "=" * 60)
+    if best:
+        latency = best.to_dict()["latency_ms"]
+        print(f"✅ Taxa sustentável: {best.throughput:.1f} predições/s")
+        print(f"   p50={latency['p50']:.1f} ms  p95={latency['p95']:.1f} ms  p99={latency['p99']:.1f} ms")
+        print(f"   (timeout do cliente: {args.timeout * 1000:.0f} ms, erro máximo: {args.max_error_rate:.1%})")
+    else:
+        print("❌ Nenhuma taxa testada foi sustentável")
+    print("=" * 60)
+
+    if args.output:
+        report = {
+            "url": args.url,
+            "timeout_s": args.timeout,
+            "max_error_rate": args.max_error_rate,
+            "saturation_rps": best.throughput if best else None,
+            "runs": [run.to_dict() for run in runs],
+        }
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"📁 Relatório salvo em: {args.output}")
+
+    return 0 if best else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,338 @@
+"""
+Verificações de paridade de predição
+
+Garante que otimizações do pipeline não mudam as probabilidades
+retornadas. Cada verificação imprime a maior diferença absoluta encontrada
+e o script termina com código 1 se alguma passar da tolerância.
+
+Uso (a partir do diretório ml/):
+    python -m benchmarks.parity
+"""
+
+import contextlib
+import io
+import os
+import sys
+import tempfile
+import threading
+import time
+from typing import Callable, List, Tuple
+
+import joblib
+import numpy as np
+import pandas as pd
+from sklearn.base import clone
+from sklearn.preprocessing import StandardScaler
+
+from compiled import CompiledPredictor, Precision
+from model import LEGACY_FEATURE_NAMES, ComplicationPredictor
+from benchmarks.synthetic import generate_patients, generate_payloads
+
+MODEL_TYPES = ["random_forest", "gradient_boosting"]
+
+
+def _quiet():
+    return contextlib.redirect_stdout(io.StringIO())
+
+
+def _train(model_type: str, n: int = 600, seed: int = 7):
+    data = generate_patients(n, seed=seed)
+    predictor = ComplicationPredictor(model_type=model_type)
+    with _quiet():
+        predictor.train(data)
+    return predictor, data
+
+
+def check_legacy_scaler_artifact(model_type: str) -> float:
+    """
+    Artefato antigo (StandardScaler + árvores treinadas em dados escalados)
+    carregado pelo código atual deve predizer o mesmo que o pipeline antigo
+    """
+    predictor, data = _train(model_type)
+    X = ComplicationPredictor().prepare_features(data)[LEGACY_FEATURE_NAMES]
+    y = data["teve_complicacao"].to_numpy()
+
+    scaler = StandardScaler().fit(X)
+    legacy_model = clone(predictor.model).fit(scaler.transform(X), y)
+    expected = legacy_model.predict_proba(scaler.transform(X))[:, 1]
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        path = os.path.join(tmpdir, "legacy.joblib")
+        joblib.dump(
+            {
+                "model": legacy_model,
+                "scaler": scaler,
+                "feature_names": LEGACY_FEATURE_NAMES,
+                "feature_importance": predictor.feature_importance,
+                "metrics": predictor.metrics,
+                "model_type": model_type,
+            },
+            path,
+        )
+        loaded = ComplicationPredictor()
+        with _quiet():
+            loaded.load(path)
+
+    return float(np.max(np.abs(loaded.predict_proba(data) - expected)))
+
+
+def check_single_vs_batch(model_type: str) -> float:
+    """
+    predict() de um paciente deve bater com predict_proba() em lote e com
+    a classe de model.predict
+    """
+    predictor, data = _train(model_type)
+    records = data.drop(columns=["teve_complicacao"]).head(100).to_dict(orient="records")
+    batch = predictor.predict_proba(data.head(100))
+    df = predictor.prepare_features(data.head(100))
+    X = predictor._model_input(df, predictor._feature_matrix(df))
+    classes = predictor.model.predict(X)
+
+    diff = 0.0
+    for record, expected, expected_class in zip(records, batch, classes):
+        result = predictor.predict(record)
+        if result["prediction"] != expected_class:
+            return float("inf")
+        diff = max(diff, abs(result["probability"] - expected))
+    return diff
+
+
+def check_compiled_artifact(model_type: str) -> float:
+    """
+    Modelo compilado (runtime só NumPy) deve predizer o mesmo que o modelo
+    sklearn, inclusive com campos ausentes, e devolver a mesma resposta em
+    predict() (faixa de risco, fatores de risco)
+    """
+    predictor, _ = _train(model_type)
+    records = generate_payloads(500, seed=11)
+    expected = predictor.predict_proba(pd.DataFrame(records))
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        path = os.path.join(tmpdir, "model.compiled")
+        with _quiet():
+            predictor.export_compiled(path)
+            compiled = CompiledPredictor.load(path)
+        diff = float(np.max(np.abs(compiled.predict_proba(records) - expected)))
+
+        for record in records[:100]:
+            result, compiled_result = predictor.predict(record), compiled.predict(record)
+            diff = max(diff, abs(result.pop("probability") - compiled_result.pop("probability")))
+            if result != compiled_result:
+                return float("inf")
+    return diff
+
+
+def check_invalid_age(model_type: str) -> float:
+    """
+    idade ausente, nula ou não numérica: sklearn e runtime compilado
+    recusam a predição (inf se algum devolver uma probabilidade)
+    """
+    predictor, _ = _train(model_type)
+    compiled = CompiledPredictor.from_predictor(predictor)
+    record = generate_payloads(1, seed=11)[0]
+
+    for value in (None, "abc", float("nan"), [65]):
+        invalid = dict(record, idade=value)
+        for model in (predictor, compiled):
+            try:
+                model.predict(invalid)
+            except (TypeError, ValueError):
+                continue
+            return float("inf")
+    invalid = {name: value for name, value in record.items() if name != "idade"}
+    for model in (predictor, compiled):
+        try:
+            model.predict(invalid)
+        except (KeyError, TypeError, ValueError):
+            continue
+        return float("inf")
+    return 0.0
+
+
+def _precision_diffs(model_type: str, precisions: List[Precision]) -> List[Tuple[float, float]]:
+    """(maior diferença para o sklearn, limite de erro do cabeçalho) de cada precisão"""
+    predictor, _ = _train(model_type)
+    records = generate_payloads(500, seed=11)
+    expected = predictor.predict_proba(pd.DataFrame(records))
+
+    diffs = []
+    with tempfile.TemporaryDirectory() as tmpdir:
+        for precision in precisions:
+            path = os.path.join(tmpdir, f"{precision.thresholds}-{precision.leaves}.compiled")
+            with _quiet():
+                predictor.export_compiled(path, precision)
+                compiled = CompiledPredictor.load(path)
+            diff = float(np.max(np.abs(compiled.predict_proba(records) - expected)))
+            diffs.append((diff, compiled.model.max_proba_error))
+    return diffs
+
+
+def check_reduced_thresholds(model_type: str) -> float:
+    """Thresholds float32 (arredondados para baixo) e int16 (postos) são exatos"""
+    precisions = [Precision(thresholds=thresholds) for thresholds in ("float32", "int16")]
+    return max(diff for diff, _ in _precision_diffs(model_type, precisions))
+
+
+def check_reduced_leaves(model_type: str) -> float:
+    """Folhas float32/float16 erram no máximo o limite gravado no cabeçalho (retorna o excesso)"""
+    precisions = [
+        Precision(thresholds=thresholds, leaves=leaves)
+        for thresholds in ("float64", "int16")
+        for leaves in ("float32", "float16")
+    ]
+    return max(max(diff - bound, 0.0) for diff, bound in _precision_diffs(model_type, precisions))
+
+
+def check_compressed_model(model_type: str) -> float:
+    """
+    Modelo comprimido (árvores podadas e selecionadas) deve predizer o mesmo
+    no sklearn, no artefato joblib e no runtime compilado
+    """
+    from compression import CompressionConfig
+
+    predictor, _ = _train(model_type)
+    with _quiet():
+        predictor.compress(CompressionConfig(auc_tolerance=0.01, prune_epsilon=0.02, min_trees=5))
+    records = generate_payloads(500, seed=11)
+    expected = predictor.predict_proba(pd.DataFrame(records))
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        path = os.path.join(tmpdir, "model.joblib")
+        reloaded = ComplicationPredictor()
+        with _quiet():
+            predictor.save(path)
+            predictor.export_compiled(os.path.join(tmpdir, "model.compiled"))
+            reloaded.load(path)
+            compiled = CompiledPredictor.load(os.path.join(tmpdir, "model.compiled"))
+        diff = float(np.max(np.abs(reloaded.predict_proba(pd.DataFrame(records)) - expected)))
+        diff = max(diff, float(np.max(np.abs(compiled.predict_proba(records) - expected))))
+    return diff
+
+
+def _mutations(runtime: CompiledPredictor) -> List[Callable[[], None]]:
+    def assign():
+        runtime.model_version = "outro"
+
+    def assign_tree():
+        runtime.model.max_depth = 1
+
+    def write_array():
+        runtime.model.value[0] = 1.0
+
+    def write_mapping():
+        runtime.risk_thresholds["high"] = 0.0
+
+    def write_vocabulary():
+        runtime.label_encoders["comorbidades"].vocabulary["nova"] = 1
+
+    def write_aliases():
+        runtime.label_encoders["tipo_cirurgia"].aliases["nova"] = "outra"
+
+    def assign_encoder():
+        runtime.label_encoders["comorbidades"].separator = ";"
+
+    def refit_encoder():
+        runtime.label_encoders["comorbidades"].fit(["nova"])
+
+    def write_drift_reference():
+        runtime.drift_reference["idade"][0] = 0
+
+    return [
+        assign, assign_tree, write_array, write_mapping,
+        write_vocabulary, write_aliases, assign_encoder, refit_encoder, write_drift_reference,
+    ]
+
+
+def check_runtime_from_joblib(model_type: str) -> float:
+    """
+    Artefato só com .joblib é servido pelo runtime imutável (load_model),
+    com as probabilidades do sklearn; atributos, arrays e dicionários do
+    runtime, inclusive os internos (vocabulário e sinônimos dos encoders,
+    histogramas de referência), não aceitam escrita (retorna inf se algum
+    aceitar)
+    """
+    from registry import load_model
+
+    predictor, _ = _train(model_type)
+    records = generate_payloads(500, seed=11)
+    expected = predictor.predict_proba(pd.DataFrame(records))
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        path = os.path.join(tmpdir, "model.joblib")
+        with _quiet():
+            predictor.save(path)
+            runtime = load_model(path)
+    if not isinstance(runtime, CompiledPredictor):
+        return float("inf")
+
+    for mutate in _mutations(runtime):
+        try:
+            mutate()
+        except (AttributeError, TypeError, ValueError):
+            continue
+        return float("inf")
+    return float(np.max(np.abs(runtime.predict_proba(records) - expected)))
+
+
+def check_swap_under_load(model_type: str, n_threads: int = 4, n_swaps: int = 200) -> float:
+    """
+    Threads predizendo enquanto outra troca a referência do modelo: cada
+    resposta vem inteira de um dos dois modelos (diferença para o mais
+    próximo; inf se alguma thread falhar)
+    """
+    models = [CompiledPredictor.from_predictor(_train(model_type, seed=seed)[0]) for seed in (7, 8)]
+    records = generate_payloads(50, seed=11)
+    expected = [model.predict_proba(records) for model in models]
+    current = {"model": models[0]}
+    stop = threading.Event()
+    results, errors = [], []
+
+    def serve():
+        try:
+            while not stop.is_set():
+                results.append(current["model"].predict_proba(records))
+        except Exception as e:  # qualquer falha reprova a verificação
+            errors.append(e)
+
+    threads = [threading.Thread(target=serve) for _ in range(n_threads)]
+    for thread in threads:
+        thread.start()
+    for swap in range(n_swaps):
+        current["model"] = models[swap % 2]
+        time.sleep(0.001)
+    stop.set()
+    for thread in threads:
+        thread.join()
+
+    if errors or not results:
+        return float("inf")
+    return max(min(float(np.max(np.abs(result - exp))) for exp in expected) for result in results)
+
+
+CHECKS: List[Tuple[str, Callable[[str], float], float]] = [
+    ("artefato legado com scaler", check_legacy_scaler_artifact, 0.0),
+    ("predict individual x lote", check_single_vs_batch, 1e-12),
+    ("modelo compilado x sklearn", check_compiled_artifact, 1e-12),
+    ("idade inválida recusada: sklearn x compilado", check_invalid_age, 0.0),
+    ("modelo comprimido: sklearn x joblib x compilado", check_compressed_model, 1e-12),
+    ("thresholds float32/int16 x sklearn", check_reduced_thresholds, 1e-12),
+    ("folhas float32/float16: excesso sobre o limite de erro", check_reduced_leaves, 1e-12),
+    ("runtime imutável do .joblib x sklearn", check_runtime_from_joblib, 1e-12),
+    ("troca de modelo com threads predizendo", check_swap_under_load, 0.0),
+]
+
+
+def main() -> int:
+    failures = 0
+    for name, check, tolerance in CHECKS:
+        for model_type in MODEL_TYPES:
+            diff = check(model_type)
+            ok = diff <= tolerance
+            failures += not ok
+            print(f"{'✅' if ok else '❌'} {name} [{model_type}]: diferença máxima {diff:.2e} (tolerância {tolerance:.0e})")
+
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,167 @@
+"""
+Gerador de pacientes sintéticos para benchmarks
+
+Produz DataFrames no mesmo formato de entrada de
+ComplicationPredictor.prepare_features (colunas retornadas por
+fetch_training_data), incluindo:
+- Comorbidades com os nomes reais do cadastro (seed do Prisma) misturados
+  às abreviações usadas nos scripts ("HAS", "DM tipo 2", ...)
+- Tipos de cirurgia nos dois formatos usados no sistema ("fistula" e "fistula_anal")
+- Valores ausentes nas mesmas colunas que chegam nulas do banco
+
+O target (teve_complicacao) segue um modelo logístico simples para que o
+treino tenha sinal real e os tempos sejam representativos.
+"""
+
+import numpy as np
+import pandas as pd
+from typing import Dict, List
+
+# Nomes como aparecem no banco (prisma/seed.ts) e abreviações dos scripts
+COMORBIDADES = [
+    ("HAS", 0.22),
+    ("Hipertensão Arterial Sistêmica (HAS)", 0.10),
+    ("DM tipo 2", 0.08),
+    ("Diabetes Mellitus tipo 2", 0.05),
+    ("Diabetes Mellitus tipo 1", 0.01),
+    ("Obesidade", 0.10),
+    ("Obesidade (IMC > 30)", 0.05),
+    ("IRC", 0.02),
+    ("Insuficiência Renal Crônica", 0.01),
+    ("Tabagismo", 0.12),
+    ("DPOC", 0.02),
+    ("Dislipidemia", 0.08),
+    ("Hipotireoidismo", 0.05),
+    ("Asma", 0.04),
+    ("Doença de Crohn", 0.01),
+    ("Uso de Anticoagulantes", 0.02),
+    ("Depressão", 0.05),
+    ("Etilismo", 0.03),
+]
+
+TIPOS_CIRURGIA = [
+    ("hemorroidectomia", 0.45),
+    ("fistula", 0.15),
+    ("fistula_anal", 0.05),
+    ("fissura", 0.12),
+    ("fissurectomia", 0.05),
+    ("pilonidal", 0.13),
+    ("doenca_pilonidal", 0.05),
+]
+
+# Fração de valores ausentes por coluna
+MISSING_RATES = {
+    "comorbidades": 0.10,
+    "duracao_minutos": 0.15,
+    "bloqueio_pudendo": 0.08,
+    "dor_d1": 0.05,
+    "retencao_urinaria": 0.05,
+    "febre": 0.05,
+    "sangramento_intenso": 0.05,
+}
+
+
+def generate_patients(n: int, seed: int = 42, with_target: bool = True) -> pd.DataFrame:
+    """
+    Gera n pacientes sintéticos
+
+    Args:
+        n: Número de pacientes
+        seed: Semente do gerador (mesma semente = mesmo dataset)
+        with_target: Inclui a coluna teve_complicacao
+
+    Returns:
+        DataFrame no formato de entrada de prepare_features
+    """
+    rng = np.random.default_rng(seed)
+
+    idade = np.clip(rng.normal(48, 15, n), 18, 95).round().astype(int)
+    sexo = np.where(rng.random(n) < 0.52, "Feminino", "Masculino")
+
+    # Comorbidades: cada uma sorteada de forma independente
+    nomes = [nome for nome, _ in COMORBIDADES]
+    probs = np.array([p for _, p in COMORBIDADES])
+    # Idosos têm mais comorbidades
+    fator_idade = (1 + (idade - 48) / 60).clip(0.4, 2.0)
+    presentes = rng.random((n, len(nomes))) < probs[None, :] * fator_idade[:, None]
+    comorbidades = np.array(
+        [",".join(nomes[j] for j in np.flatnonzero(linha)) for linha in presentes],
+        dtype=object,
+    )
+
+    tipos = [tipo for tipo, _ in TIPOS_CIRURGIA]
+    tipo_probs = np.array([p for _, p in TIPOS_CIRURGIA])
+    tipo_cirurgia = rng.choice(tipos, size=n, p=tipo_probs / tipo_probs.sum())
+
+    duracao = np.clip(rng.gamma(4.0, 15.0, n), 10, 300).round()
+    bloqueio = (rng.random(n) < 0.6).astype(float)
+    dor_d1 = np.clip(rng.normal(4.5, 2.2, n) + (1 - bloqueio) * 1.5, 0, 10).round()
+    retencao = (rng.random(n) < 0.08 + 0.04 * (1 - bloqueio)).astype(float)
+    febre = (rng.random(n) < 0.04).astype(float)
+    sangramento = (rng.random(n) < 0.05).astype(float)
+
+    df = pd.DataFrame(
+        {
+            "idade": idade,
+            "sexo": sexo,
+            "comorbidades": comorbidades,
+            "tipo_cirurgia": tipo_cirurgia,
+            "duracao_minutos": duracao,
+            "bloqueio_pudendo": bloqueio,
+            "dor_d1": dor_d1,
+            "retencao_urinaria": retencao,
+            "febre": febre,
+            "sangramento_intenso": sangramento,
+        }
+    )
+
+    if with_target:
+        num_comorb = presentes.sum(axis=1)
+        logit = (
+            -3.2
+            + 0.025 * (idade - 48)
+            + 0.30 * num_comorb
+            + 0.25 * (dor_d1 - 4.5)
+            + 1.2 * retencao
+            + 1.6 * febre
+            + 1.8 * sangramento
+            - 0.4 * bloqueio
+            + 0.5 * (tipo_cirurgia == "hemorroidectomia")
+        )
+        prob = 1 / (1 + np.exp(-logit))
+        df["teve_complicacao"] = (rng.random(n) < prob).astype(int)
+
+    # Valores ausentes (aplicados depois do target, como no banco)
+    for column, rate in MISSING_RATES.items():
+        mask = rng.random(n) < rate
+        if column == "comorbidades":
+            # No banco aparece tanto NULL quanto string vazia
+            df.loc[mask, column] = np.where(rng.random(mask.sum()) < 0.5, None, "")
+        else:
+            df.loc[mask, column] = np.nan
+
+    return df
+
+
+
+def generate_payloads(n: int, seed: int = 42) -> List[Dict]:
+    """
+    Gera n payloads no formato do body de POST /predict
+
+    Campos ausentes vão como null, como o cliente Next.js envia colunas
+    nulas do banco.
+    """
+    df = generate_patients(n, seed=seed, with_target=False)
+    payloads = []
+    for record in df.to_dict(orient="records"):
+        payload = {}
+        for key, value in record.items():
+            if value is None or (isinstance(value, float) and np.isnan(value)):
+                value = None
+            if isinstance(value, (np.integer, np.floating)):
+                value = value.item()
+            if isinstance(value, float) and value.is_integer():
+                value = int(value)
+            payload[key] = value
+        payloads.append(payload)
+    return payloads
@@ -0,0 +1,236 @@
+"""
+Banco PostgreSQL sintético para benchmarks
+
+Cria, em um schema descartável, as tabelas lidas por queries.py com as
+mesmas colunas e índices das migrations do Prisma (só as colunas usadas
+pelo ML) e popula N pacientes direto no servidor com generate_series:
+- uma cirurgia por paciente (5% ainda não concluídas) com anestesia
+- 0 a 3 comorbidades do cadastro
+- follow-ups D+1, D+3 e D+7; D+1 respondido em ~90% dos pacientes
+- questionnaireData como TEXT com JSON, igual ao app
+
+Uso:
+    conn = psycopg2.connect(dsn)
+    create_synthetic_schema(conn, "ml_bench", 100_000)  # search_path = ml_bench
+    ...
+    drop_schema(conn, "ml_bench")
+"""
+
+import re
+import time
+from typing import Dict
+
+from benchmarks.synthetic import COMORBIDADES, TIPOS_CIRURGIA
+
+_SCHEMA_PATTERN = re.compile(r"^[a-z_][a-z0-9_]*$")
+
+TABLES = ("Patient", "Comorbidity", "PatientComorbidity", "Surgery", "Anesthesia", "FollowUp", "FollowUpResponse")
+
+TABLES_SQL = """
+CREATE TABLE "Patient" (
+    "id" TEXT PRIMARY KEY,
+    "userId" TEXT NOT NULL,
+    "name" TEXT NOT NULL,
+    "age" INTEGER,
+    "sex" TEXT,
+    "isActive" BOOLEAN NOT NULL DEFAULT true
+);
+CREATE TABLE "Comorbidity" (
+    "id" TEXT PRIMARY KEY,
+    "name" TEXT NOT NULL
+);
+CREATE TABLE "PatientComorbidity" (
+    "id" TEXT PRIMARY KEY,
+    "patientId" TEXT NOT NULL,
+    "comorbidityId" TEXT NOT NULL
+);
+CREATE TABLE "Surgery" (
+    "id" TEXT PRIMARY KEY,
+    "patientId" TEXT NOT NULL,
+    "userId" TEXT NOT NULL,
+    "type" TEXT NOT NULL,
+    "durationMinutes" INTEGER,
+    "status" TEXT NOT NULL DEFAULT 'active',
+    "date" TIMESTAMP(3) NOT NULL,
+    "mlModelVersion" TEXT,
+    "mlPredictedAt" TIMESTAMP(3),
+    "predictedRisk" DOUBLE PRECISION,
+    "predictedRiskLevel" TEXT
+);
+CREATE TABLE "Anesthesia" (
+    "id" TEXT PRIMARY KEY,
+    "surgeryId" TEXT NOT NULL,
+    "pudendoBlock" BOOLEAN NOT NULL DEFAULT false
+);
+CREATE TABLE "FollowUp" (
+    "id" TEXT PRIMARY KEY,
+    "surgeryId" TEXT NOT NULL,
+    "patientId" TEXT NOT NULL,
+    "userId" TEXT NOT NULL,
+    "dayNumber" INTEGER NOT NULL,
+    "status" TEXT NOT NULL DEFAULT 'pending'
+);
+CREATE TABLE "FollowUpResponse" (
+    "id" TEXT PRIMARY KEY,
+    "followUpId" TEXT NOT NULL,
+    "questionnaireData" TEXT NOT NULL,
+    "riskLevel" TEXT NOT NULL DEFAULT 'low'
+);
+"""
+
+# Índices das migrations do Prisma para essas tabelas (criados depois da carga),
+# menos os de queries.TRAINING_INDEXES_SQL (bench_training_query mede com e sem)
+INDEXES_SQL = """
+CREATE INDEX "Patient_userId_idx" ON "Patient"("userId");
+CREATE INDEX "Patient_isActive_idx" ON "Patient"("isActive");
+CREATE UNIQUE INDEX "Comorbidity_name_key" ON "Comorbidity"("name");
+CREATE UNIQUE INDEX "PatientComorbidity_patientId_comorbidityId_key"
+    ON "PatientComorbidity"("patientId", "comorbidityId");
+CREATE INDEX "PatientComorbidity_patientId_idx" ON "PatientComorbidity"("patientId");
+CREATE INDEX "PatientComorbidity_comorbidityId_idx" ON "PatientComorbidity"("comorbidityId");
+CREATE INDEX "Surgery_userId_idx" ON "Surgery"("userId");
+CREATE INDEX "Surgery_patientId_idx" ON "Surgery"("patientId");
+CREATE INDEX "Surgery_type_idx" ON "Surgery"("type");
+CREATE INDEX "Surgery_predictedRiskLevel_idx" ON "Surgery"("predictedRiskLevel");
+CREATE UNIQUE INDEX "Anesthesia_surgeryId_key" ON "Anesthesia"("surgeryId");
+CREATE INDEX "Anesthesia_surgeryId_idx" ON "Anesthesia"("surgeryId");
+CREATE INDEX "FollowUp_userId_idx" ON "FollowUp"("userId");
+CREATE INDEX "FollowUp_surgeryId_idx" ON "FollowUp"("surgeryId");
+CREATE INDEX "FollowUp_patientId_idx" ON "FollowUp"("patientId");
+CREATE INDEX "FollowUp_status_idx" ON "FollowUp"("status");
+CREATE INDEX "FollowUpResponse_followUpId_idx" ON "FollowUpResponse"("followUpId");
+CREATE INDEX "FollowUpResponse_riskLevel_idx" ON "FollowUpResponse"("riskLevel");
+"""
+
+_POPULATE_SQL = """
+SELECT setseed(%(seed)s);
+
+INSERT INTO "Comorbidity" ("id", "name")
+SELECT 'c' || ordinality, name FROM unnest(%(comorbidities)s::text[]) WITH ORDINALITY AS t(name, ordinality);
+
+INSERT INTO "Patient" ("id", "userId", "name", "age", "sex")
+SELECT
+    'p' || lpad(g::text, 8, '0'),
+    'u' || (g %% %(doctors)s),
+    'Paciente ' || g,
+    CASE WHEN random() < 0.02 THEN NULL ELSE 18 + floor(random() * 70)::int END,
+    CASE WHEN random() < 0.52 THEN 'Feminino' ELSE 'Masculino' END
+FROM generate_series(0, %(n)s - 1) g;
+
+INSERT INTO "PatientComorbidity" ("id", "patientId", "comorbidityId")
+SELECT DISTINCT ON (p, c) 'pc' || p || '-' || c, 'p' || lpad(p::text, 8, '0'), 'c' || c
+FROM (
+    SELECT g AS p, 1 + floor(random() * %(n_comorbidities)s)::int AS c
+    FROM generate_series(0, %(n)s - 1) g, generate_series(1, 3) k
+    WHERE random() < 0.25
+) t;
+
+INSERT INTO "Surgery" ("id", "patientId", "userId", "type", "durationMinutes", "status", "date")
+SELECT
+    's' || lpad(g::text, 8, '0'),
+    'p' || lpad(g::text, 8, '0'),
+    'u' || (g %% %(doctors)s),
+    (%(surgery_types)s::text[])[1 + floor(random() * %(n_surgery_types)s)::int],
+    CASE WHEN random() < 0.15 THEN NULL ELSE 20 + floor(random() * 100)::int END,
+    CASE WHEN random() < 0.95 THEN 'completed' ELSE 'active' END,
+    now() - random() * interval '730 days'
+FROM generate_series(0, %(n)s - 1) g;
+
+INSERT INTO "Anesthesia" ("id", "surgeryId", "pudendoBlock")
+SELECT 'a' || lpad(g::text, 8, '0'), 's' || lpad(g::text, 8, '0'), random() < 0.4
+FROM generate_series(0, %(n)s - 1) g
+WHERE random() < 0.92;
+
+INSERT INTO "FollowUp" ("id", "surgeryId", "patientId", "userId", "dayNumber", "status")
+SELECT
+    'f' || lpad(g::text, 8, '0') || '-' || d,
+    's' || lpad(g::text, 8, '0'),
+    'p' || lpad(g::text, 8, '0'),
+    'u' || (g %% %(doctors)s),
+    d,
+    CASE WHEN random() < CASE WHEN d = 1 THEN 0.9 ELSE 0.7 END THEN 'responded' ELSE 'pending' END
+FROM generate_series(0, %(n)s - 1) g, unnest(ARRAY[1, 3, 7]) d;
+
+INSERT INTO "FollowUpResponse" ("id", "followUpId", "questionnaireData", "riskLevel")
+SELECT
+    'r' || f."id",
+    f."id",
+    json_build_object(
+        'painLevel', floor(random() * 11)::int,
+        'urinaryRetention', random() < 0.08,
+        'fever', random() < 0.05,
+        'intenseBleeding', random() < 0.03
+    )::text,
+    CASE WHEN random() < 0.85 THEN 'low' WHEN random() < 0.6 THEN 'medium' WHEN random() < 0.8 THEN 'high' ELSE 'critical' END
+FROM "FollowUp" f
+WHERE f."status" = 'responded';
+"""
+
+
+def _validate_schema(schema: str) -> str:
+    if not _SCHEMA_PATTERN.match(schema):
+        raise ValueError(f"Schema inválido: {schema}")
+    return schema
+
+
+def use_schema(conn, schema: str):
+    """search_path da conexão = schema (depois public)"""
+    with conn, conn.cursor() as cursor:
+        cursor.execute(f"SET search_path TO {_validate_schema(schema)}, public")
+
+
+def drop_schema(conn, schema: str):
+    with conn, conn.cursor() as cursor:
+        cursor.execute(f"DROP SCHEMA IF EXISTS {_validate_schema(schema)} CASCADE")
+
+
+def create_synthetic_schema(conn, schema: str, n_patients: int, seed: float = 0.42, doctors: int = 50) -> Dict:
+    """
+    (Re)cria o schema com n_patients pacientes sintéticos
+
+    Args:
+        conn: Conexão psycopg2 (o search_path dela passa a ser o schema)
+        schema: Nome do schema (apagado se já existir)
+        n_patients: Número de pacientes
+        seed: Semente do random() do Postgres (entre -1 e 1)
+        doctors: Número de médicos (Patient.userId) entre os quais os
+            pacientes são distribuídos
+
+    Returns:
+        Linhas por tabela e segundos de carga e de indexação
+    """
+    drop_schema(conn, schema)
+    with conn, conn.cursor() as cursor:
+        cursor.execute(f"CREATE SCHEMA {schema}")
+    use_schema(conn, schema)
+
+    start = time.perf_counter()
+    with conn, conn.cursor() as cursor:
+        cursor.execute(TABLES_SQL)
+        cursor.execute(
+            _POPULATE_SQL,
+            {
+                "seed": seed,
+                "n": n_patients,
+                "doctors": doctors,
+                "comorbidities": [name for name, _ in COMORBIDADES],
+                "n_comorbidities": len(COMORBIDADES),
+                "surgery_types": [name for name, _ in TIPOS_CIRURGIA],
+                "n_surgery_types": len(TIPOS_CIRURGIA),
+            },
+        )
+    load_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    with conn, conn.cursor() as cursor:
+        cursor.execute(INDEXES_SQL)
+        for table in TABLES:
+            cursor.execute(f'ANALYZE "{table}"')
+    index_seconds = time.perf_counter() - start
+
+    counts = {}
+    with conn, conn.cursor() as cursor:
+        for table in TABLES:
+            cursor.execute(f'SELECT count(*) FROM "{table}"')
+            counts[table] = cursor.fetchone()[0]
+    return {"rows": counts, "load_seconds": load_seconds, "index_seconds": index_seconds}
@@ -0,0 +1,683 @@
+"""
+Formato compilado do modelo (sem scikit-learn)
+
+Um ComplicationPredictor treinado é exportado para um arquivo binário
+versionado e autodescritivo:
+
+    [8 bytes]  MAGIC
+    [uint32]   versão do formato
+    [uint32]   tamanho do cabeçalho
+    [cabeçalho JSON UTF-8]: tipo de modelo, features, encoders, faixas de
+               risco, métricas e a tabela de arrays (dtype, shape, offset)
+    [arrays]   nós de todas as árvores, alinhados em 64 bytes
+
+O loader depende só de NumPy: o arquivo é mapeado em memória (np.memmap),
+os arrays são views somente leitura sobre o mapeamento e a featurização é
+feita sem pandas. Não há pickle, então o artefato não depende da versão do
+scikit-learn que treinou o modelo.
+
+As árvores são percorridas em lote: todas as amostras descem todas as
+árvores ao mesmo tempo, um nível por iteração (folhas apontam para si
+mesmas). Como no scikit-learn, X é convertido para float32 e comparado
+com os thresholds em float64, e valores ausentes seguem missing_go_to_left.
+
+Precisão dos arrays (Precision; ML_COMPILED_THRESHOLDS/ML_COMPILED_LEAVES):
+- índices de feature e de nós: sempre o menor inteiro que comporta o
+  modelo (uint8 para até 255 features, uint16 para até 65535 nós)
+- thresholds float32: arredondados para baixo. Para x float32,
+  x <= t se e só se x <= maior float32 <= t, então a descida é exata
+- thresholds int16: posto do threshold entre os thresholds float32 da
+  mesma feature (bins). X é convertido no mesmo posto (searchsorted, NaN
+  vira NAN_CODE): x <= bins[j] se e só se posto(x) <= j, também exato
+- folhas float32/float16: erro limitado; o limite da probabilidade fica
+  em aggregation["max_proba_error"]
+
+Arquivos com thresholds int16 ou folhas reduzidas usam o formato v2, que
+também omite o array left quando as árvores estão em pré-ordem.
+"""
+
+import json
+import math
+import os
+import struct
+from dataclasses import dataclass
+from datetime import datetime
+from types import MappingProxyType
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from encoding import VocabularyEncoder
+
+MAGIC = b"TELOSML\x00"
+FORMAT_VERSION = 2
+_PREAMBLE = struct.Struct("<8sII")
+ALIGNMENT = 64
+
+EXTENSION = ".compiled"
+
+THRESHOLD_DTYPES = ("float64", "float32", "int16")
+LEAF_DTYPES = ("float64", "float32", "float16")
+# Posto dos valores ausentes com thresholds int16 (maior que qualquer posto)
+NAN_CODE = np.iinfo(np.int16).max
+
+
+@dataclass
+class Precision:
+    """Precisão dos thresholds e das folhas no arquivo compilado"""
+
+    # float64 (como o sklearn), float32 ou int16 (exatos)
+    thresholds: str = "float64"
+    # float64 (exato), float32 ou float16 (erro limitado)
+    leaves: str = "float64"
+
+    def __post_init__(self):
+        if self.thresholds not in THRESHOLD_DTYPES:
+            raise ValueError(f"Precisão de thresholds inválida: {self.thresholds} (use {', '.join(THRESHOLD_DTYPES)})")
+        if self.leaves not in LEAF_DTYPES:
+            raise ValueError(f"Precisão de folhas inválida: {self.leaves} (use {', '.join(LEAF_DTYPES)})")
+
+    @classmethod
+    def from_env(cls) -> "Precision":
+        """Lê ML_COMPILED_THRESHOLDS e ML_COMPILED_LEAVES"""
+        return cls(
+            thresholds=os.getenv("ML_COMPILED_THRESHOLDS", cls.thresholds),
+            leaves=os.getenv("ML_COMPILED_LEAVES", cls.leaves),
+        )
+
+    @property
+    def format_version(self) -> int:
+        """v1 quando leitores antigos interpretam os arrays corretamente"""
+        return 2 if self.thresholds == "int16" or self.leaves != "float64" else 1
+
+
+# ---------------------------------------------------------------------------
+# Exportação
+# ---------------------------------------------------------------------------
+
+
+def _tree_arrays(trees, value_of) -> Dict[str, np.ndarray]:
+    """Nós de várias árvores concatenados, com filhos em índices globais"""
+    features, thresholds, lefts, rights, missing_left, values, roots = [], [], [], [], [], [], []
+    offset = 0
+    max_depth = 0
+
+    for tree in trees:
+        n_nodes = tree.node_count
+        nodes = np.arange(n_nodes, dtype=np.int64) + offset
+        is_leaf = tree.children_left == -1
+
+        # Folhas apontam para si mesmas: a descida tem profundidade fixa
+        lefts.append(np.where(is_leaf, nodes, tree.children_left + offset))
+        rights.append(np.where(is_leaf, nodes, tree.children_right + offset))
+        features.append(np.where(is_leaf, 0, tree.feature))
+        thresholds.append(tree.threshold)
+        missing = getattr(tree, "missing_go_to_left", None)
+        missing_left.append(np.zeros(n_nodes, dtype=np.uint8) if missing is None else missing)
+        values.append(value_of(tree))
+        roots.append(offset)
+
+        offset += n_nodes
+        max_depth = max(max_depth, tree.max_depth)
+
+    return {
+        "feature": np.concatenate(features).astype("<i4"),
+        "threshold": np.concatenate(thresholds).astype("<f8"),
+        "left": np.concatenate(lefts).astype("<i4"),
+        "right": np.concatenate(rights).astype("<i4"),
+        "missing_left": np.concatenate(missing_left).astype("u1"),
+        "value": np.concatenate(values).astype("<f8"),
+        "roots": np.asarray(roots, dtype="<i4"),
+        "max_depth": max_depth,
+    }
+
+
+def _index_dtype(max_value: int) -> str:
+    """Menor inteiro sem sinal que comporta max_value"""
+    for dtype in ("u1", "<u2", "<u4"):
+        if max_value <= np.iinfo(dtype).max:
+            return dtype
+    raise ValueError(f"Modelo grande demais para o formato compilado ({max_value})")
+
+
+def _float32_floor(values: np.ndarray) -> np.ndarray:
+    """Maior float32 <= cada valor"""
+    rounded = values.astype(np.float32)
+    above = rounded.astype(np.float64) > values
+    rounded[above] = np.nextafter(rounded[above], np.float32(-np.inf))
+    return rounded
+
+
+def _threshold_ranks(feature: np.ndarray, threshold: np.ndarray, is_split: np.ndarray, n_features: int):
+    """
+    Thresholds como posto int16 entre os thresholds da feature
+
+    Returns:
+        (postos por nó, bins: thresholds float32 distintos ordenados por
+        feature, bin_offsets: início dos bins de cada feature)
+    """
+    threshold = _float32_floor(threshold)
+    ranks = np.zeros(len(feature), dtype="<i2")
+    bins, offsets = [], [0]
+    for index in range(n_features):
+        nodes = is_split & (feature == index)
+        values = np.unique(threshold[nodes])
+        if len(values) >= NAN_CODE:
+            raise ValueError(f"Feature {index} tem {len(values)} thresholds distintos; use thresholds float32")
+        ranks[nodes] = np.searchsorted(values, threshold[nodes])
+        bins.append(values)
+        offsets.append(offsets[-1] + len(values))
+    return ranks, np.concatenate(bins).astype("<f4"), np.asarray(offsets, dtype="<i4")
+
+
+def _leaf_error_bound(value: np.ndarray, stored: np.ndarray, roots: np.ndarray, aggregation: Dict) -> float:
+    """
+    Maior erro possível na probabilidade com as folhas em menor precisão
+
+    Cada árvore contribui no máximo com o maior erro entre os seus nós; a
+    média (Random Forest) erra no máximo a média desses erros e a sigmoide
+    (Gradient Boosting) tem derivada <= 1/4.
+    """
+    if not np.all(np.isfinite(stored)):
+        raise ValueError("Valores de folha fora do alcance da precisão escolhida")
+    per_tree = np.maximum.reduceat(np.abs(stored.astype(np.float64) - value), roots)
+    if aggregation["kind"] == "mean":
+        return float(per_tree.mean())
+    return float(aggregation["scale"] * per_tree.sum() / 4)
+
+
+def _reduce_precision(ensemble: Dict, n_features: int, precision: Precision) -> Dict:
+    """Converte os arrays das árvores para a precisão escolhida (in-place)"""
+    arrays, aggregation = ensemble["arrays"], ensemble["aggregation"]
+    n_nodes = len(arrays["feature"])
+    is_split = arrays["left"] != np.arange(n_nodes)
+
+    arrays["feature"] = arrays["feature"].astype(_index_dtype(max(n_features - 1, 0)))
+    for name in ("left", "right", "roots"):
+        arrays[name] = arrays[name].astype(_index_dtype(n_nodes - 1))
+
+    if precision.thresholds == "float32":
+        arrays["threshold"] = _float32_floor(arrays["threshold"]).astype("<f4")
+    elif precision.thresholds == "int16":
+        arrays["threshold"], arrays["bins"], arrays["bin_offsets"] = _threshold_ranks(
+            arrays["feature"], arrays["threshold"], is_split, n_features
+        )
+
+    if precision.format_version == 2 and np.array_equal(
+        arrays["left"][is_split], np.flatnonzero(is_split) + 1
+    ):
+        # Pré-ordem (como o sklearn cria as árvores): filho esquerdo = nó + 1.
+        # O threshold das folhas fica abaixo de qualquer valor: elas sempre
+        # vão para a direita, que aponta para elas mesmas.
+        del arrays["left"]
+        arrays["threshold"][~is_split] = -1 if precision.thresholds == "int16" else -np.inf
+
+    aggregation["max_proba_error"] = 0.0
+    if precision.leaves != "float64":
+        stored = arrays["value"].astype(np.dtype(precision.leaves).newbyteorder("<"))
+        aggregation["max_proba_error"] = _leaf_error_bound(arrays["value"], stored, arrays["roots"], aggregation)
+        arrays["value"] = stored
+    return ensemble
+
+
+def _class_one_fraction(tree) -> np.ndarray:
+    """Probabilidade da classe 1 em cada nó (mesma normalização do sklearn)"""
+    value = tree.value[:, 0, :]
+    normalizer = value.sum(axis=1)
+    normalizer[normalizer == 0.0] = 1.0
+    return value[:, 1] / normalizer
+
+
+def _ensemble(predictor) -> Dict:
+    from distillation import DISTILLED_TREE
+
+    model = predictor.model
+    if predictor.model_type == DISTILLED_TREE:
+        # Fallback destilado: uma árvore de regressão cujas folhas já são probabilidades
+        arrays = _tree_arrays([model.tree_], lambda tree: tree.value[:, 0, 0])
+        aggregation = {"kind": "mean", "max_depth": arrays.pop("max_depth")}
+        return {"aggregation": aggregation, "arrays": arrays}
+
+    if list(model.classes_) != [0, 1]:
+        raise ValueError(f"Classes inesperadas no modelo: {list(model.classes_)}")
+
+    if predictor.model_type == "random_forest":
+        arrays = _tree_arrays([estimator.tree_ for estimator in model.estimators_], _class_one_fraction)
+        aggregation = {"kind": "mean"}
+    else:
+        arrays = _tree_arrays(
+            [estimator.tree_ for estimator in model.estimators_[:, 0]],
+            lambda tree: tree.value[:, 0, 0],
+        )
+        # Log-odds da prevalência do treino (estimador init_ do sklearn)
+        init = model._raw_predict_init(np.zeros((1, model.n_features_in_), dtype=np.float32))
+        aggregation = {
+            "kind": "logit_sum",
+            "init": float(init[0, 0]),
+            "scale": float(model.learning_rate),
+        }
+
+    aggregation["max_depth"] = arrays.pop("max_depth")
+    return {"aggregation": aggregation, "arrays": arrays}
+
+
+def _compile(predictor, precision: Precision) -> Tuple[Dict, Dict[str, np.ndarray]]:
+    """Cabeçalho (sem a tabela de arrays) e arrays das árvores de um preditor treinado"""
+    from model import LOW_RISK, NUMERIC_FEATURES, RISK_LEVELS
+
+    if predictor.model is None:
+        raise ValueError("Modelo não treinado. Execute train() primeiro.")
+    if predictor.scaler is not None or not predictor.label_encoders:
+        raise ValueError(
+            "Artefato anterior ao vocabulário aprendido (StandardScaler/colunas fixas) "
+            "não pode ser compilado. Retreine o modelo."
+        )
+
+    ensemble = _reduce_precision(_ensemble(predictor), len(predictor.feature_names), precision)
+    header = {
+        "format_version": precision.format_version,
+        "model_type": predictor.model_type,
+        "model_version": predictor.model_version,
+        "aggregation": ensemble["aggregation"],
+        "precision": {"thresholds": precision.thresholds, "leaves": precision.leaves},
+        "feature_names": predictor.feature_names,
+        "numeric_features": NUMERIC_FEATURES,
+        "label_encoders": {name: encoder.to_dict() for name, encoder in predictor.label_encoders.items()},
+        "risk_thresholds": predictor.risk_thresholds,
+        "risk_levels": [list(level) for level in RISK_LEVELS],
+        "low_risk": list(LOW_RISK),
+        # Lista de pares: preserva a ordem por importância
+        "feature_importance": [[name, float(value)] for name, value in predictor.feature_importance.items()],
+        "metrics": {name: float(value) for name, value in predictor.metrics.items()},
+        "drift_reference": predictor.drift_reference,
+        "exported_at": datetime.now().isoformat(),
+    }
+    return header, ensemble["arrays"]
+
+
+def export_compiled(predictor, path: str, precision: Optional[Precision] = None):
+    """
+    Escreve o modelo no formato compilado
+
+    Args:
+        predictor: ComplicationPredictor treinado (com encoders de vocabulário)
+        path: Arquivo de saída
+        precision: Precisão dos thresholds e das folhas (padrão: lida do
+            ambiente; float64 nos dois)
+    """
+    precision = precision or Precision.from_env()
+    header, arrays = _compile(predictor, precision)
+
+    table = {}
+    blobs = []
+    offset = 0
+    for name, array in arrays.items():
+        array = np.ascontiguousarray(array)
+        table[name] = {"dtype": array.dtype.str, "shape": list(array.shape), "offset": offset}
+        blobs.append((offset, array.tobytes()))
+        offset += -(-array.nbytes // ALIGNMENT) * ALIGNMENT
+
+    header["arrays"] = table
+    header_bytes = json.dumps(header, ensure_ascii=False).encode("utf-8")
+    data_start = -(-(_PREAMBLE.size + len(header_bytes)) // ALIGNMENT) * ALIGNMENT
+
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+
+    with open(path, "wb") as f:
+        f.write(_PREAMBLE.pack(MAGIC, precision.format_version, len(header_bytes)))
+        f.write(header_bytes)
+        for blob_offset, blob in blobs:
+            f.seek(data_start + blob_offset)
+            f.write(blob)
+        f.truncate(data_start + offset)
+
+    print(
+        f"✅ Modelo compilado salvo em: {path}"
+        f" (thresholds {precision.thresholds}, folhas {precision.leaves})"
+    )
+
+
+# ---------------------------------------------------------------------------
+# Runtime (somente NumPy)
+# ---------------------------------------------------------------------------
+
+
+class Frozen:
+    """
+    Base dos objetos do runtime: atributos em __slots__, definidos uma vez
+    no __init__ (_set) e imutáveis depois
+    """
+
+    __slots__ = ()
+
+    def _set(self, **fields):
+        for name, value in fields.items():
+            object.__setattr__(self, name, value)
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f"{type(self).__name__} é imutável: carregue um novo e troque a referência")
+
+    def __delattr__(self, name):
+        raise AttributeError(f"{type(self).__name__} é imutável: carregue um novo e troque a referência")
+
+
+class FrozenVocabularyEncoder(Frozen, VocabularyEncoder):
+    """
+    VocabularyEncoder do runtime: vocabulário e sinônimos em MappingProxyType,
+    sem fit (só tokenize, token_ids e nomes das colunas)
+    """
+
+    __slots__ = ()
+
+    def __init__(self, data: Dict):
+        """
+        Args:
+            data: VocabularyEncoder.to_dict() do cabeçalho
+        """
+        self._set(
+            separator=data["separator"],
+            aliases=MappingProxyType(dict(data["aliases"])),
+            min_count=data["min_count"],
+            unknown_name=data["unknown_name"],
+            vocabulary=MappingProxyType(dict(data["vocabulary"])),
+            unknown_count=0,
+        )
+
+    def to_dict(self) -> Dict:
+        return {**super().to_dict(), "aliases": dict(self.aliases), "vocabulary": dict(self.vocabulary)}
+
+
+def _read_only(array: Optional[np.ndarray]) -> Optional[np.ndarray]:
+    """View somente leitura (as do memmap já são; as montadas em memória não)"""
+    if array is None or not array.flags.writeable:
+        return array
+    view = array.view()
+    view.flags.writeable = False
+    return view
+
+
+class CompiledEnsemble(Frozen):
+    """Árvores de um modelo compilado (arrays somente leitura)"""
+
+    __slots__ = (
+        "feature", "threshold", "left", "right", "missing_left", "value", "roots", "bins", "bin_offsets",
+        "kind", "max_depth", "init", "scale", "max_proba_error", "_binned",
+    )
+
+    def __init__(self, arrays: Dict[str, np.ndarray], aggregation: Dict):
+        bins = _read_only(arrays.get("bins"))
+        bin_offsets = _read_only(arrays.get("bin_offsets"))
+        self._set(
+            feature=_read_only(arrays["feature"]),
+            threshold=_read_only(arrays["threshold"]),
+            # Ausente no formato v2 com árvores em pré-ordem (esquerdo = nó + 1)
+            left=_read_only(arrays.get("left")),
+            right=_read_only(arrays["right"]),
+            missing_left=_read_only(arrays["missing_left"].astype(bool)),
+            value=_read_only(arrays["value"]),
+            roots=_read_only(arrays["roots"]),
+            # Só com thresholds int16
+            bins=bins,
+            bin_offsets=bin_offsets,
+            kind=aggregation["kind"],
+            max_depth=aggregation["max_depth"],
+            init=aggregation.get("init", 0.0),
+            scale=aggregation.get("scale", 1.0),
+            max_proba_error=aggregation.get("max_proba_error", 0.0),
+            _binned=()
+            if bins is None
+            else tuple(
+                (index, bins[start:end])
+                for index, (start, end) in enumerate(zip(bin_offsets[:-1], bin_offsets[1:]))
+                if end > start
+            ),
+        )
+
+    @property
+    def n_trees(self) -> int:
+        return len(self.roots)
+
+    @property
+    def nbytes(self) -> int:
+        """Bytes dos arrays das árvores"""
+        arrays = (
+            self.feature, self.threshold, self.left, self.right, self.missing_left,
+            self.value, self.roots, self.bins, self.bin_offsets,
+        )
+        return sum(array.nbytes for array in arrays if array is not None)
+
+    def _ranks(self, X: np.ndarray) -> np.ndarray:
+        """Posto de cada valor entre os bins da sua feature (NaN -> NAN_CODE)"""
+        codes = np.full(X.shape, NAN_CODE, dtype=np.int16)
+        for index, bins in self._binned:
+            codes[:, index] = np.searchsorted(bins, X[:, index])
+        codes[np.isnan(X)] = NAN_CODE
+        return codes
+
+    def leaves(self, X: np.ndarray) -> np.ndarray:
+        """Nó folha de cada (amostra, árvore)"""
+        binned = self.bins is not None
+        if binned:
+            X = self._ranks(X)
+        rows = np.arange(X.shape[0])[:, None]
+        node = np.broadcast_to(self.roots, (X.shape[0], self.n_trees)).copy()
+        for _ in range(self.max_depth):
+            x = X[rows, self.feature[node]]
+            missing = x == NAN_CODE if binned else np.isnan(x)
+            go_left = (x <= self.threshold[node]) | (missing & self.missing_left[node])
+            left = node + 1 if self.left is None else self.left[node]
+            node = np.where(go_left, left, self.right[node])
+        return node
+
+    def predict_proba(self, X: np.ndarray) -> np.ndarray:
+        """Probabilidade da classe 1 (X: float32, uma linha por paciente)"""
+        # Folhas float16/float32 somadas em float64
+        leaf_values = self.value[self.leaves(X)].astype(np.float64, copy=False)
+        if self.kind == "mean":
+            return leaf_values.sum(axis=1) / self.n_trees
+        raw = self.init + (self.scale * leaf_values).sum(axis=1)
+        return 1.0 / (1.0 + np.exp(-raw))
+
+
+def _number(value, default=math.nan) -> float:
+    if value is None:
+        return default
+    try:
+        value = float(value)
+    except (TypeError, ValueError):
+        return default
+    return default if math.isnan(value) else value
+
+
+def required_number(record: Dict, name: str) -> float:
+    """
+    Campo numérico obrigatório (ValueError se ausente, nulo ou não numérico)
+
+    Sem imputação: no scikit-learn o NaN resultante faz a predição falhar, e
+    aqui seguiria missing_left, que é 0 em todos os nós quando o treino não
+    viu ausentes (o paciente cairia sempre à direita dos cortes).
+    """
+    value = _number(record.get(name))
+    if math.isnan(value):
+        raise ValueError(f"Campo {name} deve ser numérico (recebido: {record.get(name)!r})")
+    return value
+
+
+class CompiledPredictor(Frozen):
+    """
+    Runtime de inferência imutável, construído de um artefato
+
+    Mesma interface de predição do ComplicationPredictor (predict e
+    predict_proba), sem scikit-learn, pandas ou joblib. Os arrays são
+    somente leitura, listas viram tuplas e dicionários, MappingProxyType,
+    também nos níveis internos (encoders são FrozenVocabularyEncoder; o
+    cabeçalho não fica no objeto); nenhum método altera o objeto. Várias threads usam o mesmo preditor sem
+    lock, e trocar de modelo é atribuir outra referência (ver
+    POST /admin/reload na API): quem já pegou a referência antiga termina
+    com ela.
+
+    CompiledPredictor() sem argumentos é o preditor vazio (model is None)
+    que a API usa antes de haver modelo treinado.
+    """
+
+    __slots__ = (
+        "model", "model_type", "model_version", "feature_names", "numeric_features", "label_encoders",
+        "feature_importance", "metrics", "risk_thresholds", "drift_reference",
+        "_risk_levels", "_low_risk",
+    )
+
+    def __init__(self, header: Optional[Dict] = None, arrays: Optional[Dict[str, np.ndarray]] = None):
+        """
+        Args:
+            header: Cabeçalho do formato compilado (None = preditor vazio)
+            arrays: Arrays das árvores descritos no cabeçalho
+        """
+        if header is None:
+            self._set(
+                model=None, model_type=None, model_version=None, feature_names=(), numeric_features=(),
+                label_encoders=MappingProxyType({}), feature_importance=MappingProxyType({}),
+                metrics=MappingProxyType({}), risk_thresholds=MappingProxyType({}),
+                drift_reference=MappingProxyType({}), _risk_levels=(), _low_risk=None,
+            )
+            return
+
+        model_type = header["model_type"]
+        self._set(
+            model=CompiledEnsemble(arrays, header["aggregation"]),
+            model_type=model_type,
+            # Exportados antes do model_version: tipo + data da exportação
+            model_version=header.get("model_version") or f"{model_type}-{header.get('exported_at')}",
+            feature_names=tuple(header["feature_names"]),
+            numeric_features=tuple(header["numeric_features"]),
+            # Encoders só são lidos na predição (tokenize, token_ids)
+            label_encoders=MappingProxyType({
+                name: FrozenVocabularyEncoder(encoder) for name, encoder in header["label_encoders"].items()
+            }),
+            feature_importance=MappingProxyType(dict(header["feature_importance"])),
+            metrics=MappingProxyType(dict(header["metrics"])),
+            risk_thresholds=MappingProxyType(dict(header["risk_thresholds"])),
+            drift_reference=MappingProxyType({name: tuple(counts) for name, counts in header["drift_reference"].items()}),
+            _risk_levels=tuple(tuple(level) for level in header["risk_levels"]),
+            _low_risk=tuple(header["low_risk"]),
+        )
+
+    @classmethod
+    def load(cls, path: str) -> "CompiledPredictor":
+        """Mapeia o arquivo compilado em memória"""
+        buffer = np.memmap(path, dtype=np.uint8, mode="r")
+        magic, version, header_size = _PREAMBLE.unpack(buffer[: _PREAMBLE.size].tobytes())
+        if magic != MAGIC:
+            raise ValueError(f"{path} não é um modelo compilado")
+        if version > FORMAT_VERSION:
+            raise ValueError(f"Formato compilado v{version} não suportado (máximo v{FORMAT_VERSION})")
+
+        header_end = _PREAMBLE.size + header_size
+        header = json.loads(buffer[_PREAMBLE.size : header_end].tobytes().decode("utf-8"))
+        data_start = -(-header_end // ALIGNMENT) * ALIGNMENT
+
+        arrays = {}
+        for name, spec in header["arrays"].items():
+            dtype = np.dtype(spec["dtype"])
+            count = int(np.prod(spec["shape"]))
+            start = data_start + spec["offset"]
+            arrays[name] = np.frombuffer(buffer, dtype=dtype, count=count, offset=start).reshape(spec["shape"])
+
+        predictor = cls(header, arrays)
+        print(f"✅ Modelo compilado carregado de: {path}")
+        return predictor
+
+    @classmethod
+    def from_predictor(cls, predictor, precision: Optional[Precision] = None) -> "CompiledPredictor":
+        """
+        Runtime de um ComplicationPredictor treinado ou carregado de .joblib,
+        sem passar por arquivo
+
+        Args:
+            predictor: ComplicationPredictor com encoders de vocabulário
+            precision: Precisão das árvores (padrão: float64, exato)
+        """
+        header, arrays = _compile(predictor, precision or Precision())
+        # Ida e volta pelo JSON: mesmo cabeçalho do arquivo, sem compartilhar
+        # listas e dicionários com o preditor de treino
+        return cls(json.loads(json.dumps(header)), arrays)
+
+    def _features(self, record: Dict) -> Tuple[List[float], List[str], List[str]]:
+        """Features numéricas de um paciente (mesmas regras de prepare_features)"""
+        comorbidities = self.label_encoders["comorbidades"].tokenize(record.get("comorbidades"))
+        surgery = self.label_encoders["tipo_cirurgia"].tokenize(record.get("tipo_cirurgia"))
+
+        idade = required_number(record, "idade")
+        dor_d1 = _number(record.get("dor_d1"))
+        retencao = int(_number(record.get("retencao_urinaria"), 0))
+
+        values = {
+            "idade_normalizada": idade / 100,
+            "sexo_masculino": float(record.get("sexo") == "Masculino"),
+            "num_comorbidades": float(len(comorbidities)),
+            "duracao_normalizada": _number(record.get("duracao_minutos"), 60) / 180,
+            "bloqueio_pudendo": float(int(_number(record.get("bloqueio_pudendo"), 0))),
+            "dor_d1_normalizada": (5 if math.isnan(dor_d1) else dor_d1) / 10,
+            "retencao_urinaria": float(retencao),
+            "febre": float(int(_number(record.get("febre"), 0))),
+            "sangramento_intenso": float(int(_number(record.get("sangramento_intenso"), 0))),
+            "idoso_com_dm": float(idade > 65 and "dm tipo 2" in comorbidities),
+            "dor_alta_retencao": float(dor_d1 > 7 and retencao == 1),
+            "multiplas_comorb_cirurgia_complexa": float(
+                len(comorbidities) >= 3 and "hemorroidectomia" in surgery
+            ),
+        }
+        return [values[name] for name in self.numeric_features], comorbidities, surgery
+
+    def feature_matrix(self, records: List[Dict]) -> np.ndarray:
+        """Matriz densa na ordem de feature_names"""
+        comorbidity_encoder = self.label_encoders["comorbidades"]
+        surgery_encoder = self.label_encoders["tipo_cirurgia"]
+        n_numeric = len(self.numeric_features)
+        surgery_offset = n_numeric + comorbidity_encoder.n_columns
+
+        X = np.zeros((len(records), len(self.feature_names)), dtype=np.float64)
+        for row, record in enumerate(records):
+            numeric, comorbidities, surgery = self._features(record)
+            X[row, :n_numeric] = numeric
+            X[row, [n_numeric + i for i in comorbidity_encoder.token_ids(comorbidities)]] = 1.0
+            X[row, [surgery_offset + i for i in surgery_encoder.token_ids(surgery)]] = 1.0
+        return X
+
+    def predict_proba(self, records: List[Dict]) -> np.ndarray:
+        """Predição em lote (lista de dicts no formato de /predict)"""
+        X = self.feature_matrix(records)
+        # As árvores do sklearn comparam em float32
+        return self.model.predict_proba(X.astype(np.float32))
+
+    def risk_level(self, probability: float):
+        """(nível, rótulo, recomendação) da faixa de risco da probabilidade"""
+        for level, label, recommendation in self._risk_levels:
+            if probability >= self.risk_thresholds[level]:
+                return level, label, recommendation
+        return self._low_risk
+
+    def predict(self, patient_data: Dict) -> Dict:
+        """Predição de um paciente (mesma resposta de ComplicationPredictor.predict)"""
+        X = self.feature_matrix([patient_data])
+        probability = float(self.model.predict_proba(X.astype(np.float32))[0])
+        risk_level, risk_label, recommendation = self.risk_level(probability)
+
+        risk_factors = [
+            (name, self.feature_importance[name])
+            for name, value in zip(self.feature_names, X[0])
+            if value > 0 and name in self.feature_importance
+        ]
+        risk_factors.sort(key=lambda item: item[1], reverse=True)
+
+        return {
+            "probability": probability,
+            "prediction": int(probability > 0.5),
+            "risk_level": risk_level,
+            "risk_label": risk_label,
+            "recommendation": recommendation,
+            "top_risk_factors": [
+                {"name": name, "contribution": float(importance)} for name, importance in risk_factors[:3]
+            ],
+        }
@@ -0,0 +1,421 @@
+"""
+Compressão pós-treino do ensemble
+
+Reduz o custo de inferência do modelo treinado mantendo o AUC out-of-fold
+dentro de uma tolerância do AUC do modelo completo:
+
+- Poda de subárvores (opcional, prune_epsilon > 0): um nó interno vira
+  folha quando todas as folhas abaixo dele têm valores a no máximo
+  prune_epsilon entre si; a nova folha recebe a média dos valores
+  ponderada pelas amostras. A predição de cada árvore muda no máximo
+  prune_epsilon (probabilidade no Random Forest, escore bruto por estágio
+  no Gradient Boosting).
+- Seleção de árvores:
+  - Random Forest: seleção gulosa (forward) das posições de árvore cuja
+    média maximiza o AUC OOF, com o menor número de árvores que fica acima
+    de AUC_completo - auc_tolerance em uma seleção cruzada entre os folds
+    (ver _greedy_forest)
+  - Gradient Boosting: os estágios são sequenciais, então fica o menor
+    prefixo (primeiros k estágios) dentro da tolerância
+
+O AUC de cada candidato vem das árvores dos modelos dos folds
+(evaluation.fit_out_of_fold) aplicadas aos pacientes que não viram: a
+mesma seleção e a mesma poda são aplicadas aos folds e ao modelo final,
+como em qualquer outro hiperparâmetro avaliado por OOF. As árvores na
+mesma posição compartilham a semente (amostra bootstrap e sorteio de
+features) nos folds e no modelo final.
+"""
+
+import contextlib
+import io
+import os
+import pickle
+import tempfile
+import time
+from dataclasses import dataclass
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+from scipy import sparse
+from scipy.stats import rankdata
+
+
+@dataclass
+class CompressionConfig:
+    """Configuração da compressão pós-treino"""
+
+    # Perda máxima de AUC OOF em relação ao modelo completo
+    auc_tolerance: float = 0.005
+    # Diferença máxima entre folhas de uma subárvore podada (0 = sem poda)
+    prune_epsilon: float = 0.0
+    min_trees: int = 10
+
+    @classmethod
+    def from_env(cls) -> "CompressionConfig":
+        """Lê ML_COMPRESS_AUC_TOLERANCE, ML_COMPRESS_PRUNE_EPSILON e ML_COMPRESS_MIN_TREES"""
+        return cls(
+            auc_tolerance=float(os.getenv("ML_COMPRESS_AUC_TOLERANCE", cls.auc_tolerance)),
+            prune_epsilon=float(os.getenv("ML_COMPRESS_PRUNE_EPSILON", cls.prune_epsilon)),
+            min_trees=int(os.getenv("ML_COMPRESS_MIN_TREES", cls.min_trees)),
+        )
+
+
+# ---------------------------------------------------------------------------
+# Árvores
+# ---------------------------------------------------------------------------
+
+
+def _trees(model, model_type: str) -> List:
+    """Estimadores (DecisionTree*) do ensemble, na ordem do modelo"""
+    if model_type == "random_forest":
+        return list(model.estimators_)
+    return list(model.estimators_[:, 0])
+
+
+def _tree_values(tree, model_type: str) -> np.ndarray:
+    """Valor de cada nó usado na predição (fração da classe 1 ou escore do estágio)"""
+    if model_type == "random_forest":
+        value = tree.value[:, 0, :]
+        normalizer = value.sum(axis=1)
+        normalizer[normalizer == 0.0] = 1.0
+        return value[:, 1] / normalizer
+    return tree.value[:, 0, 0]
+
+
+def prune_tree(tree, values: np.ndarray, epsilon: float):
+    """
+    Nova sklearn Tree sem as subárvores cujas folhas variam até epsilon
+
+    Os nós ficam compactados (em pré-ordem, como o sklearn os cria), então
+    node_count, max_depth e o tamanho serializado diminuem junto.
+    """
+    left, right = tree.children_left, tree.children_right
+    weight = tree.weighted_n_node_samples
+    n_nodes = tree.node_count
+
+    # Pós-ordem: menor/maior valor de folha e soma ponderada abaixo de cada nó
+    low = values.copy()
+    high = values.copy()
+    weighted_value = tree.value * weight[:, None, None]
+    leaf_weight = weight.copy()
+    order = []
+    stack = [0]
+    while stack:
+        node = stack.pop()
+        order.append(node)
+        if left[node] != -1:
+            stack.extend((left[node], right[node]))
+    for node in reversed(order):
+        if left[node] != -1:
+            a, b = left[node], right[node]
+            low[node] = min(low[a], low[b])
+            high[node] = max(high[a], high[b])
+            weighted_value[node] = weighted_value[a] + weighted_value[b]
+            leaf_weight[node] = leaf_weight[a] + leaf_weight[b]
+
+    state = tree.__getstate__()
+    old_nodes, old_values = state["nodes"], state["values"]
+    keep, new_values = [], []
+    new_left, new_right = [], []
+    depth_max = 0
+    stack = [(0, 0, None, False)]
+    while stack:
+        node, depth, parent, is_right = stack.pop()
+        index = len(keep)
+        if parent is not None:
+            (new_right if is_right else new_left)[parent] = index
+        keep.append(node)
+        new_left.append(-1)
+        new_right.append(-1)
+        depth_max = max(depth_max, depth)
+        if left[node] != -1 and high[node] - low[node] <= epsilon:
+            # Subárvore colapsada: média das folhas ponderada pelas amostras
+            new_values.append(weighted_value[node] / max(leaf_weight[node], 1e-300))
+        else:
+            new_values.append(old_values[node])
+            if left[node] != -1:
+                # Direita empilhada primeiro: a esquerda sai antes (pré-ordem)
+                stack.append((right[node], depth + 1, index, True))
+                stack.append((left[node], depth + 1, index, False))
+
+    nodes = old_nodes[keep].copy()
+    nodes["left_child"] = new_left
+    nodes["right_child"] = new_right
+    collapsed = nodes["left_child"] == -1
+    nodes["feature"][collapsed] = -2
+    nodes["threshold"][collapsed] = -2.0
+    nodes["missing_go_to_left"][collapsed] = 0
+
+    pruned = type(tree)(*tree.__reduce__()[1])
+    pruned.__setstate__(
+        {
+            "max_depth": depth_max,
+            "node_count": len(keep),
+            "nodes": nodes,
+            "values": np.ascontiguousarray(np.asarray(new_values, dtype=old_values.dtype)),
+        }
+    )
+    return pruned
+
+
+def _prune_model(model, model_type: str, epsilon: float) -> Tuple[int, int]:
+    """Poda todas as árvores do modelo (in-place); (nós antes, nós depois)"""
+    before = after = 0
+    for estimator in _trees(model, model_type):
+        tree = estimator.tree_
+        before += tree.node_count
+        estimator.tree_ = prune_tree(tree, _tree_values(tree, model_type), epsilon)
+        after += estimator.tree_.node_count
+    return before, after
+
+
+# ---------------------------------------------------------------------------
+# Valores OOF por árvore
+# ---------------------------------------------------------------------------
+
+
+def _as_tree_input(X):
+    """Entrada que as árvores do sklearn usam internamente (float32)"""
+    if sparse.issparse(X):
+        return sparse.csr_matrix(X, dtype=np.float32)
+    return np.ascontiguousarray(X, dtype=np.float32)
+
+
+def _oof_tree_values(oof, model_type: str) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Valor de cada árvore para cada paciente, pela árvore do fold que não o viu
+
+    Returns:
+        (valores [pacientes x árvores], escore inicial de cada paciente:
+        0 no Random Forest, log-odds init_ do fold no Gradient Boosting)
+    """
+    X = _as_tree_input(oof.X)
+    n_trees = len(_trees(oof.models[0], model_type))
+    values = np.empty((len(oof.y), n_trees), dtype=np.float64)
+    init = np.zeros(len(oof.y), dtype=np.float64)
+    for fold, fold_model in enumerate(oof.models):
+        rows = np.flatnonzero(oof.folds == fold)
+        X_fold = X[rows]
+        for position, estimator in enumerate(_trees(fold_model, model_type)):
+            tree = estimator.tree_
+            values[rows, position] = _tree_values(tree, model_type)[tree.apply(X_fold)]
+        if model_type != "random_forest":
+            init[rows] = fold_model._raw_predict_init(X_fold)[:, 0]
+    return values, init
+
+
+def _aggregate(values: np.ndarray, init: np.ndarray, positions, model_type: str, scale: float) -> np.ndarray:
+    """Probabilidade OOF do ensemble restrito às posições"""
+    selected = values[:, positions]
+    if model_type == "random_forest":
+        return selected.mean(axis=1)
+    return 1.0 / (1.0 + np.exp(-(init + scale * selected.sum(axis=1))))
+
+
+def _column_auc(scores: np.ndarray, y: np.ndarray) -> np.ndarray:
+    """AUC de cada coluna de scores (postos médios nos empates, como roc_auc_score)"""
+    positives = y == 1
+    n_pos = positives.sum()
+    n_neg = len(y) - n_pos
+    ranks = rankdata(scores, axis=0)
+    return (ranks[positives].sum(axis=0) - n_pos * (n_pos + 1) / 2) / (n_pos * n_neg)
+
+
+def _greedy_order(values: np.ndarray, y: np.ndarray) -> Iterator[int]:
+    """Posições na ordem gulosa: cada passo soma a árvore que mais aumenta o AUC"""
+    remaining = np.ones(values.shape[1], dtype=bool)
+    total = np.zeros(len(y), dtype=np.float64)
+    while remaining.any():
+        candidates = np.flatnonzero(remaining)
+        # A soma tem o mesmo AUC da média
+        auc = _column_auc(total[:, None] + values[:, candidates], y)
+        best = int(candidates[int(np.argmax(auc))])
+        remaining[best] = False
+        total += values[:, best]
+        yield best
+
+
+def _greedy_forest(values: np.ndarray, y: np.ndarray, folds: np.ndarray, target: float, min_trees: int):
+    """
+    Número de árvores e posições escolhidas no Random Forest
+
+    Escolher as árvores olhando o AUC OOF e reportar esse mesmo AUC seria
+    otimista. O tamanho vem de uma seleção cruzada: os pacientes de cada
+    fold são avaliados com a ordem gulosa calculada nos outros folds, e fica
+    o menor k cujo AUC assim obtido atinge target. As k posições finais são
+    as k primeiras da ordem gulosa em todos os pacientes.
+
+    Returns:
+        (posições, probabilidades OOF da seleção cruzada com k árvores)
+    """
+    from sklearn.metrics import roc_auc_score
+
+    n_trees = values.shape[1]
+    fold_ids = np.unique(folds)
+    orders = [_greedy_order(values[folds != fold], y[folds != fold]) for fold in fold_ids]
+    held_out = [np.flatnonzero(folds == fold) for fold in fold_ids]
+    sums = [np.zeros(len(rows)) for rows in held_out]
+    proba = np.empty(len(y), dtype=np.float64)
+
+    n_selected = n_trees
+    for k in range(1, n_trees + 1):
+        for order, rows, total in zip(orders, held_out, sums):
+            total += values[rows, next(order)]
+            proba[rows] = total / k
+        if k >= min_trees and roc_auc_score(y, proba) >= target:
+            n_selected = k
+            break
+
+    positions = [position for position, _ in zip(_greedy_order(values, y), range(n_selected))]
+    return sorted(positions), proba
+
+
+def _shortest_prefix(values: np.ndarray, init: np.ndarray, y: np.ndarray, target: float, min_trees: int) -> int:
+    """Menor número de estágios iniciais com AUC >= target"""
+    raw = init[:, None] + np.cumsum(values, axis=1)
+    auc = _column_auc(raw, y)
+    for n_stages in range(min(min_trees, values.shape[1]), values.shape[1] + 1):
+        if auc[n_stages - 1] >= target:
+            return n_stages
+    return values.shape[1]
+
+
+def _select(model, model_type: str, positions: List[int]):
+    """Mantém só as árvores/estágios escolhidos (in-place)"""
+    if model_type == "random_forest":
+        model.estimators_ = [model.estimators_[i] for i in positions]
+        model.n_estimators = len(positions)
+    else:
+        n_stages = len(positions)
+        model.estimators_ = model.estimators_[:n_stages]
+        model.n_estimators = model.n_estimators_ = n_stages
+        if getattr(model, "train_score_", None) is not None:
+            model.train_score_ = model.train_score_[:n_stages]
+
+
+# ---------------------------------------------------------------------------
+# Custo de inferência
+# ---------------------------------------------------------------------------
+
+
+def inference_cost(predictor, X, repeats: int = 200) -> Dict:
+    """
+    Tamanho dos artefatos, memória das árvores e latência do runtime compilado
+
+    Args:
+        predictor: ComplicationPredictor treinado
+        X: Matriz de features (densa ou CSR) para medir a latência
+        repeats: Predições individuais medidas
+    """
+    from compiled import CompiledPredictor
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        path = os.path.join(tmpdir, "model.compiled")
+        with contextlib.redirect_stdout(io.StringIO()):
+            predictor.export_compiled(path)
+            compiled = CompiledPredictor.load(path)
+        compiled_bytes = os.path.getsize(path)
+
+        ensemble = compiled.model
+        X_dense = X.toarray() if sparse.issparse(X) else np.asarray(X)
+        X_dense = np.ascontiguousarray(X_dense, dtype=np.float32)
+        tree_bytes = ensemble.nbytes
+
+        # Mediana de 5 rodadas, depois de uma de aquecimento
+        rows = [X_dense[i % len(X_dense)][None, :] for i in range(repeats)]
+        single, batch = [], []
+        for _ in range(6):
+            start = time.perf_counter()
+            for row in rows:
+                ensemble.predict_proba(row)
+            single.append((time.perf_counter() - start) / repeats * 1e6)
+            start = time.perf_counter()
+            ensemble.predict_proba(X_dense)
+            batch.append((time.perf_counter() - start) / len(X_dense) * 1e6)
+        single_us, batch_us = float(np.median(single[1:])), float(np.median(batch[1:]))
+
+        n_trees, n_nodes, max_depth = ensemble.n_trees, len(ensemble.feature), ensemble.max_depth
+        del compiled, ensemble
+
+    return {
+        "trees": n_trees,
+        "nodes": n_nodes,
+        "max_depth": max_depth,
+        "compiled_bytes": compiled_bytes,
+        "joblib_bytes": len(pickle.dumps(predictor.model, protocol=pickle.HIGHEST_PROTOCOL)),
+        "tree_memory_bytes": tree_bytes,
+        "single_us": single_us,
+        "batch_us_per_row": batch_us,
+    }
+
+
+# ---------------------------------------------------------------------------
+# Compressão
+# ---------------------------------------------------------------------------
+
+
+def compress_ensemble(predictor, config: Optional[CompressionConfig] = None) -> Tuple[np.ndarray, Dict]:
+    """
+    Poda e seleciona as árvores do modelo final (in-place)
+
+    Args:
+        predictor: ComplicationPredictor treinado com train() (usa
+            predictor.oof: modelos dos folds, X e probabilidades OOF)
+        config: Tolerância de AUC, epsilon da poda e mínimo de árvores
+
+    Returns:
+        (probabilidades OOF do modelo comprimido, relatório)
+    """
+    from sklearn.metrics import roc_auc_score
+
+    config = config or CompressionConfig()
+    oof = predictor.oof
+    if oof is None or oof.models is None or oof.X is None:
+        raise ValueError("Compressão requer o treino em memória (train), com os modelos dos folds.")
+
+    model_type = predictor.model_type
+    scale = float(getattr(predictor.model, "learning_rate", 1.0))
+    before = inference_cost(predictor, oof.X)
+    auc_before = float(roc_auc_score(oof.y, oof.proba))
+    target = auc_before - config.auc_tolerance
+
+    nodes_pruned = None
+    if config.prune_epsilon > 0:
+        for fold_model in oof.models:
+            _prune_model(fold_model, model_type, config.prune_epsilon)
+        nodes_pruned = _prune_model(predictor.model, model_type, config.prune_epsilon)
+
+    values, init = _oof_tree_values(oof, model_type)
+    if model_type == "random_forest":
+        positions, proba = _greedy_forest(values, oof.y, oof.folds, target, config.min_trees)
+    else:
+        positions = list(range(_shortest_prefix(values, init, oof.y, target, config.min_trees)))
+        proba = _aggregate(values, init, positions, model_type, scale)
+
+    _select(predictor.model, model_type, positions)
+    for fold_model in oof.models:
+        _select(fold_model, model_type, positions)
+
+    after = inference_cost(predictor, oof.X)
+    auc_after = float(roc_auc_score(oof.y, proba))
+
+    report = {
+        "auc_tolerance": config.auc_tolerance,
+        "prune_epsilon": config.prune_epsilon,
+        "oof_auc_before": auc_before,
+        "oof_auc_after": auc_after,
+        "oof_auc_change": auc_after - auc_before,
+        "oof_max_abs_proba_change": float(np.max(np.abs(proba - oof.proba))),
+        "selected_trees": positions if model_type == "random_forest" else len(positions),
+        "nodes_before_pruning": nodes_pruned[0] if nodes_pruned else None,
+        "nodes_after_pruning": nodes_pruned[1] if nodes_pruned else None,
+        "before": before,
+        "after": after,
+        "reduction": {
+            key: 1.0 - after[key] / before[key]
+            for key in ("trees", "nodes", "compiled_bytes", "joblib_bytes", "tree_memory_bytes",
+                        "single_us", "batch_us_per_row")
+            if before[key]
+        },
+    }
+    return proba, report
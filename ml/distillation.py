@@ -0,0 +1,131 @@
+"""
+Modelo de fallback destilado do ensemble
+
+Uma árvore de regressão rasa ajustada às probabilidades out-of-fold do
+ensemble (o "professor"). Ela responde quando o modelo principal não
+responde dentro do prazo da requisição ou não está carregado (ver
+fallback.py).
+
+O fallback é exportado no formato compilado como um ensemble de uma árvore
+com agregação "mean" (cada folha guarda a probabilidade média do ensemble
+nos pacientes dela). Por isso é servido pelo mesmo CompiledPredictor, com a
+mesma featurização e as mesmas faixas de risco.
+
+A fidelidade é medida por ajuste cruzado nos folds do OOF: a árvore de cada
+fold é ajustada nos outros folds e comparada com as probabilidades do
+ensemble nos pacientes que não viu.
+"""
+
+import os
+from dataclasses import dataclass
+from typing import Dict, Tuple
+
+import numpy as np
+
+DISTILLED_TREE = "distilled_tree"
+
+
+@dataclass
+class DistillationConfig:
+    """Tamanho da árvore do fallback"""
+
+    max_depth: int = 6
+    min_samples_leaf: int = 20
+
+    @classmethod
+    def from_env(cls) -> "DistillationConfig":
+        """Lê ML_FALLBACK_MAX_DEPTH e ML_FALLBACK_MIN_SAMPLES_LEAF"""
+        return cls(
+            max_depth=int(os.getenv("ML_FALLBACK_MAX_DEPTH", cls.max_depth)),
+            min_samples_leaf=int(os.getenv("ML_FALLBACK_MIN_SAMPLES_LEAF", cls.min_samples_leaf)),
+        )
+
+
+def _student(config: DistillationConfig):
+    from sklearn.tree import DecisionTreeRegressor
+
+    return DecisionTreeRegressor(
+        max_depth=config.max_depth,
+        min_samples_leaf=config.min_samples_leaf,
+        random_state=42,
+    )
+
+
+def _risk_band(proba: np.ndarray, risk_thresholds: Dict[str, float]) -> np.ndarray:
+    """Número de cortes de risco atingidos (mesma faixa = mesmo número)"""
+    return sum((proba >= cut).astype(np.int8) for cut in risk_thresholds.values())
+
+
+def fidelity(teacher: np.ndarray, student: np.ndarray, y: np.ndarray, risk_thresholds: Dict[str, float]) -> Dict:
+    """
+    Quanto o fallback reproduz o ensemble
+
+    Args:
+        teacher: Probabilidades do ensemble
+        student: Probabilidades do fallback para os mesmos pacientes
+        y: Desfechos observados (para o AUC dos dois)
+        risk_thresholds: Cortes das faixas de risco
+    """
+    from sklearn.metrics import roc_auc_score
+
+    error = student - teacher
+    variance = float(np.var(teacher))
+    return {
+        "fidelity_mae": float(np.mean(np.abs(error))),
+        "fidelity_max_abs_error": float(np.max(np.abs(error))),
+        "fidelity_r2": 1.0 - float(np.mean(error**2)) / variance if variance > 0 else 0.0,
+        "risk_level_agreement": float(
+            np.mean(_risk_band(student, risk_thresholds) == _risk_band(teacher, risk_thresholds))
+        ),
+        "roc_auc": float(roc_auc_score(y, student)),
+        "teacher_roc_auc": float(roc_auc_score(y, teacher)),
+    }
+
+
+def distill(predictor, config: DistillationConfig = None) -> Tuple[object, Dict]:
+    """
+    Ajusta o fallback às probabilidades OOF do preditor
+
+    Args:
+        predictor: ComplicationPredictor treinado com train() (usa
+            predictor.oof: matriz de features, folds e probabilidades)
+        config: Profundidade e mínimo de pacientes por folha
+
+    Returns:
+        (ComplicationPredictor do fallback, relatório de fidelidade)
+    """
+    from model import ComplicationPredictor
+
+    config = config or DistillationConfig()
+    oof = predictor.oof
+    if oof is None or oof.X is None:
+        raise ValueError("Destilação requer o treino em memória (train), com a matriz de features.")
+
+    X, teacher = oof.X, oof.proba
+    cross_fitted = np.empty_like(teacher)
+    for fold in np.unique(oof.folds):
+        held_out = np.flatnonzero(oof.folds == fold)
+        fitted = np.flatnonzero(oof.folds != fold)
+        student = _student(config).fit(X[fitted], teacher[fitted])
+        cross_fitted[held_out] = student.predict(X[held_out])
+
+    student = _student(config).fit(X, teacher)
+
+    fallback = ComplicationPredictor(model_type=DISTILLED_TREE)
+    fallback.model = student
+    fallback.label_encoders = predictor.label_encoders
+    fallback.feature_names = predictor.feature_names
+    fallback.risk_thresholds = dict(predictor.risk_thresholds)
+    fallback.drift_reference = predictor.drift_reference
+    fallback.model_version = f"{predictor.model_version}-fallback"
+    fallback.metrics = fidelity(teacher, cross_fitted, oof.y, predictor.risk_thresholds)
+    fallback._store_feature_importance()
+
+    report = {
+        **fallback.metrics,
+        "max_depth": int(student.get_depth()),
+        "leaves": int(student.get_n_leaves()),
+        "nodes": int(student.tree_.node_count),
+        "model_version": fallback.model_version,
+    }
+    return fallback, report
@@ -0,0 +1,275 @@
+"""
+Monitoramento de drift das features de entrada
+
+Cada feature bruta de /predict tem um histograma de faixas fixas (ou de
+categorias do vocabulário aprendido) com uma faixa extra para valor
+ausente. A atualização por requisição custa O(1) em tempo e memória: um
+bisect em uma lista pequena de cortes ou uma consulta de dicionário, e um
+incremento de contador.
+
+O treino salva no artefato os histogramas de referência (dados de treino).
+A API compara a janela recente com a referência:
+- PSI (Population Stability Index) para todas as features
+- KS (maior diferença entre as distribuições acumuladas) para as ordinais
+
+As features são monitoradas antes da imputação de prepare_features, então
+um dor_d1 sempre ausente (imputado como 5) aparece como drift na faixa de
+ausentes.
+"""
+
+import math
+import threading
+from bisect import bisect_right
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from encoding import UNKNOWN_ID, VocabularyEncoder
+
+# Cortes internos das features numéricas: faixa i = bisect_right(cortes, valor)
+NUMERIC_CUTS = {
+    "idade": [30, 40, 50, 60, 65, 70, 80],
+    "duracao_minutos": [30, 45, 60, 90, 120, 180],
+    "dor_d1": [1, 2, 3, 4, 5, 6, 7, 8, 9, 10],
+}
+FLAG_FEATURES = ["bloqueio_pudendo", "retencao_urinaria", "febre", "sangramento_intenso"]
+SEX_CATEGORIES = ["Masculino", "Feminino"]
+
+# Proporção mínima por faixa no PSI (evita log(0))
+PSI_EPSILON = 1e-4
+# Limiares usuais do PSI
+PSI_MODERATE = 0.10
+PSI_SIGNIFICANT = 0.25
+# Requisições mínimas na janela antes de classificar drift
+MIN_SAMPLES = 100
+
+
+def _is_missing(value) -> bool:
+    return value is None or (isinstance(value, float) and math.isnan(value))
+
+
+class FeatureSketch:
+    """
+    Histograma de faixas fixas de uma feature
+
+    kind:
+    - "numeric": faixas por cortes + ausente
+    - "category": categorias fixas + outra + ausente
+    - "tokens": vocabulário do encoder (id 0 = desconhecido) + nenhum;
+      features com vários valores (comorbidades) contam cada token
+    """
+
+    def __init__(
+        self,
+        name: str,
+        kind: str,
+        cuts: Optional[List[float]] = None,
+        categories: Optional[List[str]] = None,
+        encoder: Optional[VocabularyEncoder] = None,
+    ):
+        self.name = name
+        self.kind = kind
+        self.cuts = cuts
+        self.categories = {category: i for i, category in enumerate(categories or [])}
+        self.encoder = encoder
+
+        if kind == "numeric":
+            self.n_bins = len(cuts) + 2
+        elif kind == "category":
+            self.n_bins = len(self.categories) + 2
+        else:
+            self.n_bins = encoder.n_columns + 1
+        self.missing_bin = self.n_bins - 1
+
+    @property
+    def ordinal(self) -> bool:
+        return self.kind == "numeric"
+
+    def bins(self, value) -> List[int]:
+        """Faixas de um valor bruto"""
+        if _is_missing(value) or value == "":
+            return [self.missing_bin]
+
+        if self.kind == "numeric":
+            try:
+                return [bisect_right(self.cuts, float(value))]
+            except (TypeError, ValueError, OverflowError):
+                return [self.missing_bin]
+
+        if self.kind == "category":
+            # Listas e objetos do JSON não são chaves válidas: contam como outra
+            if not isinstance(value, (str, int, float, bool)):
+                return [len(self.categories)]
+            return [self.categories.get(value, len(self.categories))]
+
+        tokens = self.encoder.tokenize(value)
+        if not tokens:
+            return [self.missing_bin]
+        return [self.encoder.vocabulary.get(token, UNKNOWN_ID) for token in tokens]
+
+    def batch_counts(self, values: "pd.Series") -> np.ndarray:
+        """Histograma de uma coluna inteira (referência do treino)"""
+        if self.kind == "numeric":
+            import pandas as pd  # só no treino; a API não importa pandas
+
+            numeric = pd.to_numeric(values, errors="coerce").to_numpy(dtype=np.float64)
+            index = np.searchsorted(self.cuts, numeric, side="right")
+            index[np.isnan(numeric)] = self.missing_bin
+            return np.bincount(index, minlength=self.n_bins)
+
+        counts = np.zeros(self.n_bins, dtype=np.int64)
+        for value in values:
+            for index in self.bins(value):
+                counts[index] += 1
+        return counts
+
+    def labels(self) -> List[str]:
+        """Nome de cada faixa (para o relatório)"""
+        if self.kind == "numeric":
+            edges = ["-inf"] + [f"{cut:g}" for cut in self.cuts] + ["inf"]
+            names = [f"[{edges[i]}, {edges[i + 1]})" for i in range(len(self.cuts) + 1)]
+            return names + ["ausente"]
+
+        if self.kind == "category":
+            return list(self.categories) + ["outra", "ausente"]
+
+        names = [self.encoder.unknown_name] + [None] * len(self.encoder.vocabulary)
+        for token, index in self.encoder.vocabulary.items():
+            names[index] = token
+        return names + ["nenhum"]
+
+
+def feature_sketches(label_encoders: Dict[str, VocabularyEncoder]) -> List[FeatureSketch]:
+    """Histogramas monitorados para um preditor (depende dos encoders)"""
+    sketches = [
+        FeatureSketch(name, "numeric", cuts=cuts) for name, cuts in NUMERIC_CUTS.items()
+    ]
+    sketches += [FeatureSketch(name, "numeric", cuts=[0.5]) for name in FLAG_FEATURES]
+    sketches.append(FeatureSketch("sexo", "category", categories=SEX_CATEGORIES))
+    for name in ("tipo_cirurgia", "comorbidades"):
+        if name in label_encoders:
+            sketches.append(FeatureSketch(name, "tokens", encoder=label_encoders[name]))
+    return sketches
+
+
+def reference_histograms(data: "pd.DataFrame", label_encoders: Dict[str, VocabularyEncoder]) -> Dict[str, List[int]]:
+    """
+    Histogramas de referência dos dados de treino (salvos no artefato)
+
+    Chamável por blocos: some os resultados com merge_histograms.
+    """
+    return {
+        sketch.name: sketch.batch_counts(data[sketch.name]).tolist()
+        for sketch in feature_sketches(label_encoders)
+        if sketch.name in data
+    }
+
+
+def merge_histograms(total: Dict[str, List[int]], part: Dict[str, List[int]]) -> Dict[str, List[int]]:
+    """Soma histogramas de referência (treino em blocos)"""
+    for name, counts in part.items():
+        if name in total:
+            total[name] = [a + b for a, b in zip(total[name], counts)]
+        else:
+            total[name] = list(counts)
+    return total
+
+
+def population_stability_index(expected: np.ndarray, actual: np.ndarray) -> float:
+    """PSI entre duas contagens com as mesmas faixas"""
+    expected = np.maximum(expected / max(expected.sum(), 1), PSI_EPSILON)
+    actual = np.maximum(actual / max(actual.sum(), 1), PSI_EPSILON)
+    return float(np.sum((actual - expected) * np.log(actual / expected)))
+
+
+def ks_statistic(expected: np.ndarray, actual: np.ndarray) -> float:
+    """Maior diferença entre as distribuições acumuladas (faixas ordenadas)"""
+    expected_cdf = np.cumsum(expected) / max(expected.sum(), 1)
+    actual_cdf = np.cumsum(actual) / max(actual.sum(), 1)
+    return float(np.max(np.abs(expected_cdf - actual_cdf)))
+
+
+class DriftMonitor:
+    """
+    Histogramas das requisições recentes de um modelo
+
+    Janela de duas gerações: a atual recebe as atualizações e, ao completar
+    window_size requisições, vira a anterior. O relatório soma as duas, ou
+    seja, cobre entre window_size e 2 * window_size requisições recentes, com
+    memória constante.
+    """
+
+    def __init__(self, label_encoders: Dict[str, VocabularyEncoder], reference: Dict[str, List[int]], window_size: int = 5000):
+        self.window_size = window_size
+        self.sketches = [
+            sketch
+            for sketch in feature_sketches(label_encoders)
+            # Faixas mudaram desde o treino: sem comparação possível
+            if len(reference.get(sketch.name, [])) == sketch.n_bins
+        ]
+        self.reference = {sketch.name: np.asarray(reference[sketch.name], dtype=np.float64) for sketch in self.sketches}
+        self.current = {sketch.name: np.zeros(sketch.n_bins, dtype=np.int64) for sketch in self.sketches}
+        self.previous = {sketch.name: np.zeros(sketch.n_bins, dtype=np.int64) for sketch in self.sketches}
+        self.current_requests = 0
+        self.previous_requests = 0
+        self.lock = threading.Lock()
+
+    @classmethod
+    def for_predictor(cls, predictor, window_size: int = 5000) -> Optional["DriftMonitor"]:
+        """Monitor do preditor carregado (None se o artefato não tem referência)"""
+        if not predictor.drift_reference:
+            return None
+        return cls(predictor.label_encoders, predictor.drift_reference, window_size)
+
+    def update(self, payload: Dict):
+        """Conta um payload de /predict"""
+        bins = [(sketch.name, sketch.bins(payload.get(sketch.name))) for sketch in self.sketches]
+        with self.lock:
+            if self.current_requests >= self.window_size:
+                self.previous, self.current = self.current, self.previous
+                for counts in self.current.values():
+                    counts[:] = 0
+                self.previous_requests, self.current_requests = self.current_requests, 0
+
+            for name, indices in bins:
+                counts = self.current[name]
+                for index in indices:
+                    counts[index] += 1
+            self.current_requests += 1
+
+    def report(self) -> Dict:
+        """PSI/KS por feature da janela recente contra a referência do treino"""
+        with self.lock:
+            recent = {name: self.current[name] + self.previous[name] for name in self.current}
+            n_requests = self.current_requests + self.previous_requests
+
+        features = {}
+        for sketch in self.sketches:
+            expected = self.reference[sketch.name]
+            actual = recent[sketch.name].astype(np.float64)
+            psi = population_stability_index(expected, actual) if n_requests else None
+
+            if n_requests < MIN_SAMPLES:
+                status = "insufficient_data"
+            elif psi >= PSI_SIGNIFICANT:
+                status = "drift"
+            elif psi >= PSI_MODERATE:
+                status = "warning"
+            else:
+                status = "ok"
+
+            features[sketch.name] = {
+                "psi": psi,
+                "ks": ks_statistic(expected, actual) if sketch.ordinal and n_requests else None,
+                "status": status,
+                "bins": sketch.labels(),
+                "reference": (expected / max(expected.sum(), 1)).round(4).tolist(),
+                "recent": (actual / max(actual.sum(), 1)).round(4).tolist(),
+            }
+
+        return {
+            "requests": n_requests,
+            "window_size": self.window_size,
+            "min_samples": MIN_SAMPLES,
+            "features": features,
+        }
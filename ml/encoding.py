@@ -0,0 +1,212 @@
+"""
+Codificação de variáveis categóricas (comorbidades e tipo de cirurgia)
+
+O vocabulário é aprendido no treino e salvo no artefato. Cada token é
+normalizado (minúsculas, sem acentos, espaços colapsados), passa por uma
+tabela de sinônimos e é mapeado para um id inteiro por dicionário (hash
+table), com custo constante por token. Tokens fora do vocabulário caem em
+um balde compartilhado (id 0).
+
+A saída é uma matriz esparsa CSR de indicadores (uma coluna por token).
+"""
+
+import re
+import unicodedata
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+
+UNKNOWN_ID = 0
+
+# Sinônimos -> token canônico. As chaves já estão normalizadas.
+# Os nomes longos são os do cadastro (prisma/seed.ts); os curtos, os usados
+# nos scripts e nos artefatos antigos.
+COMORBIDITY_ALIASES = {
+    "hipertensao arterial sistemica (has)": "has",
+    "hipertensao arterial sistemica": "has",
+    "hipertensao": "has",
+    "diabetes mellitus tipo 2": "dm tipo 2",
+    "dm2": "dm tipo 2",
+    "diabetes mellitus tipo 1": "dm tipo 1",
+    "dm1": "dm tipo 1",
+    "obesidade (imc > 30)": "obesidade",
+    "insuficiencia renal cronica": "irc",
+    "dpoc (doenca pulmonar obstrutiva cronica)": "dpoc",
+    "doenca pulmonar obstrutiva cronica": "dpoc",
+}
+
+# Mesmas equivalências de SURGERY_TYPE_LABELS em lib/constants/surgery-types.ts
+SURGERY_ALIASES = {
+    "fistula_anal": "fistula",
+    "fissurectomia": "fissura",
+    "doenca_pilonidal": "pilonidal",
+    "cisto_pilonidal": "pilonidal",
+}
+
+_WHITESPACE = re.compile(r"\s+")
+_NON_ALNUM = re.compile(r"[^a-z0-9]+")
+
+
+def normalize_token(token: str) -> str:
+    """Minúsculas, sem acentos e com espaços colapsados"""
+    token = unicodedata.normalize("NFKD", token)
+    token = "".join(ch for ch in token if not unicodedata.combining(ch))
+    return _WHITESPACE.sub(" ", token).strip().lower()
+
+
+def tokenize(value, separator: Optional[str] = ",", aliases: Optional[Dict[str, str]] = None) -> List[str]:
+    """
+    Converte um valor bruto em lista de tokens canônicos
+
+    Args:
+        value: String (ex: "HAS,DM tipo 2"), None ou NaN
+        separator: Separador de múltiplos valores (None = valor único)
+        aliases: Tabela de sinônimos normalizados
+
+    Returns:
+        Tokens normalizados, sem vazios e sem repetição (ordem preservada)
+    """
+    if value is None or (isinstance(value, float) and np.isnan(value)):
+        return []
+
+    parts = str(value).split(separator) if separator else [str(value)]
+    aliases = aliases or {}
+    tokens = []
+    for part in parts:
+        token = normalize_token(part)
+        if token:
+            token = aliases.get(token, token)
+            if token not in tokens:
+                tokens.append(token)
+    return tokens
+
+
+def slugify(token: str) -> str:
+    """Token -> sufixo de nome de feature (ex: 'dm tipo 2' -> 'dm_tipo_2')"""
+    return _NON_ALNUM.sub("_", token).strip("_")
+
+
+class VocabularyEncoder:
+    """
+    Codificador de indicadores com vocabulário aprendido no treino
+
+    Coluna 0 é o balde de tokens desconhecidos; as demais seguem a ordem
+    de frequência (desempate alfabético) observada no fit. Tokens com menos
+    de min_count ocorrências no treino também vão para a coluna 0: é o que
+    dá exemplos ao balde, senão ele seria sempre 0 no fit e as árvores não
+    aprenderiam nada para um token novo na predição.
+    """
+
+    def __init__(
+        self,
+        separator: Optional[str] = ",",
+        aliases: Optional[Dict[str, str]] = None,
+        min_count: int = 5,
+        unknown_name: str = "outra",
+    ):
+        """
+        Args:
+            separator: Separador de múltiplos valores (None = valor único)
+            aliases: Tabela de sinônimos aplicada após a normalização
+            min_count: Ocorrências mínimas para o token ter coluna própria
+            unknown_name: Sufixo do nome da coluna do balde desconhecido
+        """
+        self.separator = separator
+        self.aliases = dict(aliases or {})
+        self.min_count = min_count
+        self.unknown_name = unknown_name
+        self.vocabulary: Dict[str, int] = {}
+        # Ocorrências no fit que foram para o balde desconhecido (não salvo)
+        self.unknown_count = 0
+
+    def tokenize(self, value) -> List[str]:
+        return tokenize(value, self.separator, self.aliases)
+
+    def fit(self, values: Iterable) -> "VocabularyEncoder":
+        """Aprende o vocabulário a partir dos valores brutos"""
+        return self.fit_counts(self.count_tokens(values))
+
+    def count_tokens(self, values: Iterable, counts: Optional[Dict[str, int]] = None) -> Dict[str, int]:
+        """
+        Acumula a frequência de cada token em `counts`
+
+        Permite aprender o vocabulário em blocos (treino out-of-core):
+        chame para cada bloco e depois fit_counts com o total.
+        """
+        counts = {} if counts is None else counts
+        for value in values:
+            for token in self.tokenize(value):
+                counts[token] = counts.get(token, 0) + 1
+        return counts
+
+    def fit_counts(self, counts: Dict[str, int]) -> "VocabularyEncoder":
+        """Define o vocabulário a partir de frequências já contadas"""
+        kept = sorted(
+            (token for token, count in counts.items() if count >= self.min_count),
+            key=lambda token: (-counts[token], token),
+        )
+        self.vocabulary = {token: i for i, token in enumerate(kept, start=1)}
+        self.unknown_count = sum(count for count in counts.values() if count < self.min_count)
+        return self
+
+    @property
+    def n_columns(self) -> int:
+        return len(self.vocabulary) + 1
+
+    def feature_names(self, prefix: str) -> List[str]:
+        """Nomes das colunas na ordem da matriz"""
+        names = [f"{prefix}{self.unknown_name}"] + [None] * len(self.vocabulary)
+        used = {names[0]}
+        for token, index in sorted(self.vocabulary.items(), key=lambda item: item[1]):
+            name = f"{prefix}{slugify(token)}"
+            if name in used:  # tokens diferentes com o mesmo slug
+                name = f"{name}_{index}"
+            used.add(name)
+            names[index] = name
+        return names
+
+    def token_ids(self, tokens: Iterable[str]) -> List[int]:
+        """Ids ordenados e sem repetição (desconhecidos -> UNKNOWN_ID)"""
+        return sorted({self.vocabulary.get(token, UNKNOWN_ID) for token in tokens})
+
+    def transform_tokens(self, token_lists: Iterable[List[str]]) -> "sparse.csr_matrix":
+        """Listas de tokens já normalizados -> matriz CSR de indicadores"""
+        # Import local: o runtime compilado (compiled.py) usa só a tokenização
+        from scipy import sparse
+
+        indptr = [0]
+        indices: List[int] = []
+        for tokens in token_lists:
+            indices.extend(self.token_ids(tokens))
+            indptr.append(len(indices))
+
+        data = np.ones(len(indices), dtype=np.float64)
+        return sparse.csr_matrix(
+            (data, np.asarray(indices, dtype=np.int32), np.asarray(indptr, dtype=np.int32)),
+            shape=(len(indptr) - 1, self.n_columns),
+        )
+
+    def transform(self, values: Iterable) -> "sparse.csr_matrix":
+        """Valores brutos -> matriz CSR de indicadores"""
+        return self.transform_tokens(self.tokenize(value) for value in values)
+
+    def to_dict(self) -> Dict:
+        """Representação serializável (salva no artefato)"""
+        return {
+            "separator": self.separator,
+            "aliases": self.aliases,
+            "min_count": self.min_count,
+            "unknown_name": self.unknown_name,
+            "vocabulary": self.vocabulary,
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> "VocabularyEncoder":
+        encoder = cls(
+            separator=data["separator"],
+            aliases=data["aliases"],
+            min_count=data["min_count"],
+            unknown_name=data["unknown_name"],
+        )
+        encoder.vocabulary = dict(data["vocabulary"])
+        return encoder
@@ -0,0 +1,402 @@
+"""
+Avaliação out-of-fold dos modelos
+
+Cada paciente recebe uma probabilidade prevista por um modelo que não o viu
+no treino. Essas probabilidades (OOF) são calculadas uma vez e reutilizadas
+para todas as métricas reportadas, para a escolha de limiares e para o
+diagnóstico de calibração.
+
+Os k modelos dos folds (validação cruzada estratificada) e o modelo final
+são treinados em paralelo, em uma única passada. Não há mais um conjunto de
+teste separado nem um cross_val_score à parte.
+
+As estimativas out-of-bag do Random Forest não são usadas: com
+class_weight="balanced" os positivos quase sempre entram na amostra
+bootstrap e ficam com poucas (ou nenhuma) árvores out-of-bag, o que
+subestima o AUC.
+"""
+
+from contextlib import nullcontext
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from scipy import sparse
+from joblib import Parallel, delayed
+from sklearn.base import clone
+from sklearn.metrics import (
+    accuracy_score,
+    brier_score_loss,
+    f1_score,
+    precision_score,
+    recall_score,
+    roc_auc_score,
+)
+from sklearn.model_selection import StratifiedKFold
+
+N_SPLITS = 5
+CALIBRATION_BINS = 10
+
+# Intervalos de confiança bootstrap
+BOOTSTRAP_RESAMPLES = 2000
+# Elementos da matriz de contagens por bloco (reamostragens x pacientes)
+BOOTSTRAP_BATCH_ELEMENTS = 2_000_000
+
+# Alvos das faixas de risco (probabilidade >= corte da faixa)
+RISK_BAND_TARGETS = {
+    # medium ou acima deve sinalizar 90% dos pacientes que complicam
+    "medium_sensitivity": 0.90,
+    # high ou acima: no máximo 20% dos pacientes
+    "high_alert_rate": 0.20,
+    # critical: no máximo 5% dos pacientes (contato imediato)
+    "critical_alert_rate": 0.05,
+}
+
+
+@dataclass
+class OutOfFoldResult:
+    """Probabilidades out-of-fold de um treino"""
+
+    proba: np.ndarray
+    y: np.ndarray
+    folds: np.ndarray  # fold de cada paciente (para a variação entre folds)
+    method: str = "cross_validation"
+    # Modelos dos folds e matriz de features (para a compressão pós-treino;
+    # não são salvos no artefato)
+    models: Optional[List] = None
+    X: Optional[object] = None
+
+    @property
+    def n_splits(self) -> int:
+        return int(self.folds.max()) + 1
+
+
+def _fit(estimator, X, y, indices=None):
+    if indices is not None:
+        X, y = X[indices], y[indices]
+    return estimator.fit(X, y)
+
+
+def fit_out_of_fold(
+    estimator,
+    X,
+    y: np.ndarray,
+    n_splits: int = N_SPLITS,
+    random_state: int = 42,
+    n_jobs: int = -1,
+    profile=None,
+) -> Tuple[object, OutOfFoldResult]:
+    """
+    Treina o modelo final no dataset inteiro e calcula as probabilidades OOF
+
+    Args:
+        estimator: Estimador sklearn não treinado
+        X: Matriz de features (densa ou CSR)
+        y: Target (0/1)
+        n_splits: Número de folds
+        random_state: Semente da divisão em folds
+        n_jobs: Processos para os ajustes da validação cruzada
+        profile: timing.TrainingProfile que recebe as etapas "split", "fit"
+            (folds e modelo final, no mesmo lote paralelo) e "cv"
+            (probabilidades OOF)
+
+    Returns:
+        (modelo final treinado, OutOfFoldResult)
+    """
+    stage = profile.stage if profile is not None else (lambda name: nullcontext())
+
+    y = np.asarray(y)
+    with stage("split"):
+        splitter = StratifiedKFold(n_splits=n_splits, shuffle=True, random_state=random_state)
+        splits = list(splitter.split(np.zeros(len(y)), y))
+        folds = np.empty(len(y), dtype=np.int64)
+        for fold, (_, test_index) in enumerate(splits):
+            folds[test_index] = fold
+
+    # Folds e modelo final no mesmo lote paralelo, cada um com n_jobs=1
+    # interno para não disputar CPU com o paralelismo externo
+    single = clone(estimator)
+    if "n_jobs" in single.get_params():
+        single.set_params(n_jobs=1)
+
+    with stage("fit"):
+        jobs = [delayed(_fit)(clone(single), X, y, train_index) for train_index, _ in splits]
+        jobs.append(delayed(_fit)(clone(single), X, y))
+        fitted = Parallel(n_jobs=n_jobs)(jobs)
+
+    model = fitted.pop()
+    if "n_jobs" in model.get_params():
+        model.set_params(n_jobs=estimator.get_params()["n_jobs"])
+
+    with stage("cv"):
+        proba = np.empty(len(y), dtype=np.float64)
+        for fold_model, (_, test_index) in zip(fitted, splits):
+            proba[test_index] = fold_model.predict_proba(X[test_index])[:, 1]
+
+    return model, OutOfFoldResult(proba, y, folds, models=fitted, X=X)
+
+
+def classification_metrics(y: np.ndarray, proba: np.ndarray, threshold: float = 0.5) -> Dict:
+    """
+    Métricas de classificação a partir de probabilidades
+
+    O corte padrão (probabilidade > 0.5) é o mesmo de model.predict.
+    """
+    y_pred = (proba > threshold).astype(int)
+    return {
+        "accuracy": accuracy_score(y, y_pred),
+        "precision": precision_score(y, y_pred, zero_division=0),
+        "recall": recall_score(y, y_pred, zero_division=0),
+        "f1_score": f1_score(y, y_pred, zero_division=0),
+        "roc_auc": roc_auc_score(y, proba),
+    }
+
+
+def fold_auc(result: OutOfFoldResult) -> Tuple[float, float]:
+    """Média e desvio do AUC-ROC entre folds"""
+    scores = [
+        roc_auc_score(result.y[result.folds == fold], result.proba[result.folds == fold])
+        for fold in range(result.n_splits)
+    ]
+    return float(np.mean(scores)), float(np.std(scores))
+
+
+def calibration_table(y: np.ndarray, proba: np.ndarray, n_bins: int = CALIBRATION_BINS) -> List[Dict]:
+    """
+    Curva de calibração em faixas fixas de probabilidade
+
+    Returns:
+        Uma entrada por faixa não vazia: probabilidade média prevista,
+        taxa observada de complicação e número de pacientes
+    """
+    bins = np.minimum((proba * n_bins).astype(int), n_bins - 1)
+    counts = np.bincount(bins, minlength=n_bins)
+    predicted = np.bincount(bins, weights=proba, minlength=n_bins)
+    observed = np.bincount(bins, weights=y, minlength=n_bins)
+
+    return [
+        {
+            "bin_start": i / n_bins,
+            "bin_end": (i + 1) / n_bins,
+            "mean_predicted": float(predicted[i] / counts[i]),
+            "observed_rate": float(observed[i] / counts[i]),
+            "count": int(counts[i]),
+        }
+        for i in range(n_bins)
+        if counts[i]
+    ]
+
+
+def evaluate(result: OutOfFoldResult) -> Tuple[Dict, Dict]:
+    """
+    Métricas e relatório de avaliação a partir das probabilidades OOF
+
+    Returns:
+        (metrics, evaluation): metrics tem as mesmas chaves do treino com
+        conjunto de teste; evaluation guarda método, folds, calibração e
+        intervalos de confiança bootstrap
+    """
+    metrics = classification_metrics(result.y, result.proba)
+    metrics["cv_roc_auc_mean"], metrics["cv_roc_auc_std"] = fold_auc(result)
+    metrics["brier_score"] = brier_score_loss(result.y, result.proba)
+
+    evaluation = {
+        "method": result.method,
+        "n_splits": result.n_splits,
+        "n_samples": int(len(result.y)),
+        "calibration": calibration_table(result.y, result.proba),
+        "confidence_level": 0.95,
+        "confidence_intervals": bootstrap_confidence_intervals(result.y, result.proba),
+    }
+    return metrics, evaluation
+
+
+def threshold_sweep(y: np.ndarray, proba: np.ndarray) -> Dict[str, np.ndarray]:
+    """
+    Sensibilidade, precisão e volume de alertas em todos os cortes
+
+    Uma ordenação decrescente e somas acumuladas dão os verdadeiros e falsos
+    positivos de "probabilidade >= corte" para cada valor distinto de
+    probabilidade, em O(n log n).
+
+    Returns:
+        Arrays alinhados (cortes em ordem decrescente): cutoff, recall,
+        precision e alert_rate (fração de pacientes sinalizados)
+    """
+    y = np.asarray(y)
+    order = np.argsort(-proba, kind="mergesort")
+    sorted_proba = proba[order]
+    true_positives = np.cumsum(y[order])
+    false_positives = np.cumsum(1 - y[order])
+
+    # Empates entram juntos: última posição de cada valor distinto
+    last = np.r_[np.flatnonzero(np.diff(sorted_proba)), len(sorted_proba) - 1]
+    tp = true_positives[last]
+    flagged = tp + false_positives[last]
+
+    return {
+        "cutoff": sorted_proba[last],
+        "recall": tp / max(true_positives[-1], 1),
+        "precision": tp / flagged,
+        "alert_rate": flagged / len(sorted_proba),
+    }
+
+
+def risk_thresholds(y: np.ndarray, proba: np.ndarray, targets: Optional[Dict[str, float]] = None) -> Tuple[Dict[str, float], List[Dict]]:
+    """
+    Cortes das faixas de risco a partir de probabilidades out-of-fold
+
+    - medium: maior corte que ainda sinaliza a sensibilidade alvo
+    - high / critical: menor corte dentro do volume de alertas alvo
+
+    Os cortes são monótonos (medium <= high <= critical); se a sensibilidade
+    alvo já é atingida dentro do volume de "high", a faixa média fica vazia.
+
+    Returns:
+        ({"critical": corte, "high": corte, "medium": corte}, tabela com
+        sensibilidade, precisão e volume de alertas de cada faixa)
+    """
+    targets = {**RISK_BAND_TARGETS, **(targets or {})}
+    sweep = threshold_sweep(y, proba)
+    last = len(sweep["cutoff"]) - 1
+
+    def within_alert_rate(rate: float) -> int:
+        # recall e alert_rate crescem com o índice (cortes decrescentes)
+        return max(int(np.searchsorted(sweep["alert_rate"], rate, side="right")) - 1, 0)
+
+    high = within_alert_rate(targets["high_alert_rate"])
+    critical = min(within_alert_rate(targets["critical_alert_rate"]), high)
+    medium = min(int(np.searchsorted(sweep["recall"], targets["medium_sensitivity"])), last)
+    medium = max(medium, high)
+
+    thresholds = {}
+    table = []
+    for level, index in (("critical", critical), ("high", high), ("medium", medium)):
+        thresholds[level] = float(sweep["cutoff"][index])
+        table.append(
+            {
+                "level": level,
+                "cutoff": thresholds[level],
+                "recall": float(sweep["recall"][index]),
+                "precision": float(sweep["precision"][index]),
+                "alert_rate": float(sweep["alert_rate"][index]),
+            }
+        )
+    return thresholds, table
+
+
+def _resample_counts(rng: np.random.Generator, n: int, n_resamples: int) -> np.ndarray:
+    """Matriz (n_resamples x n) com quantas vezes cada paciente foi sorteado"""
+    index = rng.integers(0, n, size=(n_resamples, n))
+    index += np.arange(n_resamples)[:, None] * n
+    return np.bincount(index.ravel(), minlength=n_resamples * n).reshape(n_resamples, n)
+
+
+def _group_indicator(y: np.ndarray, sorted_proba: np.ndarray) -> sparse.csr_matrix:
+    """
+    Indicadora (paciente x 2 * grupos) para o AUC em lote
+
+    Grupos são os valores distintos de probabilidade (pacientes já em ordem
+    crescente); as primeiras colunas recebem os positivos, as demais os
+    negativos.
+    """
+    groups = np.r_[0, np.cumsum(np.diff(sorted_proba) != 0)]
+    n_groups = groups[-1] + 1
+    columns = groups + n_groups * (y == 0)
+    return sparse.csr_matrix(
+        (np.ones(len(y)), (np.arange(len(y)), columns)), shape=(len(y), 2 * n_groups)
+    )
+
+
+def _batched_auc(counts: np.ndarray, indicator: sparse.csr_matrix) -> np.ndarray:
+    """
+    AUC-ROC de cada reamostragem (linhas de counts) por postos
+
+    O numerador de Mann-Whitney é a soma, em cada grupo de probabilidade,
+    dos positivos vezes os negativos abaixo (empates valem meio).
+    """
+    weights = (indicator.T @ counts.T).T
+    n_groups = weights.shape[1] // 2
+    weights_pos, weights_neg = weights[:, :n_groups], weights[:, n_groups:]
+
+    negatives_below = np.cumsum(weights_neg, axis=1) - weights_neg
+    numerator = (weights_pos * (negatives_below + 0.5 * weights_neg)).sum(axis=1)
+    pairs = weights_pos.sum(axis=1) * weights_neg.sum(axis=1)
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return numerator / pairs  # NaN se a reamostragem tem uma classe só
+
+
+def bootstrap_confidence_intervals(
+    y: np.ndarray,
+    proba: np.ndarray,
+    threshold: float = 0.5,
+    n_resamples: int = BOOTSTRAP_RESAMPLES,
+    confidence: float = 0.95,
+    random_state: int = 42,
+) -> Dict[str, Dict[str, float]]:
+    """
+    Intervalos de confiança bootstrap (percentil) das métricas
+
+    Todas as reamostragens são avaliadas de uma vez: uma matriz de
+    contagens (reamostragem x paciente) multiplicada pelos indicadores de
+    acerto/erro dá as matrizes de confusão, e o AUC sai por postos em lote.
+    O trabalho é dividido em blocos de reamostragens para limitar a memória.
+
+    Returns:
+        {métrica: {"low": ..., "high": ...}} para accuracy, precision,
+        recall, f1_score, roc_auc e brier_score
+    """
+    # A ordem dos pacientes não altera o bootstrap; ordenar uma vez
+    # dispensa ordenar dentro de cada reamostragem para o AUC
+    proba = np.asarray(proba, dtype=np.float64)
+    order = np.argsort(proba, kind="mergesort")
+    proba = proba[order]
+    y = np.asarray(y).astype(np.int64)[order]
+    n = len(y)
+    rng = np.random.default_rng(random_state)
+    indicator = _group_indicator(y, proba)
+
+    flagged = proba > threshold
+    outcomes = np.column_stack(
+        [
+            y & flagged,  # verdadeiro positivo
+            (1 - y) & flagged,  # falso positivo
+            y & ~flagged,  # falso negativo
+            (proba - y) ** 2,  # erro quadrático (Brier)
+        ]
+    ).astype(np.float64)
+
+    per_batch = max(1, BOOTSTRAP_BATCH_ELEMENTS // n)
+    tp, fp, fn, squared_error, auc = [], [], [], [], []
+    for start in range(0, n_resamples, per_batch):
+        counts = _resample_counts(rng, n, min(per_batch, n_resamples - start))
+        totals = counts @ outcomes
+        tp.append(totals[:, 0])
+        fp.append(totals[:, 1])
+        fn.append(totals[:, 2])
+        squared_error.append(totals[:, 3])
+        auc.append(_batched_auc(counts, indicator))
+
+    tp, fp, fn = np.concatenate(tp), np.concatenate(fp), np.concatenate(fn)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        precision = np.where(tp + fp > 0, tp / (tp + fp), 0.0)
+        recall = np.where(tp + fn > 0, tp / (tp + fn), 0.0)
+        f1 = np.where(2 * tp + fp + fn > 0, 2 * tp / (2 * tp + fp + fn), 0.0)
+    true_negatives = n - tp - fp - fn
+
+    samples = {
+        "accuracy": (tp + true_negatives) / n,
+        "precision": precision,
+        "recall": recall,
+        "f1_score": f1,
+        "roc_auc": np.concatenate(auc),
+        "brier_score": np.concatenate(squared_error) / n,
+    }
+
+    tail = (1 - confidence) / 2 * 100
+    intervals = {}
+    for name, values in samples.items():
+        low, high = np.nanpercentile(values, [tail, 100 - tail])
+        intervals[name] = {"low": float(low), "high": float(high)}
+    return intervals
@@ -0,0 +1,159 @@
+"""
+Fallback por prazo para as predições da API
+
+O modelo principal (tenant, coletivo ou individual) roda em um pool de
+threads e a requisição espera no máximo o prazo dela (header X-Deadline-Ms,
+campo "deadline_ms" ou ML_PREDICT_DEADLINE_MS). Se o prazo passa, se não há
+modelo principal carregado ou se ele falha, responde o fallback destilado
+(distillation.py): uma árvore rasa, servida pelo CompiledPredictor em
+microssegundos. A resposta informa o modelo que de fato respondeu.
+
+Sem prazo configurado, o modelo principal roda na própria thread da
+requisição, sem o pool. A predição que estourou o prazo continua no pool
+até terminar (threads não são interrompidas); as que ainda estão na fila
+são canceladas.
+"""
+
+import os
+import threading
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from typing import Callable, Dict, Optional, Tuple
+
+from compiled import CompiledPredictor
+from registry import fallback_path
+
+DEADLINE_HEADER = "X-Deadline-Ms"
+
+# Motivos para responder com o fallback
+DEADLINE = "deadline"
+UNAVAILABLE = "unavailable"
+ERROR = "error"
+
+
+def load_fallback(path: str, primary_version: Optional[str] = None) -> Optional[CompiledPredictor]:
+    """
+    Fallback exportado ao lado do .joblib em path (None se não existe, falha
+    ou foi destilado de outro modelo)
+
+    Args:
+        path: .joblib do modelo principal
+        primary_version: model_version do modelo principal carregado; o
+            fallback precisa ser f"{primary_version}-fallback" (None = sem
+            modelo principal para comparar)
+    """
+    path = fallback_path(path)
+    if not os.path.exists(path):
+        return None
+    try:
+        fallback = CompiledPredictor.load(path)
+    except Exception as e:
+        print(f"⚠️ Erro ao carregar fallback {path}: {e}")
+        return None
+    if primary_version is not None and fallback.model_version != f"{primary_version}-fallback":
+        print(
+            f"⚠️ Fallback {path} ignorado: destilado de {fallback.model_version.removesuffix('-fallback')},"
+            f" modelo principal é {primary_version}"
+        )
+        return None
+    return fallback
+
+
+class DeadlineRouter:
+    """Executa o modelo principal com prazo e conta quem respondeu"""
+
+    def __init__(self, default_deadline_ms: Optional[float] = None, max_workers: int = 4):
+        """
+        Args:
+            default_deadline_ms: Prazo das requisições que não informam um
+                (None = sem prazo)
+            max_workers: Threads do pool do modelo principal
+        """
+        self.default_deadline_ms = default_deadline_ms
+        self.max_workers = max(1, max_workers)
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self.lock = threading.Lock()
+        # "primary" ou "fallback_<motivo>" / "failed_<motivo>" (sem fallback)
+        self.counts: Counter = Counter()
+
+    @classmethod
+    def from_env(cls) -> "DeadlineRouter":
+        """Lê ML_PREDICT_DEADLINE_MS e ML_PRIMARY_WORKERS"""
+        deadline = os.environ.get("ML_PREDICT_DEADLINE_MS")
+        return cls(
+            default_deadline_ms=float(deadline) if deadline else None,
+            max_workers=int(os.environ.get("ML_PRIMARY_WORKERS", 4)),
+        )
+
+    def deadline_ms(self, requested) -> Optional[float]:
+        """
+        Prazo da requisição (ms), ou o padrão se ela não informa
+
+        Raises:
+            ValueError: prazo não numérico ou não positivo
+        """
+        if requested is None or requested == "":
+            return self.default_deadline_ms
+        try:
+            deadline = float(requested)
+        except (TypeError, ValueError):
+            raise ValueError("deadline_ms inválido (use milissegundos > 0)") from None
+        if not deadline > 0:
+            raise ValueError("deadline_ms inválido (use milissegundos > 0)")
+        return deadline
+
+    def _pool(self) -> ThreadPoolExecutor:
+        with self.lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(self.max_workers, thread_name_prefix="ml-primary")
+            return self._executor
+
+    def call(
+        self, primary: Callable[[], Optional[Dict]], deadline_ms: Optional[float]
+    ) -> Tuple[Optional[Dict], Optional[str], Optional[BaseException]]:
+        """
+        Roda primary() com prazo
+
+        Args:
+            primary: Resposta do modelo principal, ou None se não há modelo
+            deadline_ms: Prazo em ms (None = espera o quanto for preciso)
+
+        Returns:
+            (resposta, None, None) se o modelo principal respondeu a tempo;
+            senão (None, motivo, exceção de primary ou None)
+        """
+        if deadline_ms is None:
+            try:
+                result = primary()
+            except Exception as error:
+                return None, ERROR, error
+        else:
+            future = self._pool().submit(primary)
+            try:
+                result = future.result(timeout=deadline_ms / 1000)
+            except FutureTimeoutError:
+                future.cancel()
+                return None, DEADLINE, None
+            except Exception as error:
+                return None, ERROR, error
+
+        if result is None:
+            return None, UNAVAILABLE, None
+        return result, None, None
+
+    def record(self, outcome: str):
+        with self.lock:
+            self.counts[outcome] += 1
+
+    def stats(self) -> Dict:
+        with self.lock:
+            counts = dict(self.counts)
+        total = sum(counts.values())
+        fallbacks = sum(count for outcome, count in counts.items() if outcome.startswith("fallback_"))
+        return {
+            "default_deadline_ms": self.default_deadline_ms,
+            "max_workers": self.max_workers,
+            "requests": total,
+            "fallback_rate": fallbacks / total if total else None,
+            "outcomes": counts,
+        }
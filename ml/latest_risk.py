@@ -0,0 +1,85 @@
+"""
+Tabela do último risco calculado por paciente
+
+Escrita pelo worker de re-scoring (rescoring.py) e lida pela API em
+GET /risk/<patient_id>: uma consulta pela chave primária, sem pandas nem
+modelo. SQLite em modo WAL, então leituras não bloqueiam a escrita.
+"""
+
+import os
+import sqlite3
+import threading
+from typing import Dict, List, Optional
+
+DEFAULT_DB_PATH = "models/rescoring.sqlite"
+
+
+def connect_sqlite(path: str) -> sqlite3.Connection:
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+    # WAL: a API lê latest_risk enquanto o worker escreve
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    return conn
+
+
+class LatestRiskStore:
+    """
+    Último risco calculado por paciente (tabela latest_risk em SQLite)
+
+    Cada thread usa a própria conexão (a API lê em várias threads).
+    """
+
+    COLUMNS = ["patient_id", "surgery_id", "probability", "risk_level", "model_version", "scored_at"]
+
+    def __init__(self, path: str = DEFAULT_DB_PATH):
+        self.path = path
+        self.local = threading.local()
+        self._conn().execute(
+            """
+            CREATE TABLE IF NOT EXISTS latest_risk (
+                patient_id TEXT PRIMARY KEY,
+                surgery_id TEXT,
+                probability REAL NOT NULL,
+                risk_level TEXT NOT NULL,
+                model_version TEXT,
+                scored_at TEXT NOT NULL
+            )
+            """
+        )
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self.local, "conn", None)
+        if conn is None:
+            conn = self.local.conn = connect_sqlite(self.path)
+        return conn
+
+    def upsert_many(self, rows: List[Dict]):
+        conn = self._conn()
+        with conn:
+            conn.executemany(
+                """
+                INSERT INTO latest_risk (patient_id, surgery_id, probability, risk_level, model_version, scored_at)
+                VALUES (:patient_id, :surgery_id, :probability, :risk_level, :model_version, :scored_at)
+                ON CONFLICT(patient_id) DO UPDATE SET
+                    surgery_id = excluded.surgery_id,
+                    probability = excluded.probability,
+                    risk_level = excluded.risk_level,
+                    model_version = excluded.model_version,
+                    scored_at = excluded.scored_at
+                """,
+                rows,
+            )
+
+    def get(self, patient_id: str) -> Optional[Dict]:
+        row = self._conn().execute(
+            "SELECT patient_id, surgery_id, probability, risk_level, model_version, scored_at"
+            " FROM latest_risk WHERE patient_id = ?",
+            (patient_id,),
+        ).fetchone()
+        return dict(zip(self.COLUMNS, row)) if row else None
+
+    def count(self) -> int:
+        return self._conn().execute("SELECT COUNT(*) FROM latest_risk").fetchone()[0]
@@ -10,23 +10,90 @@ Autor: Dr. João Vitor Viana
 
 import pandas as pd
 import numpy as np
-from sklearn.ensemble import RandomForestClassifier, GradientBoostingClassifier
-from sklearn.model_selection import train_test_split, cross_val_score
-from sklearn.preprocessing import StandardScaler, LabelEncoder
-from sklearn.metrics import (
-    accuracy_score,
-    precision_score,
-    recall_score,
-    f1_score,
-    roc_auc_score,
-    confusion_matrix,
-    classification_report,
-)
+from scipy import sparse
 import joblib
-from typing import Dict, List, Tuple, Optional
+from typing import TYPE_CHECKING, Dict, List, Tuple, Optional
 import json
 from datetime import datetime
 
+from encoding import (
+    COMORBIDITY_ALIASES,
+    SURGERY_ALIASES,
+    VocabularyEncoder,
+    slugify,
+)
+from timing import TrainingProfile, save_profile
+
+# Só o treino usa scikit-learn e evaluation.py; são importados em train() e
+# _build_estimator() para a API não pagar esse import ao servir predições.
+if TYPE_CHECKING:
+    from evaluation import OutOfFoldResult
+
+# Features numéricas (densas). Comorbidades e tipo de cirurgia vêm dos
+# encoders de vocabulário e são anexadas depois destas.
+NUMERIC_FEATURES = [
+    "idade_normalizada",
+    "sexo_masculino",
+    "num_comorbidades",
+    "duracao_normalizada",
+    "bloqueio_pudendo",
+    "dor_d1_normalizada",
+    "retencao_urinaria",
+    "febre",
+    "sangramento_intenso",
+    "idoso_com_dm",
+    "dor_alta_retencao",
+    "multiplas_comorb_cirurgia_complexa",
+]
+
+# Artefatos anteriores ao vocabulário aprendido usam listas fixas
+LEGACY_COMORBIDITIES = ["has", "dm tipo 2", "obesidade", "irc", "tabagismo", "dpoc"]
+LEGACY_SURGERY_TYPES = ["hemorroidectomia", "fistula", "fissura", "pilonidal"]
+LEGACY_FEATURE_NAMES = [
+    "idade_normalizada",
+    "sexo_masculino",
+    "num_comorbidades",
+    "tem_has",
+    "tem_dm_tipo_2",
+    "tem_obesidade",
+    "tem_irc",
+    "tem_tabagismo",
+    "tem_dpoc",
+    "cirurgia_hemorroidectomia",
+    "cirurgia_fistula",
+    "cirurgia_fissura",
+    "cirurgia_pilonidal",
+    "duracao_normalizada",
+    "bloqueio_pudendo",
+    "dor_d1_normalizada",
+    "retencao_urinaria",
+    "febre",
+    "sangramento_intenso",
+    "idoso_com_dm",
+    "dor_alta_retencao",
+    "multiplas_comorb_cirurgia_complexa",
+]
+
+
+# Faixas de risco em ordem decrescente: (nível, rótulo, recomendação)
+RISK_LEVELS = [
+    ("critical", "CRÍTICO", "Contato IMEDIATO com médico! Alto risco de complicação."),
+    ("high", "ALTO", "Monitoramento próximo recomendado. Considere contato preventivo."),
+    ("medium", "MÉDIO", "Atenção! Continue acompanhamento regular."),
+]
+LOW_RISK = ("low", "BAIXO", "Evolução dentro do esperado. Continue cuidados.")
+
+# Cortes usados por artefatos treinados antes dos cortes calculados no treino
+DEFAULT_RISK_THRESHOLDS = {"critical": 0.75, "high": 0.50, "medium": 0.25}
+
+
+def new_comorbidity_encoder() -> VocabularyEncoder:
+    return VocabularyEncoder(separator=",", aliases=COMORBIDITY_ALIASES)
+
+
+def new_surgery_encoder() -> VocabularyEncoder:
+    return VocabularyEncoder(separator=None, aliases=SURGERY_ALIASES)
+
 
 class ComplicationPredictor:
     """
@@ -42,11 +109,28 @@ class ComplicationPredictor:
         """
         self.model_type = model_type
         self.model = None
-        self.scaler = StandardScaler()
-        self.label_encoders = {}
+        # Modelos de árvore não dependem de escala: as features entram cruas.
+        # Só artefatos antigos trazem um StandardScaler (ver _model_input).
+        self.scaler = None
+        # Encoders de vocabulário ("comorbidades", "tipo_cirurgia")
+        self.label_encoders: Dict[str, VocabularyEncoder] = {}
         self.feature_names = []
         self.feature_importance = {}
         self.metrics = {}
+        # Método de avaliação e calibração (salvos no artefato)
+        self.evaluation: Dict = {}
+        # Probabilidades out-of-fold do último treino (não salvas)
+        self.oof: Optional["OutOfFoldResult"] = None
+        # Probabilidade mínima de cada faixa de risco (calculada no treino)
+        self.risk_thresholds: Dict[str, float] = dict(DEFAULT_RISK_THRESHOLDS)
+        # Histogramas das features brutas do treino (referência de drift)
+        self.drift_reference: Dict[str, List[int]] = {}
+        # Identifica o treino nas predições gravadas (ex.: re-scoring)
+        self.model_version: Optional[str] = None
+        # Fallback destilado (distill), exportado à parte; não salvo no .joblib
+        self.fallback: Optional["ComplicationPredictor"] = None
+        # Tempo e memória por etapa do treino (salvo no .joblib)
+        self.profile = TrainingProfile()
 
     def prepare_features(self, data: pd.DataFrame) -> pd.DataFrame:
         """
@@ -56,7 +140,7 @@ class ComplicationPredictor:
         - Idade
         - Sexo (M/F)
         - Número de comorbidades
-        - Comorbidades específicas (HAS, DM, etc)
+        - Comorbidades (vocabulário aprendido no treino, ver encoding.py)
         - Tipo de cirurgia
         - Técnica cirúrgica
         - Duração da cirurgia
@@ -68,6 +152,13 @@ class ComplicationPredictor:
         """
         df = data.copy()
 
+        comorbidity_encoder = self.label_encoders.get("comorbidades") or new_comorbidity_encoder()
+        surgery_encoder = self.label_encoders.get("tipo_cirurgia") or new_surgery_encoder()
+
+        # Tokens normalizados (ex: "Diabetes Mellitus tipo 2" -> "dm tipo 2")
+        df["comorbidades_tokens"] = df["comorbidades"].map(comorbidity_encoder.tokenize)
+        df["tipo_cirurgia_tokens"] = df["tipo_cirurgia"].map(surgery_encoder.tokenize)
+
         # 1. Features demográficas
         df["idade_normalizada"] = df["idade"] / 100  # Normaliza 0-1
 
@@ -75,32 +166,9 @@ class ComplicationPredictor:
         df["sexo_masculino"] = (df["sexo"] == "Masculino").astype(int)
 
         # 2. Comorbidades
-        df["num_comorbidades"] = df["comorbidades"].apply(
-            lambda x: len(x.split(",")) if pd.notna(x) and x else 0
-        )
-
-        # Comorbidades específicas (OneHot)
-        comorbidades_importantes = [
-            "HAS",
-            "DM tipo 2",
-            "Obesidade",
-            "IRC",
-            "Tabagismo",
-            "DPOC",
-        ]
-
-        for comorb in comorbidades_importantes:
-            col_name = f"tem_{comorb.lower().replace(' ', '_')}"
-            df[col_name] = df["comorbidades"].apply(
-                lambda x: 1 if pd.notna(x) and comorb in x else 0
-            )
+        df["num_comorbidades"] = df["comorbidades_tokens"].map(len)
 
         # 3. Características cirúrgicas
-        # Tipo de cirurgia (OneHot)
-        surgery_types = ["hemorroidectomia", "fistula", "fissura", "pilonidal"]
-        for surgery in surgery_types:
-            df[f"cirurgia_{surgery}"] = (df["tipo_cirurgia"] == surgery).astype(int)
-
         # Duração normalizada (minutos / 180)
         df["duracao_normalizada"] = df["duracao_minutos"].fillna(60) / 180
 
@@ -117,10 +185,13 @@ class ComplicationPredictor:
         df["sangramento_intenso"] = df["sangramento_intenso"].fillna(0).astype(int)
 
         # 5. Features derivadas (interações)
+        tem_dm = df["comorbidades_tokens"].map(lambda tokens: "dm tipo 2" in tokens)
+        hemorroidectomia = df["tipo_cirurgia_tokens"].map(
+            lambda tokens: "hemorroidectomia" in tokens
+        )
+
         # Idosos (>65) com DM têm risco maior
-        df["idoso_com_dm"] = (
-            (df["idade"] > 65) & (df["tem_dm_tipo_2"] == 1)
-        ).astype(int)
+        df["idoso_com_dm"] = ((df["idade"] > 65) & tem_dm).astype(int)
 
         # Dor alta + retenção urinária = risco
         df["dor_alta_retencao"] = (
@@ -129,10 +200,23 @@ class ComplicationPredictor:
 
         # Múltiplas comorbidades + cirurgia complexa
         df["multiplas_comorb_cirurgia_complexa"] = (
-            (df["num_comorbidades"] >= 3)
-            & (df["cirurgia_hemorroidectomia"] == 1)
+            (df["num_comorbidades"] >= 3) & hemorroidectomia
         ).astype(int)
 
+        # Comorbidades e tipo de cirurgia entram como matriz esparsa em
+        # _feature_matrix. Sem encoders treinados (artefatos antigos), gera
+        # as colunas fixas que esses modelos esperam.
+        if not self.label_encoders:
+            for comorb in LEGACY_COMORBIDITIES:
+                df[f"tem_{slugify(comorb)}"] = df["comorbidades_tokens"].map(
+                    lambda tokens, comorb=comorb: comorb in tokens
+                ).astype(int)
+
+            for surgery in LEGACY_SURGERY_TYPES:
+                df[f"cirurgia_{surgery}"] = df["tipo_cirurgia_tokens"].map(
+                    lambda tokens, surgery=surgery: surgery in tokens
+                ).astype(int)
+
         return df
 
     def train(self, data: pd.DataFrame, target_column: str = "teve_complicacao"):
@@ -143,101 +227,217 @@ class ComplicationPredictor:
             data: DataFrame com dados de treinamento
             target_column: Nome da coluna target (0/1)
         """
+        from drift import reference_histograms
+        from evaluation import fit_out_of_fold
+
         print("🔥 Iniciando treinamento do modelo ML...")
         print(f"📊 Dataset: {len(data)} pacientes")
 
-        # Prepara features
-        df = self.prepare_features(data)
+        with self.profile.stage("prepare_features"):
+            # Vocabulário de comorbidades e tipos de cirurgia
+            self.label_encoders = {
+                "comorbidades": new_comorbidity_encoder().fit(data["comorbidades"]),
+                "tipo_cirurgia": new_surgery_encoder().fit(data["tipo_cirurgia"]),
+            }
 
-        # Seleciona features
-        self.feature_names = [
-            "idade_normalizada",
-            "sexo_masculino",
-            "num_comorbidades",
-            "tem_has",
-            "tem_dm_tipo_2",
-            "tem_obesidade",
-            "tem_irc",
-            "tem_tabagismo",
-            "tem_dpoc",
-            "cirurgia_hemorroidectomia",
-            "cirurgia_fistula",
-            "cirurgia_fissura",
-            "cirurgia_pilonidal",
-            "duracao_normalizada",
-            "bloqueio_pudendo",
-            "dor_d1_normalizada",
-            "retencao_urinaria",
-            "febre",
-            "sangramento_intenso",
-            "idoso_com_dm",
-            "dor_alta_retencao",
-            "multiplas_comorb_cirurgia_complexa",
-        ]
+            # Prepara features
+            df = self.prepare_features(data)
 
-        X = df[self.feature_names]
-        y = df[target_column]
+            # Seleciona features
+            self.feature_names = self._encoded_feature_names()
+
+            # Distribuição das entradas brutas, para o monitor de drift da API
+            self.drift_reference = reference_histograms(data, self.label_encoders)
+
+            X = self._feature_matrix(df)
+            y = df[target_column].to_numpy()
 
         print(f"✅ Features: {len(self.feature_names)}")
+        print(
+            f"🏷️  Vocabulário: {len(self.label_encoders['comorbidades'].vocabulary)} comorbidades,"
+            f" {len(self.label_encoders['tipo_cirurgia'].vocabulary)} tipos de cirurgia"
+            f" (ocorrências raras no balde 'outra': {self.label_encoders['comorbidades'].unknown_count},"
+            f" {self.label_encoders['tipo_cirurgia'].unknown_count})"
+        )
         print(f"📈 Casos positivos: {y.sum()} ({y.sum()/len(y)*100:.1f}%)")
         print(f"📉 Casos negativos: {len(y) - y.sum()} ({(len(y)-y.sum())/len(y)*100:.1f}%)")
 
-        # Split treino/teste (80/20)
-        X_train, X_test, y_train, y_test = train_test_split(
-            X, y, test_size=0.2, random_state=42, stratify=y
-        )
-
-        print(f"\n🎯 Treinamento: {len(X_train)} pacientes")
-        print(f"🧪 Teste: {len(X_test)} pacientes")
-
-        # Normaliza features
-        X_train_scaled = self.scaler.fit_transform(X_train)
-        X_test_scaled = self.scaler.transform(X_test)
-
-        # Treina modelo
+        # Modelo final no dataset inteiro + probabilidades out-of-fold
+        # (folds e modelo final treinados em paralelo, ver evaluation.py)
         if self.model_type == "random_forest":
             print("\n🌲 Treinando Random Forest...")
-            self.model = RandomForestClassifier(
-                n_estimators=200,
-                max_depth=10,
-                min_samples_split=10,
-                min_samples_leaf=5,
-                class_weight="balanced",  # Importante para dados desbalanceados
-                random_state=42,
-                n_jobs=-1,
-            )
         else:
             print("\n⚡ Treinando Gradient Boosting...")
-            self.model = GradientBoostingClassifier(
-                n_estimators=100,
-                max_depth=5,
-                learning_rate=0.1,
-                random_state=42,
+        self.model, self.oof = fit_out_of_fold(self._build_estimator(), X, y, profile=self.profile)
+
+        # Todas as métricas vêm das probabilidades OOF
+        with self.profile.stage("cv"):
+            self._evaluate_oof()
+
+        # Feature importance
+        self._store_feature_importance()
+        self.model_version = self._new_model_version()
+
+        # Relatório
+        self._print_report()
+
+        return self.metrics
+
+    def _evaluate_oof(self):
+        """Métricas, avaliação e cortes de risco a partir de self.oof"""
+        from evaluation import evaluate, risk_thresholds
+
+        self.metrics, self.evaluation = evaluate(self.oof)
+
+        # Cortes das faixas de risco (sensibilidade e volume de alertas alvo)
+        self.risk_thresholds, self.evaluation["risk_bands"] = risk_thresholds(
+            self.oof.y, self.oof.proba
+        )
+
+    def _print_report(self):
+        """Imprime métricas e features mais importantes"""
+        print("\n" + "=" * 60)
+        print("📊 RESULTADOS DO TREINAMENTO")
+        print("=" * 60)
+        if "n_splits" in self.evaluation:
+            print(
+                f"🧪 Avaliação out-of-fold ({self.evaluation['n_splits']}-fold,"
+                f" {self.evaluation['n_samples']} pacientes)"
+            )
+        intervals = self.evaluation.get("confidence_intervals", {})
+        level = self.evaluation.get("confidence_level", 0.95)
+
+        def with_interval(name: str) -> str:
+            if name not in intervals:
+                return f"{self.metrics[name]:.3f}"
+            return (
+                f"{self.metrics[name]:.3f} (IC {level:.0%}: "
+                f"{intervals[name]['low']:.3f}-{intervals[name]['high']:.3f})"
             )
 
-        self.model.fit(X_train_scaled, y_train)
+        print(f"✅ Acurácia: {with_interval('accuracy')}")
+        print(f"✅ Precisão: {with_interval('precision')}")
+        print(f"✅ Recall (Sensibilidade): {with_interval('recall')}")
+        print(f"✅ F1-Score: {with_interval('f1_score')}")
+        print(f"✅ AUC-ROC: {with_interval('roc_auc')}")
+        if "brier_score" in self.metrics:
+            print(f"✅ Brier score: {with_interval('brier_score')}")
+        if "cv_roc_auc_mean" in self.metrics:
+            print(
+                f"✅ Cross-Validation AUC: {self.metrics['cv_roc_auc_mean']:.3f} ± {self.metrics['cv_roc_auc_std']:.3f}"
+            )
 
-        # Avalia modelo
-        y_pred = self.model.predict(X_test_scaled)
-        y_pred_proba = self.model.predict_proba(X_test_scaled)[:, 1]
+        if "risk_bands" in self.evaluation:
+            print("\n🚦 FAIXAS DE RISCO (probabilidade >= corte):")
+            for band in self.evaluation["risk_bands"]:
+                print(
+                    f"   {band['level']}: >= {band['cutoff']:.3f} | sensibilidade {band['recall']:.2f}"
+                    f" | precisão {band['precision']:.2f} | alertas {band['alert_rate']*100:.1f}%"
+                )
 
-        # Métricas
-        self.metrics = {
-            "accuracy": accuracy_score(y_test, y_pred),
-            "precision": precision_score(y_test, y_pred, zero_division=0),
-            "recall": recall_score(y_test, y_pred, zero_division=0),
-            "f1_score": f1_score(y_test, y_pred, zero_division=0),
-            "roc_auc": roc_auc_score(y_test, y_pred_proba),
-        }
+        print("\n🔝 TOP 10 FEATURES MAIS IMPORTANTES:")
+        for i, (feature, importance) in enumerate(
+            list(self.feature_importance.items())[:10], 1
+        ):
+            print(f"{i}. {feature}: {importance:.4f}")
+
+        print("\n" + "=" * 60)
+
+    def train_streaming(self, source, target_column: str = "teve_complicacao", config=None):
+        """
+        Treina sem carregar o dataset inteiro em memória
+
+        Args:
+            source: Fonte de blocos (streaming.CSVChunkSource ou QueryChunkSource)
+            target_column: Nome da coluna target (0/1)
+            config: streaming.StreamingConfig (padrão: lido do ambiente)
+        """
+        from streaming import train_streaming
+
+        return train_streaming(self, source, target_column, config)
+
+    def compress(self, config=None) -> Dict:
+        """
+        Compressão pós-treino: poda de subárvores e seleção de árvores
+        (ver compression.py)
+
+        Substitui o modelo pelo comprimido e recalcula métricas, faixas de
+        risco e importâncias a partir das probabilidades OOF dele.
+
+        Args:
+            config: compression.CompressionConfig (padrão: lido do ambiente)
+
+        Returns:
+            Relatório com AUC OOF, árvores, nós, tamanho, memória e latência
+            antes e depois
+        """
+        from compression import CompressionConfig, compress_ensemble
+
+        print("\n✂️  Comprimindo o ensemble...")
+        with self.profile.stage("compress"):
+            proba, report = compress_ensemble(self, config or CompressionConfig.from_env())
+            self.oof.proba = proba
+            self._evaluate_oof()
+        self.evaluation["compression"] = report
+        self._store_feature_importance()
+        self.model_version = f"{self.model_version}-c{report['after']['trees']}"
+
+        before, after, reduction = report["before"], report["after"], report["reduction"]
+        print(
+            f"   AUC OOF: {report['oof_auc_before']:.4f} -> {report['oof_auc_after']:.4f}"
+            f" ({report['oof_auc_change']:+.4f}, tolerância {report['auc_tolerance']})"
+        )
+        print(
+            f"   Árvores: {before['trees']} -> {after['trees']} | nós: {before['nodes']:,} -> {after['nodes']:,}"
+            f" | profundidade: {before['max_depth']} -> {after['max_depth']}"
+        )
+        print(
+            f"   Latência (compilado): {before['single_us']:.0f} -> {after['single_us']:.0f} µs/predição"
+            f" ({-reduction.get('single_us', 0):+.0%}) | lote: {before['batch_us_per_row']:.1f}"
+            f" -> {after['batch_us_per_row']:.1f} µs/linha ({-reduction.get('batch_us_per_row', 0):+.0%})"
+        )
+        print(
+            f"   Memória das árvores: {before['tree_memory_bytes'] / 1024:.0f} -> {after['tree_memory_bytes'] / 1024:.0f} KB"
+            f" | .compiled: {before['compiled_bytes'] / 1024:.0f} -> {after['compiled_bytes'] / 1024:.0f} KB"
+            f" | .joblib: {before['joblib_bytes'] / 1024:.0f} -> {after['joblib_bytes'] / 1024:.0f} KB"
+        )
+        return report
+
+    def distill(self, config=None) -> Dict:
+        """
+        Ajusta o modelo de fallback às probabilidades OOF (ver distillation.py)
+
+        O fallback fica em self.fallback (exportado por export_fallback) e o
+        relatório de fidelidade em evaluation["fallback"].
+
+        Args:
+            config: distillation.DistillationConfig (padrão: lido do ambiente)
+        """
+        from distillation import DistillationConfig, distill
 
-        # Validação cruzada
-        cv_scores = cross_val_score(
-            self.model, X_train_scaled, y_train, cv=5, scoring="roc_auc"
+        print("\n🪶 Destilando modelo de fallback...")
+        with self.profile.stage("distill"):
+            self.fallback, report = distill(self, config or DistillationConfig.from_env())
+        self.evaluation["fallback"] = report
+        print(
+            f"   Árvore: profundidade {report['max_depth']}, {report['leaves']} folhas"
+            f" | AUC {report['roc_auc']:.3f} (ensemble {report['teacher_roc_auc']:.3f})"
+        )
+        print(
+            f"   Fidelidade (OOF): erro médio {report['fidelity_mae']:.3f}, máximo {report['fidelity_max_abs_error']:.3f}"
+            f", R² {report['fidelity_r2']:.3f} | mesma faixa de risco em {report['risk_level_agreement']:.1%}"
         )
-        self.metrics["cv_roc_auc_mean"] = cv_scores.mean()
-        self.metrics["cv_roc_auc_std"] = cv_scores.std()
+        return report
 
-        # Feature importance
+    def export_fallback(self, path: str = "models/complication_predictor.fallback.compiled"):
+        """Exporta o fallback destilado no formato compilado (servido pela API, ver fallback.py)"""
+        if self.fallback is None:
+            raise ValueError("Fallback não destilado. Execute distill() primeiro.")
+        with self.profile.stage("save"):
+            self.fallback.export_compiled(path)
+
+    def _store_feature_importance(self):
+        """Guarda feature_importances_ do modelo, ordenadas por importância"""
         if hasattr(self.model, "feature_importances_"):
             self.feature_importance = dict(
                 zip(self.feature_names, self.model.feature_importances_)
@@ -251,28 +451,39 @@ class ComplicationPredictor:
                 )
             )
 
-        # Relatório
-        print("\n" + "=" * 60)
-        print("📊 RESULTADOS DO TREINAMENTO")
-        print("=" * 60)
-        print(f"✅ Acurácia: {self.metrics['accuracy']:.3f}")
-        print(f"✅ Precisão: {self.metrics['precision']:.3f}")
-        print(f"✅ Recall (Sensibilidade): {self.metrics['recall']:.3f}")
-        print(f"✅ F1-Score: {self.metrics['f1_score']:.3f}")
-        print(f"✅ AUC-ROC: {self.metrics['roc_auc']:.3f}")
-        print(
-            f"✅ Cross-Validation AUC: {self.metrics['cv_roc_auc_mean']:.3f} ± {self.metrics['cv_roc_auc_std']:.3f}"
-        )
+    def _new_model_version(self) -> str:
+        """Tipo do modelo + instante do treino"""
+        return f"{self.model_type}-{datetime.now():%Y%m%dT%H%M%S}"
 
-        print("\n🔝 TOP 10 FEATURES MAIS IMPORTANTES:")
-        for i, (feature, importance) in enumerate(
-            list(self.feature_importance.items())[:10], 1
-        ):
-            print(f"{i}. {feature}: {importance:.4f}")
+    def _build_estimator(self, n_estimators: Optional[int] = None):
+        """Estimador com os hiperparâmetros do tipo de modelo"""
+        from sklearn.ensemble import GradientBoostingClassifier, RandomForestClassifier
 
-        print("\n" + "=" * 60)
+        if self.model_type == "random_forest":
+            return RandomForestClassifier(
+                n_estimators=n_estimators or 200,
+                max_depth=10,
+                min_samples_split=10,
+                min_samples_leaf=5,
+                class_weight="balanced",  # Importante para dados desbalanceados
+                random_state=42,
+                n_jobs=-1,
+            )
 
-        return self.metrics
+        return GradientBoostingClassifier(
+            n_estimators=n_estimators or 100,
+            max_depth=5,
+            learning_rate=0.1,
+            random_state=42,
+        )
+
+    def _encoded_feature_names(self) -> List[str]:
+        """feature_names para os encoders de vocabulário treinados"""
+        return (
+            NUMERIC_FEATURES
+            + self.label_encoders["comorbidades"].feature_names("tem_")
+            + self.label_encoders["tipo_cirurgia"].feature_names("cirurgia_")
+        )
 
     def predict(self, patient_data: Dict) -> Dict:
         """
@@ -294,35 +505,21 @@ class ComplicationPredictor:
         df_features = self.prepare_features(df)
 
         # Extrai features
-        X = df_features[self.feature_names]
-
-        # Normaliza
-        X_scaled = self.scaler.transform(X)
+        X = self._feature_matrix(df_features)
+        X_values = self._model_input(df_features, X)
 
         # Predição
-        probability = self.model.predict_proba(X_scaled)[0, 1]
-        prediction = self.model.predict(X_scaled)[0]
+        probability = self.model.predict_proba(X_values)[0, 1]
+        # Mesmo critério de model.predict (argmax, empate -> classe 0),
+        # sem percorrer as árvores uma segunda vez
+        prediction = int(probability > 0.5)
 
         # Classifica risco
-        if probability >= 0.75:
-            risk_level = "critical"
-            risk_label = "CRÍTICO"
-            recommendation = "Contato IMEDIATO com médico! Alto risco de complicação."
-        elif probability >= 0.50:
-            risk_level = "high"
-            risk_label = "ALTO"
-            recommendation = "Monitoramento próximo recomendado. Considere contato preventivo."
-        elif probability >= 0.25:
-            risk_level = "medium"
-            risk_label = "MÉDIO"
-            recommendation = "Atenção! Continue acompanhamento regular."
-        else:
-            risk_level = "low"
-            risk_label = "BAIXO"
-            recommendation = "Evolução dentro do esperado. Continue cuidados."
+        risk_level, risk_label, recommendation = self.risk_level(probability)
 
         # Top 3 fatores de risco
-        feature_values = X.iloc[0].to_dict()
+        row = X.toarray()[0] if sparse.issparse(X) else X[0]
+        feature_values = dict(zip(self.feature_names, row))
         risk_factors = []
 
         for feature, value in feature_values.items():
@@ -354,8 +551,73 @@ class ComplicationPredictor:
             ],
         }
 
+    def risk_level(self, probability: float) -> Tuple[str, str, str]:
+        """(nível, rótulo, recomendação) da faixa de risco da probabilidade"""
+        for level, label, recommendation in RISK_LEVELS:
+            if probability >= self.risk_thresholds[level]:
+                return level, label, recommendation
+        return LOW_RISK
+
+    def predict_proba(self, data: pd.DataFrame) -> np.ndarray:
+        """
+        Predição em lote
+
+        Args:
+            data: DataFrame com os mesmos campos aceitos por predict()
+
+        Returns:
+            Array com a probabilidade de complicação de cada paciente
+        """
+        if self.model is None:
+            raise ValueError("Modelo não treinado. Execute train() primeiro.")
+
+        df = self.prepare_features(data)
+        X = self._model_input(df, self._feature_matrix(df))
+        return self.model.predict_proba(X)[:, 1]
+
+    def _feature_matrix(self, df: pd.DataFrame):
+        """
+        Matriz de features (valores não escalados) na ordem de feature_names
+
+        Com encoders de vocabulário, retorna CSR: features numéricas seguidas
+        dos indicadores de comorbidade e de tipo de cirurgia. Artefatos antigos
+        usam as colunas fixas geradas por prepare_features.
+        """
+        if not self.label_encoders:
+            return df[self.feature_names].to_numpy(dtype=np.float64)
+
+        return sparse.hstack(
+            [
+                sparse.csr_matrix(df[NUMERIC_FEATURES].to_numpy(dtype=np.float64)),
+                self.label_encoders["comorbidades"].transform_tokens(df["comorbidades_tokens"]),
+                self.label_encoders["tipo_cirurgia"].transform_tokens(df["tipo_cirurgia_tokens"]),
+            ],
+            format="csr",
+        )
+
+    def _model_input(self, df: pd.DataFrame, X):
+        """
+        Matriz de entrada do modelo
+
+        Artefatos treinados antes da remoção do StandardScaler têm árvores
+        com thresholds no espaço escalado. Incorporar a escala aos thresholds
+        não é exato (as árvores comparam em float32 e valores na fronteira
+        mudariam de lado), então esses artefatos continuam aplicando o scaler
+        salvo até serem retreinados.
+        """
+        if self.scaler is not None:
+            return self.scaler.transform(df[self.feature_names])
+        return X
+
     def save(self, path: str = "models/complication_predictor.joblib"):
-        """Salva modelo treinado"""
+        """
+        Salva modelo treinado
+
+        O training_profile salvo tem as etapas até aqui: o tempo deste save
+        só entra nos saves seguintes do mesmo preditor (os scripts de treino
+        salvam o vencedor duas vezes). Remove o .compiled do mesmo caminho,
+        que deixou de corresponder ao .joblib (ver export_compiled).
+        """
         import os
 
         os.makedirs(os.path.dirname(path), exist_ok=True)
@@ -363,26 +625,69 @@ class ComplicationPredictor:
         model_data = {
             "model": self.model,
             "scaler": self.scaler,
+            "label_encoders": {
+                name: encoder.to_dict() for name, encoder in self.label_encoders.items()
+            },
             "feature_names": self.feature_names,
             "feature_importance": self.feature_importance,
             "metrics": self.metrics,
+            "evaluation": self.evaluation,
+            "risk_thresholds": self.risk_thresholds,
+            "drift_reference": self.drift_reference,
             "model_type": self.model_type,
+            "model_version": self.model_version,
             "trained_at": datetime.now().isoformat(),
+            "training_profile": self.profile.to_dict() if self.profile.stages else None,
         }
 
-        joblib.dump(model_data, path)
+        with self.profile.stage("save"):
+            joblib.dump(model_data, path)
+            save_profile(model_data["training_profile"], path)
         print(f"✅ Modelo salvo em: {path}")
 
+        # Um .compiled ao lado é de outro treino: load_model o preferiria ao
+        # .joblib recém-salvo (os scripts de treino exportam o novo em seguida)
+        from registry import compiled_path
+
+        if os.path.exists(compiled_path(path)):
+            os.remove(compiled_path(path))
+            print(f"🗑️  Modelo compilado anterior removido: {compiled_path(path)}")
+
+    def export_compiled(self, path: str = "models/complication_predictor.compiled", precision=None):
+        """
+        Exporta para o formato compilado (servido sem scikit-learn, ver compiled.py)
+
+        Args:
+            path: Arquivo de saída
+            precision: compiled.Precision dos thresholds e das folhas
+                (padrão: lida do ambiente)
+        """
+        from compiled import export_compiled
+
+        with self.profile.stage("save"):
+            export_compiled(self, path, precision)
+
     def load(self, path: str = "models/complication_predictor.joblib"):
         """Carrega modelo treinado"""
         model_data = joblib.load(path)
 
         self.model = model_data["model"]
-        self.scaler = model_data["scaler"]
+        self.scaler = model_data.get("scaler")
+        self.label_encoders = {
+            name: VocabularyEncoder.from_dict(encoder)
+            for name, encoder in model_data.get("label_encoders", {}).items()
+        }
         self.feature_names = model_data["feature_names"]
         self.feature_importance = model_data["feature_importance"]
         self.metrics = model_data["metrics"]
+        self.evaluation = model_data.get("evaluation", {})
+        self.risk_thresholds = model_data.get("risk_thresholds", dict(DEFAULT_RISK_THRESHOLDS))
+        self.drift_reference = model_data.get("drift_reference", {})
         self.model_type = model_data["model_type"]
+        # Artefatos anteriores ao model_version: tipo + data do save
+        self.model_version = model_data.get("model_version") or (
+            f"{self.model_type}-{model_data.get('trained_at', 'desconhecido')}"
+        )
 
         print(f"✅ Modelo carregado de: {path}")
         print(f"📅 Treinado em: {model_data.get('trained_at', 'N/A')}")
@@ -0,0 +1,215 @@
+"""
+Profiler por amostragem da API em produção
+
+Amostra, a cada interval_ms, a pilha Python de todas as threads do processo
+(sys._current_frames) por alguns segundos e agrega as pilhas no formato
+"collapsed" (uma linha "thread;frame;frame;... contagem"), lido por
+flamegraph.pl, speedscope e inferno. Nada é instrumentado: fora de uma
+amostragem o custo é zero, e durante ela é o de percorrer as pilhas ~100
+vezes por segundo.
+
+Opcionalmente compara dois snapshots do tracemalloc (início e fim da janela)
+e devolve as linhas que mais alocaram. O tracemalloc só fica ligado durante a
+janela (a não ser que já estivesse, com PYTHONTRACEMALLOC) e deixa as
+alocações mais lentas enquanto isso.
+
+Para poder ficar ligado em produção:
+- o endpoint só existe com ML_ADMIN_API_KEY definida (comparada em tempo
+  constante com o header Authorization: Bearer <chave>)
+- uma amostragem por processo de cada vez
+- duração limitada a ML_PROFILE_MAX_SECONDS e intervalo mínimo de 1 ms
+- só o processo que atende a requisição é amostrado (com vários workers,
+  repita a chamada)
+
+O amostrador é uma thread e precisa do GIL para ler as pilhas. Com poucos
+núcleos ele tende a rodar quando as outras threads bloqueiam, então o código
+Python que usa CPU aparece com menos amostras do que o tempo real dele
+(benchmarks/bench_profiler.py compara as duas frações). As proporções entre
+as funções do caminho quente continuam úteis para achar onde o tempo vai.
+"""
+
+import hmac
+import os
+import random
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from typing import Dict, Optional
+
+ADMIN_KEY_ENV = "ML_ADMIN_API_KEY"
+MAX_SECONDS = float(os.environ.get("ML_PROFILE_MAX_SECONDS", 60))
+MIN_INTERVAL_MS = 1.0
+
+# Frames em que a thread está parada esperando (lock, socket, fila): as
+# pilhas que terminam neles são omitidas, a não ser com idle=True
+IDLE_FRAMES = {
+    ("threading.py", "wait"),
+    ("threading.py", "_wait_for_tstate_lock"),
+    ("selectors.py", "select"),
+    ("socket.py", "accept"),
+    ("socket.py", "readinto"),
+    ("socketserver.py", "serve_forever"),
+    ("queue.py", "get"),
+    ("ssl.py", "read"),
+}
+
+
+class ProfilerBusy(Exception):
+    """Já existe uma amostragem em andamento neste processo"""
+
+
+def admin_key() -> Optional[str]:
+    """Chave do endpoint de administração (None = endpoint desligado)"""
+    return os.environ.get(ADMIN_KEY_ENV) or None
+
+
+def authorized(header: Optional[str], key: Optional[str] = None) -> bool:
+    """Header Authorization: Bearer <chave>, comparado em tempo constante"""
+    key = key if key is not None else admin_key()
+    if not key or not header or not header.startswith("Bearer "):
+        return False
+    return hmac.compare_digest(header[len("Bearer "):].encode(), key.encode())
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})"
+
+
+def _is_idle(frame) -> bool:
+    code = frame.f_code
+    return (os.path.basename(code.co_filename), code.co_name) in IDLE_FRAMES
+
+
+class StackSampler:
+    """Amostrador de pilhas de todas as threads (uma amostragem por vez)"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+
+    def profile(
+        self,
+        seconds: float,
+        interval_ms: float = 10.0,
+        memory: bool = False,
+        idle: bool = False,
+        top: int = 25,
+    ) -> Dict:
+        """
+        Amostra as pilhas por seconds segundos
+
+        Args:
+            seconds: Duração (limitada a ML_PROFILE_MAX_SECONDS)
+            interval_ms: Intervalo entre amostras (mínimo 1 ms)
+            memory: Compara snapshots do tracemalloc do início e do fim
+            idle: Inclui as threads paradas esperando (IDLE_FRAMES)
+            top: Linhas do relatório de memória
+
+        Returns:
+            {"collapsed": texto para flamegraph, "samples", "threads", ...,
+             "memory": alocações por linha (ou None)}
+
+        Raises:
+            ValueError: duração ou intervalo inválido
+            ProfilerBusy: outra amostragem em andamento
+        """
+        if not 0 < seconds <= MAX_SECONDS:
+            raise ValueError(f"seconds deve estar entre 0 e {MAX_SECONDS:g}")
+        if not interval_ms >= MIN_INTERVAL_MS:
+            raise ValueError(f"interval_ms deve ser pelo menos {MIN_INTERVAL_MS:g}")
+        if not self.lock.acquire(blocking=False):
+            raise ProfilerBusy("Já existe um profiling em andamento")
+        try:
+            return self._profile(seconds, interval_ms / 1000, memory, idle, top)
+        finally:
+            self.lock.release()
+
+    def _profile(self, seconds: float, interval: float, memory: bool, idle: bool, top: int) -> Dict:
+        started_tracing = memory and not tracemalloc.is_tracing()
+        if started_tracing:
+            tracemalloc.start()
+        try:
+            before = tracemalloc.take_snapshot() if memory else None
+            report = self._sample(seconds, interval, idle)
+            if memory:
+                report["memory"] = _allocations(before, tracemalloc.take_snapshot(), top)
+            return report
+        finally:
+            if started_tracing:
+                tracemalloc.stop()
+
+    def _sample(self, seconds: float, interval: float, idle: bool) -> Dict:
+        me = threading.get_ident()
+        stacks: Counter = Counter()
+        samples = idle_samples = 0
+        sampling_s = 0.0
+        start = time.perf_counter()
+        deadline = start + seconds
+        next_sample = start
+        while True:
+            now = time.perf_counter()
+            if now >= deadline:
+                break
+            if now < next_sample:
+                time.sleep(next_sample - now)
+
+            tick = time.perf_counter()
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == me:
+                    continue
+                if not idle and _is_idle(frame):
+                    idle_samples += 1
+                    continue
+                labels = []
+                while frame is not None:
+                    labels.append(_frame_label(frame))
+                    frame = frame.f_back
+                labels.append(f"thread {names.get(ident, ident)}")
+                stacks[";".join(reversed(labels))] += 1
+            frame = None  # não segura os frames até a próxima amostra
+            samples += 1
+            done = time.perf_counter()
+            sampling_s += done - tick
+            # Intervalo com jitter (média = interval): a intervalos fixos as
+            # amostras entram em fase com trabalho periódico e caem sempre no
+            # mesmo ponto dele. Amostra mais lenta que o intervalo: espera
+            # meio intervalo em vez de amostrar sem parar
+            next_sample = max(next_sample + interval * random.uniform(0.5, 1.5), done + interval / 2)
+        elapsed = time.perf_counter() - start
+
+        return {
+            "seconds": elapsed,
+            "interval_ms": interval * 1000,
+            "samples": samples,
+            "stack_samples": sum(stacks.values()),
+            "idle_samples": idle_samples,
+            # Fração do tempo gasta percorrendo pilhas (o custo do profiler)
+            "sampling_overhead": sampling_s / elapsed if elapsed else 0.0,
+            "threads": sorted({stack.split(";", 1)[0][len("thread "):] for stack in stacks}),
+            "collapsed": "".join(f"{stack} {count}\n" for stack, count in stacks.most_common()),
+            "memory": None,
+        }
+
+
+def _allocations(before, after, top: int) -> Dict:
+    """Linhas que mais alocaram entre os dois snapshots do tracemalloc"""
+    current, peak = tracemalloc.get_traced_memory()
+    ignore = [tracemalloc.Filter(False, tracemalloc.__file__), tracemalloc.Filter(False, __file__)]
+    diff = after.filter_traces(ignore).compare_to(before.filter_traces(ignore), "lineno")
+    return {
+        "traced_bytes": current,
+        "peak_traced_bytes": peak,
+        "top_allocations": [
+            {
+                "location": f"{stat.traceback[0].filename}:{stat.traceback[0].lineno}",
+                "size_diff_bytes": stat.size_diff,
+                "count_diff": stat.count_diff,
+                "size_bytes": stat.size,
+                "count": stat.count,
+            }
+            for stat in diff[:top]
+        ],
+    }
@@ -0,0 +1,172 @@
+"""
+Queries SQL do dataset de pacientes
+
+Compartilhadas pelo treino (train_model.py) e pelo re-scoring
+(rescoring.py), que precisam das mesmas features com os mesmos nomes.
+
+O dataset é uma linha por paciente e cirurgia concluída com o follow-up D+1
+respondido: sintomas do D+1 como features e, como alvo, se alguma resposta
+do D+3 em diante teve risco high ou critical. Há duas formas da mesma query
+(mesmas linhas, conferidas por benchmarks/bench_training_query.py):
+- TRAINING_QUERY (todos os pacientes): cada parte é agregada sozinha em uma
+  CTE (respostas do D+1 por cirurgia, complicações, comorbidades por
+  paciente) e juntada por hash. O join das sete tabelas agrupado
+  multiplicava comorbidades x follow-ups x respostas por cirurgia
+- TRAINING_QUERY_TEMPLATE (com filtros em "Patient" p): as mesmas partes por
+  cirurgia selecionada (LATERAL), pelos índices. Custa proporcional aos
+  pacientes selecionados, não ao histórico inteiro; agregar as tabelas
+  inteiras para depois filtrar custaria o treino completo a cada chamada
+"""
+
+from typing import Dict, List, Optional, Tuple
+
+# Todos os pacientes (treino completo)
+TRAINING_QUERY = """
+WITH d1 AS (
+    -- Sintomas do D+1 respondido. O JSON de cada resposta é lido uma vez:
+    -- OFFSET 0 impede o planner de repetir o cast em cada campo
+    SELECT
+        fu."surgeryId" as surgery_id,
+        MAX(CAST(r.dados->>'painLevel' AS INTEGER)) as dor_d1,
+        MAX(CASE WHEN r.dados->>'urinaryRetention' = 'true' THEN 1 ELSE 0 END) as retencao_urinaria,
+        MAX(CASE WHEN r.dados->>'fever' = 'true' THEN 1 ELSE 0 END) as febre,
+        MAX(CASE WHEN r.dados->>'intenseBleeding' = 'true' THEN 1 ELSE 0 END) as sangramento_intenso
+    FROM "FollowUp" fu
+    JOIN "FollowUpResponse" fur ON fur."followUpId" = fu.id
+    CROSS JOIN LATERAL (SELECT fur."questionnaireData"::jsonb as dados OFFSET 0) r
+    WHERE fu."dayNumber" = 1 AND fu.status = 'responded'
+    GROUP BY fu."surgeryId"
+),
+complicacoes AS (
+    -- TARGET: risco high ou critical em D+3 a D+14
+    SELECT DISTINCT fu."surgeryId" as surgery_id
+    FROM "FollowUp" fu
+    JOIN "FollowUpResponse" fur ON fur."followUpId" = fu.id
+    WHERE fu."dayNumber" >= 3 AND fur."riskLevel" IN ('high', 'critical')
+),
+comorbidades AS (
+    SELECT pc."patientId" as patient_id, STRING_AGG(DISTINCT c.name, ',') as comorbidades
+    FROM "PatientComorbidity" pc
+    JOIN "Comorbidity" c ON c.id = pc."comorbidityId"
+    GROUP BY pc."patientId"
+)
+SELECT
+    p.id as patient_id,
+    s.id as surgery_id,
+    p.age as idade,
+    p.sex as sexo,
+    cm.comorbidades,
+    s.type as tipo_cirurgia,
+    s."durationMinutes" as duracao_minutos,
+    CASE WHEN a."pudendoBlock" = true THEN 1 ELSE 0 END as bloqueio_pudendo,
+    d1.dor_d1,
+    d1.retencao_urinaria,
+    d1.febre,
+    d1.sangramento_intenso,
+    CASE WHEN x.surgery_id IS NOT NULL THEN 1 ELSE 0 END as teve_complicacao
+FROM "Patient" p
+JOIN "Surgery" s ON s."patientId" = p.id
+JOIN d1 ON d1.surgery_id = s.id
+LEFT JOIN "Anesthesia" a ON a."surgeryId" = s.id
+LEFT JOIN comorbidades cm ON cm.patient_id = p.id
+LEFT JOIN complicacoes x ON x.surgery_id = s.id
+WHERE p.age IS NOT NULL AND s.type IS NOT NULL AND s.status = 'completed'
+"""
+
+# Pacientes selecionados ({filters}: filtros em "Patient" p como
+# TENANT_FILTER e PATIENTS_FILTER)
+TRAINING_QUERY_TEMPLATE = """
+SELECT
+    p.id as patient_id,
+    s.id as surgery_id,
+    p.age as idade,
+    p.sex as sexo,
+    cm.comorbidades,
+    s.type as tipo_cirurgia,
+    s."durationMinutes" as duracao_minutos,
+    CASE WHEN a."pudendoBlock" = true THEN 1 ELSE 0 END as bloqueio_pudendo,
+    d1.dor_d1,
+    d1.retencao_urinaria,
+    d1.febre,
+    d1.sangramento_intenso,
+    CASE WHEN x.alto IS NOT NULL THEN 1 ELSE 0 END as teve_complicacao
+FROM "Patient" p
+JOIN "Surgery" s ON s."patientId" = p.id
+CROSS JOIN LATERAL (
+    SELECT
+        MAX(CAST(r.dados->>'painLevel' AS INTEGER)) as dor_d1,
+        MAX(CASE WHEN r.dados->>'urinaryRetention' = 'true' THEN 1 ELSE 0 END) as retencao_urinaria,
+        MAX(CASE WHEN r.dados->>'fever' = 'true' THEN 1 ELSE 0 END) as febre,
+        MAX(CASE WHEN r.dados->>'intenseBleeding' = 'true' THEN 1 ELSE 0 END) as sangramento_intenso
+    FROM "FollowUp" fu
+    JOIN "FollowUpResponse" fur ON fur."followUpId" = fu.id
+    CROSS JOIN LATERAL (SELECT fur."questionnaireData"::jsonb as dados OFFSET 0) r
+    WHERE fu."surgeryId" = s.id AND fu."dayNumber" = 1 AND fu.status = 'responded'
+    -- Sem D+1 respondido: nenhuma linha, e a cirurgia fica fora do dataset
+    HAVING count(*) > 0
+) d1
+LEFT JOIN LATERAL (
+    -- TARGET: risco high ou critical em D+3 a D+14. Um EXISTS na lista do
+    -- SELECT pode virar uma subquery com hash sobre a tabela inteira
+    SELECT 1 as alto
+    FROM "FollowUp" fu
+    JOIN "FollowUpResponse" fur ON fur."followUpId" = fu.id
+    WHERE fu."surgeryId" = s.id AND fu."dayNumber" >= 3 AND fur."riskLevel" IN ('high', 'critical')
+    LIMIT 1
+) x ON true
+LEFT JOIN LATERAL (
+    SELECT STRING_AGG(DISTINCT c.name, ',') as comorbidades
+    FROM "PatientComorbidity" pc
+    JOIN "Comorbidity" c ON c.id = pc."comorbidityId"
+    WHERE pc."patientId" = p.id
+) cm ON true
+LEFT JOIN "Anesthesia" a ON a."surgeryId" = s.id
+WHERE
+    p.age IS NOT NULL
+    AND s.type IS NOT NULL
+    AND s.status = 'completed'
+    {filters}
+"""
+
+# Índices de apoio às duas queries, além dos do schema do app (os mesmos da
+# migration add_training_query_indexes do Prisma): follow-ups de uma cirurgia
+# por dia, para o D+1 e o D+3 em diante sem ler os outros dias
+TRAINING_INDEXES_SQL = """
+CREATE INDEX IF NOT EXISTS "FollowUp_surgeryId_dayNumber_idx" ON "FollowUp"("surgeryId", "dayNumber");
+"""
+
+# Só os pacientes de um médico (modelo por tenant)
+TENANT_FILTER = 'AND p."userId" = %(tenant_id)s'
+
+# Só os pacientes listados (psycopg2 adapta a lista para ARRAY)
+PATIENTS_FILTER = "AND p.id = ANY(%(patient_ids)s)"
+
+# Cirurgias de cada paciente da mais antiga para a mais recente: a última
+# linha de um paciente é a cirurgia atual (re-scoring)
+PATIENTS_ORDER = 'ORDER BY p.id, s.date, s.id'
+
+# Próxima página de pacientes em ordem de id (keyset: id > último id visto);
+# usa o índice da chave primária, sem OFFSET
+PATIENT_PAGE_QUERY = 'SELECT id FROM "Patient" WHERE id > %(after)s ORDER BY id LIMIT %(limit)s'
+
+
+def training_query(tenant_id: Optional[str] = None) -> Tuple[str, Optional[Dict]]:
+    """SQL e parâmetros do dataset de treino (de um médico, se informado)"""
+    if tenant_id is None:
+        return TRAINING_QUERY, None
+    return TRAINING_QUERY_TEMPLATE.format(filters=TENANT_FILTER), {"tenant_id": tenant_id}
+
+
+def patients_query(patient_ids: List[str]) -> Tuple[str, Dict]:
+    """
+    SQL e parâmetros das features atuais de alguns pacientes (re-scoring)
+
+    Uma linha por cirurgia concluída elegível, em ordem de data por paciente
+    """
+    query = TRAINING_QUERY_TEMPLATE.format(filters=PATIENTS_FILTER) + PATIENTS_ORDER
+    return query, {"patient_ids": list(patient_ids)}
+
+
+def patient_page_query(after: str, limit: int) -> Tuple[str, Dict]:
+    """SQL e parâmetros da página de ids seguinte a after ("" = início)"""
+    return PATIENT_PAGE_QUERY, {"after": after, "limit": limit}
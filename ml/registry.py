@@ -0,0 +1,346 @@
+"""
+Registro de modelos por tenant (médico ou clínica)
+
+Cada tenant pode ter o próprio artefato em
+models/tenants/<tenant_id>/complication_predictor.{compiled,joblib}
+(gerado por `python train_model.py --tenant <id>`). Tenants sem artefato
+usam o modelo coletivo/individual da API.
+
+Os modelos são carregados no primeiro uso e ficam em um LRU limitado por
+número de modelos e por bytes (tamanho do artefato em disco: o .compiled é
+mapeado com memmap, então é o teto da memória residente; para .joblib é uma
+estimativa). Cargas concorrentes do mesmo tenant viram uma só: a primeira
+thread carrega e as demais esperam o resultado (single-flight).
+"""
+
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional, Tuple
+
+from compiled import EXTENSION as COMPILED_EXTENSION, CompiledPredictor
+
+DEFAULT_TENANT_DIR = "models/tenants"
+MODEL_FILENAME = "complication_predictor.joblib"
+
+# Ids viram nomes de diretório: nada de "/", ".." etc.
+TENANT_ID_PATTERN = re.compile(r"^[A-Za-z0-9_-]{1,64}$")
+
+
+def compiled_path(path: str) -> str:
+    """Modelo compilado exportado ao lado do .joblib"""
+    return os.path.splitext(path)[0] + COMPILED_EXTENSION
+
+
+def fallback_path(path: str) -> str:
+    """Fallback destilado (distillation.py) exportado ao lado do .joblib"""
+    return os.path.splitext(path)[0] + ".fallback" + COMPILED_EXTENSION
+
+
+def artifact_path(path: str) -> Optional[str]:
+    """
+    Arquivo que load_model usaria para um .joblib (None se nenhum existe)
+
+    Um .compiled mais antigo que o .joblib (salvo sem exportar de novo) é de
+    outro treino e não é usado.
+    """
+    compiled = compiled_path(path)
+    if os.path.exists(compiled):
+        if not os.path.exists(path) or os.path.getmtime(compiled) >= os.path.getmtime(path):
+            return compiled
+    if os.path.exists(path):
+        return path
+    return None
+
+
+def model_exists(path: str) -> bool:
+    return artifact_path(path) is not None
+
+
+def load_model(path: str):
+    """
+    Runtime de inferência imutável (CompiledPredictor) do artefato em path
+
+    Prefere o formato compilado (sem scikit-learn); senão, ou se o .compiled
+    é mais antigo que o .joblib (salvo sem exportar de novo), carrega o
+    .joblib e o converte em memória. model.py (pandas, scipy, scikit-learn) só é
+    importado nesse fallback. Artefatos anteriores ao vocabulário aprendido
+    (StandardScaler/colunas fixas) não são compiláveis e continuam servidos
+    pelo ComplicationPredictor.
+    """
+    compiled = compiled_path(path)
+    if artifact_path(path) == compiled:
+        return CompiledPredictor.load(compiled)
+    if os.path.exists(compiled):
+        print(f"⚠️ {compiled} é anterior a {path}; ignorado (exporte o modelo compilado de novo)")
+
+    from model import ComplicationPredictor
+
+    loaded = ComplicationPredictor()
+    loaded.load(path)
+    if loaded.scaler is not None or not loaded.label_encoders:
+        return loaded
+    return CompiledPredictor.from_predictor(loaded)
+
+
+def validate_tenant_id(tenant_id: str) -> str:
+    if not isinstance(tenant_id, str) or not TENANT_ID_PATTERN.match(tenant_id):
+        raise ValueError("tenant_id inválido (use letras, números, _ ou -, até 64 caracteres)")
+    return tenant_id
+
+
+def tenant_model_path(tenant_id: str, root: str = DEFAULT_TENANT_DIR) -> str:
+    """Caminho do .joblib de um tenant (o .compiled fica ao lado)"""
+    return os.path.join(root, validate_tenant_id(tenant_id), MODEL_FILENAME)
+
+
+class TenantStats:
+    """Contadores de uso do LRU de um tenant"""
+
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        # Esperaram a carga já em andamento de outra thread
+        self.coalesced = 0
+        self.loads = 0
+        self.load_errors = 0
+        # Requisições recusadas sem ler o disco: falha recente em cache
+        self.failed_lookups = 0
+        self.last_error: Optional[str] = None
+        self.evictions = 0
+        self.load_seconds_total = 0.0
+        self.load_seconds_max = 0.0
+        self.last_load_seconds: Optional[float] = None
+
+    def record_load(self, seconds: float):
+        self.loads += 1
+        self.load_seconds_total += seconds
+        self.load_seconds_max = max(self.load_seconds_max, seconds)
+        self.last_load_seconds = seconds
+
+    def to_dict(self) -> Dict:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else None,
+            "coalesced_loads": self.coalesced,
+            "loads": self.loads,
+            "load_errors": self.load_errors,
+            "failed_lookups": self.failed_lookups,
+            "last_error": self.last_error,
+            "evictions": self.evictions,
+            "load_ms_mean": self.load_seconds_total / self.loads * 1000 if self.loads else None,
+            "load_ms_max": self.load_seconds_max * 1000 if self.loads else None,
+            "load_ms_last": self.last_load_seconds * 1000 if self.last_load_seconds is not None else None,
+        }
+
+
+class _PendingLoad:
+    """Carga em andamento de um tenant (compartilhada entre threads)"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.predictor = None
+        self.error: Optional[BaseException] = None
+
+
+class ModelRegistry:
+    """
+    LRU de modelos por tenant
+
+    get(tenant_id) devolve o preditor do tenant ou None se ele não tem
+    artefato (o chamador usa o modelo padrão). Uma carga que falha fica em
+    cache por retry_seconds: nesse intervalo get repassa o mesmo erro sem
+    ler o disco de novo.
+    """
+
+    def __init__(
+        self,
+        root: str = DEFAULT_TENANT_DIR,
+        max_models: int = 8,
+        max_bytes: Optional[int] = None,
+        loader: Callable[[str], object] = load_model,
+        retry_seconds: float = 30.0,
+    ):
+        """
+        Args:
+            root: Diretório com um subdiretório por tenant
+            max_models: Máximo de modelos residentes
+            max_bytes: Máximo de bytes residentes (None = sem limite); o
+                modelo recém-carregado fica mesmo se sozinho passar do limite
+            loader: Função caminho do .joblib -> preditor
+            retry_seconds: Intervalo até tentar de novo uma carga que falhou
+        """
+        self.root = root
+        self.max_models = max(1, max_models)
+        self.max_bytes = max_bytes
+        self.loader = loader
+        self.retry_seconds = retry_seconds
+        self.lock = threading.Lock()
+        # tenant_id -> (preditor, bytes), do menos para o mais recente
+        self.models: "OrderedDict[str, tuple]" = OrderedDict()
+        self.resident_bytes = 0
+        self.pending: Dict[str, _PendingLoad] = {}
+        # tenant_id -> (instante da próxima tentativa, erro da última carga)
+        self.failures: Dict[str, Tuple[float, BaseException]] = {}
+        # Só tenants com artefato (ids arbitrários não crescem o dicionário)
+        self.tenant_stats: Dict[str, TenantStats] = {}
+        # Requisições de tenants sem artefato (atendidas pelo modelo padrão)
+        self.fallbacks = 0
+
+    @classmethod
+    def from_env(cls) -> "ModelRegistry":
+        """
+        Lê ML_TENANT_MODEL_DIR, ML_TENANT_MAX_MODELS, ML_TENANT_MAX_MB e
+        ML_TENANT_RETRY_SECONDS
+        """
+        max_mb = os.environ.get("ML_TENANT_MAX_MB")
+        return cls(
+            root=os.environ.get("ML_TENANT_MODEL_DIR", DEFAULT_TENANT_DIR),
+            max_models=int(os.environ.get("ML_TENANT_MAX_MODELS", 8)),
+            max_bytes=int(float(max_mb) * 1024**2) if max_mb else None,
+            retry_seconds=float(os.environ.get("ML_TENANT_RETRY_SECONDS", 30)),
+        )
+
+    def _stats(self, tenant_id: str) -> TenantStats:
+        stats = self.tenant_stats.get(tenant_id)
+        if stats is None:
+            stats = self.tenant_stats[tenant_id] = TenantStats()
+        return stats
+
+    def get(self, tenant_id: str):
+        """
+        Preditor do tenant, carregando no primeiro uso
+
+        Raises:
+            ValueError: tenant_id inválido
+            Exception: erro ao carregar o artefato (repassado a todas as
+                threads que esperavam a mesma carga e, por retry_seconds,
+                às requisições seguintes)
+        """
+        path = tenant_model_path(tenant_id, self.root)
+
+        with self.lock:
+            entry = self.models.get(tenant_id)
+            if entry is not None:
+                self.models.move_to_end(tenant_id)
+                self.tenant_stats[tenant_id].hits += 1
+                return entry[0]
+
+            failure = self.failures.get(tenant_id)
+            if failure is not None and time.monotonic() < failure[0]:
+                self.tenant_stats[tenant_id].failed_lookups += 1
+                raise failure[1]
+
+            pending = self.pending.get(tenant_id)
+            if pending is not None:
+                stats = self.tenant_stats[tenant_id]
+                stats.misses += 1
+                stats.coalesced += 1
+                owner = False
+            else:
+                artifact = artifact_path(path)
+                if artifact is None:
+                    self.fallbacks += 1
+                    return None
+                stats = self._stats(tenant_id)
+                stats.misses += 1
+                pending = self.pending[tenant_id] = _PendingLoad()
+                owner = True
+
+        if not owner:
+            pending.done.wait()
+            if pending.error is not None:
+                raise pending.error
+            return pending.predictor
+
+        start = time.perf_counter()
+        try:
+            predictor = self.loader(path)
+            size = os.path.getsize(artifact)
+        except BaseException as error:
+            print(
+                f"⚠️ Falha ao carregar modelo do tenant {tenant_id}: {error}"
+                f" (nova tentativa em {self.retry_seconds:g} s)"
+            )
+            with self.lock:
+                stats.load_errors += 1
+                stats.last_error = str(error)
+                self.failures[tenant_id] = (time.monotonic() + self.retry_seconds, error)
+                del self.pending[tenant_id]
+            pending.error = error
+            pending.done.set()
+            raise
+        elapsed = time.perf_counter() - start
+
+        with self.lock:
+            stats.record_load(elapsed)
+            self.failures.pop(tenant_id, None)
+            self.models[tenant_id] = (predictor, size)
+            self.resident_bytes += size
+            self._evict_locked()
+            del self.pending[tenant_id]
+        pending.predictor = predictor
+        pending.done.set()
+        return predictor
+
+    def _evict_locked(self):
+        """Remove os menos usados até caber nos limites (com self.lock)"""
+        while len(self.models) > 1 and (
+            len(self.models) > self.max_models
+            or (self.max_bytes is not None and self.resident_bytes > self.max_bytes)
+        ):
+            tenant_id, (_, size) = self.models.popitem(last=False)
+            self.resident_bytes -= size
+            self.tenant_stats[tenant_id].evictions += 1
+
+    def evict(self, tenant_id: str) -> bool:
+        """
+        Descarta o modelo de um tenant (ex.: após retreino); True se estava carregado
+
+        Também esquece uma falha de carga em cache: o próximo get lê o disco.
+        """
+        with self.lock:
+            self.failures.pop(tenant_id, None)
+            entry = self.models.pop(tenant_id, None)
+            if entry is None:
+                return False
+            self.resident_bytes -= entry[1]
+            return True
+
+    def evict_all(self) -> List[str]:
+        """Descarta todos os modelos residentes (recarregados no próximo uso); ids descartados"""
+        with self.lock:
+            tenant_ids = list(self.models)
+            self.failures.clear()
+            self.models.clear()
+            self.resident_bytes = 0
+            return tenant_ids
+
+    def stats(self) -> Dict:
+        """Estado do LRU e contadores por tenant"""
+        with self.lock:
+            tenants = {tenant_id: stats.to_dict() for tenant_id, stats in self.tenant_stats.items()}
+            for tenant_id, data in tenants.items():
+                data["resident"] = tenant_id in self.models
+            hits = sum(stats.hits for stats in self.tenant_stats.values())
+            misses = sum(stats.misses for stats in self.tenant_stats.values())
+            now = time.monotonic()
+            return {
+                "root": self.root,
+                "max_models": self.max_models,
+                "max_bytes": self.max_bytes,
+                "resident_models": list(self.models),
+                "resident_bytes": self.resident_bytes,
+                "loading": list(self.pending),
+                # Tenants com carga falha em cache e segundos até a nova tentativa
+                "failed": {
+                    tenant_id: max(0.0, retry_at - now) for tenant_id, (retry_at, _) in self.failures.items()
+                },
+                "hit_rate": hits / (hits + misses) if hits + misses else None,
+                "fallbacks": self.fallbacks,
+                "tenants": tenants,
+            }
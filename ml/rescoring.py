@@ -0,0 +1,420 @@
+"""
+Re-scoring incremental de pacientes a partir de novos follow-ups
+
+Quando chega um FollowUpResponse, o paciente entra em uma fila de eventos.
+O worker consome a fila em micro-lotes:
+1. junta os eventos de até batch_size pacientes ou max_wait segundos
+2. coalesce: vários eventos do mesmo paciente viram um só
+3. busca as features atuais só desses pacientes (queries.patients_query)
+4. prediz todos de uma vez (predict_proba do modelo)
+5. grava o último risco de cada paciente em latest_risk e confirma os eventos
+
+Filas:
+- SQLiteEventQueue: durável, local (stand-in sem Postgres); eventos só saem
+  da fila depois de processados (pelo menos uma vez)
+- PostgresEventQueue: LISTEN/NOTIFY no canal ml_rescore, alimentado pelo
+  trigger de NOTIFY_TRIGGER_SQL; NOTIFY não é durável, então eventos emitidos
+  com o worker parado se perdem (o re-scoring noturno completo cobre isso)
+
+A tabela latest_risk (SQLite, chave primária patient_id) é lida pela API em
+GET /risk/<patient_id>: uma consulta por chave, sem recalcular o modelo.
+
+Uso (a partir do diretório ml/):
+    python rescoring.py                          # fila SQLite (ML_RESCORE_DB)
+    python rescoring.py --queue postgres         # LISTEN ml_rescore
+    python rescoring.py --install-trigger        # cria o trigger no Postgres
+    python rescoring.py --publish <patient_id>   # enfileira (fila SQLite)
+"""
+
+import argparse
+import json
+import os
+import re
+import select
+import threading
+import time
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Callable, Dict, Iterable, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from compiled import CompiledPredictor
+from latest_risk import DEFAULT_DB_PATH, LatestRiskStore, connect_sqlite
+from queries import patients_query
+
+RESCORE_CHANNEL = "ml_rescore"
+
+# Trigger que publica um evento por resposta de follow-up
+NOTIFY_TRIGGER_SQL = f"""
+CREATE OR REPLACE FUNCTION ml_notify_followup_response() RETURNS trigger AS $$
+DECLARE
+    followup RECORD;
+BEGIN
+    SELECT "patientId", "surgeryId" INTO followup FROM "FollowUp" WHERE id = NEW."followUpId";
+    PERFORM pg_notify(
+        '{RESCORE_CHANNEL}',
+        json_build_object('patient_id', followup."patientId", 'surgery_id', followup."surgeryId")::text
+    );
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS ml_rescore_on_response ON "FollowUpResponse";
+CREATE TRIGGER ml_rescore_on_response
+AFTER INSERT OR UPDATE ON "FollowUpResponse"
+FOR EACH ROW EXECUTE FUNCTION ml_notify_followup_response();
+"""
+
+_CHANNEL_PATTERN = re.compile(r"^[a-z_][a-z0-9_]*$")
+
+
+@dataclass
+class RescoreEvent:
+    """Pedido de re-scoring de um paciente"""
+
+    patient_id: str
+    surgery_id: Optional[str] = None
+    # Id na fila SQLite (None para NOTIFY)
+    event_id: Optional[int] = None
+    received_at: float = field(default_factory=time.time)
+
+
+class SQLiteEventQueue:
+    """Fila durável de eventos em SQLite"""
+
+    def __init__(self, path: str = DEFAULT_DB_PATH, poll_interval: float = 0.05):
+        self.path = path
+        self.poll_interval = poll_interval
+        self.conn = connect_sqlite(path)
+        self.conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS rescore_events (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                patient_id TEXT NOT NULL,
+                surgery_id TEXT,
+                created_at REAL NOT NULL
+            )
+            """
+        )
+        # Maior id já entregue por poll (não entrega de novo antes do ack)
+        self.delivered_id = 0
+
+    def publish(self, patient_id: str, surgery_id: Optional[str] = None):
+        self.publish_many([RescoreEvent(patient_id, surgery_id)])
+
+    def publish_many(self, events: Iterable[RescoreEvent]):
+        with self.conn:
+            self.conn.executemany(
+                "INSERT INTO rescore_events (patient_id, surgery_id, created_at) VALUES (?, ?, ?)",
+                ((event.patient_id, event.surgery_id, event.received_at) for event in events),
+            )
+
+    def poll(self, timeout: float, limit: int) -> List[RescoreEvent]:
+        """Até limit eventos novos; espera até timeout segundos se não houver"""
+        deadline = time.monotonic() + timeout
+        while True:
+            rows = self.conn.execute(
+                "SELECT id, patient_id, surgery_id, created_at FROM rescore_events WHERE id > ? ORDER BY id LIMIT ?",
+                (self.delivered_id, limit),
+            ).fetchall()
+            if rows:
+                self.delivered_id = rows[-1][0]
+                return [RescoreEvent(patient_id, surgery_id, event_id, created_at)
+                        for event_id, patient_id, surgery_id, created_at in rows]
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return []
+            time.sleep(min(self.poll_interval, remaining))
+
+    def ack(self, events: List[RescoreEvent]):
+        """Remove os eventos processados"""
+        ids = [event.event_id for event in events if event.event_id is not None]
+        if ids:
+            with self.conn:
+                self.conn.execute("DELETE FROM rescore_events WHERE id <= ?", (max(ids),))
+
+    def pending(self) -> int:
+        return self.conn.execute("SELECT COUNT(*) FROM rescore_events").fetchone()[0]
+
+
+class PostgresEventQueue:
+    """Eventos de LISTEN/NOTIFY (payload JSON com patient_id e surgery_id)"""
+
+    def __init__(self, connect: Callable, channel: str = RESCORE_CHANNEL):
+        """
+        Args:
+            connect: Função sem argumentos que retorna uma conexão psycopg2
+            channel: Canal do NOTIFY
+        """
+        if not _CHANNEL_PATTERN.match(channel):
+            raise ValueError(f"Canal inválido: {channel}")
+        self.connect = connect
+        self.channel = channel
+        self.conn = None
+
+    def _listen(self):
+        if self.conn is None or self.conn.closed:
+            self.conn = self.connect()
+            self.conn.autocommit = True
+            with self.conn.cursor() as cursor:
+                cursor.execute(f"LISTEN {self.channel}")
+        return self.conn
+
+    def poll(self, timeout: float, limit: int) -> List[RescoreEvent]:
+        conn = self._listen()
+        if not conn.notifies and select.select([conn], [], [], timeout)[0]:
+            conn.poll()
+
+        events = []
+        while conn.notifies and len(events) < limit:
+            notify = conn.notifies.pop(0)
+            try:
+                payload = json.loads(notify.payload)
+            except ValueError:
+                continue
+            if payload.get("patient_id"):
+                events.append(RescoreEvent(payload["patient_id"], payload.get("surgery_id")))
+        return events
+
+    def ack(self, events: List[RescoreEvent]):
+        """NOTIFY não tem confirmação"""
+
+    def close(self):
+        if self.conn is not None:
+            self.conn.close()
+
+
+class PostgresFeatureSource:
+    """Features atuais de uma lista de pacientes, direto do banco"""
+
+    def __init__(self, connect: Callable):
+        self.connect = connect
+        self.conn = None
+
+    def __call__(self, patient_ids: List[str]) -> pd.DataFrame:
+        if self.conn is None or self.conn.closed:
+            self.conn = self.connect()
+        query, params = patients_query(patient_ids)
+        try:
+            return pd.read_sql_query(query, self.conn, params=params)
+        finally:
+            # Não deixa a transação de leitura aberta entre lotes
+            self.conn.rollback()
+
+
+class FrameFeatureSource:
+    """
+    Features de um DataFrame em memória (CSV exportado, benchmarks)
+
+    As cirurgias de um paciente ficam na ordem do DataFrame: a última conta
+    como a mais recente, como em patients_query.
+    """
+
+    def __init__(self, data: pd.DataFrame):
+        self.data = data.set_index("patient_id", drop=False)
+
+    def __call__(self, patient_ids: List[str]) -> pd.DataFrame:
+        found = self.data.index.intersection(pd.Index(patient_ids))
+        return self.data.loc[found].reset_index(drop=True)
+
+
+def predict_batch(predictor, frame: pd.DataFrame) -> np.ndarray:
+    """Probabilidades de um DataFrame de features, para os dois tipos de preditor"""
+    if isinstance(predictor, CompiledPredictor):
+        records = frame.astype(object).where(frame.notna(), None).to_dict("records")
+        return predictor.predict_proba(records)
+    return predictor.predict_proba(frame)
+
+
+def current_surgeries(frame: pd.DataFrame, latest: Dict[str, RescoreEvent]) -> pd.DataFrame:
+    """
+    Uma linha por paciente: a cirurgia do evento, quando ele informa uma e
+    ela está em frame; senão a última linha do paciente, que é a cirurgia
+    mais recente (patients_query ordena por data)
+    """
+    if "surgery_id" not in frame:
+        return frame.drop_duplicates("patient_id", keep="last")
+
+    wanted = frame["patient_id"].map(lambda patient_id: latest[patient_id].surgery_id if patient_id in latest else None)
+    match = frame["surgery_id"] == wanted
+    keep = match | ~match.groupby(frame["patient_id"]).transform("any")
+    return frame[keep].drop_duplicates("patient_id", keep="last")
+
+
+def coalesce(events: List[RescoreEvent]) -> Dict[str, RescoreEvent]:
+    """Último evento de cada paciente (na ordem de chegada)"""
+    latest: Dict[str, RescoreEvent] = {}
+    for event in events:
+        latest[event.patient_id] = event
+    return latest
+
+
+class RescoringWorker:
+    """Consome a fila e re-calcula o risco dos pacientes afetados"""
+
+    def __init__(
+        self,
+        queue,
+        fetch_features: Callable[[List[str]], pd.DataFrame],
+        predictor,
+        store: LatestRiskStore,
+        batch_size: int = 256,
+        max_wait: float = 0.5,
+    ):
+        """
+        Args:
+            queue: SQLiteEventQueue ou PostgresEventQueue
+            fetch_features: patient_ids -> DataFrame com as colunas de queries.py
+            predictor: ComplicationPredictor ou CompiledPredictor carregado
+            store: Tabela de último risco
+            batch_size: Pacientes distintos por micro-lote
+            max_wait: Segundos máximos esperando o lote encher
+        """
+        self.queue = queue
+        self.fetch_features = fetch_features
+        self.predictor = predictor
+        self.store = store
+        self.batch_size = batch_size
+        self.max_wait = max_wait
+        self.totals = {"batches": 0, "events": 0, "patients": 0, "scored": 0, "missing": 0, "seconds": 0.0}
+
+    def collect(self, timeout: float) -> List[RescoreEvent]:
+        """Eventos de um micro-lote (vazio se nada chegou em timeout segundos)"""
+        events = self.queue.poll(timeout, self.batch_size)
+        if not events:
+            return events
+
+        deadline = time.monotonic() + self.max_wait
+        patients = {event.patient_id for event in events}
+        while len(patients) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            more = self.queue.poll(remaining, self.batch_size)
+            events.extend(more)
+            patients.update(event.patient_id for event in more)
+        return events
+
+    def process(self, events: List[RescoreEvent]) -> Dict:
+        """Re-scoring dos pacientes de um lote de eventos"""
+        start = time.perf_counter()
+        latest = coalesce(events)
+        # latest_risk guarda um risco por paciente: o da cirurgia do evento
+        # ou, sem ela, o da mais recente
+        frame = current_surgeries(self.fetch_features(list(latest)), latest)
+
+        rows = []
+        if len(frame):
+            probabilities = predict_batch(self.predictor, frame)
+            scored_at = datetime.now(timezone.utc).isoformat()
+            for patient_id, surgery_id, probability in zip(
+                frame["patient_id"], frame.get("surgery_id", [None] * len(frame)), probabilities
+            ):
+                rows.append({
+                    "patient_id": patient_id,
+                    "surgery_id": surgery_id if pd.notna(surgery_id) else latest[patient_id].surgery_id,
+                    "probability": float(probability),
+                    "risk_level": self.predictor.risk_level(float(probability))[0],
+                    "model_version": self.predictor.model_version,
+                    "scored_at": scored_at,
+                })
+            self.store.upsert_many(rows)
+
+        self.queue.ack(events)
+
+        stats = {
+            "events": len(events),
+            "patients": len(latest),
+            "scored": len(rows),
+            # Sem linha elegível (ex.: sem D+1 respondido ainda)
+            "missing": len(latest) - len({row["patient_id"] for row in rows}),
+            "seconds": time.perf_counter() - start,
+        }
+        self.totals["batches"] += 1
+        for key, value in stats.items():
+            self.totals[key] += value
+        return stats
+
+    def run_once(self, timeout: float = 1.0) -> Optional[Dict]:
+        """Processa um micro-lote; None se a fila ficou vazia por timeout"""
+        events = self.collect(timeout)
+        if not events:
+            return None
+        return self.process(events)
+
+    def run(self, stop: Optional[threading.Event] = None, idle_timeout: float = 1.0, verbose: bool = True):
+        """Loop até stop ser sinalizado (ou Ctrl+C)"""
+        stop = stop or threading.Event()
+        while not stop.is_set():
+            stats = self.run_once(idle_timeout)
+            if stats and verbose:
+                print(
+                    f"🔁 {stats['events']} eventos -> {stats['patients']} pacientes,"
+                    f" {stats['scored']} re-calculados ({stats['missing']} sem dados)"
+                    f" em {stats['seconds'] * 1000:.1f} ms"
+                )
+
+
+def main():
+    from registry import load_model, model_exists
+
+    parser = argparse.ArgumentParser(description="Worker de re-scoring por eventos de follow-up")
+    parser.add_argument("--queue", choices=["sqlite", "postgres"], default="sqlite")
+    parser.add_argument("--db", default=os.environ.get("ML_RESCORE_DB", DEFAULT_DB_PATH),
+                        help="SQLite da fila e de latest_risk (padrão: ML_RESCORE_DB)")
+    parser.add_argument("--model", help="Artefato .joblib (o .compiled ao lado é preferido)")
+    parser.add_argument("--features-csv", help="Lê as features de um CSV em vez do banco")
+    parser.add_argument("--batch-size", type=int, default=int(os.environ.get("ML_RESCORE_BATCH_SIZE", 256)))
+    parser.add_argument("--max-wait-ms", type=float, default=float(os.environ.get("ML_RESCORE_MAX_WAIT_MS", 500)))
+    parser.add_argument("--install-trigger", action="store_true", help="Cria o trigger de NOTIFY e sai")
+    parser.add_argument("--publish", nargs="+", metavar="PATIENT_ID", help="Enfileira pacientes (fila SQLite) e sai")
+    args = parser.parse_args()
+
+    def connect():
+        import psycopg2
+        from dotenv import load_dotenv
+
+        load_dotenv("../.env")
+        return psycopg2.connect(os.getenv("DATABASE_URL"))
+
+    if args.install_trigger:
+        conn = connect()
+        with conn, conn.cursor() as cursor:
+            cursor.execute(NOTIFY_TRIGGER_SQL)
+        conn.close()
+        print(f"✅ Trigger criado: FollowUpResponse -> NOTIFY {RESCORE_CHANNEL}")
+        return
+
+    if args.publish:
+        SQLiteEventQueue(args.db).publish_many(RescoreEvent(patient_id) for patient_id in args.publish)
+        print(f"✅ {len(args.publish)} evento(s) enfileirado(s) em {args.db}")
+        return
+
+    model_path = args.model
+    if model_path is None:
+        collective = "models/complication_predictor_collective.joblib"
+        model_path = collective if model_exists(collective) else "models/complication_predictor.joblib"
+    predictor = load_model(model_path)
+
+    queue = SQLiteEventQueue(args.db) if args.queue == "sqlite" else PostgresEventQueue(connect)
+    if args.features_csv:
+        fetch_features = FrameFeatureSource(pd.read_csv(args.features_csv))
+    else:
+        fetch_features = PostgresFeatureSource(connect)
+
+    worker = RescoringWorker(
+        queue, fetch_features, predictor, LatestRiskStore(args.db),
+        batch_size=args.batch_size, max_wait=args.max_wait_ms / 1000,
+    )
+    print(f"👂 Aguardando eventos ({args.queue}, lotes de até {args.batch_size} pacientes)...")
+    try:
+        worker.run()
+    except KeyboardInterrupt:
+        totals = worker.totals
+        print(f"\n⏹️  {totals['events']} eventos, {totals['scored']} pacientes re-calculados em {totals['batches']} lotes")
+
+
+if __name__ == "__main__":
+    main()
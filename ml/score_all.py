@@ -0,0 +1,350 @@
+"""
+Scoring em lote de todos os pacientes elegíveis (execução noturna)
+
+Percorre "Patient" por keyset (id > último id visto, em ordem de id) em
+blocos de chunk_size pacientes:
+1. uma thread leitora busca a página de ids e as features do bloco
+   (queries.patients_query) por um pool de conexões psycopg2
+2. um pool de processos calcula as probabilidades (cada processo carrega o
+   modelo uma vez; o .compiled é mapeado com memmap e compartilhado)
+3. o processo principal grava as predições em "MlPrediction" (writeback.py:
+   COPY + upsert) e, na ordem dos blocos, atualiza o checkpoint
+
+O checkpoint (JSON, gravado de forma atômica) guarda o último patient_id
+cujo bloco já foi gravado. Se a execução for interrompida, a próxima com o
+mesmo modelo continua do bloco seguinte; um bloco gravado mas ainda não
+marcado é gravado de novo sem efeito (o upsert é idempotente).
+
+Uso (a partir do diretório ml/):
+    python score_all.py
+    python score_all.py --workers 4 --chunk-size 20000 --update-surgeries
+    python score_all.py --time-budget 1800   # para após 30 min; a próxima execução continua
+    python score_all.py --restart            # ignora o checkpoint
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from typing import Dict, Optional
+
+import pandas as pd
+
+from queries import patient_page_query, patients_query
+from registry import load_model, model_exists
+
+DEFAULT_CHECKPOINT = "models/score_all.checkpoint.json"
+CHUNK_SIZE = 10_000
+
+# Preditor de cada processo do pool (carregado em _init_worker)
+_PREDICTOR = None
+
+
+def _init_worker(model_path: str):
+    global _PREDICTOR
+    _PREDICTOR = load_model(model_path)
+
+
+def _score_chunk(frame: pd.DataFrame):
+    """(patient_ids, surgery_ids, probabilidades) de um bloco de features"""
+    from rescoring import predict_batch
+
+    probabilities = predict_batch(_PREDICTOR, frame) if len(frame) else []
+    return frame["patient_id"].tolist(), frame["surgery_id"].tolist(), probabilities
+
+
+class Checkpoint:
+    """Progresso de uma execução em um arquivo JSON"""
+
+    def __init__(self, path: str = DEFAULT_CHECKPOINT):
+        self.path = path
+
+    def load(self) -> Optional[Dict]:
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def save(self, state: Dict):
+        # Grava ao lado e renomeia: uma interrupção no meio não corrompe o arquivo
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(state, f, indent=2)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+
+
+def _fetch_features(conn, patient_ids) -> pd.DataFrame:
+    query, params = patients_query(patient_ids)
+    with conn.cursor() as cursor:
+        cursor.execute(query, params)
+        columns = [column[0] for column in cursor.description]
+        return pd.DataFrame.from_records(cursor.fetchall(), columns=columns)
+
+
+class _ChunkReader(threading.Thread):
+    """Lê os blocos à frente do scoring e os coloca em uma fila limitada"""
+
+    def __init__(self, pool, after: str, chunk_size: int, prefetch: int):
+        super().__init__(daemon=True)
+        self.pool = pool
+        self.after = after
+        self.chunk_size = chunk_size
+        self.chunks: "queue.Queue" = queue.Queue(maxsize=prefetch)
+        self.stop = threading.Event()
+        self.seconds = 0.0
+
+    def _put(self, item) -> bool:
+        while not self.stop.is_set():
+            try:
+                self.chunks.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def run(self):
+        try:
+            while not self.stop.is_set():
+                start = time.perf_counter()
+                conn = self.pool.getconn()
+                try:
+                    query, params = patient_page_query(self.after, self.chunk_size)
+                    with conn.cursor() as cursor:
+                        cursor.execute(query, params)
+                        patient_ids = [row[0] for row in cursor.fetchall()]
+                    frame = _fetch_features(conn, patient_ids) if patient_ids else None
+                finally:
+                    # Não deixa a transação de leitura aberta entre blocos
+                    conn.rollback()
+                    self.pool.putconn(conn)
+                self.seconds += time.perf_counter() - start
+
+                if not patient_ids:
+                    self._put(None)
+                    return
+                self.after = patient_ids[-1]
+                if not self._put((self.after, len(patient_ids), frame)):
+                    return
+        except BaseException as error:
+            self._put(error)
+
+
+def score_all(
+    dsn: str,
+    model_path: str,
+    checkpoint_path: str = DEFAULT_CHECKPOINT,
+    chunk_size: int = CHUNK_SIZE,
+    workers: int = 0,
+    update_surgeries: bool = False,
+    restart: bool = False,
+    time_budget: Optional[float] = None,
+    max_chunks: Optional[int] = None,
+    verbose: bool = True,
+) -> Dict:
+    """
+    Calcula e grava o risco de todos os pacientes elegíveis
+
+    Args:
+        dsn: URL/DSN do PostgreSQL
+        model_path: Artefato .joblib (o .compiled ao lado é preferido)
+        checkpoint_path: Arquivo de progresso
+        chunk_size: Pacientes por bloco (página do keyset)
+        workers: Processos de scoring (0 = no próprio processo)
+        update_surgeries: Também atualiza as colunas de predição de "Surgery"
+        restart: Ignora o checkpoint e começa do primeiro paciente
+        time_budget: Para depois de tantos segundos (com checkpoint gravado)
+        max_chunks: Para depois de tantos blocos nesta execução
+        verbose: Imprime o progresso de cada bloco
+
+    Returns:
+        Resumo da execução (pacientes, predições, linhas/s, tempos por etapa)
+    """
+    from psycopg2.pool import ThreadedConnectionPool
+
+    from writeback import prediction_rows, write_predictions
+
+    predictor = load_model(model_path)
+    checkpoint = Checkpoint(checkpoint_path)
+    state = None if restart else checkpoint.load()
+    if state and (state.get("completed") or state.get("model_version") != predictor.model_version):
+        if verbose and not state.get("completed"):
+            print(f"⚠️  Checkpoint de outro modelo ({state.get('model_version')}), recomeçando do início")
+        state = None
+    resumed_from = state["last_patient_id"] if state else None
+    state = state or {
+        "model_version": predictor.model_version,
+        "started_at": datetime.now().isoformat(),
+        "last_patient_id": "",
+        "chunks": 0,
+        "patients": 0,
+        "rows": 0,
+        "completed": False,
+    }
+    if verbose and resumed_from:
+        print(f"↩️  Continuando após {resumed_from} ({state['patients']:,} pacientes já processados)")
+
+    # spawn: os processos não herdam as conexões do pool (com fork, um processo
+    # órfão manteria a transação de leitura aberta se o pai fosse morto)
+    executor = ProcessPoolExecutor(
+        workers, mp_context=multiprocessing.get_context("spawn"), initializer=_init_worker, initargs=(model_path,)
+    ) if workers else None
+    if executor is None:
+        global _PREDICTOR
+        _PREDICTOR = predictor
+
+    pool = ThreadedConnectionPool(1, 2, dsn)
+    in_flight = max(1, 2 * workers)
+    reader = _ChunkReader(pool, state["last_patient_id"], chunk_size, prefetch=in_flight)
+    pending: deque = deque()
+    totals = {"chunks": 0, "patients": 0, "rows": 0, "score_seconds": 0.0, "write_seconds": 0.0}
+    start = time.perf_counter()
+    stopped_early = False
+
+    def finish_oldest(conn):
+        last_patient_id, n_patients, result = pending.popleft()
+        score_start = time.perf_counter()
+        patient_ids, surgery_ids, probabilities = result.result() if executor else result
+        totals["score_seconds"] += time.perf_counter() - score_start
+
+        rows = prediction_rows(patient_ids, surgery_ids, probabilities, predictor)
+        write_start = time.perf_counter()
+        written = write_predictions(conn, rows, update_surgeries=update_surgeries)
+        totals["write_seconds"] += time.perf_counter() - write_start
+
+        totals["chunks"] += 1
+        totals["patients"] += n_patients
+        totals["rows"] += written["rows"]
+        state.update(
+            last_patient_id=last_patient_id,
+            chunks=state["chunks"] + 1,
+            patients=state["patients"] + n_patients,
+            rows=state["rows"] + written["rows"],
+            updated_at=datetime.now().isoformat(),
+        )
+        checkpoint.save(state)
+
+        if verbose:
+            elapsed = time.perf_counter() - start
+            print(
+                f"📦 Bloco {state['chunks']}: {n_patients:,} pacientes, {written['rows']:,} predições"
+                f" (até {last_patient_id}) | {totals['rows'] / elapsed:,.0f} linhas/s"
+            )
+
+    reader.start()
+    write_conn = pool.getconn()
+    try:
+        while True:
+            if (time_budget is not None and time.perf_counter() - start >= time_budget) or (
+                max_chunks is not None and totals["chunks"] + len(pending) >= max_chunks
+            ):
+                stopped_early = True
+                break
+            item = reader.chunks.get()
+            if isinstance(item, BaseException):
+                raise item
+            if item is None:
+                break
+
+            last_patient_id, n_patients, frame = item
+            if executor:
+                result = executor.submit(_score_chunk, frame)
+            else:
+                score_start = time.perf_counter()
+                result = _score_chunk(frame)
+                totals["score_seconds"] += time.perf_counter() - score_start
+            pending.append((last_patient_id, n_patients, result))
+            if len(pending) >= in_flight:
+                finish_oldest(write_conn)
+
+        while pending:
+            finish_oldest(write_conn)
+    finally:
+        reader.stop.set()
+        reader.join()
+        pool.putconn(write_conn)
+        pool.closeall()
+        if executor:
+            executor.shutdown(cancel_futures=True)
+
+    if not stopped_early:
+        state["completed"] = True
+        checkpoint.save(state)
+
+    elapsed = time.perf_counter() - start
+    return {
+        "model_version": predictor.model_version,
+        "resumed_from": resumed_from,
+        "completed": state["completed"],
+        "chunks": totals["chunks"],
+        "patients": totals["patients"],
+        "rows": totals["rows"],
+        "seconds": elapsed,
+        "rows_per_s": totals["rows"] / elapsed if elapsed else 0.0,
+        "patients_per_s": totals["patients"] / elapsed if elapsed else 0.0,
+        "fetch_seconds": reader.seconds,
+        # Com workers, tempo esperando o pool (o scoring em si corre em paralelo)
+        "score_seconds": totals["score_seconds"],
+        "write_seconds": totals["write_seconds"],
+        "run_totals": {key: state[key] for key in ("chunks", "patients", "rows")},
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Scoring em lote de todos os pacientes elegíveis")
+    parser.add_argument("--dsn", help="URL do PostgreSQL (padrão: DATABASE_URL)")
+    parser.add_argument("--model", help="Artefato .joblib (o .compiled ao lado é preferido)")
+    parser.add_argument("--checkpoint", default=os.environ.get("ML_SCORE_CHECKPOINT", DEFAULT_CHECKPOINT))
+    parser.add_argument("--chunk-size", type=int, default=int(os.environ.get("ML_SCORE_CHUNK_SIZE", CHUNK_SIZE)))
+    parser.add_argument("--workers", type=int, default=int(os.environ.get("ML_SCORE_WORKERS", os.cpu_count() or 1)),
+                        help="Processos de scoring (0 = no próprio processo)")
+    parser.add_argument("--update-surgeries", action="store_true", help="Também atualiza \"Surgery\"")
+    parser.add_argument("--time-budget", type=float, help="Segundos máximos desta execução")
+    parser.add_argument("--restart", action="store_true", help="Ignora o checkpoint")
+    args = parser.parse_args()
+
+    dsn = args.dsn
+    if dsn is None:
+        from dotenv import load_dotenv
+
+        load_dotenv("../.env")
+        dsn = os.getenv("DATABASE_URL")
+
+    model_path = args.model
+    if model_path is None:
+        collective = "models/complication_predictor_collective.joblib"
+        model_path = collective if model_exists(collective) else "models/complication_predictor.joblib"
+
+    print("=" * 60)
+    print("🌙 SCORING EM LOTE DE TODOS OS PACIENTES")
+    print("=" * 60)
+    summary = score_all(
+        dsn, model_path,
+        checkpoint_path=args.checkpoint,
+        chunk_size=args.chunk_size,
+        workers=args.workers,
+        update_surgeries=args.update_surgeries,
+        restart=args.restart,
+        time_budget=args.time_budget,
+    )
+
+    status = "✅ Concluído" if summary["completed"] else "⏸️  Interrompido (a próxima execução continua)"
+    print(f"\n{status}: {summary['patients']:,} pacientes, {summary['rows']:,} predições em {summary['seconds']:.1f} s")
+    print(f"   {summary['rows_per_s']:,.0f} linhas/s | {summary['patients_per_s']:,.0f} pacientes/s")
+    print(
+        f"   Leitura {summary['fetch_seconds']:.1f} s | scoring {summary['score_seconds']:.1f} s"
+        f" | gravação {summary['write_seconds']:.1f} s"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+"""
+Codec JSON da API
+
+Usa orjson quando instalado (codifica tipos NumPy nativamente, direto para
+bytes) e cai para o json da stdlib com conversão de tipos NumPy caso
+contrário. As duas implementações produzem o mesmo JSON para os payloads
+da API (NaN vira null em ambas).
+
+Respostas estáticas de um modelo (/feature-importance, /metrics) são
+codificadas uma vez por carga de modelo com encode_static_responses.
+"""
+
+import json
+import math
+from collections.abc import Mapping
+from typing import Dict
+
+import numpy as np
+from flask import Response
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+BACKEND = "orjson" if orjson is not None else "json"
+
+MIMETYPE = "application/json"
+
+
+def _to_builtin(value):
+    """Tipos NumPy e mapeamentos somente leitura (MappingProxyType) -> tipos nativos"""
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    if isinstance(value, Mapping):
+        return dict(value)
+    raise TypeError(f"Objeto do tipo {type(value).__name__} não é serializável em JSON")
+
+
+def _replace_nan(value):
+    """NaN/inf -> None, como no orjson (json da stdlib geraria NaN inválido)"""
+    if isinstance(value, (np.generic, np.ndarray)):
+        value = _to_builtin(value)
+    if isinstance(value, float):
+        return value if math.isfinite(value) else None
+    if isinstance(value, Mapping):
+        return {key: _replace_nan(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_replace_nan(item) for item in value]
+    return value
+
+
+if orjson is not None:
+    _ORJSON_OPTIONS = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+
+    def dumps(obj) -> bytes:
+        """Objeto -> JSON (bytes UTF-8)"""
+        return orjson.dumps(obj, default=_to_builtin, option=_ORJSON_OPTIONS)
+
+    def loads(data):
+        """JSON (bytes ou str) -> objeto"""
+        return orjson.loads(data)
+
+else:
+    _encoder = json.JSONEncoder(default=_to_builtin, ensure_ascii=False, separators=(",", ":"), allow_nan=False)
+
+    def dumps(obj) -> bytes:
+        """Objeto -> JSON (bytes UTF-8)"""
+        try:
+            return _encoder.encode(obj).encode("utf-8")
+        except ValueError:  # NaN/inf: só então percorre o objeto
+            return _encoder.encode(_replace_nan(obj)).encode("utf-8")
+
+    def loads(data):
+        """JSON (bytes ou str) -> objeto"""
+        return json.loads(data)
+
+
+def json_response(obj, status: int = 200) -> Response:
+    """Resposta Flask com o corpo codificado pelo codec rápido"""
+    return Response(dumps(obj), status=status, mimetype=MIMETYPE)
+
+
+def bytes_response(body: bytes, status: int = 200) -> Response:
+    """Resposta Flask com corpo JSON já codificado"""
+    return Response(body, status=status, mimetype=MIMETYPE)
+
+
+def encode_static_responses(predictor) -> Dict[str, bytes]:
+    """
+    Corpos de /feature-importance e /metrics de um modelo carregado
+
+    Não mudam até o próximo load, então são codificados uma vez.
+    """
+    if predictor.model is None:
+        return {}
+
+    return {
+        "feature-importance": dumps(
+            {
+                "feature_importance": predictor.feature_importance,
+                "top_10": dict(list(predictor.feature_importance.items())[:10]),
+            }
+        ),
+        "metrics": dumps(
+            {
+                "metrics": predictor.metrics,
+                "model_type": predictor.model_type,
+            }
+        ),
+    }
@@ -0,0 +1,310 @@
+"""
+Treino out-of-core do ComplicationPredictor
+
+Para datasets maiores que a RAM: os dados são lidos em blocos (CSV em disco
+ou cursor do PostgreSQL) e a matriz completa nunca é materializada.
+
+- Passo 1: percorre os blocos contando tokens (vocabulário), linhas e
+  positivos, e mede o custo em memória por linha.
+- Passo 2: percorre de novo; cada bloco é transformado em features e treina
+  uma parte do ensemble:
+  - Random Forest: árvores novas treinadas só no bloco (bagging por bloco),
+    somadas à floresta final
+  - Gradient Boosting: estágios novos via warm_start, ajustados aos resíduos
+    do bloco
+  O número de árvores por bloco é proporcional ao tamanho do bloco, então o
+  ensemble final tem o mesmo tamanho do treino em memória.
+
+Uma fração fixa das linhas (uniforme no dataset, com teto de linhas) fica
+fora do treino para as métricas.
+
+No perfil do treino (timing.py) o passo 1 é a etapa "fetch", o passo 2 é
+"fit" (leitura, features e treino intercalados) e a avaliação é "cv".
+
+O pico de memória (RSS) é reportado nas métricas e limitado por
+max_memory_mb: o tamanho do bloco é reduzido para caber no orçamento e o
+treino é interrompido com MemoryError se o limite for ultrapassado.
+"""
+
+import math
+import os
+from dataclasses import dataclass
+from typing import Callable, Dict, Iterator, List, Optional
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+from drift import merge_histograms, reference_histograms
+from evaluation import bootstrap_confidence_intervals, classification_metrics, risk_thresholds
+from model import new_comorbidity_encoder, new_surgery_encoder
+from timing import current_rss_mb, peak_rss_mb
+
+# Cópias feitas por bloco (DataFrame de features + CSR + fatias de treino)
+# em relação ao tamanho do bloco bruto
+CHUNK_OVERHEAD_FACTOR = 4.0
+MIN_CHUNK_ROWS = 500
+
+
+@dataclass
+class StreamingConfig:
+    """Configuração do treino out-of-core"""
+
+    chunk_size: int = 50_000
+    max_memory_mb: Optional[float] = None
+    holdout_fraction: float = 0.2
+    holdout_max_rows: int = 20_000
+    random_state: int = 42
+
+    @classmethod
+    def from_env(cls) -> "StreamingConfig":
+        """Lê ML_TRAIN_CHUNK_SIZE e ML_TRAIN_MAX_MEMORY_MB"""
+        max_memory = os.getenv("ML_TRAIN_MAX_MEMORY_MB")
+        return cls(
+            chunk_size=int(os.getenv("ML_TRAIN_CHUNK_SIZE", cls.chunk_size)),
+            max_memory_mb=float(max_memory) if max_memory else None,
+        )
+
+
+class CSVChunkSource:
+    """Blocos de um CSV em disco"""
+
+    def __init__(self, path: str, **read_csv_kwargs):
+        self.path = path
+        self.read_csv_kwargs = read_csv_kwargs
+
+    def chunks(self, chunk_size: int) -> Iterator[pd.DataFrame]:
+        yield from pd.read_csv(self.path, chunksize=chunk_size, **self.read_csv_kwargs)
+
+
+class QueryChunkSource:
+    """
+    Blocos de uma query no PostgreSQL
+
+    Usa cursor nomeado (server-side), então o servidor envia as linhas sob
+    demanda em vez de o driver carregar o resultado inteiro.
+    """
+
+    def __init__(self, connect: Callable, query: str, params=None):
+        """
+        Args:
+            connect: Função sem argumentos que retorna uma conexão psycopg2
+            query: SQL do dataset de treino
+            params: Parâmetros da query
+        """
+        self.connect = connect
+        self.query = query
+        self.params = params
+
+    def chunks(self, chunk_size: int) -> Iterator[pd.DataFrame]:
+        conn = self.connect()
+        try:
+            with conn.cursor(name="ml_training_stream") as cursor:
+                cursor.itersize = chunk_size
+                cursor.execute(self.query, self.params)
+                columns = None
+                while True:
+                    rows = cursor.fetchmany(chunk_size)
+                    if not rows:
+                        break
+                    if columns is None:
+                        columns = [column[0] for column in cursor.description]
+                    yield pd.DataFrame.from_records(rows, columns=columns)
+        finally:
+            conn.close()
+
+
+class MemoryMonitor:
+    """Acompanha o RSS entre blocos e aplica o limite configurado"""
+
+    def __init__(self, max_memory_mb: Optional[float]):
+        self.max_memory_mb = max_memory_mb
+        self.peak_mb = current_rss_mb() or 0.0
+
+    def check(self, stage: str) -> float:
+        current = current_rss_mb()
+        if current is None:
+            return 0.0
+        # Pico do kernel desde o início da etapa (timing.TrainingProfile o
+        # zera entre etapas): pega picos entre duas verificações
+        self.peak_mb = max(self.peak_mb, current, peak_rss_mb() or 0.0)
+        if self.max_memory_mb and current > self.max_memory_mb:
+            raise MemoryError(
+                f"Uso de memória ({current:.0f} MB) passou do limite de "
+                f"{self.max_memory_mb:.0f} MB em: {stage}. Reduza chunk_size "
+                f"ou aumente ML_TRAIN_MAX_MEMORY_MB."
+            )
+        return current
+
+    def report_mb(self) -> float:
+        return max(self.peak_mb, peak_rss_mb() or 0.0)
+
+
+def _budget_chunk_size(config: StreamingConfig, bytes_per_row: float, monitor: MemoryMonitor) -> int:
+    """Maior bloco que cabe no limite de memória (ou o configurado)"""
+    if not config.max_memory_mb:
+        return config.chunk_size
+
+    available_mb = config.max_memory_mb - monitor.check("orçamento de memória")
+    if available_mb <= 0:
+        raise MemoryError(
+            f"Processo já usa mais que o limite de {config.max_memory_mb:.0f} MB antes do treino"
+        )
+
+    max_rows = int(available_mb * 1024**2 / (bytes_per_row * CHUNK_OVERHEAD_FACTOR))
+    return max(MIN_CHUNK_ROWS, min(config.chunk_size, max_rows))
+
+
+def _fit_chunk(predictor, model, X, y, n_new: int, seed: int):
+    """Acrescenta n_new árvores/estágios ao ensemble usando apenas este bloco"""
+    if predictor.model_type == "random_forest":
+        forest = predictor._build_estimator(n_new)
+        forest.set_params(random_state=seed)
+        forest.fit(X, y)
+        if model is None:
+            return forest
+        model.estimators_.extend(forest.estimators_)
+        model.n_estimators = len(model.estimators_)
+        return model
+
+    if model is None:
+        model = predictor._build_estimator(n_new)
+        model.set_params(warm_start=True)
+    else:
+        model.set_params(n_estimators=model.n_estimators + n_new)
+    model.fit(X, y)
+    return model
+
+
+def train_streaming(predictor, source, target_column: str = "teve_complicacao", config: Optional[StreamingConfig] = None) -> Dict:
+    """
+    Treina o preditor bloco a bloco
+
+    Args:
+        predictor: ComplicationPredictor (model_type já definido)
+        source: Objeto com chunks(chunk_size) -> iterador de DataFrames
+        target_column: Nome da coluna target (0/1)
+        config: StreamingConfig (padrão: StreamingConfig.from_env())
+
+    Returns:
+        Métricas (inclui peak_memory_mb e n_samples)
+    """
+    config = config or StreamingConfig.from_env()
+    monitor = MemoryMonitor(config.max_memory_mb)
+
+    print("🔥 Iniciando treinamento out-of-core...")
+
+    # Passo 1: vocabulário, contagens e custo por linha
+    comorbidity_encoder = new_comorbidity_encoder()
+    surgery_encoder = new_surgery_encoder()
+    comorbidity_counts: Dict[str, int] = {}
+    surgery_counts: Dict[str, int] = {}
+    n_rows = 0
+    n_positive = 0
+    bytes_per_row = 0.0
+
+    with predictor.profile.stage("fetch"):
+        for chunk in source.chunks(config.chunk_size):
+            comorbidity_encoder.count_tokens(chunk["comorbidades"], comorbidity_counts)
+            surgery_encoder.count_tokens(chunk["tipo_cirurgia"], surgery_counts)
+            n_rows += len(chunk)
+            n_positive += int(chunk[target_column].sum())
+            if len(chunk):
+                bytes_per_row = max(bytes_per_row, chunk.memory_usage(deep=True).sum() / len(chunk))
+            monitor.check("passo 1 (vocabulário)")
+
+    if n_rows == 0:
+        raise ValueError("Fonte de dados vazia")
+
+    predictor.label_encoders = {
+        "comorbidades": comorbidity_encoder.fit_counts(comorbidity_counts),
+        "tipo_cirurgia": surgery_encoder.fit_counts(surgery_counts),
+    }
+    predictor.feature_names = predictor._encoded_feature_names()
+    predictor.scaler = None
+    predictor.drift_reference = {}
+
+    chunk_size = _budget_chunk_size(config, bytes_per_row, monitor)
+    holdout_every = max(
+        int(round(1 / config.holdout_fraction)),
+        math.ceil(n_rows / config.holdout_max_rows),
+    )
+    total_estimators = predictor._build_estimator().n_estimators
+
+    print(f"📊 Dataset: {n_rows} pacientes ({n_positive} com complicação)")
+    print(f"✅ Features: {len(predictor.feature_names)}")
+    print(f"📦 Blocos de {chunk_size} linhas (teste: 1 a cada {holdout_every})")
+
+    # Passo 2: featurização e treino por bloco
+    model = None
+    built = 0
+    consumed = 0
+    holdout_X: List[sparse.csr_matrix] = []
+    holdout_y: List[np.ndarray] = []
+    carry = None  # linhas de blocos com uma classe só, somadas ao próximo
+
+    with predictor.profile.stage("fit"):
+        for index, chunk in enumerate(source.chunks(chunk_size)):
+            merge_histograms(predictor.drift_reference, reference_histograms(chunk, predictor.label_encoders))
+            df = predictor.prepare_features(chunk)
+            X = predictor._feature_matrix(df)
+            y = df[target_column].to_numpy()
+
+            positions = consumed + np.arange(len(df))
+            consumed += len(df)
+            is_holdout = positions % holdout_every == 0
+            holdout_X.append(X[is_holdout])
+            holdout_y.append(y[is_holdout])
+
+            X_fit, y_fit = X[~is_holdout], y[~is_holdout]
+            del df, X
+            if carry is not None:
+                X_fit = sparse.vstack([carry[0], X_fit], format="csr")
+                y_fit = np.concatenate([carry[1], y_fit])
+                carry = None
+
+            if len(np.unique(y_fit)) < 2:
+                carry = (X_fit, y_fit)
+                continue
+
+            # Árvores proporcionais às linhas já consumidas
+            target_built = int(round(total_estimators * consumed / n_rows))
+            n_new = max(1, target_built - built)
+            model = _fit_chunk(predictor, model, X_fit, y_fit, n_new, config.random_state + index)
+            built += n_new
+
+            current = monitor.check(f"bloco {index + 1}")
+            print(f"   🧱 Bloco {index + 1}: {consumed}/{n_rows} linhas, {built} árvores, RSS {current:.0f} MB")
+
+    if model is None:
+        raise ValueError("Nenhum bloco com casos positivos e negativos para treinar")
+    if carry is not None:
+        print(f"⚠️ {carry[0].shape[0]} linhas finais com uma classe só ficaram fora do treino")
+
+    if predictor.model_type == "gradient_boosting":
+        model.set_params(warm_start=False)
+    predictor.model = model
+
+    # Avaliação no conjunto reservado
+    with predictor.profile.stage("cv"):
+        X_test = sparse.vstack(holdout_X, format="csr")
+        y_test = np.concatenate(holdout_y)
+        proba = model.predict_proba(X_test)[:, 1]
+        predictor.metrics = classification_metrics(y_test, proba)
+        predictor.metrics["n_samples"] = n_rows
+        predictor.metrics["peak_memory_mb"] = monitor.report_mb()
+        # Sem probabilidades out-of-fold: métricas e faixas de risco vêm do
+        # conjunto reservado
+        predictor.evaluation = {
+            "confidence_level": 0.95,
+            "confidence_intervals": bootstrap_confidence_intervals(y_test, proba),
+        }
+        predictor.oof = None
+        predictor.risk_thresholds, predictor.evaluation["risk_bands"] = risk_thresholds(y_test, proba)
+
+    predictor._store_feature_importance()
+    predictor.model_version = predictor._new_model_version()
+    predictor._print_report()
+    print(f"💾 Pico de memória: {predictor.metrics['peak_memory_mb']:.0f} MB")
+
+    return predictor.metrics
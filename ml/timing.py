@@ -0,0 +1,256 @@
+"""
+Tempo e memória por etapa do treino
+
+Cada etapa (fetch, prepare_features, split, fit, cv, save, ...) registra:
+- wall_s: tempo de relógio
+- cpu_s: tempo de CPU deste processo (todas as threads; não inclui os
+  processos de trabalho do joblib, então cpu_s < wall_s x núcleos indica
+  trabalho feito fora do processo)
+- peak_rss_mb: pico de RSS durante a etapa. No Linux o pico do kernel
+  (VmHWM) é zerado no início de cada etapa via /proc/self/clear_refs; sem
+  isso é o pico do processo até o fim da etapa
+- rss_delta_mb: RSS no fim menos RSS no início
+- peak_traced_mb: pico das alocações Python/NumPy vistas pelo tracemalloc,
+  só com ML_TRAIN_TRACEMALLOC=1 (ligado durante cada etapa). Desligado por
+  padrão: deixa o ajuste das árvores ~4x mais lento e distorceria os
+  próprios tempos medidos
+
+Etapas com o mesmo nome são acumuladas (tempos somados, picos pelo máximo).
+O perfil é salvo no artefato (.joblib, "training_profile") e em um JSON ao
+lado dele (<modelo>.profile.json), e impresso como tabela ao fim do treino,
+com a variação em relação ao artefato anterior. A comparação lê só o JSON:
+carregar o .joblib inteiro (todas as árvores) custaria mais que a tabela.
+"""
+
+import json
+import os
+import platform
+import sys
+import time
+import tracemalloc
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# Colunas da tabela: (chave, título, formato)
+COLUMNS = [
+    ("wall_s", "wall (s)", "{:.2f}"),
+    ("cpu_s", "CPU (s)", "{:.2f}"),
+    ("peak_rss_mb", "pico RSS (MB)", "{:.0f}"),
+    ("rss_delta_mb", "ΔRSS (MB)", "{:+.0f}"),
+    ("peak_traced_mb", "pico tracemalloc (MB)", "{:.1f}"),
+]
+
+
+def current_rss_mb() -> Optional[float]:
+    """RSS atual do processo em MB (None se indisponível)"""
+    try:
+        with open("/proc/self/statm") as f:
+            resident_pages = int(f.read().split()[1])
+        return resident_pages * os.sysconf("SC_PAGE_SIZE") / 1024**2
+    except (OSError, ValueError, AttributeError):
+        pass
+
+    try:
+        import psutil
+
+        return psutil.Process().memory_info().rss / 1024**2
+    except ImportError:
+        return None
+
+
+def peak_rss_mb() -> Optional[float]:
+    """Pico de RSS do processo em MB, desde o último _reset_peak_rss (None se indisponível)"""
+    if resource is None:
+        return current_rss_mb()
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reporta em KB, macOS em bytes
+    return peak / 1024**2 if sys.platform == "darwin" else peak / 1024
+
+
+def _reset_peak_rss() -> bool:
+    """Zera o pico de RSS do kernel, e com ele o ru_maxrss (Linux >= 4.0); False se não suportado"""
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+        return True
+    except OSError:
+        return False
+
+
+class TrainingProfile:
+    """Etapas cronometradas de um treino"""
+
+    def __init__(self, trace_memory: Optional[bool] = None):
+        """
+        Args:
+            trace_memory: Liga o tracemalloc em cada etapa (padrão:
+                ML_TRAIN_TRACEMALLOC=1; desligado se não definido)
+        """
+        if trace_memory is None:
+            trace_memory = os.getenv("ML_TRAIN_TRACEMALLOC", "0") == "1"
+        self.trace_memory = trace_memory
+        self.stages: List[Dict] = []
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        """Mede o bloco como a etapa name"""
+        started_tracing = self.trace_memory and not tracemalloc.is_tracing()
+        if started_tracing:
+            tracemalloc.start()
+        elif tracemalloc.is_tracing():
+            tracemalloc.reset_peak()
+        peak_is_stage = _reset_peak_rss()
+        rss_before = current_rss_mb()
+        wall = time.perf_counter()
+        cpu = time.process_time()
+        try:
+            yield
+        finally:
+            stats = {
+                "name": name,
+                "wall_s": time.perf_counter() - wall,
+                "cpu_s": time.process_time() - cpu,
+                "peak_rss_mb": peak_rss_mb(),
+                "rss_delta_mb": None,
+                "peak_traced_mb": None,
+                "peak_rss_scope": "stage" if peak_is_stage else "process",
+            }
+            rss_after = current_rss_mb()
+            if rss_before is not None and rss_after is not None:
+                stats["rss_delta_mb"] = rss_after - rss_before
+            if tracemalloc.is_tracing():
+                stats["peak_traced_mb"] = tracemalloc.get_traced_memory()[1] / 1024**2
+            if started_tracing:
+                tracemalloc.stop()
+            self._add(stats)
+
+    def _add(self, stats: Dict):
+        stats = dict(stats)
+        calls = stats.pop("calls", 1)
+        for existing in self.stages:
+            if existing["name"] == stats["name"]:
+                existing["wall_s"] += stats["wall_s"]
+                existing["cpu_s"] += stats["cpu_s"]
+                for key in ("peak_rss_mb", "peak_traced_mb"):
+                    values = [value for value in (existing[key], stats[key]) if value is not None]
+                    existing[key] = max(values) if values else None
+                if existing["rss_delta_mb"] is not None and stats["rss_delta_mb"] is not None:
+                    existing["rss_delta_mb"] += stats["rss_delta_mb"]
+                existing["calls"] += calls
+                return
+        self.stages.append({**stats, "calls": calls})
+
+    def include(self, other: "TrainingProfile"):
+        """Acrescenta as etapas de outro perfil (ex.: fetch compartilhado entre modelos)"""
+        for stats in other.stages:
+            self._add(stats)
+
+    def to_dict(self) -> Dict:
+        """Perfil salvo no artefato"""
+        peaks = [stats["peak_rss_mb"] for stats in self.stages if stats["peak_rss_mb"] is not None]
+        return {
+            "stages": [dict(stats) for stats in self.stages],
+            "total_wall_s": sum(stats["wall_s"] for stats in self.stages),
+            "total_cpu_s": sum(stats["cpu_s"] for stats in self.stages),
+            "peak_rss_mb": max(peaks) if peaks else None,
+            "tracemalloc": self.trace_memory,
+            "environment": {
+                "python": platform.python_version(),
+                "platform": platform.platform(),
+                "cpu_count": os.cpu_count(),
+            },
+        }
+
+    def table(self, previous: Optional[Dict] = None) -> str:
+        """
+        Tabela das etapas
+
+        Args:
+            previous: training_profile de um artefato anterior; acrescenta a
+                variação do tempo de relógio de cada etapa
+        """
+        before = {stats["name"]: stats for stats in (previous or {}).get("stages", [])}
+        headers = ["etapa"] + [title for _, title, _ in COLUMNS] + (["Δ wall"] if previous else [])
+        rows = []
+        for stats in self.stages + [self._total()]:
+            row = [stats["name"]] + [
+                "-" if stats.get(key) is None else fmt.format(stats[key]) for key, _, fmt in COLUMNS
+            ]
+            if previous:
+                old = before.get(stats["name"]) if stats["name"] != "total" else {
+                    "wall_s": previous.get("total_wall_s")
+                }
+                if old and old.get("wall_s"):
+                    row.append(f"{(stats['wall_s'] - old['wall_s']) / old['wall_s']:+.0%}")
+                else:
+                    row.append("novo")
+            rows.append(row)
+
+        widths = [max(len(row[i]) for row in [headers] + rows) for i in range(len(headers))]
+        lines = [
+            "  ".join(cell.ljust(width) if i == 0 else cell.rjust(width) for i, (cell, width) in enumerate(zip(row, widths)))
+            for row in [headers] + rows
+        ]
+        lines.insert(1, "  ".join("-" * width for width in widths))
+        lines.insert(len(lines) - 1, lines[1])
+        return "\n".join(lines)
+
+    def _total(self) -> Dict:
+        profile = self.to_dict()
+        return {
+            "name": "total",
+            "wall_s": profile["total_wall_s"],
+            "cpu_s": profile["total_cpu_s"],
+            "peak_rss_mb": profile["peak_rss_mb"],
+            "rss_delta_mb": None,
+            "peak_traced_mb": None,
+        }
+
+    def print_table(self, title: str, previous: Optional[Dict] = None):
+        """Imprime a tabela (previous: ver table)"""
+        print(f"\n⏱️  {title}")
+        print(self.table(previous))
+
+
+def profile_path(path: str) -> str:
+    """Perfil do treino gravado ao lado do .joblib"""
+    return os.path.splitext(path)[0] + ".profile.json"
+
+
+def save_profile(profile: Optional[Dict], path: str):
+    """Grava o training_profile do artefato .joblib em path (None remove o anterior)"""
+    target = profile_path(path)
+    if profile is None:
+        if os.path.exists(target):
+            os.remove(target)
+        return
+    tmp_path = f"{target}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(profile, f, indent=2)
+    os.replace(tmp_path, target)
+
+
+def previous_profile(path: str) -> Optional[Dict]:
+    """
+    training_profile do artefato .joblib em path, lido de <modelo>.profile.json
+
+    None se o JSON não existe ou não é legível (artefatos anteriores a ele
+    não são comparados: o .joblib não é carregado).
+    """
+    try:
+        with open(profile_path(path)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def save_and_report(predictor, path: str):
+    """Salva o ComplicationPredictor e imprime as etapas do treino, comparadas ao artefato anterior em path"""
+    previous = previous_profile(path)
+    predictor.save(path)
+    predictor.profile.print_table(f"TEMPO E MEMÓRIA POR ETAPA ({predictor.model_type})", previous)
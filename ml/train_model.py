@@ -2,9 +2,13 @@
 Script para treinar modelo ML com dados do banco PostgreSQL
 """
 
+import argparse
 import pandas as pd
 import psycopg2
 from model import ComplicationPredictor
+from queries import training_query
+from registry import MODEL_FILENAME, compiled_path, fallback_path, tenant_model_path
+from timing import TrainingProfile, previous_profile, save_and_report
 import os
 from dotenv import load_dotenv
 
@@ -13,84 +17,21 @@ load_dotenv("../.env")
 
 DATABASE_URL = os.getenv("DATABASE_URL")
 
-def fetch_training_data():
+
+def fetch_training_data(tenant_id=None):
     """
     Busca dados do banco PostgreSQL para treinamento
+
+    Args:
+        tenant_id: Se informado, só os pacientes desse médico (Patient.userId)
     """
     print("🔗 Conectando ao banco de dados...")
 
     conn = psycopg2.connect(DATABASE_URL)
 
-    query = """
-    SELECT
-        p.id as patient_id,
-        p.age as idade,
-        p.sex as sexo,
-
-        -- Comorbidades (concatenadas)
-        STRING_AGG(DISTINCT c.name, ',') as comorbidades,
-
-        -- Cirurgia
-        s.type as tipo_cirurgia,
-        s."durationMinutes" as duracao_minutos,
-
-        -- Anestesia
-        CASE WHEN a."pudendoBlock" = true THEN 1 ELSE 0 END as bloqueio_pudendo,
-
-        -- Follow-up D+1
-        MAX(CASE
-            WHEN fu."dayNumber" = 1
-            THEN CAST(fur."questionnaireData"->>'painLevel' AS INTEGER)
-        END) as dor_d1,
-
-        MAX(CASE
-            WHEN fu."dayNumber" = 1
-            THEN CASE WHEN fur."questionnaireData"->>'urinaryRetention' = 'true' THEN 1 ELSE 0 END
-        END) as retencao_urinaria,
-
-        MAX(CASE
-            WHEN fu."dayNumber" = 1
-            THEN CASE WHEN fur."questionnaireData"->>'fever' = 'true' THEN 1 ELSE 0 END
-        END) as febre,
-
-        MAX(CASE
-            WHEN fu."dayNumber" = 1
-            THEN CASE WHEN fur."questionnaireData"->>'intenseBleeding' = 'true' THEN 1 ELSE 0 END
-        END) as sangramento_intenso,
-
-        -- TARGET: Teve complicação? (risco high ou critical em D+3 a D+14)
-        MAX(CASE
-            WHEN fu."dayNumber" >= 3 AND fur."riskLevel" IN ('high', 'critical')
-            THEN 1
-            ELSE 0
-        END) as teve_complicacao
-
-    FROM "Patient" p
-    LEFT JOIN "PatientComorbidity" pc ON p.id = pc."patientId"
-    LEFT JOIN "Comorbidity" c ON pc."comorbidityId" = c.id
-    LEFT JOIN "Surgery" s ON p.id = s."patientId"
-    LEFT JOIN "Anesthesia" a ON s.id = a."surgeryId"
-    LEFT JOIN "FollowUp" fu ON s.id = fu."surgeryId"
-    LEFT JOIN "FollowUpResponse" fur ON fu.id = fur."followUpId"
-
-    WHERE
-        p.age IS NOT NULL
-        AND s.type IS NOT NULL
-        AND s.status = 'completed'
-        -- Apenas pacientes com pelo menos 1 follow-up respondido
-        AND EXISTS (
-            SELECT 1 FROM "FollowUp" fu2
-            WHERE fu2."patientId" = p.id AND fu2.status = 'responded'
-        )
-
-    GROUP BY p.id, p.age, p.sex, s.type, s."durationMinutes", a."pudendoBlock"
-    HAVING
-        -- Precisa ter respondido D+1
-        MAX(CASE WHEN fu."dayNumber" = 1 THEN 1 ELSE 0 END) = 1
-    """
-
     print("📊 Executando query...")
-    df = pd.read_sql_query(query, conn)
+    query, params = training_query(tenant_id)
+    df = pd.read_sql_query(query, conn, params=params)
     conn.close()
 
     print(f"✅ Dados carregados: {len(df)} pacientes")
@@ -98,16 +39,20 @@ def fetch_training_data():
     return df
 
 
-def main():
+def fetch_and_explore(tenant_id=None, profile=None):
     """
-    Função principal de treinamento
-    """
-    print("=" * 60)
-    print("🤖 TREINAMENTO DO MODELO DE PREDIÇÃO DE COMPLICAÇÕES")
-    print("=" * 60)
+    Carrega o dataset inteiro e imprime a análise exploratória
+
+    Args:
+        tenant_id: Se informado, só os pacientes desse médico
+        profile: TrainingProfile que recebe a etapa "fetch"
 
+    Returns:
+        DataFrame de treino, ou None se o usuário cancelar
+    """
     # 1. Busca dados
-    df = fetch_training_data()
+    with (profile or TrainingProfile()).stage("fetch"):
+        df = fetch_training_data(tenant_id)
 
     if len(df) < 30:
         print("⚠️ ATENÇÃO: Poucos dados para treinamento!")
@@ -118,7 +63,7 @@ def main():
         response = input("Deseja continuar mesmo assim? (s/n): ")
         if response.lower() != 's':
             print("❌ Treinamento cancelado.")
-            return
+            return None
 
     # 2. Análise exploratória
     print("\n📈 ANÁLISE EXPLORATÓRIA DOS DADOS:")
@@ -133,14 +78,99 @@ def main():
     print("\nDistribuição por sexo:")
     print(df['sexo'].value_counts())
 
+    return df
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Treina os modelos de predição de complicações")
+    parser.add_argument(
+        "--streaming",
+        action="store_true",
+        help="Treino out-of-core: lê o banco em blocos, sem carregar o dataset inteiro",
+    )
+    parser.add_argument("--chunk-size", type=int, help="Linhas por bloco (padrão: ML_TRAIN_CHUNK_SIZE ou 50000)")
+    parser.add_argument("--max-memory-mb", type=float, help="Limite de memória do treino (padrão: ML_TRAIN_MAX_MEMORY_MB)")
+    parser.add_argument(
+        "--compress",
+        action="store_true",
+        help="Poda e seleciona as árvores depois do treino (ver compression.py; só no treino em memória)",
+    )
+    parser.add_argument("--auc-tolerance", type=float, help="Perda máxima de AUC OOF (padrão: ML_COMPRESS_AUC_TOLERANCE ou 0.005)")
+    parser.add_argument("--prune-epsilon", type=float, help="Epsilon da poda de subárvores (padrão: ML_COMPRESS_PRUNE_EPSILON ou 0)")
+    parser.add_argument(
+        "--tenant",
+        help="Treina só com os pacientes deste médico (userId) e salva em models/tenants/<id>/",
+    )
+    return parser.parse_args()
+
+
+def main():
+    """
+    Função principal de treinamento
+    """
+    args = parse_args()
+
+    print("=" * 60)
+    print("🤖 TREINAMENTO DO MODELO DE PREDIÇÃO DE COMPLICAÇÕES")
+    print("=" * 60)
+
+    # Modelo por médico: mesmo layout de arquivos em models/tenants/<id>/
+    output_dir = os.path.dirname(tenant_model_path(args.tenant)) if args.tenant else "models"
+    if args.tenant:
+        print(f"👤 Tenant: {args.tenant} (artefatos em {output_dir}/)")
+
+    # Busca compartilhada pelos dois modelos: entra no perfil de cada um
+    fetch_profile = TrainingProfile()
+
+    if args.streaming and args.compress:
+        print("⚠️  --compress requer o treino em memória; ignorado com --streaming")
+
+    if args.streaming:
+        from streaming import QueryChunkSource, StreamingConfig
+
+        config = StreamingConfig.from_env()
+        if args.chunk_size:
+            config.chunk_size = args.chunk_size
+        if args.max_memory_mb:
+            config.max_memory_mb = args.max_memory_mb
+
+        query, params = training_query(args.tenant)
+        source = QueryChunkSource(lambda: psycopg2.connect(DATABASE_URL), query, params)
+
+        def train(predictor):
+            return predictor.train_streaming(source, config=config)
+
+    else:
+        df = fetch_and_explore(args.tenant, fetch_profile)
+        if df is None:
+            return
+
+        compression = None
+        if args.compress:
+            from compression import CompressionConfig
+
+            compression = CompressionConfig.from_env()
+            if args.auc_tolerance is not None:
+                compression.auc_tolerance = args.auc_tolerance
+            if args.prune_epsilon is not None:
+                compression.prune_epsilon = args.prune_epsilon
+
+        def train(predictor):
+            metrics = predictor.train(df)
+            if compression is None:
+                return metrics
+            predictor.compress(compression)
+            return predictor.metrics
+
     # 3. Treina modelo Random Forest
     print("\n" + "=" * 60)
     print("🌲 RANDOM FOREST")
     print("=" * 60)
 
     predictor_rf = ComplicationPredictor(model_type="random_forest")
-    metrics_rf = predictor_rf.train(df)
-    predictor_rf.save("models/complication_predictor_rf.joblib")
+    predictor_rf.profile.include(fetch_profile)
+    metrics_rf = train(predictor_rf)
+    save_and_report(predictor_rf, os.path.join(output_dir, "complication_predictor_rf.joblib"))
 
     # 4. Treina modelo Gradient Boosting
     print("\n" + "=" * 60)
@@ -148,8 +178,9 @@ def main():
     print("=" * 60)
 
     predictor_gb = ComplicationPredictor(model_type="gradient_boosting")
-    metrics_gb = predictor_gb.train(df)
-    predictor_gb.save("models/complication_predictor_gb.joblib")
+    predictor_gb.profile.include(fetch_profile)
+    metrics_gb = train(predictor_gb)
+    save_and_report(predictor_gb, os.path.join(output_dir, "complication_predictor_gb.joblib"))
 
     # 5. Compara modelos
     print("\n" + "=" * 60)
@@ -167,15 +198,30 @@ def main():
     if metrics_rf['roc_auc'] >= metrics_gb['roc_auc']:
         print("\n✅ VENCEDOR: Random Forest")
         print(f"   AUC-ROC: {metrics_rf['roc_auc']:.3f}")
-
-        # Salva como modelo padrão
-        predictor_rf.save("models/complication_predictor.joblib")
+        winner = predictor_rf
     else:
         print("\n✅ VENCEDOR: Gradient Boosting")
         print(f"   AUC-ROC: {metrics_gb['roc_auc']:.3f}")
+        winner = predictor_gb
 
-        # Salva como modelo padrão
-        predictor_gb.save("models/complication_predictor.joblib")
+    # Fallback destilado (servido pela API quando o modelo não responde no prazo)
+    model_path = os.path.join(output_dir, MODEL_FILENAME)
+    if args.streaming:
+        print("⚠️  Fallback destilado requer o treino em memória; não gerado com --streaming")
+    else:
+        winner.distill()
+
+    # Salva como modelo padrão
+    previous = previous_profile(model_path)
+    winner.save(model_path)
+    winner.export_compiled(compiled_path(model_path))
+    if winner.fallback is not None:
+        winner.export_fallback(fallback_path(model_path))
+    elif os.path.exists(fallback_path(model_path)):
+        # Fallback de um treino anterior: destilado de outro modelo
+        os.remove(fallback_path(model_path))
+        print(f"🗑️  Fallback anterior removido: {fallback_path(model_path)}")
+    winner.profile.print_table(f"TEMPO E MEMÓRIA POR ETAPA (vencedor: {winner.model_type})", previous)
 
     print("\n" + "=" * 60)
     print("✅ TREINAMENTO CONCLUÍDO!")
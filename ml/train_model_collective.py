@@ -8,6 +8,8 @@ import requests
 import os
 from dotenv import load_dotenv
 from model import ComplicationPredictor
+from registry import fallback_path
+from timing import TrainingProfile, previous_profile, save_and_report
 
 # Carrega variáveis de ambiente
 load_dotenv("../.env")
@@ -117,8 +119,10 @@ def main():
     print("   ✓ Conforme LGPD (Art. 7º, IV e Art. 11)")
     print()
 
-    # 1. Busca dataset coletivo
-    dataset = fetch_collective_dataset()
+    # 1. Busca dataset coletivo (etapa "fetch" inclui a conversão para DataFrame)
+    fetch_profile = TrainingProfile()
+    with fetch_profile.stage("fetch"):
+        dataset = fetch_collective_dataset()
 
     if not dataset or dataset["totalPatients"] == 0:
         print("\n❌ Sem dados para treinamento.")
@@ -129,7 +133,8 @@ def main():
         return
 
     # 2. Converte para DataFrame
-    df = convert_to_dataframe(dataset)
+    with fetch_profile.stage("fetch"):
+        df = convert_to_dataframe(dataset)
 
     if len(df) < 30:
         print("\n⚠️ ATENÇÃO: Poucos dados para treinamento!")
@@ -163,8 +168,9 @@ def main():
     print("=" * 60)
 
     predictor_rf = ComplicationPredictor(model_type="random_forest")
+    predictor_rf.profile.include(fetch_profile)
     metrics_rf = predictor_rf.train(df)
-    predictor_rf.save("models/complication_predictor_collective_rf.joblib")
+    save_and_report(predictor_rf, "models/complication_predictor_collective_rf.joblib")
 
     # 5. Treina modelo Gradient Boosting
     print("\n" + "=" * 60)
@@ -172,8 +178,9 @@ def main():
     print("=" * 60)
 
     predictor_gb = ComplicationPredictor(model_type="gradient_boosting")
+    predictor_gb.profile.include(fetch_profile)
     metrics_gb = predictor_gb.train(df)
-    predictor_gb.save("models/complication_predictor_collective_gb.joblib")
+    save_and_report(predictor_gb, "models/complication_predictor_collective_gb.joblib")
 
     # 6. Compara modelos
     print("\n" + "=" * 60)
@@ -190,20 +197,26 @@ def main():
     if metrics_rf["roc_auc"] >= metrics_gb["roc_auc"]:
         print("\n✅ VENCEDOR: Random Forest")
         print(f"   AUC-ROC: {metrics_rf['roc_auc']:.3f}")
-
-        # Salva como modelo padrão COLETIVO
-        predictor_rf.save("models/complication_predictor_collective.joblib")
+        winner = predictor_rf
         best_model = "Random Forest"
         best_auc = metrics_rf["roc_auc"]
     else:
         print("\n✅ VENCEDOR: Gradient Boosting")
         print(f"   AUC-ROC: {metrics_gb['roc_auc']:.3f}")
-
-        # Salva como modelo padrão COLETIVO
-        predictor_gb.save("models/complication_predictor_collective.joblib")
+        winner = predictor_gb
         best_model = "Gradient Boosting"
         best_auc = metrics_gb["roc_auc"]
 
+    # Fallback destilado (servido pela API quando o modelo não responde no prazo)
+    winner.distill()
+
+    # Salva como modelo padrão COLETIVO
+    previous = previous_profile("models/complication_predictor_collective.joblib")
+    winner.save("models/complication_predictor_collective.joblib")
+    winner.export_compiled("models/complication_predictor_collective.compiled")
+    winner.export_fallback(fallback_path("models/complication_predictor_collective.joblib"))
+    winner.profile.print_table(f"TEMPO E MEMÓRIA POR ETAPA (vencedor: {winner.model_type})", previous)
+
     print("\n" + "=" * 60)
     print("✅ TREINAMENTO COM INTELIGÊNCIA COLETIVA CONCLUÍDO!")
     print("=" * 60)
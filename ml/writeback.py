@@ -0,0 +1,237 @@
+"""
+Gravação em lote das predições no PostgreSQL
+
+Escreve linhas de predição (mesmo formato de latest_risk: patient_id,
+surgery_id, probability, risk_level, model_version, scored_at) na tabela
+"MlPrediction" (model MlPrediction do Prisma), em transações grandes:
+
+- "copy": COPY para uma tabela temporária + um INSERT ... SELECT com
+  ON CONFLICT por transação (padrão)
+- "values": execute_values (INSERT com várias linhas por comando)
+- "row": um INSERT por linha, cada um na própria transação (o que o
+  Next.js faz hoje, uma resposta HTTP por vez); só para comparação
+
+O upsert é idempotente pela chave (patientId, surgeryId, modelVersion):
+regravar o mesmo lote não duplica linhas, e uma predição mais antiga não
+sobrescreve uma mais nova. Com update_surgeries, o resultado também vai
+para as colunas predictedRisk/predictedRiskLevel/mlModelVersion/
+mlPredictedAt de "Surgery", lidas pelo Next.js.
+"""
+
+import csv
+import io
+import time
+from datetime import datetime, timezone
+from typing import Dict, Iterable, List
+
+from psycopg2.extras import execute_values
+
+BATCH_ROWS = 100_000
+
+# Mesma estrutura da migration do Prisma (add_ml_predictions), sem as FKs:
+# para bancos de teste/benchmark sem as tabelas do app
+PREDICTIONS_TABLE_SQL = """
+CREATE TABLE IF NOT EXISTS "MlPrediction" (
+    "id" TEXT NOT NULL,
+    "createdAt" TIMESTAMP(3) NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    "updatedAt" TIMESTAMP(3) NOT NULL,
+    "patientId" TEXT NOT NULL,
+    "surgeryId" TEXT NOT NULL,
+    "modelVersion" TEXT NOT NULL,
+    "probability" DOUBLE PRECISION NOT NULL,
+    "riskLevel" TEXT NOT NULL,
+    "predictedAt" TIMESTAMP(3) NOT NULL,
+    CONSTRAINT "MlPrediction_pkey" PRIMARY KEY ("id")
+);
+CREATE UNIQUE INDEX IF NOT EXISTS "MlPrediction_patientId_surgeryId_modelVersion_key"
+    ON "MlPrediction"("patientId", "surgeryId", "modelVersion");
+CREATE INDEX IF NOT EXISTS "MlPrediction_surgeryId_idx" ON "MlPrediction"("surgeryId");
+CREATE INDEX IF NOT EXISTS "MlPrediction_predictedAt_idx" ON "MlPrediction"("predictedAt");
+"""
+
+COLUMNS = ("patient_id", "surgery_id", "model_version", "probability", "risk_level", "scored_at")
+
+_STAGING_SQL = """
+CREATE TEMP TABLE ml_prediction_staging (
+    patient_id TEXT,
+    surgery_id TEXT,
+    model_version TEXT,
+    probability DOUBLE PRECISION,
+    risk_level TEXT,
+    scored_at TIMESTAMPTZ
+) ON COMMIT DROP
+"""
+
+# id gerado no banco (o @default(cuid()) do Prisma só vale para o client).
+# Colunas DateTime do Prisma são TIMESTAMP em UTC, daí os AT TIME ZONE 'UTC'.
+_UPSERT_SQL = """
+INSERT INTO "MlPrediction" (
+    "id", "updatedAt", "patientId", "surgeryId", "modelVersion", "probability", "riskLevel", "predictedAt"
+)
+{source}
+ON CONFLICT ("patientId", "surgeryId", "modelVersion") DO UPDATE SET
+    "probability" = EXCLUDED."probability",
+    "riskLevel" = EXCLUDED."riskLevel",
+    "predictedAt" = EXCLUDED."predictedAt",
+    "updatedAt" = EXCLUDED."updatedAt"
+WHERE "MlPrediction"."predictedAt" <= EXCLUDED."predictedAt"
+"""
+
+# ON CONFLICT não pode atualizar a mesma linha duas vezes no mesmo comando:
+# fica a predição mais recente de cada chave do lote
+_STAGING_SOURCE = """
+SELECT DISTINCT ON (patient_id, surgery_id, model_version)
+    gen_random_uuid()::text, now() AT TIME ZONE 'UTC', patient_id, surgery_id, model_version,
+    probability, risk_level, scored_at AT TIME ZONE 'UTC'
+FROM ml_prediction_staging
+ORDER BY patient_id, surgery_id, model_version, scored_at DESC
+"""
+
+_VALUES_SOURCE = "VALUES %s"
+_VALUES_TEMPLATE = (
+    "(gen_random_uuid()::text, now() AT TIME ZONE 'UTC', %s, %s, %s, %s, %s, %s::timestamptz AT TIME ZONE 'UTC')"
+)
+
+_UPDATE_SURGERIES_SQL = """
+UPDATE "Surgery" s SET
+    "predictedRisk" = p.probability,
+    "predictedRiskLevel" = p.risk_level,
+    "mlModelVersion" = p.model_version,
+    "mlPredictedAt" = p.scored_at AT TIME ZONE 'UTC'
+FROM (
+    SELECT DISTINCT ON (surgery_id) surgery_id, probability, risk_level, model_version, scored_at
+    FROM {source}
+    ORDER BY surgery_id, scored_at DESC
+) p
+WHERE s.id = p.surgery_id
+  AND (s."mlPredictedAt" IS NULL OR s."mlPredictedAt" <= p.scored_at AT TIME ZONE 'UTC')
+"""
+
+
+def ensure_predictions_table(conn):
+    """Cria "MlPrediction" se não existir (fora do Prisma: testes e benchmarks)"""
+    with conn, conn.cursor() as cursor:
+        cursor.execute(PREDICTIONS_TABLE_SQL)
+
+
+def _tuples(rows: Iterable[Dict]) -> List[tuple]:
+    """Linhas -> tuplas na ordem de COLUMNS (sem cirurgia não há chave)"""
+    return [tuple(row[column] for column in COLUMNS) for row in rows if row.get("surgery_id")]
+
+
+def _copy_buffer(batch: List[tuple]) -> io.StringIO:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator="\n")
+    writer.writerows(batch)
+    buffer.seek(0)
+    return buffer
+
+
+def _write_copy(cursor, batch: List[tuple], update_surgeries: bool):
+    cursor.execute(_STAGING_SQL)
+    cursor.copy_expert(
+        f"COPY ml_prediction_staging ({', '.join(COLUMNS)}) FROM STDIN WITH (FORMAT csv)",
+        _copy_buffer(batch),
+    )
+    cursor.execute(_UPSERT_SQL.format(source=_STAGING_SOURCE))
+    if update_surgeries:
+        cursor.execute(_UPDATE_SURGERIES_SQL.format(source="ml_prediction_staging"))
+
+
+def _write_values(cursor, batch: List[tuple], update_surgeries: bool, page_size: int):
+    # Mesma deduplicação do COPY, em Python (a ordem do lote decide empates)
+    latest = {}
+    for row in batch:
+        key = row[:3]
+        if key not in latest or latest[key][5] <= row[5]:
+            latest[key] = row
+    execute_values(
+        cursor, _UPSERT_SQL.format(source=_VALUES_SOURCE), list(latest.values()),
+        template=_VALUES_TEMPLATE, page_size=page_size,
+    )
+    if update_surgeries:
+        source = (
+            "(VALUES %s) AS v (patient_id, surgery_id, model_version, probability, risk_level, scored_at)"
+        )
+        execute_values(
+            cursor, _UPDATE_SURGERIES_SQL.format(source=source), list(latest.values()),
+            template="(%s, %s, %s, %s::double precision, %s, %s::timestamptz)", page_size=page_size,
+        )
+
+
+def _write_rows(conn, batch: List[tuple], update_surgeries: bool):
+    source = "(SELECT %s, %s, %s, %s::double precision, %s, %s::timestamptz) AS v" \
+        " (patient_id, surgery_id, model_version, probability, risk_level, scored_at)"
+    for row in batch:
+        with conn, conn.cursor() as cursor:
+            cursor.execute(_UPSERT_SQL.format(source=_VALUES_SOURCE.replace("%s", _VALUES_TEMPLATE)), row)
+            if update_surgeries:
+                cursor.execute(_UPDATE_SURGERIES_SQL.format(source=source), row)
+
+
+def write_predictions(
+    conn,
+    rows: Iterable[Dict],
+    method: str = "copy",
+    batch_rows: int = BATCH_ROWS,
+    update_surgeries: bool = False,
+    page_size: int = 1000,
+) -> Dict:
+    """
+    Upsert das predições em "MlPrediction"
+
+    Args:
+        conn: Conexão psycopg2
+        rows: Dicts com patient_id, surgery_id, model_version, probability,
+            risk_level e scored_at (datetime com fuso ou ISO 8601 com offset)
+        method: "copy", "values" ou "row"
+        batch_rows: Linhas por transação ("copy" e "values")
+        update_surgeries: Também atualiza as colunas de predição de "Surgery"
+        page_size: Linhas por INSERT no método "values"
+
+    Returns:
+        Linhas gravadas, ignoradas (sem cirurgia), transações e segundos
+    """
+    if method not in ("copy", "values", "row"):
+        raise ValueError(f"Método desconhecido: {method}")
+
+    rows = list(rows)
+    batch_all = _tuples(rows)
+    start = time.perf_counter()
+
+    if method == "row":
+        _write_rows(conn, batch_all, update_surgeries)
+        transactions = len(batch_all)
+    else:
+        transactions = 0
+        for offset in range(0, len(batch_all), batch_rows):
+            batch = batch_all[offset : offset + batch_rows]
+            with conn, conn.cursor() as cursor:
+                if method == "copy":
+                    _write_copy(cursor, batch, update_surgeries)
+                else:
+                    _write_values(cursor, batch, update_surgeries, page_size)
+            transactions += 1
+
+    return {
+        "rows": len(batch_all),
+        "skipped": len(rows) - len(batch_all),
+        "transactions": transactions,
+        "seconds": time.perf_counter() - start,
+    }
+
+
+def prediction_rows(patient_ids, surgery_ids, probabilities, predictor, scored_at=None) -> List[Dict]:
+    """Linhas de write_predictions a partir de um lote predito"""
+    scored_at = scored_at or datetime.now(timezone.utc)
+    return [
+        {
+            "patient_id": patient_id,
+            "surgery_id": surgery_id,
+            "model_version": predictor.model_version,
+            "probability": float(probability),
+            "risk_level": predictor.risk_level(float(probability))[0],
+            "scored_at": scored_at,
+        }
+        for patient_id, surgery_id, probability in zip(patient_ids, surgery_ids, probabilities)
+    ]
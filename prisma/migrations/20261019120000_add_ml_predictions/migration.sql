@@ -0,0 +1,29 @@
+-- CreateTable
+CREATE TABLE "MlPrediction" (
+    "id" TEXT NOT NULL,
+    "createdAt" TIMESTAMP(3) NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    "updatedAt" TIMESTAMP(3) NOT NULL,
+    "patientId" TEXT NOT NULL,
+    "surgeryId" TEXT NOT NULL,
+    "modelVersion" TEXT NOT NULL,
+    "probability" DOUBLE PRECISION NOT NULL,
+    "riskLevel" TEXT NOT NULL,
+    "predictedAt" TIMESTAMP(3) NOT NULL,
+
+    CONSTRAINT "MlPrediction_pkey" PRIMARY KEY ("id")
+);
+
+-- CreateIndex
+CREATE INDEX "MlPrediction_surgeryId_idx" ON "MlPrediction"("surgeryId");
+
+-- CreateIndex
+CREATE INDEX "MlPrediction_predictedAt_idx" ON "MlPrediction"("predictedAt");
+
+-- CreateIndex
+CREATE UNIQUE INDEX "MlPrediction_patientId_surgeryId_modelVersion_key" ON "MlPrediction"("patientId", "surgeryId", "modelVersion");
+
+-- AddForeignKey
+ALTER TABLE "MlPrediction" ADD CONSTRAINT "MlPrediction_patientId_fkey" FOREIGN KEY ("patientId") REFERENCES "Patient"("id") ON DELETE CASCADE ON UPDATE CASCADE;
+
+-- AddForeignKey
+ALTER TABLE "MlPrediction" ADD CONSTRAINT "MlPrediction_surgeryId_fkey" FOREIGN KEY ("surgeryId") REFERENCES "Surgery"("id") ON DELETE CASCADE ON UPDATE CASCADE;
@@ -0,0 +1,2 @@
+-- CreateIndex
+CREATE INDEX "FollowUp_surgeryId_dayNumber_idx" ON "FollowUp"("surgeryId", "dayNumber");